@@ -8,9 +8,15 @@ import asyncio
 import aiohttp
 from typing import Dict, List, Any, Optional
 from datetime import datetime
+from data.levels import STRONG_TOUCHES, zone_at
 
 logger = logging.getLogger(__name__)
 
+# Luật của _analyze_with_puter - backtest pre-screen (trading/backtest.py) dùng cùng các hằng số này
+AI_MAX_CONFIDENCE = 0.9
+AI_RSI_OVERSOLD, AI_RSI_OVERBOUGHT = 30, 70
+AI_SR_PROXIMITY = 0.02  # Giá cách support / resistance gần nhất dưới 2% => BUY / SELL
+
 class PuterAIClient:
     """Client sử dụng Puter.js để phân tích Bitcoin trading miễn phí"""
     
@@ -76,10 +82,15 @@ class PuterAIClient:
         volume = market_data.get('volume', 0)
         rsi = market_data.get('rsi', 50)
         macd = market_data.get('macd', {})
+        zones = ", ".join(
+            f"{zone['side']} ${zone['low']:,.0f}-${zone['high']:,.0f} ({zone['touches']} lần chạm)"
+            for zone in market_data.get('sr_zones') or []
+        )
         
         prompt = f"""
         Phân tích Bitcoin trading với dữ liệu:
         Giá: ${current_price:,.2f}, Volume: {volume:,.0f}, RSI: {rsi:.2f}
+        Vùng S/R: {zones or 'không có'}
         
         Đưa ra quyết định BUY/SELL/HOLD với lý do chi tiết.
         """
@@ -97,6 +108,7 @@ class PuterAIClient:
         macd = market_data.get('macd', {})
         support_levels = market_data.get('support_levels', [])
         resistance_levels = market_data.get('resistance_levels', [])
+        sr_zones = market_data.get('sr_zones')
         
         # Advanced AI-like analysis
         confidence = 0.5
@@ -105,12 +117,12 @@ class PuterAIClient:
         key_factors = []
         
         # 1. RSI Analysis (weight: 25%)
-        if rsi < 30:
+        if rsi < AI_RSI_OVERSOLD:
             action = "BUY"
             confidence += 0.25
             reasoning_parts.append(f"RSI {rsi:.1f} cho thấy oversold - cơ hội mua tốt")
             key_factors.append("rsi_oversold")
-        elif rsi > 70:
+        elif rsi > AI_RSI_OVERBOUGHT:
             action = "SELL"
             confidence += 0.25
             reasoning_parts.append(f"RSI {rsi:.1f} cho thấy overbought - nên chốt lời")
@@ -155,12 +167,13 @@ class PuterAIClient:
             nearest_support = max([s for s in support_levels if s < current_price], default=0)
             if nearest_support > 0:
                 support_distance = (current_price - nearest_support) / current_price
-                if support_distance < 0.02:  # Within 2% of support
+                if support_distance < AI_SR_PROXIMITY:  # Within 2% of support
                     if action != "SELL":
                         action = "BUY"
                     confidence += 0.25
                     reasoning_parts.append(f"Giá gần support ${nearest_support:,.0f} - khả năng bật lên cao")
                     key_factors.append("near_support")
+                    self._add_zone_factor(zone_at(sr_zones, nearest_support), reasoning_parts, key_factors)
                 elif support_distance < 0.05:  # Within 5% of support
                     confidence += 0.15
                     reasoning_parts.append(f"Giá tiến gần support ${nearest_support:,.0f}")
@@ -170,12 +183,13 @@ class PuterAIClient:
             nearest_resistance = min([r for r in resistance_levels if r > current_price], default=float('inf'))
             if nearest_resistance < float('inf'):
                 resistance_distance = (nearest_resistance - current_price) / current_price
-                if resistance_distance < 0.02:  # Within 2% of resistance
+                if resistance_distance < AI_SR_PROXIMITY:  # Within 2% of resistance
                     if action != "BUY":
                         action = "SELL"
                     confidence += 0.25
                     reasoning_parts.append(f"Giá gần resistance ${nearest_resistance:,.0f} - áp lực bán cao")
                     key_factors.append("near_resistance")
+                    self._add_zone_factor(zone_at(sr_zones, nearest_resistance), reasoning_parts, key_factors)
                 elif resistance_distance < 0.05:  # Within 5% of resistance
                     confidence += 0.15
                     reasoning_parts.append(f"Giá tiến gần resistance ${nearest_resistance:,.0f}")
@@ -188,7 +202,7 @@ class PuterAIClient:
             key_factors.append("positive_sentiment")
         
         # Limit confidence to maximum 0.9
-        confidence = min(confidence, 0.9)
+        confidence = min(confidence, AI_MAX_CONFIDENCE)
         
         # Calculate entry points
         if action == "BUY":
@@ -230,6 +244,14 @@ class PuterAIClient:
             "market_sentiment": market_sentiment
         }
     
+    def _add_zone_factor(self, zone: Optional[Dict[str, Any]], reasoning_parts: List[str], key_factors: List[str]):
+        """Vùng S/R đã được chạm nhiều lần => thêm lý do (không đổi action / confidence như backtest)"""
+        if zone and zone['touches'] >= STRONG_TOUCHES:
+            reasoning_parts.append(
+                f"Vùng {zone['side']} ${zone['low']:,.0f}-${zone['high']:,.0f} đã giữ {zone['touches']} lần"
+            )
+            key_factors.append(f"strong_{zone['side']}_zone")
+    
     def _analyze_price_pattern(self, price_data: List[float], timeframe: str) -> Dict[str, Any]:
         """Phân tích pattern price với logic thông minh"""
         if len(price_data) < 10:
@@ -5,9 +5,13 @@ import random
 import time
 from datetime import datetime, timedelta
 import json
+from config.settings import Settings
 
 class AITradingEngine:
-    def __init__(self):
+    def __init__(self, seed: int = None):
+        # Random riêng của engine - cùng seed (RANDOM_SEED) => cùng chuỗi dự đoán
+        self.rng = random.Random(Settings().RANDOM_SEED if seed is None else seed)
+        
         # Trading patterns learned from historical data
         self.patterns = {
             'morning_breakout': {'time': '09:00-11:00', 'signal': 'BUY', 'confidence': 0.85, 'duration': 15},
@@ -50,13 +54,13 @@ class AITradingEngine:
     def calculate_technical_indicators(self, current_price):
         """Tính toán các chỉ số kỹ thuật"""
         # Simulated technical indicators
-        rsi = random.uniform(30, 70)
-        macd = random.choice(['bullish', 'bearish', 'neutral'])
-        volume = random.uniform(0.8, 1.5)  # Volume multiplier
+        rsi = self.rng.uniform(30, 70)
+        macd = self.rng.choice(['bullish', 'bearish', 'neutral'])
+        volume = self.rng.uniform(0.8, 1.5)  # Volume multiplier
         
         # Support and resistance levels
-        support = current_price * random.uniform(0.97, 0.99)
-        resistance = current_price * random.uniform(1.01, 1.03)
+        support = current_price * self.rng.uniform(0.97, 0.99)
+        resistance = current_price * self.rng.uniform(1.01, 1.03)
         
         return {
             'rsi': rsi,
@@ -78,16 +82,16 @@ class AITradingEngine:
         # Determine action based on multiple factors
         if signal_strength > 0.7:
             action = 'BUY'
-            confidence = min(0.95, signal_strength + random.uniform(0.05, 0.15))
+            confidence = min(0.95, signal_strength + self.rng.uniform(0.05, 0.15))
             target_price = current_price * (1 + strategy['target_profit']/100)
         elif signal_strength < 0.3:
             action = 'SELL'
-            confidence = min(0.95, (1 - signal_strength) + random.uniform(0.05, 0.15))
+            confidence = min(0.95, (1 - signal_strength) + self.rng.uniform(0.05, 0.15))
             target_price = current_price * (1 - strategy['target_profit']/100)
         else:
             action = 'HOLD'
-            confidence = random.uniform(0.6, 0.8)
-            target_price = current_price * random.uniform(0.995, 1.005)
+            confidence = self.rng.uniform(0.6, 0.8)
+            target_price = current_price * self.rng.uniform(0.995, 1.005)
         
         # Calculate timing based on timeframe
         timing = self._calculate_timing(timeframe, action, market_session)
@@ -144,17 +148,17 @@ class AITradingEngine:
     def _calculate_timing(self, timeframe, action, market_session):
         """Tính toán thời gian chính xác cho hành động"""
         base_minutes = {
-            '5m': random.randint(3, 7),
-            '15m': random.randint(10, 20),
-            '1h': random.randint(45, 75),
-            '4h': random.randint(180, 300)
+            '5m': self.rng.randint(3, 7),
+            '15m': self.rng.randint(10, 20),
+            '1h': self.rng.randint(45, 75),
+            '4h': self.rng.randint(180, 300)
         }
         
         # Adjust timing based on action urgency
         urgency_multiplier = {
-            'BUY': random.uniform(0.7, 1.0),    # Buy signals are more urgent
-            'SELL': random.uniform(0.8, 1.2),   # Sell signals vary
-            'HOLD': random.uniform(1.2, 2.0)    # Hold can wait longer
+            'BUY': self.rng.uniform(0.7, 1.0),    # Buy signals are more urgent
+            'SELL': self.rng.uniform(0.8, 1.2),   # Sell signals vary
+            'HOLD': self.rng.uniform(1.2, 2.0)    # Hold can wait longer
         }
         
         # Market session affects timing
@@ -202,7 +206,7 @@ class AITradingEngine:
             ]
         }
         
-        return random.choice(analyses[action])
+        return self.rng.choice(analyses[action])
     
     def generate_trading_plan(self, current_price, capital, risk_percent):
         """Tạo kế hoạch trading multi-timeframe"""
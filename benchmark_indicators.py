@@ -0,0 +1,100 @@
+"""
+Benchmark: vectorized indicators (data/indicators.py) so với list helpers cũ
+
+List helpers chỉ trả về giá trị cuối; vectorized trả về toàn bộ chuỗi.
+Chạy: python benchmark_indicators.py
+"""
+
+import sys
+import time
+from pathlib import Path
+from typing import Tuple
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data import indicators
+from data.collector import DataCollector
+
+SIZES = [100, 10_000, 1_000_000]
+
+def _synthetic_ohlcv(count: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    closes = 45000 + np.cumsum(rng.normal(0, 150, count))
+    highs = closes + rng.random(count) * 50
+    lows = closes - rng.random(count) * 50
+    volumes = 100 + rng.random(count) * 900
+    return highs, lows, closes, volumes
+
+def _run_list_helpers(collector: DataCollector, highs, lows, closes, volumes):
+    """Đường tính cũ: list comprehension + vòng lặp Python, chỉ lấy giá trị cuối"""
+    return {
+        'rsi': collector._calculate_rsi(closes),
+        'macd': collector._calculate_macd(closes),
+        'moving_averages': collector._calculate_moving_averages(closes),
+        'bollinger_bands': collector._calculate_bollinger_bands(closes),
+        'stochastic': collector._calculate_stochastic(highs, lows, closes),
+        'volume_sma': collector._calculate_sma(volumes, 20)
+    }
+
+def _best_of(func, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def _list_full_series_time(collector: DataCollector, lists, size: int) -> Tuple[float, bool]:
+    """
+    Thời gian để list code tạo ra cả chuỗi (gọi lại cho mỗi prefix)
+    
+    Với chuỗi dài, đo trên 20 prefix rải đều rồi nhân lên (chi phí mỗi prefix tuyến tính).
+    """
+    if size <= 100:
+        start = time.perf_counter()
+        for n in range(1, size + 1):
+            _run_list_helpers(collector, *(values[:n] for values in lists))
+        return time.perf_counter() - start, False
+    
+    if size > 10_000:
+        # Chi phí mỗi prefix ~ tuyến tính theo độ dài => tổng ~ n * t(n) / 2
+        return size * _best_of(lambda: _run_list_helpers(collector, *lists), 1) / 2, True
+    
+    samples = np.linspace(1, size, 20, dtype=int)
+    sample_time = 0.0
+    for n in samples:
+        sample_time += _best_of(lambda: _run_list_helpers(collector, *(values[:n] for values in lists)), 1)
+    return sample_time / len(samples) * size, True
+
+def main():
+    collector = DataCollector()
+    
+    print("📊 BENCHMARK: VECTORIZED vs LIST INDICATORS")
+    print("=" * 96)
+    print(f"{'candles':>10} | {'list last value':>16} | {'list full series':>18} | {'vectorized series':>18} | "
+          f"{'vs last':>8} | {'vs series':>9}")
+    print("-" * 96)
+    
+    for size in SIZES:
+        highs, lows, closes, volumes = _synthetic_ohlcv(size)
+        lists = (highs.tolist(), lows.tolist(), closes.tolist(), volumes.tolist())
+        repeat = 20 if size <= 10_000 else 3
+        
+        list_time = _best_of(lambda: _run_list_helpers(collector, *lists), repeat)
+        vector_time = _best_of(lambda: indicators.compute_indicators(highs, lows, closes, volumes), repeat)
+        series_time, estimated = _list_full_series_time(collector, lists, size)
+        series_label = f"{'~' if estimated else ''}{series_time * 1000:,.0f} ms"
+        
+        print(f"{size:>10,} | {list_time * 1000:>13.2f} ms | {series_label:>18} | {vector_time * 1000:>15.2f} ms | "
+              f"{list_time / vector_time:>7.1f}x | {series_time / vector_time:>8,.0f}x")
+    
+    print("-" * 96)
+    print("list last value: code cũ, chỉ ra giá trị cuối. list full series: gọi lại code cũ cho mọi prefix")
+    print("(~ = ước lượng từ mẫu). vectorized series: data/indicators.compute_indicators, cả chuỗi trong một lượt.")
+
+if __name__ == "__main__":
+    main()
@@ -35,6 +35,107 @@ class Settings:
     DEFAULT_TIMEFRAME = os.getenv('DEFAULT_TIMEFRAME', '1h')
     ANALYSIS_TIMEFRAMES = os.getenv('ANALYSIS_TIMEFRAMES', '1m,5m,15m,1h,4h,1d').split(',')
     
+    # HTTP Connection Pool - Dùng chung một session cho mọi REST call
+    HTTP_POOL_LIMIT = int(os.getenv('HTTP_POOL_LIMIT', '100'))
+    HTTP_POOL_LIMIT_PER_HOST = int(os.getenv('HTTP_POOL_LIMIT_PER_HOST', '20'))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv('HTTP_KEEPALIVE_TIMEOUT', '60'))  # seconds
+    HTTP_DNS_CACHE_TTL = int(os.getenv('HTTP_DNS_CACHE_TTL', '300'))  # seconds
+    HTTP_REQUEST_TIMEOUT = float(os.getenv('HTTP_REQUEST_TIMEOUT', '10'))  # seconds
+    
+    # WebSocket Streaming - Thay REST polling bằng Binance combined stream
+    STREAMING_ENABLED = os.getenv('STREAMING_ENABLED', 'False').lower() == 'true'
+    BINANCE_WS_URL = os.getenv('BINANCE_WS_URL', 'wss://stream.binance.com:9443')
+    STREAM_MAX_BACKOFF = float(os.getenv('STREAM_MAX_BACKOFF', '30'))  # seconds
+    STREAM_STALE_SECONDS = float(os.getenv('STREAM_STALE_SECONDS', '10'))  # quá hạn thì quay về REST
+    
+    # Rate Limit - Request weight của Binance REST, dùng chung cho collector và exchange
+    BINANCE_WEIGHT_LIMIT = int(os.getenv('BINANCE_WEIGHT_LIMIT', '6000'))  # request weight / phút
+    RATE_LIMIT_SAFETY_MARGIN = float(os.getenv('RATE_LIMIT_SAFETY_MARGIN', '0.1'))  # chừa 10% cho app khác
+    
+    # Collection Scheduler - N symbols × ANALYSIS_TIMEFRAMES qua REST từ một process
+    SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'False').lower() == 'true'
+    TRADING_SYMBOLS = os.getenv('TRADING_SYMBOLS', 'BTCUSDT').split(',')
+    SCHEDULER_INTERVAL = float(os.getenv('SCHEDULER_INTERVAL', '5'))  # seconds
+    SCHEDULER_BOOTSTRAP_CANDLES = int(os.getenv('SCHEDULER_BOOTSTRAP_CANDLES', '100'))
+    
+    # TTL Cache - cache REST theo endpoint, trả dữ liệu cũ trong lúc refresh nền
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', '1024'))
+    CACHE_STALE_SECONDS = float(os.getenv('CACHE_STALE_SECONDS', '30'))  # quá ttl bao lâu vẫn trả dữ liệu cũ
+    
+    # Order Book - sổ lệnh local từ depth diff stream
+    ORDERBOOK_SNAPSHOT_LIMIT = int(os.getenv('ORDERBOOK_SNAPSHOT_LIMIT', '1000'))  # số level của REST snapshot
+    ORDERBOOK_DEPTH_PERCENT = float(os.getenv('ORDERBOOK_DEPTH_PERCENT', '1'))  # depth / imbalance trong ±X% quanh mid
+    MAX_SPREAD_PERCENT = float(os.getenv('MAX_SPREAD_PERCENT', '0.1'))  # risk check: spread tối đa
+    
+    # History Loader - klines lịch sử cho backtest, lưu dạng cột trên đĩa
+    HISTORY_DIR = os.getenv('HISTORY_DIR', 'history')
+    HISTORY_CONCURRENCY = int(os.getenv('HISTORY_CONCURRENCY', '4'))  # số trang /klines tải song song
+    ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', 'archive')  # candles / ticks nhị phân, đọc qua mmap
+    
+    # Database - SQLite WAL, một thread ghi với group commit + reader thread pool
+    DB_BATCH_SIZE = int(os.getenv('DB_BATCH_SIZE', '500'))  # số thao tác ghi tối đa mỗi transaction
+    DB_READER_THREADS = int(os.getenv('DB_READER_THREADS', '4'))
+    DB_POOL_MIN_SIZE = int(os.getenv('DB_POOL_MIN_SIZE', '1'))  # pool asyncpg khi DATABASE_URL là postgresql://
+    DB_POOL_MAX_SIZE = int(os.getenv('DB_POOL_MAX_SIZE', '10'))
+    DB_RETENTION_CHUNK = int(os.getenv('DB_RETENTION_CHUNK', '5000'))  # số rows mỗi transaction khi xoá dữ liệu cũ
+    DB_EXPORT_CHUNK = int(os.getenv('DB_EXPORT_CHUNK', '100000'))  # số rows mỗi chunk khi export Parquet
+    PARQUET_DIR = os.getenv('PARQUET_DIR', 'parquet')
+    
+    # Snapshot Buffer - lưu market snapshots từ stream (write-behind, downsample theo symbol)
+    SNAPSHOT_PERSIST_ENABLED = os.getenv('SNAPSHOT_PERSIST_ENABLED', 'True').lower() == 'true'  # chỉ khi STREAMING_ENABLED
+    SNAPSHOT_RESOLUTION_MS = int(os.getenv('SNAPSHOT_RESOLUTION_MS', '1000'))  # giữ snapshot cuối mỗi khoảng (0 = giữ tất cả)
+    SNAPSHOT_OHLC_MS = int(os.getenv('SNAPSHOT_OHLC_MS', '60000'))  # OHLC theo khoảng này (0 = tắt)
+    SNAPSHOT_FLUSH_ROWS = int(os.getenv('SNAPSHOT_FLUSH_ROWS', '1000'))  # ghi ngay khi đủ số rows này
+    SNAPSHOT_FLUSH_SECONDS = float(os.getenv('SNAPSHOT_FLUSH_SECONDS', '5'))
+    SNAPSHOT_MAX_PENDING = int(os.getenv('SNAPSHOT_MAX_PENDING', '100000'))  # vượt quá => bỏ rows cũ nhất
+    
+    # Backtest - replay candles lịch sử qua signal / risk / exchange mô phỏng
+    BACKTEST_FEE_PERCENT = float(os.getenv('BACKTEST_FEE_PERCENT', '0.1'))  # phí mỗi lệnh (% giá trị lệnh)
+    BACKTEST_WARMUP_CANDLES = int(os.getenv('BACKTEST_WARMUP_CANDLES', '100'))  # bỏ qua trước khi đủ window như bot
+    
+    # Optimizer - grid / random search + walk-forward trên Backtester, chạy song song bằng process pool
+    OPTIMIZER_WORKERS = int(os.getenv('OPTIMIZER_WORKERS', '0'))  # 0 = số CPU
+    OPTIMIZER_METRIC = os.getenv('OPTIMIZER_METRIC', 'sharpe')  # stat dùng để xếp hạng
+    OPTIMIZER_MIN_TRADES = int(os.getenv('OPTIMIZER_MIN_TRADES', '10'))  # ít lệnh hơn => xếp cuối
+    OPTIMIZER_RESULTS_DIR = os.getenv('OPTIMIZER_RESULTS_DIR', 'optimizer')
+    
+    # Replay - ghi lại mọi input (REST + stream) của phiên để phát lại offline, tái lập được
+    RANDOM_SEED = int(os.getenv('RANDOM_SEED')) if os.getenv('RANDOM_SEED') else None  # None = ngẫu nhiên mỗi lần chạy
+    RECORD_SESSION = os.getenv('RECORD_SESSION', 'False').lower() == 'true'
+    RECORDINGS_DIR = os.getenv('RECORDINGS_DIR', 'recordings')
+    
+    # Confluence - technical signal trên mọi ANALYSIS_TIMEFRAMES, khung cao gộp từ nến khung thấp nhất
+    # (thay signal từ market data live: không gồm orderbook / S/R theo giá hiện tại)
+    CONFLUENCE_ENABLED = os.getenv('CONFLUENCE_ENABLED', 'False').lower() == 'true'
+    CONFLUENCE_WEIGHTS = {  # timeframe:weight, khung không có / weight 0 => không chấm
+        tf: float(weight) for tf, weight in (
+            item.split(':') for item in os.getenv('CONFLUENCE_WEIGHTS', '1m:0.05,5m:0.1,15m:0.15,1h:0.3,4h:0.25,1d:0.15').split(',')
+        )
+    }
+    CONFLUENCE_WINDOW = int(os.getenv('CONFLUENCE_WINDOW', '100'))  # số nến đã đóng giữ cho mỗi khung
+    
+    # Support / Resistance - pivots gom thành vùng theo số lần chạm và volume
+    SR_PIVOT_WIDTH = int(os.getenv('SR_PIVOT_WIDTH', '2'))  # pivot cao / thấp hơn hẳn N candles mỗi bên
+    SR_ZONE_PERCENT = float(os.getenv('SR_ZONE_PERCENT', '0.3'))  # độ rộng tối đa của một vùng (% giá)
+    
+    # Event Loop - trading cycle chạy theo event của stream (nến đóng, giá vượt S/R, sổ lệnh lệch) thay cho sleep 30s
+    EVENT_DRIVEN = os.getenv('EVENT_DRIVEN', 'True').lower() == 'true'
+    EVENT_DEBOUNCE_MS = int(os.getenv('EVENT_DEBOUNCE_MS', '250'))  # gom các event đến ngay sau event đầu tiên
+    EVENT_HEARTBEAT_SECONDS = float(os.getenv('EVENT_HEARTBEAT_SECONDS', '30'))  # không có event => vẫn chạy cycle đầy đủ
+    
+    # Pipeline - timeout (giây) từng stage của trading cycle, 0 = không giới hạn (trade: không hủy lệnh đang gửi)
+    PIPELINE_TIMEOUTS = {
+        stage: float(seconds) or None for stage, seconds in (
+            item.split(':') for item in os.getenv(
+                'PIPELINE_TIMEOUTS',
+                'market_data:15,ai_analysis:30,technical_signals:10,combined_signal:5,risk_check:5,trade:0,portfolio:30'
+            ).split(',')
+        )
+    }
+    
+    # Candle Buffer - số candles giữ trong ring buffer cho mỗi symbol/interval
+    CANDLE_BUFFER_CAPACITY = int(os.getenv('CANDLE_BUFFER_CAPACITY', '1000'))
+    
     # Dashboard
     FLASK_PORT = int(os.getenv('FLASK_PORT', '5000'))
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
@@ -51,6 +152,8 @@ class Settings:
     MIN_CONFIDENCE_SCORE = 0.7  # Minimum confidence for AI signals
     RSI_OVERSOLD = 30
     RSI_OVERBOUGHT = 70
+    AI_SIGNAL_WEIGHT = 0.6  # Trọng số AI / technical khi combine signals
+    TECHNICAL_SIGNAL_WEIGHT = 0.4
     
     # Puter AI Configuration - Miễn phí, không cần API key
     PUTER_AI_ENABLED = True
@@ -6,9 +6,13 @@ import threading
 from datetime import datetime, timedelta
 import random
 import json
+from config.settings import Settings
 
 class ContinuousAIAnalyzer:
-    def __init__(self):
+    def __init__(self, seed: int = None):
+        # Random riêng của analyzer - cùng seed (RANDOM_SEED) => cùng chuỗi phân tích
+        self.rng = random.Random(Settings().RANDOM_SEED if seed is None else seed)
+        
         self.analysis_interval = 10  # Phân tích mỗi 10 giây
         self.plan_update_interval = 60  # Cập nhật kế hoạch mỗi 60 giây
         self.running = False
@@ -112,20 +116,20 @@ class ContinuousAIAnalyzer:
     def _update_market_indicators(self):
         """Cập nhật các chỉ số thị trường real-time"""
         # Simulate real market data updates
-        self.indicators['price_momentum'] += random.uniform(-0.01, 0.01)
+        self.indicators['price_momentum'] += self.rng.uniform(-0.01, 0.01)
         self.indicators['price_momentum'] = max(-0.1, min(0.1, self.indicators['price_momentum']))
         
-        self.indicators['volume_trend'] *= random.uniform(0.95, 1.05)
+        self.indicators['volume_trend'] *= self.rng.uniform(0.95, 1.05)
         self.indicators['volume_trend'] = max(0.5, min(2.0, self.indicators['volume_trend']))
         
-        self.indicators['volatility'] = random.uniform(0.02, 0.08)
+        self.indicators['volatility'] = self.rng.uniform(0.02, 0.08)
         
         # Market pressure (buying vs selling pressure)
-        self.indicators['market_pressure'] += random.uniform(-0.02, 0.02)
+        self.indicators['market_pressure'] += self.rng.uniform(-0.02, 0.02)
         self.indicators['market_pressure'] = max(-0.2, min(0.2, self.indicators['market_pressure']))
         
         # News sentiment simulation
-        self.indicators['news_sentiment'] = random.uniform(-0.1, 0.1)
+        self.indicators['news_sentiment'] = self.rng.uniform(-0.1, 0.1)
         
     def _perform_real_time_analysis(self):
         """Thực hiện phân tích real-time"""
@@ -183,7 +187,7 @@ class ContinuousAIAnalyzer:
             recommendation = "Tín hiệu bán mạnh"
         else:
             action = "HOLD"
-            confidence = 0.6 + random.uniform(-0.1, 0.1)
+            confidence = 0.6 + self.rng.uniform(-0.1, 0.1)
             recommendation = "Chờ tín hiệu rõ ràng"
             
         # Generate detailed analysis
@@ -434,7 +438,7 @@ class ContinuousAIAnalyzer:
         """Tạo tín hiệu trading rõ ràng"""
         action = analysis.get('action', 'HOLD').upper()
         confidence = analysis.get('confidence', 0.75) * 100
-        current_price = 116727 + random.uniform(-500, 500)  # Giá Bitcoin mô phỏng
+        current_price = 116727 + self.rng.uniform(-500, 500)  # Giá Bitcoin mô phỏng
         
         instructions = []
         
@@ -13,6 +13,7 @@ sys.path.insert(0, str(project_root))
 
 import asyncio
 import json
+import threading
 from datetime import datetime, timedelta
 from flask import Flask, render_template, jsonify, request, redirect, url_for
 from flask_socketio import SocketIO, emit
@@ -33,10 +34,19 @@ socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
 
 # Global components
 settings = Settings()
-exchange_manager = ExchangeManager()
 data_collector = DataCollector()
+exchange_manager = ExchangeManager(data_collector)
 puter_client = PuterAIClient()
 
+# Event loop riêng cho DataCollector: session aiohttp và cache gắn với một loop,
+# Flask handlers (nhiều thread) gửi coroutine sang loop này thay vì tạo loop mới
+collector_loop = asyncio.new_event_loop()
+threading.Thread(target=collector_loop.run_forever, name='collector-loop', daemon=True).start()
+
+def run_async(coro, timeout: float = 30):
+    """Chạy coroutine trên collector_loop và chờ kết quả"""
+    return asyncio.run_coroutine_threadsafe(coro, collector_loop).result(timeout)
+
 # Bot state
 bot_state = {
     'running': False,
@@ -73,16 +83,8 @@ def get_status():
 def get_market_data():
     """API endpoint cho market data"""
     try:
-        # Get real market data from collector
-        from data.collector import DataCollector
-        collector = DataCollector()
-        
-        # This should be async in real implementation
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        market_data = loop.run_until_complete(collector.get_market_data('BTCUSDT'))
-        loop.close()
+        # Get real market data from shared collector (cached)
+        market_data = run_async(data_collector.get_market_data('BTCUSDT'))
         
         return jsonify({
             'price': market_data.get('price', 0),
@@ -98,27 +100,13 @@ def get_market_data():
 def get_chart_data():
     """API endpoint cho chart data"""
     try:
-        # Get real chart data from collector
-        from data.collector import DataCollector
-        collector = DataCollector()
-        
-        import asyncio
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        klines = loop.run_until_complete(collector.get_kline_data('BTCUSDT', '1h', 100))
-        loop.close()
-        
-        timestamps = []
-        prices = []
-        
-        for kline in klines:
-            timestamps.append(datetime.fromtimestamp(kline['timestamp']/1000).isoformat())
-            prices.append(kline['close'])
+        # Get real chart data from shared collector (cached)
+        candles = run_async(data_collector.get_candles('BTCUSDT', '1h', 100))
         
         chart_data = {
-            'timestamps': timestamps,
-            'prices': prices,
-            'volumes': [1000000 + i * 1000 for i in range(100)]
+            'timestamps': [datetime.fromtimestamp(ts / 1000).isoformat() for ts in candles.timestamps.tolist()],
+            'prices': candles.closes.tolist(),
+            'volumes': candles.volumes.tolist()
         }
         
         return jsonify(chart_data)
@@ -295,14 +283,7 @@ def background_updates():
         try:
             if bot_state['running']:
                 # Get real market data
-                from data.collector import DataCollector
-                collector = DataCollector()
-                
-                import asyncio
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                market_data = loop.run_until_complete(collector.get_market_data('BTCUSDT'))
-                loop.close()
+                market_data = run_async(data_collector.get_market_data('BTCUSDT'))
                 
                 # Update market data
                 socketio.emit('market_update', {
@@ -0,0 +1,302 @@
+"""
+Market Archive - File nhị phân fixed-width cho candles / ticks, đọc qua mmap
+"""
+import logging
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Any, Tuple
+import numpy as np
+from config.settings import Settings
+from data.candles import FIELDS, CandleWindow
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86_400_000
+MAGIC = b'BTBARCH1'
+VERSION = 1
+
+# Header 64 bytes ở đầu mỗi file: số record và khoảng timestamp của file
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('version', '<u2'),
+    ('kind', '<u2'),
+    ('record_size', '<u4'),
+    ('count', '<i8'),
+    ('first_ts', '<i8'),
+    ('last_ts', '<i8'),
+    ('day_ms', '<i8'),
+    ('reserved', 'V16')
+])
+HEADER_SIZE = HEADER_DTYPE.itemsize
+
+# Candle: đúng các cột của FIELDS (format /klines)
+CANDLE_DTYPE = np.dtype([
+    (name, '<i8' if name in ('timestamp', 'close_time', 'trades_count') else '<f8') for name in FIELDS
+])
+
+# Tick: một snapshot market data (save_market_data)
+TICK_DTYPE = np.dtype([
+    ('timestamp', '<i8'),
+    ('price', '<f8'),
+    ('volume', '<f8'),
+    ('rsi', '<f8'),
+    ('macd', '<f8'),
+    ('macd_signal', '<f8'),
+    ('macd_histogram', '<f8')
+])
+
+TICK_INTERVAL = 'tick'
+
+KINDS: Dict[str, Tuple[int, np.dtype]] = {
+    'candles': (1, CANDLE_DTYPE),
+    'ticks': (2, TICK_DTYPE)
+}
+
+class MarketArchive:
+    """
+    Archive append-only cho candles và ticks
+    
+    Mỗi (kind, symbol, interval, ngày UTC) là một file
+    <root>/<kind>/<SYMBOL>/<interval>/<YYYY-MM-DD>.bin gồm header 64 bytes
+    và các record fixed-width sắp theo timestamp. Đọc là np.memmap trên
+    file (structured array, không copy, không parse); slice theo thời gian
+    bằng searchsorted trên cột timestamp.
+    
+    Append ghi record trước rồi mới cập nhật count trong header, nên bị
+    dừng giữa chừng thì reader vẫn chỉ thấy các record đã ghi xong.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = Path(root or Settings().ARCHIVE_DIR)
+    
+    def _dir(self, kind: str, symbol: str, interval: str) -> Path:
+        return self.root / kind / symbol.upper() / interval
+    
+    def _path(self, kind: str, symbol: str, interval: str, day_ms: int) -> Path:
+        day = datetime.fromtimestamp(day_ms / 1000, timezone.utc).strftime('%Y-%m-%d')
+        return self._dir(kind, symbol, interval) / f"{day}.bin"
+    
+    def days(self, kind: str, symbol: str, interval: str) -> List[Tuple[int, Path]]:
+        """Các file (day_ms, path) sắp theo ngày"""
+        directory = self._dir(kind, symbol, interval)
+        if not directory.exists():
+            return []
+        
+        days = []
+        for path in directory.glob('*.bin'):
+            day = datetime.strptime(path.stem, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            days.append((int(day.timestamp() * 1000), path))
+        return sorted(days)
+    
+    def _days_between(self, kind: str, symbol: str, interval: str, start_ms: int = None,
+                      end_ms: int = None) -> List[Tuple[int, Path]]:
+        """Các file giao với [start_ms, end_ms]; khoảng ngắn thì dựng thẳng tên file thay vì liệt kê thư mục"""
+        if start_ms is not None and end_ms is not None and end_ms - start_ms <= 31 * DAY_MS:
+            days = range(start_ms // DAY_MS * DAY_MS, end_ms + 1, DAY_MS)
+            paths = ((day_ms, self._path(kind, symbol, interval, day_ms)) for day_ms in days)
+            return [(day_ms, path) for day_ms, path in paths if path.exists()]
+        
+        return [
+            (day_ms, path) for day_ms, path in self.days(kind, symbol, interval)
+            if (start_ms is None or day_ms + DAY_MS > start_ms) and (end_ms is None or day_ms <= end_ms)
+        ]
+    
+    def append(self, kind: str, symbol: str, interval: str, records: np.ndarray) -> int:
+        """
+        Ghi thêm records (structured array theo KINDS[kind])
+        
+        Record có timestamp <= record cuối của file ngày đó bị bỏ qua (archive
+        chỉ ghi thêm, chạy lại importer không tạo bản trùng).
+        
+        Returns:
+            Số record đã ghi
+        """
+        kind_id, dtype = KINDS[kind]
+        records = np.asarray(records, dtype=dtype)
+        if not len(records):
+            return 0
+        if np.any(records['timestamp'][1:] < records['timestamp'][:-1]):
+            records = records[np.argsort(records['timestamp'], kind='stable')]
+        
+        written = 0
+        day_index = records['timestamp'] // DAY_MS
+        bounds = np.flatnonzero(np.diff(day_index)) + 1
+        for chunk in np.split(records, bounds):
+            day_ms = int(chunk['timestamp'][0] // DAY_MS * DAY_MS)
+            written += self._append_day(self._path(kind, symbol, interval, day_ms), kind_id, dtype, day_ms, chunk)
+        return written
+    
+    def _append_day(self, path: Path, kind_id: int, dtype: np.dtype, day_ms: int, records: np.ndarray) -> int:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if not path.exists():
+            header = np.zeros(1, dtype=HEADER_DTYPE)
+            header['magic'] = MAGIC
+            header['version'] = VERSION
+            header['kind'] = kind_id
+            header['record_size'] = dtype.itemsize
+            header['day_ms'] = day_ms
+            with open(path, 'wb') as f:
+                f.write(header.tobytes())
+        
+        with open(path, 'r+b') as f:
+            header = self._check_header(np.frombuffer(f.read(HEADER_SIZE), dtype=HEADER_DTYPE).copy(), path, dtype)
+            count = int(header['count'][0])
+            if count:
+                records = records[records['timestamp'] > header['last_ts'][0]]
+            if not len(records):
+                return 0
+            
+            f.seek(HEADER_SIZE + count * dtype.itemsize)
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            
+            if not count:
+                header['first_ts'] = records['timestamp'][0]
+            header['count'] = count + len(records)
+            header['last_ts'] = records['timestamp'][-1]
+            f.seek(0)
+            f.write(header.tobytes())
+        return len(records)
+    
+    @staticmethod
+    def _check_header(header: np.ndarray, path: Path, dtype: np.dtype) -> np.ndarray:
+        if len(header) != 1 or header['magic'][0] != MAGIC:
+            raise ValueError(f"{path} is not a market archive file")
+        if header['version'][0] != VERSION or header['record_size'][0] != dtype.itemsize:
+            raise ValueError(f"{path}: unsupported version / record size")
+        return header
+    
+    def open_day(self, path: Path, kind: str) -> np.ndarray:
+        """Toàn bộ record của một file, memory-mapped (read-only, không copy)"""
+        dtype = KINDS[kind][1]
+        header = self._check_header(np.fromfile(path, dtype=HEADER_DTYPE, count=1), path, dtype)
+        count = int(header['count'][0])
+        if not count:
+            return np.zeros(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode='r', offset=HEADER_SIZE, shape=(count,))
+    
+    def read(self, kind: str, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> np.ndarray:
+        """
+        Record trong [start_ms, end_ms] (structured array, cũ -> mới)
+        
+        Khoảng nằm trong một ngày trả về view trên mmap (không copy); nhiều
+        ngày thì nối các view lại (một lần copy).
+        """
+        parts = []
+        for day_ms, path in self._days_between(kind, symbol, interval, start_ms, end_ms):
+            records = self.open_day(path, kind)
+            timestamps = records['timestamp']
+            lo = 0 if start_ms is None else np.searchsorted(timestamps, start_ms, side='left')
+            hi = len(records) if end_ms is None else np.searchsorted(timestamps, end_ms, side='right')
+            if hi > lo:
+                parts.append(records[lo:hi])
+        
+        if not parts:
+            return np.zeros(0, dtype=KINDS[kind][1])
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+    
+    def candles(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> CandleWindow:
+        """Candles dạng cột (CandleWindow) cho backtester / indicators"""
+        records = self.read('candles', symbol, interval, start_ms, end_ms)
+        data = np.empty((len(FIELDS), len(records)), dtype=np.float64)
+        for i, name in enumerate(FIELDS):
+            data[i] = records[name]
+        return CandleWindow(data)
+    
+    def ticks(self, symbol: str, start_ms: int = None, end_ms: int = None) -> np.ndarray:
+        """Ticks (structured TICK_DTYPE) của symbol"""
+        return self.read('ticks', symbol, TICK_INTERVAL, start_ms, end_ms)
+    
+    def chart_data(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None,
+                   max_points: int = 1000) -> Dict[str, List[Any]]:
+        """Dữ liệu chart như /api/chart-data, lấy mẫu đều còn tối đa max_points điểm"""
+        records = self.read('candles', symbol, interval, start_ms, end_ms)
+        step = max(1, -(-len(records) // max_points))
+        sampled = records[::step]
+        return {
+            'timestamps': [datetime.fromtimestamp(ts / 1000).isoformat() for ts in sampled['timestamp'].tolist()],
+            'prices': sampled['close'].tolist(),
+            'volumes': sampled['volume'].tolist()
+        }
+    
+    def import_market_data(self, db_path: str, symbol: str = None, batch_size: int = 100_000) -> int:
+        """
+        Chuyển bảng market_data (SQLite) thành ticks trong archive
+        
+        Đọc theo index (symbol, timestamp) từng batch; macd_data JSON chỉ
+        parse một lần ở đây. Chạy lại chỉ ghi các row mới hơn.
+        
+        Returns:
+            Số ticks đã ghi
+        """
+        connection = sqlite3.connect(f'file:{db_path}?mode=ro', uri=True)
+        written = 0
+        try:
+            symbols = [symbol] if symbol else [
+                row[0] for row in connection.execute('SELECT DISTINCT symbol FROM market_data')
+            ]
+            for name in symbols:
+                last = -1
+                while True:
+                    rows = connection.execute('''
+                        SELECT timestamp, price, volume, rsi, macd_data FROM market_data
+                        WHERE symbol = ? AND timestamp > ?
+                        ORDER BY timestamp
+                        LIMIT ?
+                    ''', (name, last, batch_size)).fetchall()
+                    if not rows:
+                        break
+                    
+                    records = np.zeros(len(rows), dtype=TICK_DTYPE)
+                    records['timestamp'] = [row[0] for row in rows]
+                    records['price'] = [row[1] for row in rows]
+                    records['volume'] = [row[2] if row[2] is not None else np.nan for row in rows]
+                    records['rsi'] = [row[3] if row[3] is not None else np.nan for row in rows]
+                    macd = [json.loads(row[4]) if row[4] else {} for row in rows]
+                    records['macd'] = [m.get('macd', np.nan) if isinstance(m, dict) else np.nan for m in macd]
+                    records['macd_signal'] = [m.get('signal', np.nan) if isinstance(m, dict) else np.nan for m in macd]
+                    records['macd_histogram'] = [m.get('histogram', np.nan) if isinstance(m, dict) else np.nan for m in macd]
+                    
+                    written += self.append('ticks', name, TICK_INTERVAL, records)
+                    last = rows[-1][0]
+        finally:
+            connection.close()
+        
+        logger.info(f"🗃️ Imported {written} market data ticks into {self.root}")
+        return written
+    
+    def import_history(self, store, symbol: str, interval: str) -> int:
+        """Chuyển klines trong HistoryStore (.npy) thành candles trong archive"""
+        window = store.load(symbol, interval)
+        records = np.zeros(len(window), dtype=CANDLE_DTYPE)
+        for name in FIELDS:
+            records[name] = window.column(name)
+        written = self.append('candles', symbol, interval, records)
+        logger.info(f"🗃️ Imported {written} {symbol.upper()} {interval} candles into {self.root}")
+        return written
+
+if __name__ == "__main__":
+    import argparse
+    from data.history import HistoryStore
+    
+    parser = argparse.ArgumentParser(description="Nhập dữ liệu vào market archive")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    market = subparsers.add_parser('market-data', help="Bảng market_data trong SQLite => ticks")
+    market.add_argument('--db', default="bitcoin_bot.db")
+    market.add_argument('--symbol')
+    history = subparsers.add_parser('history', help="HistoryStore => candles")
+    history.add_argument('symbol')
+    history.add_argument('interval')
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    archive = MarketArchive()
+    if args.command == 'market-data':
+        count = archive.import_market_data(args.db, args.symbol)
+    else:
+        count = archive.import_history(HistoryStore(), args.symbol, args.interval)
+    print(f"🗃️ {count:,} records => {archive.root}")
@@ -0,0 +1,136 @@
+"""
+TTL Cache - Cache theo key với request coalescing và stale-while-revalidate
+"""
+import logging
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Callable, Awaitable, Hashable
+
+logger = logging.getLogger(__name__)
+
+Fetcher = Callable[[], Awaitable[Any]]
+
+def _is_empty(value: Any) -> bool:
+    """Kết quả lỗi / rỗng (None, {}, []) không được cache"""
+    return value is None or (isinstance(value, (dict, list)) and not value)
+
+class _Entry:
+    __slots__ = ('value', 'fetched_at', 'ttl')
+    
+    def __init__(self, value: Any, fetched_at: float, ttl: float):
+        self.value = value
+        self.fetched_at = fetched_at
+        self.ttl = ttl
+
+class TTLCache:
+    """
+    Cache async cho kết quả REST
+    
+    - Còn trong ttl: trả cache (hit).
+    - Quá ttl nhưng chưa quá ttl + stale_seconds: trả giá trị cũ ngay và
+      refresh trong background (stale hit).
+    - Quá hạn hẳn / chưa có: fetch (miss). Các caller đồng thời cùng key
+      chờ chung một fetch đang chạy (coalesced) thay vì gửi thêm request.
+    
+    Số entry giới hạn bởi max_entries, bỏ entry ít dùng nhất (LRU).
+    """
+    
+    def __init__(self, max_entries: int = 1024, stale_seconds: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.stale_seconds = stale_seconds
+        self.clock = clock  # Replay thay bằng đồng hồ của bản ghi
+        self._entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        
+        self.stats = {
+            'hits': 0,
+            'stale_hits': 0,
+            'misses': 0,
+            'coalesced': 0,
+            'refreshes': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def clear(self):
+        """Xóa toàn bộ entries (fetch đang chạy vẫn hoàn tất)"""
+        self._entries.clear()
+    
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Giá trị đang cache (kể cả đã cũ), không fetch"""
+        entry = self._entries.get(key)
+        return entry.value if entry else None
+    
+    async def get_or_fetch(self, key: Hashable, fetch: Fetcher, ttl: float) -> Any:
+        """
+        Lấy giá trị theo key, fetch khi cần
+        
+        Args:
+            key: Cache key, ví dụ ('price', 'BTCUSDT')
+            fetch: Coroutine function trả kết quả (None / rỗng = lỗi, không cache)
+            ttl: Số giây kết quả còn mới
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = self.clock() - entry.fetched_at
+            if age < entry.ttl:
+                self.stats['hits'] += 1
+                self._entries.move_to_end(key)
+                return entry.value
+            if age < entry.ttl + self.stale_seconds:
+                self.stats['stale_hits'] += 1
+                self._entries.move_to_end(key)
+                if key not in self._inflight:
+                    self.stats['refreshes'] += 1
+                    self._start_fetch(key, fetch, ttl)
+                return entry.value
+        
+        if key in self._inflight:
+            self.stats['coalesced'] += 1
+            return await asyncio.shield(self._inflight[key])
+        
+        self.stats['misses'] += 1
+        return await asyncio.shield(self._start_fetch(key, fetch, ttl))
+    
+    def _start_fetch(self, key: Hashable, fetch: Fetcher, ttl: float) -> asyncio.Future:
+        """Chạy fetch trong task riêng để caller bị hủy không hủy fetch của caller khác"""
+        task = asyncio.ensure_future(self._fetch(key, fetch, ttl))
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())  # Lỗi refresh nền đã được đếm
+        self._inflight[key] = task
+        return task
+    
+    async def _fetch(self, key: Hashable, fetch: Fetcher, ttl: float) -> Any:
+        try:
+            value = await fetch()
+        except Exception:
+            self.stats['errors'] += 1
+            raise
+        finally:
+            self._inflight.pop(key, None)
+        
+        if _is_empty(value):
+            self.stats['errors'] += 1
+            return value
+        
+        self._entries[key] = _Entry(value, self.clock(), ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+        return value
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Hit/miss counters và hit rate"""
+        lookups = self.stats['hits'] + self.stats['stale_hits'] + self.stats['misses'] + self.stats['coalesced']
+        served = self.stats['hits'] + self.stats['stale_hits'] + self.stats['coalesced']
+        return {
+            'entries': len(self._entries),
+            'inflight': len(self._inflight),
+            'hit_rate': served / lookups if lookups else 0.0,
+            **self.stats
+        }
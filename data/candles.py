@@ -0,0 +1,281 @@
+"""
+Candle Buffer - Lưu OHLCV dạng cột (NumPy float64) thay cho list các dict
+"""
+import logging
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Độ dài mỗi interval kline (ms)
+INTERVAL_MS = {
+    '1m': 60_000,
+    '3m': 180_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+    '2h': 7_200_000,
+    '4h': 14_400_000,
+    '6h': 21_600_000,
+    '8h': 28_800_000,
+    '12h': 43_200_000,
+    '1d': 86_400_000,
+    '3d': 259_200_000,
+    '1w': 604_800_000
+}
+
+# Thứ tự cột trùng với thứ tự field trong response /klines của Binance
+FIELDS = ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_volume', 'trades_count')
+_INDEX = {name: i for i, name in enumerate(FIELDS)}
+_INT_FIELDS = ('timestamp', 'close_time', 'trades_count')
+
+def parse_klines(rows: List[Any]) -> np.ndarray:
+    """
+    Parse response /klines (list các row của Binance) thành mảng cột (len(FIELDS), n)
+    
+    Một lần np.asarray cho cả response; các field sau trades_count bị bỏ.
+    """
+    data = np.zeros((len(rows), len(FIELDS)))
+    if len(rows):
+        values = np.asarray([row[:len(FIELDS)] for row in rows], dtype=np.float64)
+        data[:, :values.shape[1]] = values
+    return data.T
+
+class CandleWindow:
+    """
+    N candles liên tiếp (cũ -> mới) dạng cột - view không copy trên buffer
+    
+    Chỉ hợp lệ tới lần append tiếp theo của buffer; cần giữ lâu thì copy().
+    """
+    
+    def __init__(self, data: np.ndarray):
+        self._data = data  # shape (len(FIELDS), n)
+    
+    def __len__(self) -> int:
+        return self._data.shape[1]
+    
+    def column(self, field: str) -> np.ndarray:
+        """Một cột theo tên trong FIELDS"""
+        return self._data[_INDEX[field]]
+    
+    @property
+    def timestamps(self) -> np.ndarray:
+        return self._data[0]
+    
+    @property
+    def opens(self) -> np.ndarray:
+        return self._data[1]
+    
+    @property
+    def highs(self) -> np.ndarray:
+        return self._data[2]
+    
+    @property
+    def lows(self) -> np.ndarray:
+        return self._data[3]
+    
+    @property
+    def closes(self) -> np.ndarray:
+        return self._data[4]
+    
+    @property
+    def volumes(self) -> np.ndarray:
+        return self._data[5]
+    
+    def tail(self, n: int) -> 'CandleWindow':
+        """N candles cuối của window"""
+        return CandleWindow(self._data[:, max(len(self) - n, 0):])
+    
+    def slice(self, start: int, end: int) -> 'CandleWindow':
+        """Candles [start, end) của window (view, cho backtest replay từng bar)"""
+        return CandleWindow(self._data[:, start:end])
+    
+    def copy(self) -> 'CandleWindow':
+        return CandleWindow(self._data.copy())
+    
+    def to_klines(self) -> List[Dict[str, Any]]:
+        """Chuyển về list dict như DataCollector.get_kline_data (cho code cũ / JSON)"""
+        rows = self._data.T.tolist()
+        return [
+            {
+                name: int(value) if name in _INT_FIELDS else value
+                for name, value in zip(FIELDS, row)
+            }
+            for row in rows
+        ]
+
+class CandleBuffer:
+    """
+    Ring buffer OHLCV cố định dung lượng cho một symbol/interval
+    
+    Mỗi candle được ghi hai lần (vị trí i và i + capacity) nên N candle
+    cuối luôn là một slice liên tục => window() không copy dữ liệu.
+    """
+    
+    def __init__(self, capacity: int = 1000, interval: str = None):
+        self.capacity = capacity
+        self.interval = interval
+        self._data = np.zeros((len(FIELDS), 2 * capacity), dtype=np.float64)
+        self._head = -1  # Vị trí (0..capacity-1) của candle mới nhất
+        self._size = 0
+    
+    @classmethod
+    def from_klines(cls, klines: List[Dict[str, Any]], interval: str = None) -> 'CandleBuffer':
+        """Tạo buffer từ list dict (format cũ của get_kline_data)"""
+        buffer = cls(max(len(klines), 1), interval)
+        for kline in klines:
+            buffer.append([kline.get(name, 0) for name in FIELDS])
+        return buffer
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        """Open time của candle mới nhất"""
+        return int(self._data[0, self._head]) if self._size else None
+    
+    def clear(self):
+        """Xóa toàn bộ candles"""
+        self._head = -1
+        self._size = 0
+    
+    def window(self, n: int = None) -> CandleWindow:
+        """
+        N candles cuối (mặc định toàn bộ), zero-copy
+        
+        Args:
+            n: Số candle
+        """
+        n = self._size if n is None else min(n, self._size)
+        end = self._head + self.capacity + 1
+        return CandleWindow(self._data[:, end - n:end])
+    
+    def load(self, candles: CandleWindow):
+        """Thay toàn bộ nội dung bằng candles (giữ tối đa capacity candles cuối)"""
+        data = candles.tail(self.capacity)._data
+        n = data.shape[1]
+        self._data[:, :n] = data
+        self._data[:, self.capacity:self.capacity + n] = data
+        self._head = n - 1
+        self._size = n
+    
+    def last(self, field: str = 'close') -> float:
+        """Giá trị cột của candle mới nhất"""
+        return float(self._data[_INDEX[field], self._head]) if self._size else 0.0
+    
+    def last_kline(self) -> Optional[Dict[str, Any]]:
+        """Candle mới nhất dạng dict"""
+        klines = self.window(1).to_klines()
+        return klines[0] if klines else None
+    
+    def _write(self, position: int, values: np.ndarray):
+        self._data[:len(values), position] = values
+        self._data[:len(values), position + self.capacity] = values
+    
+    def append(self, values):
+        """Thêm candle mới; values theo thứ tự FIELDS (số hoặc chuỗi số như response Binance)"""
+        row = np.zeros(len(FIELDS))
+        values = np.asarray(values[:len(FIELDS)], dtype=np.float64)
+        row[:len(values)] = values
+        
+        self._head = (self._head + 1) % self.capacity
+        self._write(self._head, row)
+        self._size = min(self._size + 1, self.capacity)
+    
+    def update_last(self, **fields):
+        """Cập nhật candle đang chạy, ví dụ update_last(close=..., high=...)"""
+        if not self._size:
+            return
+        for name, value in fields.items():
+            self._data[_INDEX[name], self._head] = value
+            self._data[_INDEX[name], self._head + self.capacity] = value
+    
+    def upsert(self, values) -> bool:
+        """
+        Append nếu là candle mới, ghi đè nếu trùng open time
+        
+        Candle mới cách candle cuối hơn một interval => thiếu candle ở giữa,
+        buffer được xóa để window luôn là chuỗi liên tục.
+        
+        Returns:
+            False nếu candle không khớp vị trí nào (cũ hơn buffer)
+        """
+        timestamp = float(values[0])
+        last = self._data[0, self._head] if self._size else None
+        
+        if last is None or timestamp > last:
+            interval_ms = INTERVAL_MS.get(self.interval)
+            if last is not None and interval_ms and timestamp - last > interval_ms:
+                self.clear()
+            self.append(values)
+            return True
+        
+        timestamps = self.window().timestamps
+        index = int(np.searchsorted(timestamps, timestamp))
+        if index >= len(timestamps) or timestamps[index] != timestamp:
+            return False
+        
+        position = (self._head - (len(timestamps) - 1 - index)) % self.capacity
+        self._write(position, np.asarray(values[:len(FIELDS)], dtype=np.float64))
+        return True
+    
+    def extend(self, rows: List[Any]):
+        """
+        Upsert nhiều candles đã sắp xếp theo open time (ví dụ response /klines)
+        
+        Parse cả response trong một lần np.asarray, ghi đè phần chồng lấn
+        và append phần mới bằng fancy indexing thay vì từng candle.
+        """
+        if not len(rows):
+            return
+        data = parse_klines(rows)
+        
+        # Phần trùng open time với candles đang có => ghi đè tại chỗ
+        last = self._data[0, self._head] if self._size else None
+        new = data if last is None else data[:, data[0] > last]
+        if last is not None and new.shape[1] < data.shape[1]:
+            old = data[:, data[0] <= last]
+            timestamps = self.window().timestamps
+            index = np.searchsorted(timestamps, old[0])
+            found = index < len(timestamps)
+            found[found] = timestamps[index[found]] == old[0, found]
+            positions = (self._head - (len(timestamps) - 1 - index[found])) % self.capacity
+            self._data[:, positions] = old[:, found]
+            self._data[:, positions + self.capacity] = old[:, found]
+        
+        if not new.shape[1]:
+            return
+        interval_ms = INTERVAL_MS.get(self.interval)
+        if last is not None and interval_ms and new[0, 0] - last > interval_ms:
+            self.clear()
+        
+        new = new[:, -self.capacity:]
+        count = new.shape[1]
+        positions = (self._head + 1 + np.arange(count)) % self.capacity
+        self._data[:, positions] = new
+        self._data[:, positions + self.capacity] = new
+        self._head = int(positions[-1])
+        self._size = min(self._size + count, self.capacity)
+    
+    def to_klines(self, n: int = None) -> List[Dict[str, Any]]:
+        """N candles cuối dạng list dict"""
+        return self.window(n).to_klines()
+
+class CandleStore:
+    """Tập CandleBuffer theo (symbol, interval)"""
+    
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._buffers: Dict[Tuple[str, str], CandleBuffer] = {}
+    
+    def get(self, symbol: str, interval: str) -> CandleBuffer:
+        """Lấy buffer, tạo mới nếu chưa có"""
+        key = (symbol.upper(), interval)
+        if key not in self._buffers:
+            self._buffers[key] = CandleBuffer(self.capacity, interval)
+        return self._buffers[key]
+    
+    def keys(self) -> List[Tuple[str, str]]:
+        return list(self._buffers)
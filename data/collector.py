@@ -4,10 +4,22 @@ Data Collector - Thu thập và xử lý dữ liệu thị trường Bitcoin
 import logging
 import asyncio
 import json
+import time
+from contextlib import asynccontextmanager
 from typing import Dict, List, Any, Optional
 from datetime import datetime, timedelta
+from pathlib import Path
 import aiohttp
 from config.settings import Settings
+from data import indicators, levels
+from data.cache import TTLCache
+from data.history import HistoryLoader
+from data.candles import CandleBuffer, CandleStore, CandleWindow, parse_klines
+from data.orderbook import OrderBook
+from data.recording import EVENT_START_STREAMING, SessionRecorder, SessionReplayer
+from data.scheduler import CollectionScheduler
+from data.stream import BinanceStream, UpdateCallback
+from utils.rate_limiter import PRIORITY_MARKET_DATA, endpoint_weight, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 
@@ -22,279 +34,533 @@ class DataCollector:
             'coinmarketcap': 'https://pro-api.coinmarketcap.com/v1'
         }
         
-        # Cache để tránh call API quá nhiều
-        self.price_cache = {}
-        self.cache_timeout = 30  # 30 seconds
+        # Cache để tránh call API quá nhiều - TTL (giây) theo endpoint
+        self.cache = TTLCache(self.settings.CACHE_MAX_ENTRIES, self.settings.CACHE_STALE_SECONDS)
+        self.cache_ttl = {
+            'price': 5,
+            'ticker': 10,
+            'orderbook': 2,
+            'trades': 5,
+            'klines': 15
+        }
+        
+        # Shared HTTP session - mở trong initialize(), đóng trong close()
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.connection_stats = {
+            'requests': 0,
+            'connections_created': 0,  # Mỗi connection mới = một TLS handshake
+            'connections_reused': 0,
+            'dns_cache_hits': 0,
+            'dns_cache_misses': 0
+        }
+        
+        # Request weight dùng chung với ExchangeManager (Binance giới hạn theo IP)
+        self.rate_limiter = get_rate_limiter()
+        
+        # WebSocket stream - khi bật, get_market_data đọc từ state in-memory
+        self.stream: Optional[BinanceStream] = None
+        
+        # Scheduler REST nhiều symbols/timeframes - get_market_data đọc từ cache
+        self.scheduler: Optional[CollectionScheduler] = None
         
+        # OHLCV dạng cột theo (symbol, interval), REST và stream cùng ghi vào
+        self.candles = CandleStore(self.settings.CANDLE_BUFFER_CAPACITY)
+        
+        # Klines lịch sử nhiều tháng (backtest) - tải theo trang vào HistoryStore trên đĩa
+        self.history = HistoryLoader(self)
+        
+        # Ghi / phát lại phiên - recorder ghi mọi REST response và stream message,
+        # replayer (SessionReplayer.attach) trả response đã ghi thay cho network
+        self.recorder: Optional[SessionRecorder] = None
+        self.replayer: Optional[SessionReplayer] = None
+    
     async def initialize(self):
         """Khởi tạo data collector"""
         try:
+            await self._get_session()
+            
             # Test API connections
             await self._test_api_connections()
             logger.info("✅ Data collector initialized")
             return True
-            
+        
         except Exception as e:
             logger.error(f"❌ Data collector initialization failed: {e}")
             return False
     
-    async def get_market_data(self, symbol: str = 'BTCUSDT') -> Dict[str, Any]:
+    async def get_market_data(self, symbol: str = 'BTCUSDT', timeframe: str = '1h') -> Dict[str, Any]:
         """
         Thu thập dữ liệu thị trường đầy đủ
         
         Args:
             symbol: Trading symbol
-            
+            timeframe: Kline interval dùng cho indicators
+        
         Returns:
             Complete market data
         """
         try:
-            # Parallel data collection
+            # Streaming mode: đọc state in-memory, không cần network round trip
+            state = self.stream.get_state(symbol) if self.stream else None
+            if state and state.interval == timeframe and state.is_ready \
+                    and state.age() < self.settings.STREAM_STALE_SECONDS:
+                return await self._build_market_data(
+                    symbol, state.price, state.ticker, state.book, state.candles.window(),
+                    technical_data=state.indicators, sr_levels=state.support_resistance
+                )
+            
+            # Scheduler mode: đọc cache do scheduler nạp định kỳ
+            if self.scheduler and self.scheduler.is_fresh(symbol, timeframe):
+                price, ticker, orderbook = self.scheduler.snapshot(symbol)
+                candles = self.candles.get(symbol, timeframe).window(100)
+                return await self._build_market_data(symbol, price, ticker, orderbook, candles, full_book=False)
+            
+            # Parallel data collection (sổ lệnh đủ level để depth ±ORDERBOOK_DEPTH_PERCENT không bị cắt)
             tasks = [
                 self.get_current_price(symbol),
                 self.get_24h_ticker(symbol),
-                self.get_orderbook(symbol),
+                self.get_orderbook(symbol, self.settings.ORDERBOOK_SNAPSHOT_LIMIT),
                 self.get_recent_trades(symbol),
-                self.get_kline_data(symbol, '1h', 100)
+                self.get_candles(symbol, timeframe, 100)
             ]
             
-            price, ticker, orderbook, trades, klines = await asyncio.gather(*tasks)
-            
-            # Calculate technical indicators
-            technical_data = await self.calculate_technical_indicators(klines)
-            
-            # Support/Resistance levels
-            sr_levels = self.calculate_support_resistance(klines)
-            
-            market_data = {
-                'symbol': symbol,
-                'timestamp': datetime.now().isoformat(),
-                'price': price,
-                'volume': ticker.get('volume', 0),
-                'volume_quote': ticker.get('quoteVolume', 0),
-                'high_24h': ticker.get('high', price),
-                'low_24h': ticker.get('low', price),
-                'price_change_24h': ticker.get('priceChange', 0),
-                'price_change_percent_24h': ticker.get('priceChangePercent', 0),
-                'bid_price': orderbook.get('bids', [[0]])[0][0] if orderbook.get('bids') else price,
-                'ask_price': orderbook.get('asks', [[0]])[0][0] if orderbook.get('asks') else price,
-                'spread': self._calculate_spread(orderbook),
-                'avg_volume': self._calculate_avg_volume(klines),
-                'support_levels': sr_levels['support'],
-                'resistance_levels': sr_levels['resistance'],
-                **technical_data
-            }
-            
-            logger.info(f"📊 Market data collected: BTC ${price:,.2f} | Vol: {ticker.get('volume', 0):,.0f}")
-            
-            return market_data
+            price, ticker, orderbook, trades, candles = await asyncio.gather(*tasks)
             
+            return await self._build_market_data(symbol, price, ticker, orderbook, candles)
+        
         except Exception as e:
             logger.error(f"❌ Market data collection failed: {e}")
             return self._get_fallback_market_data()
     
+    async def _build_market_data(self, symbol: str, price: float, ticker: Dict[str, Any],
+                                 orderbook, candles: CandleWindow,
+                                 technical_data: Optional[Dict[str, Any]] = None,
+                                 sr_levels: Optional[Dict[str, Any]] = None,
+                                 full_book: bool = True) -> Dict[str, Any]:
+        """
+        Tổng hợp market data từ price/ticker/orderbook/candles (REST hoặc stream)
+        
+        orderbook là OrderBook local (stream) hoặc snapshot dạng dict (REST / scheduler).
+        full_book=False (scheduler chỉ có best bid/ask) => không có 'liquidity': depth / imbalance
+        từ một level sẽ sai lệch, signal và risk check coi như không có dữ liệu sổ lệnh.
+        candles là view zero-copy vào CandleBuffer, chỉ đúng tới lần append kế tiếp - market_data
+        còn được đọc qua nhiều await trong pipeline nên giữ bản copy.
+        """
+        candles = candles.copy()
+        book = orderbook if isinstance(orderbook, OrderBook) else OrderBook.from_snapshot(orderbook, symbol)
+        best_bid, best_ask = book.best_bid(), book.best_ask()
+        
+        # Calculate technical indicators (stream đã có sẵn từ IndicatorEngine)
+        if technical_data is None:
+            technical_data = await self.calculate_technical_indicators(candles)
+        
+        # Support/Resistance zones (stream đã có sẵn từ SupportResistance)
+        if sr_levels is None:
+            sr_levels = self.calculate_support_resistance(candles, price)
+        
+        market_data = {
+            'symbol': symbol,
+            'timestamp': datetime.now().isoformat(),
+            'price': price,
+            'volume': ticker.get('volume', 0),
+            'volume_quote': ticker.get('quoteVolume', 0),
+            'high_24h': ticker.get('high', price),
+            'low_24h': ticker.get('low', price),
+            'price_change_24h': ticker.get('priceChange', 0),
+            'price_change_percent_24h': ticker.get('priceChangePercent', 0),
+            'bid_price': best_bid[0] if best_bid else price,
+            'ask_price': best_ask[0] if best_ask else price,
+            'spread': book.spread(),
+            'liquidity': book.liquidity(self.settings.ORDERBOOK_DEPTH_PERCENT) if full_book else None,
+            'avg_volume': self._calculate_avg_volume(candles),
+            'support_levels': sr_levels['support'],
+            'resistance_levels': sr_levels['resistance'],
+            'sr_zones': sr_levels['zones'],
+            'candles': candles,
+            **technical_data
+        }
+        
+        logger.info(f"📊 Market data collected: BTC ${price:,.2f} | Vol: {ticker.get('volume', 0):,.0f}")
+        
+        return market_data
+    
+    async def start_streaming(self, symbols: List[str] = None, interval: str = None, ws_url: str = None,
+                              on_update: Optional[UpdateCallback] = None,
+                              on_depth: Optional[UpdateCallback] = None) -> bool:
+        """
+        Bật streaming mode qua Binance WebSocket
+        
+        Klines lịch sử được nạp qua REST một lần, sau đó stream cập nhật
+        ticker, depth, aggTrade và kline liên tục vào state in-memory.
+        
+        Args:
+            symbols: Danh sách symbols (mặc định BTCUSDT)
+            interval: Kline interval (mặc định Settings.DEFAULT_TIMEFRAME)
+            ws_url: Base URL WebSocket (mặc định Settings.BINANCE_WS_URL)
+            on_update: Gọi với MarketState sau mỗi update giá (ví dụ SnapshotBuffer.add_state)
+            on_depth: Gọi với MarketState sau mỗi depth diff (ví dụ MarketEventDetector.on_depth)
+        """
+        try:
+            symbols = symbols or ['BTCUSDT']
+            session = await self._get_session()
+            
+            self.stream = BinanceStream(
+                session, symbols, interval=interval, ws_url=ws_url, on_gap=self._resync_stream,
+                on_update=on_update, on_message=self._record_message, on_depth=on_depth,
+                clock=self.replayer.clock if self.replayer else time.time
+            )
+            if self.recorder:
+                self.recorder.record(EVENT_START_STREAMING, {'symbols': symbols, 'interval': self.stream.interval})
+            
+            # Bootstrap klines lịch sử trước khi nhận update
+            for symbol in self.stream.states:
+                await self._resync_stream(symbol, 'klines')
+            
+            # Replay: SessionReplayer đưa message đã ghi vào stream, không mở websocket
+            if self.replayer is None:
+                await self.stream.start()
+            logger.info(f"📡 Streaming mode enabled for {', '.join(self.stream.states)}")
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Failed to start streaming: {e}")
+            self.stream = None
+            return False
+    
+    async def start_scheduler(self, symbols: List[str] = None, timeframes: List[str] = None) -> bool:
+        """
+        Bật collection scheduler cho nhiều symbols × timeframes
+        
+        Args:
+            symbols: Danh sách symbols (mặc định Settings.TRADING_SYMBOLS)
+            timeframes: Danh sách intervals (mặc định Settings.ANALYSIS_TIMEFRAMES)
+        """
+        try:
+            await self._get_session()
+            self.scheduler = CollectionScheduler(
+                self, symbols or self.settings.TRADING_SYMBOLS, timeframes
+            )
+            await self.scheduler.start()
+            return True
+        
+        except Exception as e:
+            logger.error(f"❌ Failed to start collection scheduler: {e}")
+            self.scheduler = None
+            return False
+    
+    async def stop_scheduler(self):
+        """Tắt collection scheduler"""
+        if self.scheduler:
+            await self.scheduler.stop()
+            self.scheduler = None
+    
+    async def stop_streaming(self):
+        """Tắt streaming mode, quay về REST polling"""
+        if self.stream:
+            await self.stream.stop()
+            self.stream = None
+    
+    def start_recording(self, path: Path = None) -> SessionRecorder:
+        """
+        Bắt đầu ghi phiên (REST responses + stream messages) để phát lại offline
+        
+        Args:
+            path: File .jsonl.gz (mặc định Settings.RECORDINGS_DIR/session_<thời gian>.jsonl.gz)
+        """
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+        logger.info(f"🎞️ Recording session to {self.recorder.path}")
+        return self.recorder
+    
+    def stop_recording(self):
+        """Dừng ghi và đóng file"""
+        if self.recorder:
+            self.recorder.close()
+            self.recorder = None
+    
+    def _record_message(self, message: Dict[str, Any]):
+        """BinanceStream on_message - ghi message khi đang record"""
+        if self.recorder:
+            self.recorder.record_message(message)
+    
+    async def _resync_stream(self, symbol: str, kind: str):
+        """Nạp lại dữ liệu qua REST khi stream bị gap"""
+        state = self.stream.get_state(symbol) if self.stream else None
+        if state is None:
+            return
+        
+        if kind == 'klines':
+            candles = await self.get_candles(symbol, state.interval, state.max_klines, use_cache=False)
+            if len(candles):
+                state.set_candles(candles)
+        elif kind == 'trades':
+            trades = await self._fetch_recent_trades(symbol, state.trades.maxlen)
+            if trades:
+                state.set_trades(trades)
+        elif kind == 'depth':
+            state.book.snapshot_pending = True
+            snapshot = await self._fetch_orderbook(symbol, self.settings.ORDERBOOK_SNAPSHOT_LIMIT)
+            if not snapshot:
+                state.book.reset()
+            elif not state.book.load_snapshot(snapshot['lastUpdateId'], snapshot['bids'], snapshot['asks']):
+                logger.warning(f"⚠️ {symbol} depth snapshot older than buffered updates, retrying")
+    
+    def get_local_orderbook(self, symbol: str = 'BTCUSDT') -> Optional[OrderBook]:
+        """Sổ lệnh local đầy đủ của symbol (None nếu không stream hoặc chưa đồng bộ)"""
+        state = self.stream.get_state(symbol) if self.stream else None
+        if state is None or not state.book.is_synced:
+            return None
+        return state.book
+    
     async def get_current_price(self, symbol: str = 'BTCUSDT') -> float:
         """Lấy giá hiện tại"""
+        price = await self.cache.get_or_fetch(
+            ('price', symbol), lambda: self._fetch_current_price(symbol), self.cache_ttl['price']
+        )
+        return price or 45000.0  # Fallback price
+    
+    async def _fetch_current_price(self, symbol: str) -> Optional[float]:
         try:
-            # Check cache first
-            cache_key = f"price_{symbol}"
-            if self._is_cache_valid(cache_key):
-                return self.price_cache[cache_key]['data']
-            
-            url = f"{self.api_endpoints['binance']}/ticker/price"
             params = {'symbol': symbol}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        price = float(data['price'])
-                        
-                        # Cache result
-                        self.price_cache[cache_key] = {
-                            'data': price,
-                            'timestamp': datetime.now()
-                        }
-                        
-                        return price
-            
-            # Fallback price
-            return 45000.0
+            async with self._request('/ticker/price', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return float(data['price'])
             
+            return None
+        
         except Exception as e:
             logger.error(f"❌ Price fetch failed: {e}")
-            return 45000.0  # Fallback price
+            return None
     
     async def get_24h_ticker(self, symbol: str = 'BTCUSDT') -> Dict[str, Any]:
         """Lấy thông tin ticker 24h"""
+        return await self.cache.get_or_fetch(
+            ('ticker', symbol), lambda: self._fetch_24h_ticker(symbol), self.cache_ttl['ticker']
+        )
+    
+    async def _fetch_24h_ticker(self, symbol: str) -> Dict[str, Any]:
         try:
-            url = f"{self.api_endpoints['binance']}/ticker/24hr"
             params = {'symbol': symbol}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'high': float(data['highPrice']),
-                            'low': float(data['lowPrice']),
-                            'volume': float(data['volume']),
-                            'quoteVolume': float(data['quoteVolume']),
-                            'priceChange': float(data['priceChange']),
-                            'priceChangePercent': float(data['priceChangePercent'])
+            async with self._request('/ticker/24hr', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        'high': float(data['highPrice']),
+                        'low': float(data['lowPrice']),
+                        'volume': float(data['volume']),
+                        'quoteVolume': float(data['quoteVolume']),
+                        'priceChange': float(data['priceChange']),
+                        'priceChangePercent': float(data['priceChangePercent'])
+                    }
+            
+            return {}
+        
+        except Exception as e:
+            logger.error(f"❌ 24h ticker fetch failed: {e}")
+            return {}
+    
+    async def get_24h_tickers(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Ticker 24h của nhiều symbols trong một request (kèm 'price' = lastPrice)"""
+        try:
+            params = {'symbols': json.dumps(symbols, separators=(',', ':'))}
+            
+            async with self._request('/ticker/24hr', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        item['symbol']: {
+                            'price': float(item['lastPrice']),
+                            'high': float(item['highPrice']),
+                            'low': float(item['lowPrice']),
+                            'volume': float(item['volume']),
+                            'quoteVolume': float(item['quoteVolume']),
+                            'priceChange': float(item['priceChange']),
+                            'priceChangePercent': float(item['priceChangePercent'])
                         }
+                        for item in data
+                    }
             
             return {}
+        
+        except Exception as e:
+            logger.error(f"❌ Batch 24h ticker fetch failed: {e}")
+            return {}
+    
+    async def get_book_tickers(self, symbols: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Best bid/ask của nhiều symbols trong một request (format như get_orderbook)"""
+        try:
+            params = {'symbols': json.dumps(symbols, separators=(',', ':'))}
+            
+            async with self._request('/ticker/bookTicker', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        item['symbol']: {
+                            'bids': [[float(item['bidPrice']), float(item['bidQty'])]],
+                            'asks': [[float(item['askPrice']), float(item['askQty'])]]
+                        }
+                        for item in data
+                    }
             
+            return {}
+        
         except Exception as e:
-            logger.error(f"❌ 24h ticker fetch failed: {e}")
+            logger.error(f"❌ Batch book ticker fetch failed: {e}")
             return {}
     
     async def get_orderbook(self, symbol: str = 'BTCUSDT', limit: int = 10) -> Dict[str, Any]:
         """Lấy orderbook"""
+        return await self.cache.get_or_fetch(
+            ('orderbook', symbol, limit), lambda: self._fetch_orderbook(symbol, limit), self.cache_ttl['orderbook']
+        )
+    
+    async def _fetch_orderbook(self, symbol: str, limit: int) -> Dict[str, Any]:
         try:
-            url = f"{self.api_endpoints['binance']}/depth"
             params = {'symbol': symbol, 'limit': limit}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return {
-                            'bids': [[float(price), float(qty)] for price, qty in data['bids']],
-                            'asks': [[float(price), float(qty)] for price, qty in data['asks']]
-                        }
+            async with self._request('/depth', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return {
+                        'lastUpdateId': data['lastUpdateId'],
+                        'bids': [[float(price), float(qty)] for price, qty in data['bids']],
+                        'asks': [[float(price), float(qty)] for price, qty in data['asks']]
+                    }
             
             return {}
-            
+        
         except Exception as e:
             logger.error(f"❌ Orderbook fetch failed: {e}")
             return {}
     
     async def get_recent_trades(self, symbol: str = 'BTCUSDT', limit: int = 50) -> List[Dict[str, Any]]:
         """Lấy trades gần nhất"""
+        return await self.cache.get_or_fetch(
+            ('trades', symbol, limit), lambda: self._fetch_recent_trades(symbol, limit), self.cache_ttl['trades']
+        )
+    
+    async def _fetch_recent_trades(self, symbol: str, limit: int) -> List[Dict[str, Any]]:
         try:
-            url = f"{self.api_endpoints['binance']}/trades"
             params = {'symbol': symbol, 'limit': limit}
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return [
-                            {
-                                'price': float(trade['price']),
-                                'qty': float(trade['qty']),
-                                'time': int(trade['time']),
-                                'isBuyerMaker': trade['isBuyerMaker']
-                            }
-                            for trade in data
-                        ]
+            async with self._request('/trades', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    return [
+                        {
+                            'price': float(trade['price']),
+                            'qty': float(trade['qty']),
+                            'time': int(trade['time']),
+                            'isBuyerMaker': trade['isBuyerMaker']
+                        }
+                        for trade in data
+                    ]
             
             return []
-            
+        
         except Exception as e:
             logger.error(f"❌ Recent trades fetch failed: {e}")
             return []
     
-    async def get_kline_data(self, symbol: str = 'BTCUSDT', interval: str = '1h', limit: int = 100) -> List[Dict[str, Any]]:
-        """Lấy dữ liệu candlestick"""
+    async def get_candles(self, symbol: str = 'BTCUSDT', interval: str = '1h', limit: int = 100,
+                          use_cache: bool = True) -> CandleWindow:
+        """
+        Lấy candlestick dạng cột (zero-copy view trên ring buffer)
+        
+        Response /klines được ghi thẳng vào CandleBuffer của (symbol, interval),
+        không tạo dict cho từng candle. Lỗi mạng thì trả về dữ liệu đang có.
+        
+        Args:
+            use_cache: False để luôn fetch (scheduler tự biết khi nào có candle mới)
+        
+        Returns:
+            CandleWindow với tối đa limit candles cuối
+        """
+        if use_cache:
+            await self.cache.get_or_fetch(
+                ('klines', symbol, interval, limit),
+                lambda: self._fetch_candles(symbol, interval, limit), self.cache_ttl['klines']
+            )
+        else:
+            await self._fetch_candles(symbol, interval, limit)
+        return self.candles.get(symbol, interval).window(limit)
+    
+    async def _fetch_candles(self, symbol: str, interval: str, limit: int) -> Optional[bool]:
+        """Fetch /klines vào buffer; True nếu thành công"""
+        buffer = self.candles.get(symbol, interval)
         try:
-            url = f"{self.api_endpoints['binance']}/klines"
             params = {
                 'symbol': symbol,
                 'interval': interval,
                 'limit': limit
             }
             
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        return [
-                            {
-                                'timestamp': int(kline[0]),
-                                'open': float(kline[1]),
-                                'high': float(kline[2]),
-                                'low': float(kline[3]),
-                                'close': float(kline[4]),
-                                'volume': float(kline[5]),
-                                'close_time': int(kline[6]),
-                                'quote_volume': float(kline[7]),
-                                'trades_count': int(kline[8])
-                            }
-                            for kline in data
-                        ]
-            
-            return []
+            async with self._request('/klines', params) as response:
+                if response.status == 200:
+                    data = await response.json()
+                    buffer.extend(data)
+                    return True
             
+            return None
+        
         except Exception as e:
             logger.error(f"❌ Kline data fetch failed: {e}")
-            return []
+            return None
+    
+    async def get_kline_data(self, symbol: str = 'BTCUSDT', interval: str = '1h', limit: int = 100) -> List[Dict[str, Any]]:
+        """Lấy dữ liệu candlestick dạng list dict (cho code cũ / JSON)"""
+        candles = await self.get_candles(symbol, interval, limit)
+        return candles.to_klines()
+    
+    async def get_history(self, symbol: str, interval: str, start_ms: int, end_ms: int = None) -> CandleWindow:
+        """
+        Klines lịch sử trong [start_ms, end_ms] (không giới hạn một trang limit)
+        
+        Phần chưa có trong HistoryStore được tải qua /klines (resume được),
+        sau đó đọc từ đĩa.
+        """
+        await self.history.load(symbol, interval, start_ms, end_ms)
+        return self.history.store.load(symbol, interval, start_ms, end_ms)
     
-    async def calculate_technical_indicators(self, klines: List[Dict[str, Any]]) -> Dict[str, Any]:
-        """Tính toán các chỉ báo kỹ thuật"""
-        if not klines or len(klines) < 20:
+    async def calculate_technical_indicators(self, klines) -> Dict[str, Any]:
+        """Tính toán các chỉ báo kỹ thuật (CandleWindow hoặc list dict)"""
+        if klines is None or len(klines) < 20:
             return self._get_default_indicators()
         
         try:
-            closes = [k['close'] for k in klines]
-            highs = [k['high'] for k in klines]
-            lows = [k['low'] for k in klines]
-            volumes = [k['volume'] for k in klines]
-            
-            indicators = {
-                'rsi': self._calculate_rsi(closes),
-                'macd': self._calculate_macd(closes),
-                'moving_averages': self._calculate_moving_averages(closes),
-                'bollinger_bands': self._calculate_bollinger_bands(closes),
-                'stochastic': self._calculate_stochastic(highs, lows, closes),
-                'volume_sma': self._calculate_sma(volumes, 20)
-            }
-            
-            return indicators
+            candles = self._as_candles(klines)
             
+            # Vectorized full series, bot chỉ cần giá trị cuối
+            series = indicators.compute_indicators(candles.highs, candles.lows, candles.closes, candles.volumes)
+            return indicators.latest_values(series)
+        
         except Exception as e:
             logger.error(f"❌ Technical indicators calculation failed: {e}")
             return self._get_default_indicators()
     
-    def calculate_support_resistance(self, klines: List[Dict[str, Any]]) -> Dict[str, List[float]]:
-        """Tính toán support/resistance levels"""
-        if not klines:
-            return {'support': [], 'resistance': []}
+    def calculate_support_resistance(self, klines, price: float = None) -> Dict[str, Any]:
+        """
+        Vùng support/resistance trên toàn bộ candles (xem data.levels)
+        
+        Returns:
+            'support' / 'resistance': giá các vùng mạnh nhất mỗi bên của price
+            (mặc định close cuối), 'zones': chi tiết các vùng đó
+        """
+        if klines is None or not len(klines):
+            return {'support': [], 'resistance': [], 'zones': []}
         
         try:
-            highs = [k['high'] for k in klines[-50:]]  # Last 50 candles
-            lows = [k['low'] for k in klines[-50:]]
-            
-            # Simple pivot point method
-            support_levels = []
-            resistance_levels = []
-            
-            for i in range(2, len(lows) - 2):
-                # Local minimum (support)
-                if lows[i] < lows[i-1] and lows[i] < lows[i-2] and lows[i] < lows[i+1] and lows[i] < lows[i+2]:
-                    support_levels.append(lows[i])
-                
-                # Local maximum (resistance)
-                if highs[i] > highs[i-1] and highs[i] > highs[i-2] and highs[i] > highs[i+1] and highs[i] > highs[i+2]:
-                    resistance_levels.append(highs[i])
-            
-            # Sort and remove duplicates
-            support_levels = sorted(list(set(support_levels)))[-5:]  # Keep last 5
-            resistance_levels = sorted(list(set(resistance_levels)))[-5:]  # Keep last 5
-            
-            return {
-                'support': support_levels,
-                'resistance': resistance_levels
-            }
-            
+            return levels.detect(self._as_candles(klines), price)
+        
         except Exception as e:
             logger.error(f"❌ S/R calculation failed: {e}")
-            return {'support': [], 'resistance': []}
+            return {'support': [], 'resistance': [], 'zones': []}
     
     def _calculate_rsi(self, prices: List[float], period: int = 14) -> float:
-        """Calculate RSI"""
+        """Calculate RSI (Wilder smoothing)"""
         if len(prices) < period + 1:
             return 50.0
         
@@ -302,8 +568,12 @@ class DataCollector:
         gains = [d if d > 0 else 0 for d in deltas]
         losses = [-d if d < 0 else 0 for d in deltas]
         
-        avg_gain = sum(gains[-period:]) / period
-        avg_loss = sum(losses[-period:]) / period
+        avg_gain = sum(gains[:period]) / period
+        avg_loss = sum(losses[:period]) / period
+        
+        for gain, loss in zip(gains[period:], losses[period:]):
+            avg_gain = (avg_gain * (period - 1) + gain) / period
+            avg_loss = (avg_loss * (period - 1) + loss) / period
         
         if avg_loss == 0:
             return 100.0
@@ -318,12 +588,13 @@ class DataCollector:
         if len(prices) < 26:
             return {'macd': 0, 'signal': 0, 'histogram': 0}
         
-        ema_12 = self._calculate_ema(prices, 12)
-        ema_26 = self._calculate_ema(prices, 26)
-        macd_line = ema_12 - ema_26
+        ema_12 = self._calculate_ema_series(prices, 12)
+        ema_26 = self._calculate_ema_series(prices, 26)
         
-        # For signal line, we need MACD history (simplified here)
-        signal_line = macd_line * 0.9  # Simplified
+        # Signal line = EMA 9 của MACD history (từ candle thứ 26)
+        macd_history = [fast - slow for fast, slow in zip(ema_12[25:], ema_26[25:])]
+        macd_line = macd_history[-1]
+        signal_line = self._calculate_ema(macd_history, 9)
         histogram = macd_line - signal_line
         
         return {
@@ -359,25 +630,25 @@ class DataCollector:
             'lower': sma - (std_dev * std)
         }
     
-    def _calculate_stochastic(self, highs: List[float], lows: List[float], closes: List[float], period: int = 14) -> Dict[str, float]:
-        """Calculate Stochastic Oscillator"""
+    def _calculate_stochastic(self, highs: List[float], lows: List[float], closes: List[float],
+                              period: int = 14, smooth: int = 3) -> Dict[str, float]:
+        """Calculate Stochastic Oscillator (%D = SMA 3 của %K)"""
         if len(closes) < period:
             return {'k': 50, 'd': 50}
         
-        recent_highs = highs[-period:]
-        recent_lows = lows[-period:]
-        current_close = closes[-1]
+        k_values = []
+        for end in range(max(period, len(closes) - smooth + 1), len(closes) + 1):
+            highest_high = max(highs[end - period:end])
+            lowest_low = min(lows[end - period:end])
+            current_close = closes[end - 1]
+            
+            if highest_high == lowest_low:
+                k_values.append(50)
+            else:
+                k_values.append(100 * (current_close - lowest_low) / (highest_high - lowest_low))
         
-        highest_high = max(recent_highs)
-        lowest_low = min(recent_lows)
-        
-        if highest_high == lowest_low:
-            k = 50
-        else:
-            k = 100 * (current_close - lowest_low) / (highest_high - lowest_low)
-        
-        # Simplified %D calculation
-        d = k * 0.9  # Simplified
+        k = k_values[-1]
+        d = sum(k_values) / len(k_values)
         
         return {'k': k, 'd': d}
     
@@ -404,48 +675,145 @@ class DataCollector:
         
         return ema
     
-    def _calculate_spread(self, orderbook: Dict[str, Any]) -> float:
-        """Calculate bid-ask spread"""
-        if not orderbook.get('bids') or not orderbook.get('asks'):
-            return 0
+    def _calculate_ema_series(self, prices: List[float], period: int) -> List[float]:
+        """EMA tại mỗi điểm, cùng cách seed với _calculate_ema"""
+        multiplier = 2 / (period + 1)
+        series = []
+        running_sum = 0
         
-        best_bid = orderbook['bids'][0][0]
-        best_ask = orderbook['asks'][0][0]
+        for i, price in enumerate(prices):
+            if i < period:
+                running_sum += price
+                series.append(running_sum / (i + 1) if i < period - 1 else running_sum / period)
+            else:
+                series.append((price * multiplier) + (series[-1] * (1 - multiplier)))
         
-        return best_ask - best_bid
+        return series
     
-    def _calculate_avg_volume(self, klines: List[Dict[str, Any]], period: int = 20) -> float:
+    def _calculate_avg_volume(self, klines, period: int = 20) -> float:
         """Calculate average volume"""
-        if not klines:
+        if klines is None or not len(klines):
             return 0
         
-        volumes = [k['volume'] for k in klines[-period:]]
-        return sum(volumes) / len(volumes)
+        volumes = self._as_candles(klines).tail(period).volumes
+        return float(volumes.sum() / len(volumes))
     
-    def _is_cache_valid(self, cache_key: str) -> bool:
-        """Check if cache is still valid"""
-        if cache_key not in self.price_cache:
-            return False
-        
-        cache_time = self.price_cache[cache_key]['timestamp']
-        return (datetime.now() - cache_time).seconds < self.cache_timeout
+    def _as_candles(self, klines) -> CandleWindow:
+        """CandleWindow / CandleBuffer / list dict -> CandleWindow"""
+        if isinstance(klines, CandleWindow):
+            return klines
+        if isinstance(klines, CandleBuffer):
+            return klines.window()
+        return CandleBuffer.from_klines(klines).window()
     
     async def _test_api_connections(self):
         """Test API connectivity"""
         try:
-            url = f"{self.api_endpoints['binance']}/ping"
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url) as response:
-                    if response.status != 200:
-                        raise Exception(f"Binance API test failed: {response.status}")
+            async with self._request('/ping') as response:
+                if response.status != 200:
+                    raise Exception(f"Binance API test failed: {response.status}")
             
             logger.info("✅ API connections tested successfully")
-            
+        
         except Exception as e:
             logger.warning(f"⚠️ API test warning: {e}")
     
+    @asynccontextmanager
+    async def _request(self, path: str, params: Dict[str, Any] = None, priority: int = PRIORITY_MARKET_DATA):
+        """
+        GET tới Binance REST qua rate limiter
+        
+        Chờ đủ request weight (theo priority), gửi request trên shared session
+        và đồng bộ limiter theo X-MBX-USED-WEIGHT / 429 / 418 của response.
+        Khi replay, trả response đã ghi mà không qua limiter / network.
+        """
+        if self.replayer:
+            yield self.replayer.response(path, params)
+            return
+        
+        await self.rate_limiter.acquire(endpoint_weight(path, params), priority)
+        session = await self._get_session()
+        async with session.get(f"{self.api_endpoints['binance']}{path}", params=params) as response:
+            self.rate_limiter.update_from_response(response.status, response.headers)
+            if self.recorder:
+                self.recorder.record_response(path, params, response.status, await response.read())
+            yield response
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """
+        Lấy shared HTTP session (tạo mới nếu chưa có hoặc đã đóng)
+        
+        Connection pool giữ keep-alive giữa các cycle nên mỗi request
+        dùng lại TCP/TLS connection thay vì handshake lại từ đầu.
+        """
+        if self.session is None or self.session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.settings.HTTP_POOL_LIMIT,
+                limit_per_host=self.settings.HTTP_POOL_LIMIT_PER_HOST,
+                ttl_dns_cache=self.settings.HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=self.settings.HTTP_KEEPALIVE_TIMEOUT
+            )
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=self.settings.HTTP_REQUEST_TIMEOUT),
+                trace_configs=[self._create_trace_config()]
+            )
+            logger.debug("🔌 HTTP session opened")
+        
+        return self.session
+    
+    def _create_trace_config(self) -> aiohttp.TraceConfig:
+        """Trace hooks để đếm connection mới / connection được dùng lại"""
+        trace_config = aiohttp.TraceConfig()
+        
+        async def on_request_start(session, context, params):
+            self.connection_stats['requests'] += 1
+        
+        async def on_connection_create_end(session, context, params):
+            self.connection_stats['connections_created'] += 1
+        
+        async def on_connection_reuseconn(session, context, params):
+            self.connection_stats['connections_reused'] += 1
+        
+        async def on_dns_cache_hit(session, context, params):
+            self.connection_stats['dns_cache_hits'] += 1
+        
+        async def on_dns_cache_miss(session, context, params):
+            self.connection_stats['dns_cache_misses'] += 1
+        
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace_config.on_dns_cache_hit.append(on_dns_cache_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_cache_miss)
+        
+        return trace_config
+    
+    def get_connection_stats(self) -> Dict[str, Any]:
+        """Thống kê connection pool (requests, handshakes, reuse)"""
+        stats = dict(self.connection_stats)
+        stats['handshakes'] = stats['connections_created']
+        total = stats['connections_created'] + stats['connections_reused']
+        stats['reuse_rate'] = stats['connections_reused'] / total if total > 0 else 0
+        return stats
+    
+    async def close(self):
+        """Đóng stream, scheduler, file ghi phiên và shared HTTP session"""
+        await self.stop_streaming()
+        await self.stop_scheduler()
+        self.stop_recording()
+        if self.session and not self.session.closed:
+            await self.session.close()
+            logger.info("🔌 Data collector HTTP session closed")
+        self.session = None
+    
     def _get_fallback_market_data(self) -> Dict[str, Any]:
-        """Fallback market data when APIs fail"""
+        """
+        Fallback market data when APIs fail
+        
+        Cùng key với _build_market_data: không có book/candles => liquidity None,
+        sr_zones rỗng và candles là CandleWindow rỗng.
+        """
         return {
             'symbol': 'BTCUSDT',
             'timestamp': datetime.now().isoformat(),
@@ -462,6 +830,9 @@ class DataCollector:
             'avg_volume': 950000,
             'support_levels': [44000, 43500, 43000],
             'resistance_levels': [45500, 46000, 46500],
+            'sr_zones': [],
+            'liquidity': None,
+            'candles': CandleWindow(parse_klines([])),
             **self._get_default_indicators()
         }
     
@@ -1,32 +1,112 @@
 """
 Database operations cho Bitcoin Trading Bot
 """
-import sqlite3
 import logging
+import asyncio
 import json
+import os
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from pathlib import Path
+import numpy as np
 from config.settings import Settings
+from data.migrations import to_epoch_ms
+from data.storage import SQLiteBackend, StorageBackend, create_backend
 
 logger = logging.getLogger(__name__)
 
+DAY_MS = 86_400_000
+
+# Bảng export sang Parquet và các cột partition (hive: day=YYYY-MM-DD/symbol=...)
+EXPORT_PARTITIONS = {
+    'trades': ('day', 'symbol'),
+    'signals': ('day',)
+}
+
+MARKET_DATA_COLUMNS = ('timestamp', 'symbol', 'price', 'volume', 'rsi', 'macd_data', 'indicators')
+
+# Chạy được trên cả SQLite (>= 3.24) và PostgreSQL
+OHLC_UPSERT = '''
+    INSERT INTO market_ohlc (symbol, interval_ms, timestamp, open, high, low, close, samples)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (symbol, interval_ms, timestamp) DO UPDATE SET
+        high = CASE WHEN excluded.high > market_ohlc.high THEN excluded.high ELSE market_ohlc.high END,
+        low = CASE WHEN excluded.low < market_ohlc.low THEN excluded.low ELSE market_ohlc.low END,
+        close = excluded.close,
+        samples = market_ohlc.samples + excluded.samples
+'''
+
+_ARROW_TYPES = {
+    'INTEGER': 'int64',
+    'REAL': 'float64',
+    'TEXT': 'string',
+    'BOOLEAN': 'bool'
+}
+
+def _day(timestamp_ms: int) -> str:
+    return str(np.datetime64(int(timestamp_ms) // DAY_MS, 'D'))
+
+def query_parquet(table: str, columns: Sequence[str] = None, start_ms: int = None, end_ms: int = None,
+                  symbol: str = None, where=None, root: str = None):
+    """
+    Đọc lịch sử trades / signals đã export (pyarrow.Table)
+    
+    Chỉ đọc các cột trong columns; start_ms / end_ms / symbol lọc theo
+    partition (bỏ qua cả thư mục ngày / symbol không liên quan) rồi theo
+    statistics của row group.
+    
+    Args:
+        table: 'trades' hoặc 'signals'
+        columns: Các cột cần đọc (None = tất cả)
+        where: pyarrow.dataset.Expression bổ sung, ví dụ ds.field('pnl') < 0
+    """
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    
+    path = Path(root or Settings().PARQUET_DIR) / table
+    partitioning = ds.partitioning(pa.schema([(name, pa.string()) for name in EXPORT_PARTITIONS[table]]), flavor='hive')
+    dataset = ds.dataset(path, format='parquet', partitioning=partitioning)
+    
+    conditions = []
+    if start_ms is not None:
+        conditions += [ds.field('day') >= _day(start_ms), ds.field('timestamp') >= start_ms]
+    if end_ms is not None:
+        conditions += [ds.field('day') <= _day(end_ms), ds.field('timestamp') <= end_ms]
+    if symbol is not None:
+        conditions.append(ds.field('symbol') == symbol)
+    if where is not None:
+        conditions.append(where)
+    
+    expression = None
+    for condition in conditions:
+        expression = condition if expression is None else expression & condition
+    return dataset.to_table(columns=list(columns) if columns else None, filter=expression)
+
 class DatabaseManager:
-    """Quản lý database SQLite"""
+    """
+    Quản lý database của bot (SQLite hoặc PostgreSQL / TimescaleDB)
     
-    def __init__(self):
+    Mọi thao tác đi qua StorageBackend chọn theo DATABASE_URL. Với SQLite,
+    ghi đi qua SQLiteWriter (một thread, WAL, group commit) nên event loop
+    không chờ fsync; đọc chạy trên thread pool riêng. Với PostgreSQL, đọc
+    và ghi dùng chung pool asyncpg.
+    """
+    
+    def __init__(self, db_path: Path = None, url: str = None):
         self.settings = Settings()
-        self.db_path = Path("bitcoin_bot.db")
-        self.connection = None
+        if db_path is not None:
+            self.backend: StorageBackend = SQLiteBackend(
+                db_path, self.settings.DB_BATCH_SIZE, self.settings.DB_READER_THREADS
+            )
+        else:
+            self.backend = create_backend(url, self.settings)
         
     async def initialize(self):
         """Khởi tạo database và tạo tables"""
         try:
-            self.connection = sqlite3.connect(self.db_path)
-            self.connection.row_factory = sqlite3.Row
-            
+            await self.backend.start()
             await self.create_tables()
-            logger.info("✅ Database initialized successfully")
+            logger.info(f"✅ Database initialized successfully ({self.backend.name})")
             return True
             
         except Exception as e:
@@ -34,90 +114,25 @@ class DatabaseManager:
             return False
     
     async def create_tables(self):
-        """Tạo các bảng cần thiết"""
-        cursor = self.connection.cursor()
-        
-        # Trades table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS trades (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                symbol TEXT NOT NULL,
-                side TEXT NOT NULL,
-                amount REAL NOT NULL,
-                price REAL NOT NULL,
-                cost REAL NOT NULL,
-                pnl REAL DEFAULT 0,
-                fee REAL DEFAULT 0,
-                status TEXT NOT NULL,
-                signal_data TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Signals table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS signals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                action TEXT NOT NULL,
-                confidence REAL NOT NULL,
-                entry_price REAL,
-                stop_loss REAL,
-                take_profit REAL,
-                reasoning TEXT,
-                ai_analysis TEXT,
-                technical_analysis TEXT,
-                executed BOOLEAN DEFAULT FALSE,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Performance table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS performance (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                starting_balance REAL NOT NULL,
-                ending_balance REAL NOT NULL,
-                total_trades INTEGER DEFAULT 0,
-                winning_trades INTEGER DEFAULT 0,
-                losing_trades INTEGER DEFAULT 0,
-                total_pnl REAL DEFAULT 0,
-                max_drawdown REAL DEFAULT 0,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        # Market data table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS market_data (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                timestamp TEXT NOT NULL,
-                symbol TEXT NOT NULL,
-                price REAL NOT NULL,
-                volume REAL,
-                rsi REAL,
-                macd_data TEXT,
-                indicators TEXT,
-                created_at TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
-        
-        self.connection.commit()
-        logger.info("📊 Database tables created/verified")
+        """Tạo / nâng cấp schema qua các migration"""
+        version = await self.backend.migrate()
+        logger.info(f"📊 Database tables created/verified (schema v{version})")
+    
+    @staticmethod
+    def _timestamp(data: Dict[str, Any]) -> int:
+        """Epoch ms của record (mặc định: bây giờ)"""
+        return to_epoch_ms(data.get('timestamp')) or int(datetime.now().timestamp() * 1000)
     
     async def save_trade(self, trade_data: Dict[str, Any]):
-        """Lưu thông tin trade"""
+        """Lưu thông tin trade (chờ commit xong)"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('''
+            await self.backend.execute('''
                 INSERT INTO trades (
                     timestamp, symbol, side, amount, price, cost, 
                     pnl, fee, status, signal_data
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                trade_data.get('timestamp'),
+                self._timestamp(trade_data),
                 trade_data.get('symbol'),
                 trade_data.get('side'),
                 trade_data.get('amount'),
@@ -129,23 +144,21 @@ class DatabaseManager:
                 json.dumps(trade_data.get('signal_data', {}))
             ))
             
-            self.connection.commit()
             logger.info(f"💾 Trade saved to database: {trade_data.get('side')} {trade_data.get('amount')} at ${trade_data.get('price')}")
             
         except Exception as e:
             logger.error(f"❌ Failed to save trade: {e}")
     
     async def save_signal(self, signal_data: Dict[str, Any]):
-        """Lưu thông tin signal"""
+        """Lưu thông tin signal (không chờ commit)"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('''
+            await self.backend.execute('''
                 INSERT INTO signals (
                     timestamp, action, confidence, entry_price, stop_loss, 
                     take_profit, reasoning, ai_analysis, technical_analysis
                 ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
             ''', (
-                signal_data.get('timestamp'),
+                self._timestamp(signal_data),
                 signal_data.get('action'),
                 signal_data.get('confidence'),
                 signal_data.get('entry_price'),
@@ -154,49 +167,97 @@ class DatabaseManager:
                 signal_data.get('reasoning'),
                 json.dumps(signal_data.get('ai_component', {})),
                 json.dumps(signal_data.get('technical_component', {}))
-            ))
+            ), wait=False)
             
-            self.connection.commit()
             logger.info(f"📡 Signal saved: {signal_data.get('action')} - {signal_data.get('confidence'):.2%}")
             
         except Exception as e:
             logger.error(f"❌ Failed to save signal: {e}")
     
+    def _market_data_row(self, market_data: Dict[str, Any]) -> Tuple:
+        return (
+            self._timestamp(market_data),
+            market_data.get('symbol'),
+            market_data.get('price'),
+            market_data.get('volume'),
+            market_data.get('rsi'),
+            json.dumps(market_data.get('macd', {})),
+            json.dumps({k: v for k, v in market_data.items() if k not in ['timestamp', 'symbol', 'price', 'volume', 'rsi', 'macd', 'candles']})
+        )
+    
     async def save_market_data(self, market_data: Dict[str, Any]):
-        """Lưu market data"""
+        """Lưu market data (không chờ commit)"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('''
-                INSERT INTO market_data (
-                    timestamp, symbol, price, volume, rsi, macd_data, indicators
-                ) VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                market_data.get('timestamp'),
-                market_data.get('symbol'),
-                market_data.get('price'),
-                market_data.get('volume'),
-                market_data.get('rsi'),
-                json.dumps(market_data.get('macd', {})),
-                json.dumps({k: v for k, v in market_data.items() if k not in ['timestamp', 'symbol', 'price', 'volume', 'rsi', 'macd']})
-            ))
-            
-            self.connection.commit()
+            await self.backend.execute(f'''
+                INSERT INTO market_data ({', '.join(MARKET_DATA_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', self._market_data_row(market_data), wait=False)
             
         except Exception as e:
             logger.error(f"❌ Failed to save market data: {e}")
     
+    async def save_market_data_many(self, records: Sequence[Dict[str, Any]], wait: bool = True) -> int:
+        """
+        Lưu nhiều market data một lần (SQLite: executemany, PostgreSQL: COPY)
+        
+        Returns:
+            Số rows đã ghi
+        """
+        try:
+            await self.backend.copy_records('market_data', MARKET_DATA_COLUMNS, [
+                self._market_data_row(market_data) for market_data in records
+            ], wait=wait)
+            return len(records)
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to save market data batch: {e}")
+            return 0
+    
+    async def save_ohlc_many(self, bars: Sequence[Tuple]) -> int:
+        """
+        Lưu OHLC (symbol, interval_ms, timestamp, open, high, low, close, samples)
+        
+        Bar đã có (ví dụ nửa phút ghi lúc shutdown rồi nửa còn lại sau khi
+        chạy lại) được gộp: giữ open, mở rộng high / low, lấy close mới.
+        
+        Returns:
+            Số bars đã ghi
+        """
+        try:
+            await self.backend.executemany(OHLC_UPSERT, bars)
+            return len(bars)
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to save OHLC bars: {e}")
+            return 0
+    
+    async def get_ohlc(self, symbol: str, interval_ms: int = 60_000, start_ms: int = None, end_ms: int = None,
+                       limit: int = 1000) -> List[Dict[str, Any]]:
+        """OHLC của một symbol trong [start_ms, end_ms], cũ nhất trước"""
+        try:
+            return await self.backend.fetch('''
+                SELECT * FROM (
+                    SELECT * FROM market_ohlc 
+                    WHERE symbol = ? AND interval_ms = ? AND timestamp BETWEEN ? AND ? 
+                    ORDER BY timestamp DESC 
+                    LIMIT ?
+                ) AS latest ORDER BY timestamp
+            ''', (symbol, interval_ms, start_ms or 0, end_ms if end_ms is not None else 2 ** 62, limit))
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get OHLC: {e}")
+            return []
+    
     async def get_trades(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Lấy danh sách trades"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('''
+            rows = await self.backend.fetch('''
                 SELECT * FROM trades 
-                ORDER BY timestamp DESC 
+                ORDER BY timestamp DESC, id DESC 
                 LIMIT ?
             ''', (limit,))
             
             trades = []
-            for row in cursor.fetchall():
+            for row in rows:
                 trade = dict(row)
                 if trade['signal_data']:
                     trade['signal_data'] = json.loads(trade['signal_data'])
@@ -208,18 +269,41 @@ class DatabaseManager:
             logger.error(f"❌ Failed to get trades: {e}")
             return []
     
+    async def get_market_data(self, symbol: str, start_ms: int = None, end_ms: int = None,
+                              limit: int = 1000) -> List[Dict[str, Any]]:
+        """Market data của một symbol trong [start_ms, end_ms], mới nhất trước"""
+        try:
+            rows = await self.backend.fetch('''
+                SELECT * FROM market_data 
+                WHERE symbol = ? AND timestamp BETWEEN ? AND ? 
+                ORDER BY timestamp DESC 
+                LIMIT ?
+            ''', (symbol, start_ms or 0, end_ms if end_ms is not None else 2 ** 62, limit))
+            
+            records = []
+            for row in rows:
+                record = dict(row)
+                record['macd_data'] = json.loads(record['macd_data']) if record['macd_data'] else {}
+                record['indicators'] = json.loads(record['indicators']) if record['indicators'] else {}
+                records.append(record)
+            
+            return records
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get market data: {e}")
+            return []
+    
     async def get_signals(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Lấy danh sách signals"""
         try:
-            cursor = self.connection.cursor()
-            cursor.execute('''
+            rows = await self.backend.fetch('''
                 SELECT * FROM signals 
-                ORDER BY timestamp DESC 
+                ORDER BY timestamp DESC, id DESC 
                 LIMIT ?
             ''', (limit,))
             
             signals = []
-            for row in cursor.fetchall():
+            for row in rows:
                 signal = dict(row)
                 if signal['ai_analysis']:
                     signal['ai_analysis'] = json.loads(signal['ai_analysis'])
@@ -234,46 +318,39 @@ class DatabaseManager:
             return []
     
     async def get_performance_stats(self) -> Dict[str, Any]:
-        """Lấy thống kê performance"""
+        """Lấy thống kê performance (đọc một row aggregate, không quét bảng trades)"""
         try:
-            cursor = self.connection.cursor()
-            
-            # Total trades
-            cursor.execute('SELECT COUNT(*) as total_trades FROM trades')
-            total_trades = cursor.fetchone()['total_trades']
-            
-            # Winning/losing trades
-            cursor.execute('SELECT COUNT(*) as winning FROM trades WHERE pnl > 0')
-            winning_trades = cursor.fetchone()['winning']
-            
-            cursor.execute('SELECT COUNT(*) as losing FROM trades WHERE pnl < 0')
-            losing_trades = cursor.fetchone()['losing']
-            
-            # Total P&L
-            cursor.execute('SELECT SUM(pnl) as total_pnl FROM trades')
-            total_pnl = cursor.fetchone()['total_pnl'] or 0
-            
-            # Best/worst trades
-            cursor.execute('SELECT MAX(pnl) as best, MIN(pnl) as worst FROM trades')
-            result = cursor.fetchone()
-            best_trade = result['best'] or 0
-            worst_trade = result['worst'] or 0
-            
-            # Win rate
-            win_rate = winning_trades / total_trades if total_trades > 0 else 0
-            
-            return {
-                'total_trades': total_trades,
-                'winning_trades': winning_trades,
-                'losing_trades': losing_trades,
-                'win_rate': win_rate,
-                'total_pnl': total_pnl,
-                'best_trade': best_trade,
-                'worst_trade': worst_trade
-            }
+            rows = await self.backend.fetch("SELECT * FROM trade_stats WHERE scope = 'all' AND bucket = ''")
+            return self._format_stats(rows[0]) if rows else self._format_stats(None)
             
         except Exception as e:
             logger.error(f"❌ Failed to get performance stats: {e}")
+            return self._format_stats(None)
+    
+    async def get_performance_breakdown(self, scope: str = 'day') -> Dict[str, Dict[str, Any]]:
+        """
+        Thống kê performance theo bucket
+        
+        Args:
+            scope: 'day' (ngày UTC, YYYY-MM-DD) hoặc 'symbol'
+        """
+        try:
+            rows = await self.backend.fetch('SELECT * FROM trade_stats WHERE scope = ? ORDER BY bucket', (scope,))
+            return {row['bucket']: self._format_stats(row) for row in rows}
+            
+        except Exception as e:
+            logger.error(f"❌ Failed to get performance breakdown: {e}")
+            return {}
+    
+    async def reconcile_performance_stats(self) -> int:
+        """Dựng lại aggregate từ bảng trades (sau khi sửa / xoá trade cũ hoặc nghi sai lệch)"""
+        buckets = await self.backend.reconcile_trade_stats()
+        logger.info(f"🔁 Performance stats reconciled: {buckets} buckets")
+        return buckets
+    
+    @staticmethod
+    def _format_stats(row: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if row is None:
             return {
                 'total_trades': 0,
                 'winning_trades': 0,
@@ -281,29 +358,151 @@ class DatabaseManager:
                 'win_rate': 0,
                 'total_pnl': 0,
                 'best_trade': 0,
-                'worst_trade': 0
+                'worst_trade': 0,
+                'max_drawdown': 0
             }
+        
+        total_trades = row['total_trades']
+        return {
+            'total_trades': total_trades,
+            'winning_trades': row['winning_trades'],
+            'losing_trades': row['losing_trades'],
+            'win_rate': row['winning_trades'] / total_trades if total_trades > 0 else 0,
+            'total_pnl': row['total_pnl'],
+            'best_trade': row['best_trade'] or 0,
+            'worst_trade': row['worst_trade'] or 0,
+            'max_drawdown': row['max_drawdown']
+        }
     
-    async def cleanup_old_data(self, days: int = 30):
-        """Dọn dẹp dữ liệu cũ"""
+    async def export_parquet(self, root: str = None, tables: Sequence[str] = ('trades', 'signals')) -> Dict[str, int]:
+        """
+        Export trades / signals sang Parquet, partition theo ngày (và symbol)
+        
+        Đọc theo id từng chunk DB_EXPORT_CHUNK rows (bộ nhớ cố định, không
+        chặn writer), ghi file Parquet trên thread pool. Chỉ export rows mới
+        kể từ lần trước (id cuối lưu trong <root>/<table>/_exported.json);
+        chunk bị dừng giữa chừng được ghi lại đè lên cùng file.
+        
+        Returns:
+            Số rows đã export theo bảng
+        """
+        root = Path(root or self.settings.PARQUET_DIR)
+        result = {}
         try:
-            cursor = self.connection.cursor()
-            cutoff_date = datetime.now().strftime('%Y-%m-%d')
+            for table in tables:
+                result[table] = await self._export_table(root / table, table)
+            logger.info(f"📦 Exported to Parquet {root}: {result}")
             
-            # Keep only recent market data
-            cursor.execute('''
-                DELETE FROM market_data 
-                WHERE created_at < datetime('now', '-30 days')
-            ''')
+        except Exception as e:
+            logger.error(f"❌ Failed to export Parquet: {e}")
+        return result
+    
+    async def _export_table(self, path: Path, table: str) -> int:
+        loop = asyncio.get_running_loop()
+        columns = await self.backend.columns(table)
+        state_path = path / '_exported.json'
+        last_id = json.loads(state_path.read_text())['last_id'] if state_path.exists() else 0
+        exported = 0
+        while True:
+            rows = await self.backend.fetch(
+                f'SELECT * FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (last_id, self.settings.DB_EXPORT_CHUNK)
+            )
+            if not rows:
+                break
             
-            self.connection.commit()
-            logger.info(f"🧹 Cleaned up old data (older than {days} days)")
+            await loop.run_in_executor(None, self._write_parquet_chunk, path, table, columns, rows)
+            last_id = rows[-1]['id']
+            exported += len(rows)
+            tmp_path = path / '._exported.json.tmp'
+            tmp_path.write_text(json.dumps({'last_id': last_id}))
+            os.replace(tmp_path, state_path)
+        return exported
+    
+    @staticmethod
+    def _write_parquet_chunk(path: Path, table: str, columns: List[Tuple[str, str]], rows: List[Dict[str, Any]]):
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+        
+        schema = pa.schema(
+            [(name, _ARROW_TYPES.get(column_type, 'string')) for name, column_type in columns]
+            + [('day', pa.string())]
+        )
+        partitioning = ds.partitioning(pa.schema([(name, pa.string()) for name in EXPORT_PARTITIONS[table]]), flavor='hive')
+        
+        data = {name: [row[name] for row in rows] for name, _ in columns}
+        for name, column_type in columns:
+            if column_type == 'BOOLEAN':  # SQLite lưu 0/1
+                data[name] = [None if value is None else bool(value) for value in data[name]]
+        timestamps = np.asarray(data['timestamp'], dtype=np.int64)
+        data['day'] = (timestamps // DAY_MS).astype('datetime64[D]').astype(str).tolist()
+        ds.write_dataset(
+            pa.table(data, schema=schema), path, format='parquet', partitioning=partitioning,
+            basename_template=f"part-{rows[0]['id']}-{{i}}.parquet",
+            existing_data_behavior='overwrite_or_ignore'
+        )
+    
+    async def cleanup_old_data(self, days: int = 30) -> int:
+        """
+        Dọn dẹp market data cũ hơn days ngày
+        
+        Xoá theo từng chunk DB_RETENTION_CHUNK rows (theo index timestamp), mỗi
+        chunk một transaction riêng nên các thao tác ghi khác chen vào được
+        giữa các chunk - xoá cả tháng dữ liệu không khoá database.
+        
+        Returns:
+            Số rows đã xoá
+        """
+        cutoff_ms = int((datetime.now().timestamp() - days * 86400) * 1000)
+        chunk = self.settings.DB_RETENTION_CHUNK
+        deleted = 0
+        try:
+            while True:
+                count = await self.backend.execute('''
+                    DELETE FROM market_data WHERE id IN (
+                        SELECT id FROM market_data WHERE timestamp < ? ORDER BY timestamp LIMIT ?
+                    )
+                ''', (cutoff_ms, chunk))
+                deleted += count
+                if count < chunk:
+                    break
+            
+            logger.info(f"🧹 Cleaned up old data (older than {days} days): {deleted} rows")
             
         except Exception as e:
             logger.error(f"❌ Failed to cleanup old data: {e}")
+        return deleted
     
     async def close(self):
-        """Đóng kết nối database"""
-        if self.connection:
-            self.connection.close()
-            logger.info("🔌 Database connection closed")
+        """Commit nốt các thao tác ghi đang chờ rồi đóng kết nối database"""
+        if not self.backend.is_open:
+            return
+        
+        await self.backend.close()
+        logger.info("🔌 Database connection closed")
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Bảo trì database của bot")
+    parser.add_argument('command', choices=['migrate', 'reconcile', 'export'])
+    parser.add_argument('--db', default=None, help="File SQLite (mặc định theo DATABASE_URL)")
+    parser.add_argument('--url', default=None, help="sqlite:///... hoặc postgresql://... (mặc định DATABASE_URL)")
+    parser.add_argument('--parquet-dir', default=None, help="Thư mục Parquet (mặc định PARQUET_DIR)")
+    args = parser.parse_args()
+    
+    async def main():
+        db = DatabaseManager(args.db, url=args.url)
+        if not await db.initialize():  # initialize() luôn chạy migration
+            return
+        try:
+            if args.command == 'reconcile':
+                buckets = await db.reconcile_performance_stats()
+                print(f"🔁 {db.backend.name}: {buckets} performance buckets")
+            elif args.command == 'export':
+                print(f"📦 {await db.export_parquet(args.parquet_dir)}")
+            print(f"📊 {await db.get_performance_stats()}")
+        finally:
+            await db.close()
+    
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+"""
+SQLite Writer - Một thread ghi SQLite (WAL) phía sau queue, group commit theo batch
+"""
+import logging
+import asyncio
+import queue
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Iterable, Tuple
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[sqlite3.Connection], Any]
+
+_STOP = object()
+
+def connect(db_path: Path, check_same_thread: bool = True) -> sqlite3.Connection:
+    """Mở connection với WAL + synchronous=NORMAL (reader không chặn writer và ngược lại)"""
+    connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=check_same_thread)
+    connection.row_factory = sqlite3.Row
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute('PRAGMA busy_timeout=5000')
+    return connection
+
+class SQLiteWriter:
+    """
+    Writer duy nhất của database, chạy trên thread riêng
+    
+    Coroutine gửi thao tác ghi vào queue và (tuỳ chọn) chờ commit mà không
+    chặn event loop. Thread ghi lấy mọi thao tác đang chờ (tối đa
+    batch_size) và commit chung một transaction - một lần fsync cho cả
+    batch thay vì mỗi insert một lần. Thao tác lỗi làm batch được chạy lại
+    từng thao tác để chỉ thao tác đó thất bại.
+    """
+    
+    def __init__(self, db_path: Path, batch_size: int = 500):
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self._queue: 'queue.SimpleQueue' = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        
+        self.stats = {
+            'writes': 0,
+            'batches': 0,
+            'max_batch': 0,
+            'errors': 0,
+            'commit_seconds': 0.0
+        }
+    
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    async def start(self):
+        """Khởi động thread ghi (mở connection trong thread) và chờ sẵn sàng"""
+        if self.is_running:
+            return
+        self._thread = threading.Thread(target=self._run, name='sqlite-writer', daemon=True)
+        self._thread.start()
+        await self.flush()
+    
+    async def run(self, fn: WriteFn, wait: bool = True) -> Any:
+        """
+        Chạy fn(connection) trên thread ghi, trong transaction của batch
+        
+        Args:
+            fn: Hàm nhận sqlite3.Connection
+            wait: True => chờ tới khi commit xong và trả kết quả của fn;
+                  False => trả về ngay (lỗi chỉ được log)
+        """
+        if not self.is_running:
+            raise RuntimeError("SQLite writer is not running")
+        
+        future = asyncio.get_running_loop().create_future() if wait else None
+        self._queue.put((fn, future))
+        if future is not None:
+            return await future
+    
+    async def execute(self, sql: str, params: Iterable = (), wait: bool = True) -> Optional[int]:
+        """INSERT / UPDATE / DELETE; trả lastrowid khi wait=True"""
+        return await self.run(lambda connection: connection.execute(sql, tuple(params)).lastrowid, wait)
+    
+    async def executemany(self, sql: str, rows: Iterable[Iterable], wait: bool = True) -> Optional[int]:
+        """Nhiều row cùng câu lệnh; trả số row bị ảnh hưởng khi wait=True"""
+        rows = [tuple(row) for row in rows]
+        return await self.run(lambda connection: connection.executemany(sql, rows).rowcount, wait)
+    
+    async def flush(self):
+        """Chờ mọi thao tác đã gửi trước đó được commit"""
+        await self.run(lambda connection: None)
+    
+    async def close(self):
+        """Commit nốt các thao tác đang chờ rồi dừng thread"""
+        if not self.is_running:
+            return
+        await self.flush()
+        self._queue.put(_STOP)
+        await asyncio.get_running_loop().run_in_executor(None, self._thread.join)
+        self._thread = None
+    
+    def _run(self):
+        connection = connect(self.db_path)
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _STOP:
+                    break
+                
+                # Group commit: gom mọi thao tác đã xếp hàng trong lúc commit trước
+                batch = [item]
+                stop = False
+                while len(batch) < self.batch_size:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stop = True
+                        break
+                    batch.append(item)
+                
+                self._commit(connection, batch)
+                if stop:
+                    break
+        finally:
+            connection.close()
+    
+    def _commit(self, connection: sqlite3.Connection, batch: List[Tuple[WriteFn, Optional[asyncio.Future]]]):
+        started = time.perf_counter()
+        results = []
+        try:
+            connection.execute('BEGIN')
+            for fn, _ in batch:
+                results.append(fn(connection))
+            connection.execute('COMMIT')
+        except Exception as e:
+            if connection.in_transaction:
+                connection.execute('ROLLBACK')
+            if len(batch) == 1:
+                self.stats['errors'] += 1
+                self._resolve(batch[0][1], error=e)
+                return
+            # Chạy lại từng thao tác để chỉ thao tác lỗi thất bại
+            for entry in batch:
+                self._commit(connection, [entry])
+            return
+        
+        self.stats['writes'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        self.stats['commit_seconds'] += time.perf_counter() - started
+        for (_, future), result in zip(batch, results):
+            self._resolve(future, result=result)
+    
+    @staticmethod
+    def _resolve(future: Optional[asyncio.Future], result: Any = None, error: Exception = None):
+        if future is None:
+            if error is not None:
+                logger.error(f"❌ Database write failed: {error}")
+            return
+        
+        def set_outcome():
+            if future.done():
+                return
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+        
+        try:
+            future.get_loop().call_soon_threadsafe(set_outcome)
+        except RuntimeError:
+            pass  # Event loop đã đóng
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Số thao tác ghi, số batch và kích thước batch trung bình"""
+        batches = self.stats['batches']
+        return {
+            'queued': self._queue.qsize(),
+            'avg_batch': self.stats['writes'] / batches if batches else 0.0,
+            **self.stats
+        }
@@ -0,0 +1,253 @@
+"""
+History Loader - Tải klines lịch sử nhiều tháng vào store dạng cột trên đĩa
+"""
+import logging
+import asyncio
+import os
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, TYPE_CHECKING
+import numpy as np
+from config.settings import Settings
+from data.candles import FIELDS, INTERVAL_MS, CandleWindow, parse_klines
+from utils.rate_limiter import PRIORITY_BACKGROUND
+
+if TYPE_CHECKING:
+    from data.collector import DataCollector
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 1000  # Số klines tối đa mỗi request /klines
+
+Segment = Tuple[int, int, Path]
+
+class HistoryStore:
+    """
+    Klines lịch sử theo (symbol, interval) dạng cột trên đĩa
+    
+    Mỗi trang tải về là một segment .npy (len(FIELDS) × n) tên
+    '<start>-<end>.npy' theo khoảng open time đã tải, trong thư mục
+    <root>/<SYMBOL>/<interval>/. Ghi thêm không phải đọc lại dữ liệu cũ,
+    khoảng đã có (kể cả khoảng không có candle, ví dụ trước ngày niêm yết)
+    suy ra từ tên file. compact() gộp các segment thành một.
+    """
+    
+    def __init__(self, root: str = None):
+        self.root = Path(root or Settings().HISTORY_DIR)
+    
+    def _dir(self, symbol: str, interval: str) -> Path:
+        return self.root / symbol.upper() / interval
+    
+    def segments(self, symbol: str, interval: str) -> List[Segment]:
+        """Các segment (start, end, path) sắp theo start"""
+        directory = self._dir(symbol, interval)
+        if not directory.exists():
+            return []
+        
+        segments = []
+        for path in directory.glob('*.npy'):
+            start, _, end = path.stem.partition('-')
+            segments.append((int(start), int(end), path))
+        return sorted(segments)
+    
+    def missing(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """Các khoảng open time trong [start_ms, end_ms] chưa tải"""
+        step = INTERVAL_MS[interval]
+        gaps = []
+        cursor = start_ms
+        for start, end, _ in self.segments(symbol, interval):
+            if end < cursor:
+                continue
+            if start > end_ms:
+                break
+            if start > cursor:
+                gaps.append((cursor, start - step))
+            cursor = max(cursor, end + step)
+        if cursor <= end_ms:
+            gaps.append((cursor, end_ms))
+        return gaps
+    
+    def write(self, symbol: str, interval: str, start_ms: int, end_ms: int, data: np.ndarray):
+        """Ghi một segment (ghi file tạm rồi rename nên không bao giờ để lại file dở)"""
+        directory = self._dir(symbol, interval)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{start_ms}-{end_ms}.npy"
+        tmp_path = directory / f".{path.name}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.save(f, np.ascontiguousarray(data, dtype=np.float64))
+        os.replace(tmp_path, path)
+    
+    def load(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> CandleWindow:
+        """Candles trong [start_ms, end_ms] (cũ -> mới, không trùng open time)"""
+        return CandleWindow(self._read(symbol, interval, start_ms, end_ms))
+    
+    def _read(self, symbol: str, interval: str, start_ms: int = None, end_ms: int = None) -> np.ndarray:
+        parts = [
+            np.load(path) for start, end, path in self.segments(symbol, interval)
+            if (start_ms is None or end >= start_ms) and (end_ms is None or start <= end_ms)
+        ]
+        if not parts:
+            return np.zeros((len(FIELDS), 0))
+        
+        data = np.concatenate(parts, axis=1)
+        data = data[:, np.argsort(data[0], kind='stable')]
+        keep = np.ones(data.shape[1], dtype=bool)
+        keep[:-1] = data[0, 1:] != data[0, :-1]  # Trùng open time => giữ bản ghi sau
+        data = data[:, keep]
+        
+        mask = np.ones(data.shape[1], dtype=bool)
+        if start_ms is not None:
+            mask &= data[0] >= start_ms
+        if end_ms is not None:
+            mask &= data[0] <= end_ms
+        return data[:, mask]
+    
+    def compact(self, symbol: str, interval: str):
+        """Gộp các segment liền nhau thành một file"""
+        segments = self.segments(symbol, interval)
+        if len(segments) < 2:
+            return
+        
+        runs = [[segments[0]]]
+        step = INTERVAL_MS[interval]
+        for segment in segments[1:]:
+            if segment[0] <= runs[-1][-1][1] + step:
+                runs[-1].append(segment)
+            else:
+                runs.append([segment])
+        
+        for run in runs:
+            if len(run) < 2:
+                continue
+            start, end = run[0][0], max(segment[1] for segment in run)
+            self.write(symbol, interval, start, end, self._read(symbol, interval, start, end))
+            for _, _, path in run:
+                if path.name != f"{start}-{end}.npy":
+                    path.unlink()
+
+class HistoryLoader:
+    """
+    Tải klines lịch sử qua /klines vào HistoryStore
+    
+    Khoảng cần tải được chia thành trang PAGE_LIMIT candles, đi ngược từ
+    mới về cũ, nhiều trang chạy song song qua rate limiter với
+    PRIORITY_BACKGROUND (không chiếm weight của trading cycle). Mỗi trang
+    ghi ngay thành một segment nên bị dừng giữa chừng thì lần chạy sau chỉ
+    tải các khoảng còn thiếu.
+    """
+    
+    def __init__(self, collector: 'DataCollector', store: HistoryStore = None, concurrency: int = None):
+        self.settings = Settings()
+        self.collector = collector
+        self.store = store or HistoryStore()
+        self.concurrency = concurrency or self.settings.HISTORY_CONCURRENCY
+        
+        self.stats = {
+            'pages': 0,
+            'candles': 0,
+            'failed_pages': 0
+        }
+    
+    def pages(self, interval: str, start_ms: int, end_ms: int) -> List[Tuple[int, int]]:
+        """Chia [start_ms, end_ms] thành các trang (start, end), trang mới nhất trước"""
+        step = INTERVAL_MS[interval]
+        pages = []
+        page_end = end_ms
+        while page_end >= start_ms:
+            page_start = max(start_ms, page_end - (PAGE_LIMIT - 1) * step)
+            pages.append((page_start, page_end))
+            page_end = page_start - step
+        return pages
+    
+    async def load(self, symbol: str, interval: str, start_ms: int, end_ms: int = None) -> Dict[str, int]:
+        """
+        Tải đủ klines trong [start_ms, end_ms] (mặc định tới candle đóng gần nhất)
+        
+        Returns:
+            Số trang đã tải, số candles và số trang lỗi (sẽ tải lại ở lần chạy sau)
+        """
+        symbol = symbol.upper()
+        step = INTERVAL_MS[interval]
+        last_closed = (int(time.time() * 1000) // step - 1) * step
+        start_ms = -(-start_ms // step) * step  # Làm tròn lên open time đầu tiên
+        end_ms = min(last_closed if end_ms is None else end_ms // step * step, last_closed)
+        
+        pages = []
+        for gap_start, gap_end in reversed(self.store.missing(symbol, interval, start_ms, end_ms)):
+            pages.extend(self.pages(interval, gap_start, gap_end))
+        
+        result = {'pages': 0, 'candles': 0, 'failed_pages': 0}
+        if not pages:
+            return result
+        
+        logger.info(f"📥 Loading {symbol} {interval} history: {len(pages)} pages")
+        semaphore = asyncio.Semaphore(self.concurrency)
+        
+        async def load_page(page_start: int, page_end: int):
+            async with semaphore:
+                data = await self._fetch_page(symbol, interval, page_start, page_end)
+            if data is None:
+                result['failed_pages'] += 1
+                return
+            self.store.write(symbol, interval, page_start, page_end, data)
+            result['pages'] += 1
+            result['candles'] += data.shape[1]
+        
+        await asyncio.gather(*(load_page(*page) for page in pages))
+        self.store.compact(symbol, interval)
+        
+        for key, value in result.items():
+            self.stats[key] += value
+        if result['failed_pages']:
+            logger.warning(f"⚠️ {symbol} {interval} history: {result['failed_pages']} pages failed, rerun to resume")
+        logger.info(f"✅ {symbol} {interval} history: {result['candles']} candles in {result['pages']} pages")
+        return result
+    
+    async def _fetch_page(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Optional[np.ndarray]:
+        """Một trang /klines dạng cột, None nếu lỗi"""
+        try:
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'startTime': start_ms,
+                'endTime': end_ms,
+                'limit': PAGE_LIMIT
+            }
+            
+            async with self.collector._request('/klines', params, priority=PRIORITY_BACKGROUND) as response:
+                if response.status == 200:
+                    return parse_klines(await response.json())
+                logger.warning(f"⚠️ History page {symbol} {interval} {start_ms} failed: HTTP {response.status}")
+                return None
+        
+        except Exception as e:
+            logger.error(f"❌ History page fetch failed: {e}")
+            return None
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime, timezone
+    from data.collector import DataCollector
+    
+    parser = argparse.ArgumentParser(description="Tải klines lịch sử vào HistoryStore")
+    parser.add_argument('symbol')
+    parser.add_argument('interval', choices=list(INTERVAL_MS))
+    parser.add_argument('start', help="YYYY-MM-DD (UTC)")
+    parser.add_argument('end', nargs='?', help="YYYY-MM-DD (UTC), mặc định tới hiện tại")
+    args = parser.parse_args()
+    
+    def to_ms(day: str) -> int:
+        return int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+    
+    async def main():
+        collector = DataCollector()
+        try:
+            candles = await collector.get_history(
+                args.symbol, args.interval, to_ms(args.start), to_ms(args.end) if args.end else None
+            )
+            print(f"📥 {args.symbol.upper()} {args.interval}: {len(candles):,} candles trong {collector.history.store.root}")
+        finally:
+            await collector.close()
+    
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
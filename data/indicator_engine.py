@@ -0,0 +1,350 @@
+"""
+Indicator Engine - Cập nhật technical indicators O(1) cho streaming candles
+"""
+import logging
+from collections import deque
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Số lần push trước khi tính lại tổng rolling từ window (chặn sai số float tích lũy)
+REANCHOR_INTERVAL = 1000
+
+class _EMA:
+    """EMA chạy liên tục, seed bằng SMA giống DataCollector._calculate_ema"""
+    
+    def __init__(self, period: int):
+        self.period = period
+        self.multiplier = 2 / (period + 1)
+        self.count = 0
+        self.seed_sum = 0
+        self.value = 0
+    
+    def peek(self, x: float) -> float:
+        n = self.count + 1
+        if n < self.period:
+            return (self.seed_sum + x) / n
+        if n == self.period:
+            return (self.seed_sum + x) / self.period
+        return (x * self.multiplier) + (self.value * (1 - self.multiplier))
+    
+    def push(self, x: float):
+        self.value = self.peek(x)
+        self.count += 1
+        if self.count <= self.period:
+            self.seed_sum += x
+
+class _RollingWindow:
+    """Rolling sum / sum of squares trên window cố định (SMA, Bollinger)"""
+    
+    def __init__(self, period: int):
+        self.period = period
+        self.window = deque(maxlen=period)
+        self.ref = None  # Dịch gốc để sumsq không bị cancellation
+        self.sum = 0
+        self.sumsq = 0.0
+        self.pushes = 0
+    
+    def _sums_with(self, x: float):
+        """(n, sum, sum of squares lệch ref) nếu thêm x vào window"""
+        ref = self.ref if self.ref is not None else x
+        if len(self.window) < self.period:
+            return len(self.window) + 1, self.sum + x, self.sumsq + (x - ref) ** 2, ref
+        oldest = self.window[0]
+        return (
+            self.period,
+            self.sum - oldest + x,
+            self.sumsq - (oldest - ref) ** 2 + (x - ref) ** 2,
+            ref
+        )
+    
+    def mean(self, x: float = None) -> float:
+        if x is None:
+            return self.sum / len(self.window) if self.window else 0
+        n, total, _, _ = self._sums_with(x)
+        return total / n
+    
+    def std(self, x: float = None) -> float:
+        if x is None:
+            n, total, sumsq, ref = len(self.window), self.sum, self.sumsq, self.ref
+        else:
+            n, total, sumsq, ref = self._sums_with(x)
+        if n == 0:
+            return 0
+        shifted_mean = total / n - ref
+        variance = sumsq / n - shifted_mean ** 2
+        return max(variance, 0) ** 0.5
+    
+    def push(self, x: float):
+        _, self.sum, self.sumsq, self.ref = self._sums_with(x)
+        self.window.append(x)
+        self.pushes += 1
+        
+        if self.pushes % REANCHOR_INTERVAL == 0:
+            self.ref = self.sum / len(self.window)
+            self.sum = sum(self.window)
+            self.sumsq = sum((v - self.ref) ** 2 for v in self.window)
+
+class _WilderRSI:
+    """RSI với Wilder smoothing"""
+    
+    def __init__(self, period: int = 14):
+        self.period = period
+        self.prev_close = None
+        self.deltas = 0
+        self.gain_sum = 0
+        self.loss_sum = 0
+        self.avg_gain = 0
+        self.avg_loss = 0
+    
+    def _averages_with(self, close: float):
+        """(số delta, avg_gain, avg_loss, gain_sum, loss_sum) sau khi thêm close"""
+        if self.prev_close is None:
+            return 0, 0, 0, 0, 0
+        
+        delta = close - self.prev_close
+        gain = delta if delta > 0 else 0
+        loss = -delta if delta < 0 else 0
+        n = self.deltas + 1
+        
+        if n < self.period:
+            return n, 0, 0, self.gain_sum + gain, self.loss_sum + loss
+        if n == self.period:
+            gain_sum, loss_sum = self.gain_sum + gain, self.loss_sum + loss
+            return n, gain_sum / self.period, loss_sum / self.period, gain_sum, loss_sum
+        return (
+            n,
+            (self.avg_gain * (self.period - 1) + gain) / self.period,
+            (self.avg_loss * (self.period - 1) + loss) / self.period,
+            self.gain_sum,
+            self.loss_sum
+        )
+    
+    def _rsi(self, n: int, avg_gain: float, avg_loss: float) -> float:
+        if n < self.period:
+            return 50.0
+        if avg_loss == 0:
+            return 100.0
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+    
+    def value(self) -> float:
+        return self._rsi(self.deltas, self.avg_gain, self.avg_loss)
+    
+    def peek(self, close: float) -> float:
+        n, avg_gain, avg_loss, _, _ = self._averages_with(close)
+        return self._rsi(n, avg_gain, avg_loss)
+    
+    def push(self, close: float):
+        if self.prev_close is not None:
+            self.deltas, self.avg_gain, self.avg_loss, self.gain_sum, self.loss_sum = self._averages_with(close)
+        self.prev_close = close
+
+class _MonotonicExtreme:
+    """Max (hoặc min) trượt trên window bằng monotonic deque"""
+    
+    def __init__(self, period: int, is_max: bool):
+        self.period = period
+        self.is_max = is_max
+        self.items = deque()  # (index, value), value đơn điệu
+        self.count = 0
+    
+    def _better(self, a: float, b: float) -> bool:
+        return a >= b if self.is_max else a <= b
+    
+    def peek(self, x: float) -> float:
+        # Window mới gồm index count-period+1 .. count, nên bỏ qua phần tử cũ nhất nếu hết hạn
+        cutoff = self.count - self.period + 1
+        for index, value in self.items:
+            if index >= cutoff:
+                return x if self._better(x, value) else value
+        return x
+    
+    def push(self, x: float):
+        while self.items and self._better(x, self.items[-1][1]):
+            self.items.pop()
+        self.items.append((self.count, x))
+        self.count += 1
+        while self.items[0][0] <= self.count - 1 - self.period:
+            self.items.popleft()
+
+class IndicatorEngine:
+    """
+    Technical indicators tính tăng dần cho một chuỗi candles
+    
+    Mỗi candle đóng được commit một lần (O(1)); candle đang chạy chỉ được
+    "peek" trên state đã commit nên có thể gọi ở mỗi trade tick. Kết quả
+    khớp với DataCollector.calculate_technical_indicators trên cùng klines
+    (RSI/EMA/MACD/stochastic khớp tuyệt đối, SMA/Bollinger sai khác < 1e-9
+    do rolling sum).
+    """
+    
+    MIN_CANDLES = 20
+    
+    def __init__(self, rsi_period: int = 14, stoch_period: int = 14, stoch_smooth: int = 3,
+                 bb_period: int = 20, bb_std_dev: float = 2):
+        self.rsi_period = rsi_period
+        self.stoch_period = stoch_period
+        self.stoch_smooth = stoch_smooth
+        self.bb_period = bb_period
+        self.bb_std_dev = bb_std_dev
+        self.reset()
+    
+    def reset(self):
+        """Xóa toàn bộ state"""
+        self.count = 0
+        self.last_close = 0
+        self.last_closed_timestamp: Optional[int] = None
+        self.live: Optional[Dict[str, Any]] = None
+        self.values: Optional[Dict[str, Any]] = None
+        
+        self.rsi = _WilderRSI(self.rsi_period)
+        self.ema_12 = _EMA(12)
+        self.ema_26 = _EMA(26)
+        self.macd_signal = _EMA(9)
+        self.sma_20 = _RollingWindow(20)
+        self.sma_50 = _RollingWindow(50)
+        self.bollinger = _RollingWindow(self.bb_period)
+        self.volume_sma = _RollingWindow(20)
+        self.highest = _MonotonicExtreme(self.stoch_period, is_max=True)
+        self.lowest = _MonotonicExtreme(self.stoch_period, is_max=False)
+        self.k_history = deque(maxlen=self.stoch_smooth)
+    
+    def seed(self, klines) -> Optional[Dict[str, Any]]:
+        """Nạp lại toàn bộ lịch sử; candle cuối được coi là candle đang chạy"""
+        self.reset()
+        for kline in klines[:-1]:
+            self.update(kline, closed=True)
+        if klines:
+            self.update(klines[-1])
+        return self.values
+    
+    def update(self, kline: Dict[str, Any], closed: bool = False) -> Optional[Dict[str, Any]]:
+        """
+        Cập nhật với candle mới hoặc tick của candle đang chạy
+        
+        Args:
+            kline: Candle dạng dict như DataCollector.get_kline_data
+            closed: True nếu candle đã đóng
+        
+        Returns:
+            Indicators hiện tại, None nếu chưa đủ MIN_CANDLES
+        """
+        timestamp = kline.get('timestamp')
+        if self.last_closed_timestamp is not None and timestamp is not None \
+                and timestamp <= self.last_closed_timestamp:
+            return self.values  # Candle đã commit (duplicate sau reconnect)
+        
+        # Candle đang chạy bị thay thế bởi candle mới => nó đã đóng
+        if self.live is not None and self.live.get('timestamp') != timestamp:
+            self._commit(self.live)
+        
+        if closed:
+            self._commit(kline)
+            self.live = None
+            self.values = self._snapshot()
+        else:
+            self.live = kline
+            self.values = self._snapshot(kline)
+        
+        return self.values
+    
+    def _commit(self, kline: Dict[str, Any]):
+        close = kline['close']
+        
+        self.rsi.push(close)
+        self.ema_12.push(close)
+        self.ema_26.push(close)
+        self.sma_20.push(close)
+        self.sma_50.push(close)
+        self.bollinger.push(close)
+        self.volume_sma.push(kline['volume'])
+        self.highest.push(kline['high'])
+        self.lowest.push(kline['low'])
+        self.count += 1
+        self.last_close = close
+        self.last_closed_timestamp = kline.get('timestamp')
+        
+        if self.count >= 26:
+            self.macd_signal.push(self.ema_12.value - self.ema_26.value)
+        
+        if self.count >= self.stoch_period:
+            k = self._stochastic_k(self.highest.items[0][1], self.lowest.items[0][1], close)
+            self.k_history.append(k)
+    
+    def _stochastic_k(self, highest_high: float, lowest_low: float, close: float) -> float:
+        if highest_high == lowest_low:
+            return 50
+        return 100 * (close - lowest_low) / (highest_high - lowest_low)
+    
+    def _snapshot(self, live: Dict[str, Any] = None) -> Optional[Dict[str, Any]]:
+        """Indicators trên state đã commit (+ candle đang chạy nếu có)"""
+        n = self.count + (1 if live else 0)
+        if n < self.MIN_CANDLES:
+            return None
+        
+        if live:
+            close = live['close']
+            rsi = self.rsi.peek(close)
+            ema_12 = self.ema_12.peek(close)
+            ema_26 = self.ema_26.peek(close)
+            sma_20 = self.sma_20.mean(close)
+            sma_50 = self.sma_50.mean(close)
+            bb_middle = self.bollinger.mean(close)
+            bb_std = self.bollinger.std(close)
+            volume_sma = self.volume_sma.mean(live['volume'])
+        else:
+            close = self.last_close
+            rsi = self.rsi.value()
+            ema_12 = self.ema_12.value
+            ema_26 = self.ema_26.value
+            sma_20 = self.sma_20.mean()
+            sma_50 = self.sma_50.mean()
+            bb_middle = self.bollinger.mean()
+            bb_std = self.bollinger.std()
+            volume_sma = self.volume_sma.mean()
+        
+        # MACD
+        if n >= 26:
+            macd_line = ema_12 - ema_26
+            signal_line = self.macd_signal.peek(macd_line) if live else self.macd_signal.value
+            macd = {'macd': macd_line, 'signal': signal_line, 'histogram': macd_line - signal_line}
+        else:
+            macd = {'macd': 0, 'signal': 0, 'histogram': 0}
+        
+        # Bollinger Bands
+        if n >= self.bb_period:
+            bollinger = {
+                'upper': bb_middle + (self.bb_std_dev * bb_std),
+                'middle': bb_middle,
+                'lower': bb_middle - (self.bb_std_dev * bb_std)
+            }
+        else:
+            bollinger = {'upper': close, 'middle': close, 'lower': close}
+        
+        # Stochastic
+        if n < self.stoch_period:
+            stochastic = {'k': 50, 'd': 50}
+        elif live:
+            k = self._stochastic_k(self.highest.peek(live['high']), self.lowest.peek(live['low']), close)
+            k_values = list(self.k_history)[1 - self.stoch_smooth:] if self.stoch_smooth > 1 else []
+            k_values.append(k)
+            stochastic = {'k': k, 'd': sum(k_values) / len(k_values)}
+        else:
+            k_values = list(self.k_history)
+            stochastic = {'k': k_values[-1], 'd': sum(k_values) / len(k_values)}
+        
+        return {
+            'rsi': rsi,
+            'macd': macd,
+            'moving_averages': {
+                'sma_20': sma_20,
+                'sma_50': sma_50,
+                'ema_12': ema_12,
+                'ema_26': ema_26,
+                'current_price': close
+            },
+            'bollinger_bands': bollinger,
+            'stochastic': stochastic,
+            'volume_sma': volume_sma
+        }
@@ -0,0 +1,235 @@
+"""
+Vectorized Indicators - Tính toàn bộ chuỗi technical indicators bằng NumPy
+"""
+import logging
+from typing import Dict, List, Any
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+logger = logging.getLogger(__name__)
+
+# Giá trị tại index i luôn bằng kết quả của DataCollector._calculate_* trên prices[:i+1],
+# nên phần tử cuối của mỗi chuỗi chính là giá trị "hiện tại" mà bot đang dùng.
+
+# Dưới ngưỡng này overhead của pandas lớn hơn chính phép tính => dùng NumPy / vòng lặp nhỏ
+SMALL_SERIES = 512
+
+def _prefix_mean(values: np.ndarray, count: int) -> np.ndarray:
+    """Trung bình của values[:i+1] cho i < count"""
+    head = values[:count]
+    return np.cumsum(head) / np.arange(1, len(head) + 1)
+
+def _recursive_ema(values: np.ndarray, alpha: float, seed: float) -> np.ndarray:
+    """y[0] = seed, y[t] = alpha * x[t] + (1 - alpha) * y[t-1] với x = values[1:]"""
+    if len(values) < SMALL_SERIES:
+        result = np.empty(len(values))
+        ema_value = result[0] = seed
+        for i in range(1, len(values)):
+            ema_value = result[i] = (values[i] * alpha) + (ema_value * (1 - alpha))
+        return result
+    
+    data = np.empty(len(values))
+    data[0] = seed
+    data[1:] = values[1:]
+    return pd.Series(data).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+def _rolling(values: np.ndarray, period: int, how: str) -> np.ndarray:
+    """Rolling mean/std/max/min cho các window đầy đủ (độ dài len - period + 1)"""
+    if len(values) < SMALL_SERIES:
+        windows = sliding_window_view(values, period)
+        if how == 'mean':
+            return windows.sum(axis=1) / period
+        return getattr(windows, how)(axis=1)
+    
+    rolling = pd.Series(values).rolling(period)
+    result = rolling.std(ddof=0) if how == 'std' else getattr(rolling, how)()
+    return result.to_numpy()[period - 1:]
+
+def sma(values: np.ndarray, period: int) -> np.ndarray:
+    """Simple Moving Average (trung bình tất cả nếu chưa đủ period)"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+    
+    result[:period - 1] = _prefix_mean(values, period - 1)
+    if len(values) >= period:
+        result[period - 1:] = _rolling(values, period, 'mean')
+    return result
+
+def ema(values: np.ndarray, period: int) -> np.ndarray:
+    """Exponential Moving Average, seed bằng SMA của period giá đầu tiên"""
+    values = np.asarray(values, dtype=np.float64)
+    result = np.empty(len(values))
+    if len(values) == 0:
+        return result
+    
+    result[:period - 1] = _prefix_mean(values, period - 1)
+    if len(values) >= period:
+        seed = values[:period].sum() / period
+        result[period - 1:] = _recursive_ema(values[period - 1:], 2 / (period + 1), seed)
+    return result
+
+def rsi(closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """RSI với Wilder smoothing (50 khi chưa đủ period + 1 giá)"""
+    closes = np.asarray(closes, dtype=np.float64)
+    result = np.full(len(closes), 50.0)
+    if len(closes) < period + 1:
+        return result
+    
+    deltas = np.diff(closes)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    
+    alpha = 1 / period
+    avg_gain = _recursive_ema(gains[period - 1:], alpha, gains[:period].sum() / period)
+    avg_loss = _recursive_ema(losses[period - 1:], alpha, losses[:period].sum() / period)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        values = 100 - (100 / (1 + avg_gain / avg_loss))
+    result[period:] = np.where(avg_loss == 0, 100.0, values)
+    return result
+
+def macd(closes: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9,
+         fast_ema: np.ndarray = None, slow_ema: np.ndarray = None) -> Dict[str, np.ndarray]:
+    """MACD line, signal line (EMA của MACD) và histogram; có thể truyền sẵn EMA fast/slow"""
+    closes = np.asarray(closes, dtype=np.float64)
+    macd_line = np.zeros(len(closes))
+    signal_line = np.zeros(len(closes))
+    
+    if len(closes) >= slow:
+        fast_ema = ema(closes, fast) if fast_ema is None else fast_ema
+        slow_ema = ema(closes, slow) if slow_ema is None else slow_ema
+        macd_line[slow - 1:] = fast_ema[slow - 1:] - slow_ema[slow - 1:]
+        signal_line[slow - 1:] = ema(macd_line[slow - 1:], signal)
+    
+    return {'macd': macd_line, 'signal': signal_line, 'histogram': macd_line - signal_line}
+
+def bollinger_bands(closes: np.ndarray, period: int = 20, std_dev: float = 2) -> Dict[str, np.ndarray]:
+    """Bollinger Bands (population std); chưa đủ period thì cả ba band = giá"""
+    closes = np.asarray(closes, dtype=np.float64)
+    middle = closes.copy()
+    std = np.zeros(len(closes))
+    
+    if len(closes) >= period:
+        middle[period - 1:] = _rolling(closes, period, 'mean')
+        std[period - 1:] = _rolling(closes, period, 'std')
+    
+    return {'upper': middle + std_dev * std, 'middle': middle, 'lower': middle - std_dev * std}
+
+def stochastic(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+               period: int = 14, smooth: int = 3) -> Dict[str, np.ndarray]:
+    """Stochastic %K và %D (SMA smooth của %K); 50 khi chưa đủ period"""
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    k = np.full(len(closes), 50.0)
+    d = np.full(len(closes), 50.0)
+    if len(closes) < period:
+        return {'k': k, 'd': d}
+    
+    highest_high = _rolling(highs, period, 'max')
+    lowest_low = _rolling(lows, period, 'min')
+    price_range = highest_high - lowest_low
+    with np.errstate(divide='ignore', invalid='ignore'):
+        raw_k = 100 * (closes[period - 1:] - lowest_low) / price_range
+    raw_k = np.where(price_range == 0, 50.0, raw_k)
+    
+    k[period - 1:] = raw_k
+    d[period - 1:] = sma(raw_k, smooth)
+    return {'k': k, 'd': d}
+
+def atr(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, period: int = 14) -> np.ndarray:
+    """Average True Range với Wilder smoothing"""
+    highs = np.asarray(highs, dtype=np.float64)
+    lows = np.asarray(lows, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    if len(closes) == 0:
+        return np.empty(0)
+    
+    true_range = highs - lows
+    if len(closes) > 1:
+        prev_close = closes[:-1]
+        true_range[1:] = np.maximum.reduce([
+            true_range[1:], np.abs(highs[1:] - prev_close), np.abs(lows[1:] - prev_close)
+        ])
+    
+    result = np.empty(len(closes))
+    result[:period - 1] = _prefix_mean(true_range, period - 1)
+    if len(closes) >= period:
+        seed = true_range[:period].sum() / period
+        result[period - 1:] = _recursive_ema(true_range[period - 1:], 1 / period, seed)
+    return result
+
+def compute_indicators(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                       volumes: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Tính toàn bộ chuỗi indicators trong một lượt
+    
+    Returns:
+        Dict tên indicator -> np.ndarray cùng độ dài với closes
+    """
+    closes = np.asarray(closes, dtype=np.float64)
+    ema_12 = ema(closes, 12)
+    ema_26 = ema(closes, 26)
+    macd_data = macd(closes, fast_ema=ema_12, slow_ema=ema_26)
+    bollinger = bollinger_bands(closes)
+    stoch = stochastic(highs, lows, closes)
+    
+    return {
+        'close': closes,
+        'rsi': rsi(closes),
+        'macd': macd_data['macd'],
+        'macd_signal': macd_data['signal'],
+        'macd_histogram': macd_data['histogram'],
+        'sma_20': sma(closes, 20),
+        'sma_50': sma(closes, 50),
+        'ema_12': ema_12,
+        'ema_26': ema_26,
+        'bb_upper': bollinger['upper'],
+        'bb_middle': bollinger['middle'],
+        'bb_lower': bollinger['lower'],
+        'stoch_k': stoch['k'],
+        'stoch_d': stoch['d'],
+        'atr': atr(highs, lows, closes),
+        'volume_sma': sma(volumes, 20)
+    }
+
+# Thứ tự giá trị của _format_values
+_LATEST_NAMES = ('rsi', 'macd', 'macd_signal', 'macd_histogram', 'sma_20', 'sma_50', 'ema_12', 'ema_26', 'close',
+                 'bb_upper', 'bb_middle', 'bb_lower', 'stoch_k', 'stoch_d', 'volume_sma')
+
+def _format_values(rsi_value, macd_value, macd_signal, macd_histogram, sma_20, sma_50, ema_12, ema_26, close,
+                   bb_upper, bb_middle, bb_lower, stoch_k, stoch_d, volume_sma) -> Dict[str, Any]:
+    return {
+        'rsi': rsi_value,
+        'macd': {
+            'macd': macd_value,
+            'signal': macd_signal,
+            'histogram': macd_histogram
+        },
+        'moving_averages': {
+            'sma_20': sma_20,
+            'sma_50': sma_50,
+            'ema_12': ema_12,
+            'ema_26': ema_26,
+            'current_price': close
+        },
+        'bollinger_bands': {
+            'upper': bb_upper,
+            'middle': bb_middle,
+            'lower': bb_lower
+        },
+        'stochastic': {'k': stoch_k, 'd': stoch_d},
+        'volume_sma': volume_sma
+    }
+
+def latest_values(series: Dict[str, np.ndarray], index: int = -1) -> Dict[str, Any]:
+    """Lấy giá trị tại index theo format của DataCollector.calculate_technical_indicators"""
+    return _format_values(*(series[name].item(index) for name in _LATEST_NAMES))
+
+def latest_rows(series: Dict[str, np.ndarray], indices: np.ndarray) -> List[Dict[str, Any]]:
+    """latest_values tại nhiều index một lượt (gom cột rồi tolist, nhanh hơn gọi từng index)"""
+    columns = np.column_stack([series[name][indices] for name in _LATEST_NAMES])
+    return [_format_values(*row) for row in columns.tolist()]
@@ -0,0 +1,324 @@
+"""
+Support / Resistance - Pivot vectorized, gom các mức gần nhau thành vùng theo số lần chạm và volume
+"""
+import logging
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from config.settings import Settings
+from data.candles import CandleWindow
+
+logger = logging.getLogger(__name__)
+
+MAX_LEVELS = 5  # số vùng support / resistance mỗi bên
+STRONG_TOUCHES = 3  # vùng chạm từ chừng này lần trở lên là vùng mạnh
+ROW_CHUNK = 8192  # số bars mỗi lượt của zone_levels (ma trận pivot (bars, pivots mỗi window))
+
+def find_pivots(values: np.ndarray, upper: bool, width: int = 2) -> np.ndarray:
+    """Mask các bar cao (upper) / thấp hơn hẳn width bars mỗi bên; width bars ở hai đầu luôn False"""
+    n = len(values)
+    mask = np.zeros(n, dtype=bool)
+    if n < 2 * width + 1:
+        return mask
+    
+    center = values[width:n - width]
+    pivots = np.ones(len(center), dtype=bool)
+    for offset in range(1, width + 1):
+        for other in (values[width - offset:n - width - offset], values[width + offset:n - width + offset]):
+            pivots &= (center > other) if upper else (center < other)
+    mask[width:n - width] = pivots
+    return mask
+
+def pivot_points(highs: np.ndarray, lows: np.ndarray, volumes: np.ndarray,
+                 width: int = 2) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Pivot low và pivot high theo thứ tự bar (cùng bar thì low trước)
+    
+    Returns:
+        (index bar, giá pivot, volume của bar)
+    """
+    low_index = np.flatnonzero(find_pivots(lows, upper=False, width=width))
+    high_index = np.flatnonzero(find_pivots(highs, upper=True, width=width))
+    index = np.concatenate([low_index, high_index])
+    order = np.argsort(index, kind='stable')
+    prices = np.concatenate([lows[low_index], highs[high_index]])[order]
+    index = index[order]
+    return index, prices, volumes[index]
+
+def _cluster(prices: np.ndarray, volumes: np.ndarray, tolerance: float) -> Dict[str, np.ndarray]:
+    """
+    Gom pivots của từng hàng thành vùng
+    
+    Pivots xếp theo giá; vùng bắt đầu ở pivot thấp nhất chưa thuộc vùng nào
+    và gồm mọi pivot không cao hơn nó quá tolerance (vùng rộng tối đa
+    tolerance, kể cả trên lịch sử dài dày đặc pivots). Strength là trung
+    bình của số lần chạm và tổng volume tính theo volume TB mỗi pivot.
+    
+    Args:
+        prices: (rows, m) giá pivot theo thứ tự bar, NaN ở cuối hàng = không có
+        volumes: (rows, m) volume của bar pivot
+        tolerance: Độ rộng vùng tương đối (0.003 = 0.3%)
+    
+    Returns:
+        Mảng (rows, số vùng tối đa) tăng dần theo giá: price (trung bình theo
+        volume), low, high, touches, volume, strength - thiếu vùng thì NaN / 0
+    """
+    rows, m = prices.shape
+    order = np.argsort(prices, axis=1, kind='stable')  # NaN xếp cuối
+    prices = np.take_along_axis(prices, order, axis=1)
+    volumes = np.take_along_axis(volumes, order, axis=1)
+    valid = ~np.isnan(prices)
+    counts = valid.sum(axis=1)
+    
+    # Đầu vùng: từ pivot đầu vùng nhảy tới pivot đầu tiên cao hơn quá tolerance
+    starts = np.zeros((rows, m), dtype=bool)
+    if rows == 1:  # một window (detect / stream): cùng phép so sánh, searchsorted trên hàng đã xếp
+        position = 0
+        while position < counts[0]:
+            starts[0, position] = True
+            position = int(np.searchsorted(prices[0], prices[0, position] * (1 + tolerance), side='right'))
+    else:
+        position = np.zeros(rows, dtype=np.intp)
+        active = position < counts
+        while active.any():
+            row, column = np.flatnonzero(active), position[active]
+            starts[row, column] = True
+            limit = prices[row, column] * (1 + tolerance)
+            position[active] = (prices[row] <= limit[:, None]).sum(axis=1)
+            active = position < counts
+    
+    zones = starts.sum(axis=1)
+    ids = ((np.cumsum(zones) - zones)[:, None] + np.cumsum(starts, axis=1) - 1)[valid]
+    total = int(zones.sum())
+    price, volume = prices[valid], volumes[valid]
+    ends = np.ones((rows, m), dtype=bool)
+    ends[:, :-1] = starts[:, 1:] | ~valid[:, 1:]
+    
+    touches = np.bincount(ids, minlength=total)
+    zone_volume = np.bincount(ids, weights=volume, minlength=total)
+    row_volume = np.bincount(np.nonzero(valid)[0], weights=volume, minlength=rows)
+    mean_volume = (row_volume / np.maximum(counts, 1))[np.repeat(np.arange(rows), zones)]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        center = np.where(zone_volume > 0, np.bincount(ids, weights=price * volume, minlength=total) / zone_volume,
+                          np.bincount(ids, weights=price, minlength=total) / touches)
+        relative = np.where(mean_volume > 0, zone_volume / mean_volume, touches)
+    
+    width = int(zones.max(initial=0))
+    zone_rows, zone_columns = np.nonzero(np.arange(width) < zones[:, None])
+    result = {}
+    for name, values in (('price', center), ('low', prices[starts]), ('high', prices[valid & ends]),
+                         ('touches', touches), ('volume', zone_volume), ('strength', (touches + relative) / 2)):
+        matrix = np.full((rows, width), 0 if name == 'touches' else np.nan)
+        matrix[zone_rows, zone_columns] = values
+        result[name] = matrix
+    return result
+
+def _select(zones: Dict[str, np.ndarray], prices: np.ndarray, levels: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    levels vùng mạnh nhất dưới giá (support) và trên giá (resistance) của mỗi hàng
+    
+    Cùng strength thì vùng gần giá hơn được chọn trước.
+    
+    Returns:
+        (support, resistance) cột vùng đã chọn (rows, levels), -1 = không có
+    """
+    center, strength = zones['price'], zones['strength']
+    current = prices[:, None]
+    selected = []
+    for side, distance in ((center < current, current - center), (center > current, center - current)):
+        order = np.lexsort((distance, np.where(side, -strength, np.inf)), axis=-1)[:, :levels]
+        columns = np.where(np.take_along_axis(side, order, axis=1), order, -1)
+        padded = np.full((len(prices), levels), -1, dtype=np.intp)
+        padded[:, :columns.shape[1]] = columns
+        selected.append(padded)
+    return selected[0], selected[1]
+
+def _level_values(zones: Dict[str, np.ndarray], columns: np.ndarray) -> np.ndarray:
+    """Giá vùng theo cột đã chọn, tăng dần theo hàng, NaN ở cuối hàng"""
+    if not zones['price'].shape[1]:
+        return np.full(columns.shape, np.nan)
+    values = np.take_along_axis(zones['price'], np.maximum(columns, 0), axis=1)
+    return np.sort(np.where(columns >= 0, values, np.nan), axis=1)
+
+def zone_levels(candles: CandleWindow, bars: np.ndarray, lookback: int, width: int = None,
+                tolerance: float = None, levels: int = MAX_LEVELS) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    S/R tại mỗi bar như detect() trên lookback candles kết thúc ở bar đó, giá = close của bar
+    
+    Pivots tính một lần trên toàn bộ candles; mỗi bar lấy pivots nằm trọn trong
+    window của nó rồi gom vùng cho cả khối bars cùng lúc.
+    
+    Returns:
+        (supports, resistances) dạng (len(bars), levels) tăng dần theo hàng, NaN ở cuối hàng
+    """
+    settings = Settings()
+    width = settings.SR_PIVOT_WIDTH if width is None else width
+    tolerance = settings.SR_ZONE_PERCENT / 100 if tolerance is None else tolerance
+    index, prices, volumes = pivot_points(candles.highs, candles.lows, candles.volumes, width)
+    closes = candles.closes
+    
+    supports = np.full((len(bars), levels), np.nan)
+    resistances = np.full((len(bars), levels), np.nan)
+    if not len(index):
+        return supports, resistances
+    
+    for start in range(0, len(bars), ROW_CHUNK):
+        chunk = bars[start:start + ROW_CHUNK]
+        first = np.searchsorted(index, np.maximum(chunk - lookback + 1, 0) + width, side='left')
+        counts = np.searchsorted(index, chunk - width, side='right') - first
+        columns = np.arange(counts.max(initial=0))
+        valid = columns < counts[:, None]
+        gather = np.minimum(first[:, None] + columns, len(index) - 1)
+        zones = _cluster(np.where(valid, prices[gather], np.nan), np.where(valid, volumes[gather], 0.0), tolerance)
+        support, resistance = _select(zones, closes[chunk], levels)
+        supports[start:start + len(chunk)] = _level_values(zones, support)
+        resistances[start:start + len(chunk)] = _level_values(zones, resistance)
+    return supports, resistances
+
+class SupportResistance:
+    """
+    Vùng S/R trên lookback candles cuối, cập nhật dần theo candles mới (stream)
+    
+    load() tính pivots vectorized một lần; mỗi candle mới sau đó chỉ kiểm tra
+    bar cách cuối width bars và bỏ pivots đã ra khỏi window. Candle cùng
+    timestamp với candle cuối (đang chạy) thay candle đó và kiểm tra lại bar
+    phụ thuộc vào nó. Vùng chỉ gom lại khi tập pivots đổi; kết quả giống
+    detect() trên cùng lookback candles cuối.
+    """
+    
+    def __init__(self, lookback: int = 100, width: int = None, tolerance: float = None, levels: int = MAX_LEVELS):
+        settings = Settings()
+        self.width = settings.SR_PIVOT_WIDTH if width is None else width
+        self.tolerance = settings.SR_ZONE_PERCENT / 100 if tolerance is None else tolerance
+        self.lookback = max(lookback, 2 * self.width + 1)
+        self.max_levels = levels
+        self.stats = {'candles': 0, 'clusters': 0}
+        self.reset()
+    
+    def reset(self):
+        """Xóa mọi candles / pivots"""
+        self.count = 0  # số candles đã nhận = index của candle kế tiếp
+        self.last_timestamp: Optional[int] = None
+        self.close = 0.0
+        self._tail = deque(maxlen=2 * self.width + 1)  # (high, low, volume) của các candle cuối
+        self._pivots = deque()  # (index, giá, volume) theo thứ tự bar
+        self._zones = None
+    
+    def load(self, candles: CandleWindow) -> 'SupportResistance':
+        """Tính lại từ lookback candles cuối"""
+        self.reset()
+        candles = candles.tail(self.lookback)
+        if not len(candles):
+            return self
+        
+        index, prices, volumes = pivot_points(candles.highs, candles.lows, candles.volumes, self.width)
+        self._pivots.extend(zip(index.tolist(), prices.tolist(), volumes.tolist()))
+        tail = candles.tail(self._tail.maxlen)
+        self._tail.extend(zip(tail.highs.tolist(), tail.lows.tolist(), tail.volumes.tolist()))
+        self.count = len(candles)
+        self.last_timestamp = int(candles.timestamps[-1])
+        self.close = float(candles.closes[-1])
+        self.stats['candles'] += len(candles)
+        return self
+    
+    def update(self, candles: CandleWindow) -> bool:
+        """
+        Áp dụng candles cuối của buffer: timestamp mới => thêm, trùng candle cuối => thay, cũ hơn => bỏ qua
+        
+        Returns:
+            True nếu tập pivots đổi
+        """
+        if self.last_timestamp is None:
+            self.load(candles)
+            return bool(self._pivots)
+        
+        changed = False
+        rows = zip(candles.timestamps.tolist(), candles.highs.tolist(), candles.lows.tolist(),
+                   candles.volumes.tolist(), candles.closes.tolist())
+        for timestamp, high, low, volume, close in rows:
+            if timestamp < self.last_timestamp:
+                continue
+            self.close = close
+            if timestamp == self.last_timestamp:
+                changed |= self._replace_last(high, low, volume)
+            else:
+                self.last_timestamp = int(timestamp)
+                changed |= self._append(high, low, volume)
+        if changed:
+            self._zones = None
+        return changed
+    
+    def _append(self, high: float, low: float, volume: float) -> bool:
+        self._tail.append((high, low, volume))
+        self.count += 1
+        self.stats['candles'] += 1
+        changed = self._confirm()
+        
+        first = max(self.count - self.lookback, 0) + self.width  # pivot đầu tiên còn trọn trong window
+        while self._pivots and self._pivots[0][0] < first:
+            self._pivots.popleft()
+            changed = True
+        return changed
+    
+    def _replace_last(self, high: float, low: float, volume: float) -> bool:
+        bar = self.count - 1 - self.width  # bar duy nhất có candle cuối trong window pivot
+        removed = []
+        while self._pivots and self._pivots[-1][0] == bar:
+            removed.insert(0, self._pivots.pop())
+        self._tail[-1] = (high, low, volume)
+        self._confirm()
+        return removed != [pivot for pivot in self._pivots if pivot[0] == bar]
+    
+    def _confirm(self) -> bool:
+        """Kiểm tra bar ở giữa tail (đủ width bars mỗi bên); True nếu là pivot"""
+        if len(self._tail) < self._tail.maxlen:
+            return False
+        bar = self.count - 1 - self.width
+        high, low, volume = self._tail[self.width]
+        others = [row for i, row in enumerate(self._tail) if i != self.width]
+        found = False
+        if all(low < row[1] for row in others):
+            self._pivots.append((bar, low, volume))
+            found = True
+        if all(high > row[0] for row in others):
+            self._pivots.append((bar, high, volume))
+            found = True
+        return found
+    
+    def levels(self, price: float = None) -> Dict[str, Any]:
+        """
+        Vùng S/R quanh giá (mặc định close của candle cuối)
+        
+        Returns:
+            'support' / 'resistance': giá các vùng mạnh nhất (tăng dần, tối đa levels mỗi bên),
+            'zones': dict price / low / high / touches / volume / strength / side của các vùng đó
+        """
+        if not self._pivots:
+            return {'support': [], 'resistance': [], 'zones': []}
+        if self._zones is None:
+            _, prices, volumes = np.array(self._pivots).T
+            self._zones = _cluster(prices[None], volumes[None], self.tolerance)
+            self.stats['clusters'] += 1
+        
+        price = self.close if price is None else price
+        zones = self._zones
+        fields = {name: values[0].tolist() for name, values in zones.items()}
+        result = {'zones': []}
+        for side, columns in zip(('support', 'resistance'), _select(zones, np.array([price]), self.max_levels)):
+            result[side] = [level for level in _level_values(zones, columns)[0].tolist() if level == level]
+            for column in columns[0][columns[0] >= 0].tolist():
+                zone = {name: values[column] for name, values in fields.items()}
+                zone['touches'] = int(zone['touches'])
+                zone['side'] = side
+                result['zones'].append(zone)
+        result['zones'].sort(key=lambda zone: zone['price'])
+        return result
+
+def detect(candles: CandleWindow, price: float = None, width: int = None, tolerance: float = None,
+           levels: int = MAX_LEVELS) -> Dict[str, Any]:
+    """Vùng S/R trên toàn bộ candles (độ dài bất kỳ), xem SupportResistance.levels"""
+    return SupportResistance(len(candles), width, tolerance, levels).load(candles).levels(price)
+
+def zone_at(zones: List[Dict[str, Any]], level: float) -> Optional[Dict[str, Any]]:
+    """Vùng có giá level trong danh sách zones của levels() (None nếu không có)"""
+    return next((zone for zone in zones or [] if zone['price'] == level), None)
@@ -0,0 +1,558 @@
+"""
+Database Migrations - Phiên bản schema SQLite theo PRAGMA user_version, PostgreSQL theo bảng schema_version
+"""
+import logging
+import sqlite3
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional, Callable, Tuple
+
+logger = logging.getLogger(__name__)
+
+Migration = Tuple[int, str, Callable[[sqlite3.Connection], None]]
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """
+    Chuẩn hoá timestamp về epoch milliseconds
+    
+    Nhận datetime, số (giây hoặc ms) hoặc chuỗi ISO; chuỗi không có timezone
+    được hiểu theo giờ local (như datetime.now().isoformat()).
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp() * 1000)
+    if isinstance(value, (int, float)):
+        return int(value if value > 1e11 else value * 1000)
+    
+    try:
+        return to_epoch_ms(float(value))
+    except ValueError:
+        pass
+    try:
+        return int(datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp() * 1000)
+    except ValueError:
+        return None
+
+def _initial_schema(connection: sqlite3.Connection):
+    """Schema ban đầu (timestamp TEXT, không index)"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS trades (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            amount REAL NOT NULL,
+            price REAL NOT NULL,
+            cost REAL NOT NULL,
+            pnl REAL DEFAULT 0,
+            fee REAL DEFAULT 0,
+            status TEXT NOT NULL,
+            signal_data TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS signals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            action TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            entry_price REAL,
+            stop_loss REAL,
+            take_profit REAL,
+            reasoning TEXT,
+            ai_analysis TEXT,
+            technical_analysis TEXT,
+            executed BOOLEAN DEFAULT FALSE,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS performance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            date TEXT NOT NULL,
+            starting_balance REAL NOT NULL,
+            ending_balance REAL NOT NULL,
+            total_trades INTEGER DEFAULT 0,
+            winning_trades INTEGER DEFAULT 0,
+            losing_trades INTEGER DEFAULT 0,
+            total_pnl REAL DEFAULT 0,
+            max_drawdown REAL DEFAULT 0,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS market_data (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            volume REAL,
+            rsi REAL,
+            macd_data TEXT,
+            indicators TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _rebuild(connection: sqlite3.Connection, table: str, create_sql: str):
+    """Dựng lại bảng với timestamp INTEGER (SQLite không đổi được kiểu cột tại chỗ)"""
+    columns = [row[1] for row in connection.execute(f'PRAGMA table_info({table})')]
+    select = ', '.join(
+        'COALESCE(to_epoch_ms(timestamp), to_epoch_ms(created_at), 0)' if column == 'timestamp' else column
+        for column in columns
+    )
+    
+    connection.execute(create_sql.format(table=f'{table}_new'))
+    connection.execute(f'INSERT INTO {table}_new ({", ".join(columns)}) SELECT {select} FROM {table}')
+    connection.execute(f'DROP TABLE {table}')
+    connection.execute(f'ALTER TABLE {table}_new RENAME TO {table}')
+
+def _epoch_ms_timestamps(connection: sqlite3.Connection):
+    """timestamp TEXT (ISO) => INTEGER epoch ms"""
+    connection.create_function('to_epoch_ms', 1, to_epoch_ms, deterministic=True)
+    
+    _rebuild(connection, 'trades', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            side TEXT NOT NULL,
+            amount REAL NOT NULL,
+            price REAL NOT NULL,
+            cost REAL NOT NULL,
+            pnl REAL DEFAULT 0,
+            fee REAL DEFAULT 0,
+            status TEXT NOT NULL,
+            signal_data TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    _rebuild(connection, 'signals', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            entry_price REAL,
+            stop_loss REAL,
+            take_profit REAL,
+            reasoning TEXT,
+            ai_analysis TEXT,
+            technical_analysis TEXT,
+            executed BOOLEAN DEFAULT FALSE,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    _rebuild(connection, 'market_data', '''
+        CREATE TABLE {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp INTEGER NOT NULL,
+            symbol TEXT NOT NULL,
+            price REAL NOT NULL,
+            volume REAL,
+            rsi REAL,
+            macd_data TEXT,
+            indicators TEXT,
+            created_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def _timestamp_indexes(connection: sqlite3.Connection):
+    """
+    (symbol, timestamp) cho truy vấn theo symbol, (timestamp) cho ORDER BY
+    timestamp DESC LIMIT và xoá dữ liệu cũ theo từng chunk
+    """
+    connection.execute('CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp ON trades (symbol, timestamp)')
+    connection.execute('CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp)')
+    connection.execute('CREATE INDEX IF NOT EXISTS idx_signals_timestamp ON signals (timestamp)')
+    connection.execute('CREATE INDEX IF NOT EXISTS idx_market_data_symbol_timestamp ON market_data (symbol, timestamp)')
+    connection.execute('CREATE INDEX IF NOT EXISTS idx_market_data_timestamp ON market_data (timestamp)')
+
+# Bucket của trade_stats: (scope, bucket key theo row NEW / OLD, điều kiện lọc trades của bucket)
+_STATS_BUCKETS = [
+    ("'all'", "''", "1"),
+    ("'day'", "date({row}.timestamp / 1000, 'unixepoch')",
+     "timestamp >= {row}.timestamp / 86400000 * 86400000 AND timestamp < {row}.timestamp / 86400000 * 86400000 + 86400000"),
+    ("'symbol'", "{row}.symbol", "symbol = {row}.symbol"),
+]
+
+def _stats_add(row: str) -> str:
+    """Cộng một trade vào các bucket (upsert); drawdown theo equity cộng dồn"""
+    pnl = f'COALESCE({row}.pnl, 0)'
+    return '\n'.join(f'''
+        INSERT INTO trade_stats (scope, bucket, total_trades, winning_trades, losing_trades, total_pnl,
+                                 best_trade, worst_trade, equity, peak_equity, max_drawdown)
+        VALUES ({scope}, {bucket.format(row=row)}, 1, {pnl} > 0, {pnl} < 0, {pnl},
+                {pnl}, {pnl}, {pnl}, MAX(0, {pnl}), MAX(0, -{pnl}))
+        ON CONFLICT (scope, bucket) DO UPDATE SET
+            total_trades = total_trades + 1,
+            winning_trades = winning_trades + excluded.winning_trades,
+            losing_trades = losing_trades + excluded.losing_trades,
+            total_pnl = total_pnl + excluded.total_pnl,
+            best_trade = MAX(best_trade, excluded.best_trade),
+            worst_trade = MIN(worst_trade, excluded.worst_trade),
+            equity = equity + excluded.equity,
+            peak_equity = MAX(peak_equity, equity + excluded.equity),
+            max_drawdown = MAX(max_drawdown, MAX(peak_equity, equity + excluded.equity) - equity - excluded.equity);'''
+        for scope, bucket, _ in _STATS_BUCKETS
+    )
+
+def _stats_remove(row: str) -> str:
+    """
+    Trừ một trade khỏi các bucket; best/worst chỉ tính lại (theo index) khi
+    trade bị xoá đang là best/worst. Drawdown không trừ ngược được - cần
+    reconcile_trade_stats() sau khi sửa / xoá trade cũ.
+    """
+    pnl = f'COALESCE({row}.pnl, 0)'
+    return '\n'.join(f'''
+        UPDATE trade_stats SET
+            total_trades = total_trades - 1,
+            winning_trades = winning_trades - ({pnl} > 0),
+            losing_trades = losing_trades - ({pnl} < 0),
+            total_pnl = total_pnl - {pnl},
+            equity = equity - {pnl},
+            best_trade = CASE WHEN {pnl} >= best_trade
+                THEN (SELECT MAX(pnl) FROM trades WHERE {where.format(row=row)}) ELSE best_trade END,
+            worst_trade = CASE WHEN {pnl} <= worst_trade
+                THEN (SELECT MIN(pnl) FROM trades WHERE {where.format(row=row)}) ELSE worst_trade END
+        WHERE scope = {scope} AND bucket = {bucket.format(row=row)};'''
+        for scope, bucket, where in _STATS_BUCKETS
+    ) + "\n        DELETE FROM trade_stats WHERE total_trades <= 0;"
+
+def reconcile_trade_stats(connection: sqlite3.Connection) -> int:
+    """
+    Dựng lại trade_stats từ toàn bộ bảng trades (theo thứ tự thời gian)
+    
+    Returns:
+        Số bucket
+    """
+    buckets: Dict[Tuple[str, str], List[float]] = {}
+    rows = connection.execute('SELECT timestamp, symbol, COALESCE(pnl, 0) FROM trades ORDER BY timestamp, id')
+    for timestamp, symbol, pnl in rows:
+        day = datetime.fromtimestamp(timestamp / 1000, timezone.utc).strftime('%Y-%m-%d')
+        for key in (('all', ''), ('day', day), ('symbol', symbol)):
+            stats = buckets.get(key)
+            if stats is None:
+                # total, winning, losing, total_pnl, best, worst, equity, peak, max_drawdown
+                stats = buckets[key] = [0, 0, 0, 0.0, pnl, pnl, 0.0, 0.0, 0.0]
+            stats[0] += 1
+            stats[1] += pnl > 0
+            stats[2] += pnl < 0
+            stats[3] += pnl
+            stats[4] = max(stats[4], pnl)
+            stats[5] = min(stats[5], pnl)
+            stats[6] += pnl
+            stats[7] = max(stats[7], stats[6])
+            stats[8] = max(stats[8], stats[7] - stats[6])
+    
+    connection.execute('DELETE FROM trade_stats')
+    connection.executemany(
+        'INSERT INTO trade_stats VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        [(scope, bucket, *stats) for (scope, bucket), stats in buckets.items()]
+    )
+    return len(buckets)
+
+def _trade_stats(connection: sqlite3.Connection):
+    """Aggregate performance (tổng / theo ngày UTC / theo symbol) cập nhật bằng trigger"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS trade_stats (
+            scope TEXT NOT NULL,
+            bucket TEXT NOT NULL,
+            total_trades INTEGER NOT NULL DEFAULT 0,
+            winning_trades INTEGER NOT NULL DEFAULT 0,
+            losing_trades INTEGER NOT NULL DEFAULT 0,
+            total_pnl REAL NOT NULL DEFAULT 0,
+            best_trade REAL,
+            worst_trade REAL,
+            equity REAL NOT NULL DEFAULT 0,
+            peak_equity REAL NOT NULL DEFAULT 0,
+            max_drawdown REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (scope, bucket)
+        ) WITHOUT ROWID
+    ''')
+    
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trades_stats_insert AFTER INSERT ON trades BEGIN
+        {_stats_add('NEW')}
+        END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trades_stats_delete AFTER DELETE ON trades BEGIN
+        {_stats_remove('OLD')}
+        END
+    ''')
+    connection.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trades_stats_update AFTER UPDATE OF timestamp, symbol, pnl ON trades BEGIN
+        {_stats_remove('OLD')}
+        {_stats_add('NEW')}
+        END
+    ''')
+    
+    reconcile_trade_stats(connection)
+
+def _market_ohlc(connection: sqlite3.Connection):
+    """OHLC theo interval_ms từ market snapshots (SnapshotBuffer)"""
+    connection.execute('''
+        CREATE TABLE IF NOT EXISTS market_ohlc (
+            symbol TEXT NOT NULL,
+            interval_ms INTEGER NOT NULL,
+            timestamp INTEGER NOT NULL,
+            open REAL NOT NULL,
+            high REAL NOT NULL,
+            low REAL NOT NULL,
+            close REAL NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, interval_ms, timestamp)
+        ) WITHOUT ROWID
+    ''')
+
+MIGRATIONS: List[Migration] = [
+    (1, 'initial schema', _initial_schema),
+    (2, 'epoch-ms timestamps', _epoch_ms_timestamps),
+    (3, 'timestamp indexes', _timestamp_indexes),
+    (4, 'trade stats aggregates', _trade_stats),
+    (5, 'market ohlc', _market_ohlc),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+def schema_version(connection: sqlite3.Connection) -> int:
+    return connection.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate(connection: sqlite3.Connection) -> int:
+    """
+    Áp dụng các migration chưa chạy, theo thứ tự
+    
+    Chạy trong transaction của caller (SQLiteWriter) nên lỗi giữa chừng
+    rollback toàn bộ, user_version không đổi.
+    
+    Returns:
+        Phiên bản schema sau khi migrate
+    """
+    current = schema_version(connection)
+    for version, name, apply in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"🔧 Applying database migration {version}: {name}")
+        apply(connection)
+        connection.execute(f'PRAGMA user_version = {version}')
+        current = version
+    return current
+
+# PostgreSQL / TimescaleDB: schema tương đương SQLite v4 (timestamp BIGINT epoch ms,
+# index theo timestamp, trade_stats cập nhật bằng trigger PL/pgSQL)
+_POSTGRES_SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS trades (
+        id BIGSERIAL PRIMARY KEY,
+        timestamp BIGINT NOT NULL,
+        symbol TEXT NOT NULL,
+        side TEXT NOT NULL,
+        amount DOUBLE PRECISION NOT NULL,
+        price DOUBLE PRECISION NOT NULL,
+        cost DOUBLE PRECISION NOT NULL,
+        pnl DOUBLE PRECISION DEFAULT 0,
+        fee DOUBLE PRECISION DEFAULT 0,
+        status TEXT NOT NULL,
+        signal_data TEXT,
+        created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')
+    );
+    
+    CREATE TABLE IF NOT EXISTS signals (
+        id BIGSERIAL PRIMARY KEY,
+        timestamp BIGINT NOT NULL,
+        action TEXT NOT NULL,
+        confidence DOUBLE PRECISION NOT NULL,
+        entry_price DOUBLE PRECISION,
+        stop_loss DOUBLE PRECISION,
+        take_profit DOUBLE PRECISION,
+        reasoning TEXT,
+        ai_analysis TEXT,
+        technical_analysis TEXT,
+        executed BOOLEAN DEFAULT FALSE,
+        created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')
+    );
+    
+    CREATE TABLE IF NOT EXISTS performance (
+        id BIGSERIAL PRIMARY KEY,
+        date TEXT NOT NULL,
+        starting_balance DOUBLE PRECISION NOT NULL,
+        ending_balance DOUBLE PRECISION NOT NULL,
+        total_trades INTEGER DEFAULT 0,
+        winning_trades INTEGER DEFAULT 0,
+        losing_trades INTEGER DEFAULT 0,
+        total_pnl DOUBLE PRECISION DEFAULT 0,
+        max_drawdown DOUBLE PRECISION DEFAULT 0,
+        created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS')
+    );
+    
+    -- Khoá chính gồm timestamp để có thể chuyển thành hypertable (TimescaleDB)
+    CREATE TABLE IF NOT EXISTS market_data (
+        id BIGSERIAL,
+        timestamp BIGINT NOT NULL,
+        symbol TEXT NOT NULL,
+        price DOUBLE PRECISION NOT NULL,
+        volume DOUBLE PRECISION,
+        rsi DOUBLE PRECISION,
+        macd_data TEXT,
+        indicators TEXT,
+        created_at TEXT DEFAULT to_char(now() AT TIME ZONE 'UTC', 'YYYY-MM-DD HH24:MI:SS'),
+        PRIMARY KEY (id, timestamp)
+    );
+    
+    CREATE INDEX IF NOT EXISTS idx_trades_symbol_timestamp ON trades (symbol, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_trades_timestamp ON trades (timestamp);
+    CREATE INDEX IF NOT EXISTS idx_signals_timestamp ON signals (timestamp);
+    CREATE INDEX IF NOT EXISTS idx_market_data_symbol_timestamp ON market_data (symbol, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_market_data_timestamp ON market_data (timestamp);
+    
+    CREATE TABLE IF NOT EXISTS trade_stats (
+        scope TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        total_trades INTEGER NOT NULL DEFAULT 0,
+        winning_trades INTEGER NOT NULL DEFAULT 0,
+        losing_trades INTEGER NOT NULL DEFAULT 0,
+        total_pnl DOUBLE PRECISION NOT NULL DEFAULT 0,
+        best_trade DOUBLE PRECISION,
+        worst_trade DOUBLE PRECISION,
+        equity DOUBLE PRECISION NOT NULL DEFAULT 0,
+        peak_equity DOUBLE PRECISION NOT NULL DEFAULT 0,
+        max_drawdown DOUBLE PRECISION NOT NULL DEFAULT 0,
+        PRIMARY KEY (scope, bucket)
+    );
+    
+    CREATE OR REPLACE FUNCTION trade_stats_apply(t trades, sign INTEGER) RETURNS void AS $$
+    DECLARE
+        v_pnl DOUBLE PRECISION := COALESCE(t.pnl, 0);
+        v_day_ms BIGINT := t.timestamp / 86400000 * 86400000;
+        v_best DOUBLE PRECISION;
+        v_worst DOUBLE PRECISION;
+        k RECORD;
+    BEGIN
+        FOR k IN SELECT * FROM (VALUES
+            ('all', ''),
+            ('day', to_char(to_timestamp(t.timestamp / 1000.0) AT TIME ZONE 'UTC', 'YYYY-MM-DD')),
+            ('symbol', t.symbol)
+        ) AS buckets (scope, bucket) LOOP
+            IF sign > 0 THEN
+                INSERT INTO trade_stats AS s (scope, bucket, total_trades, winning_trades, losing_trades, total_pnl,
+                                              best_trade, worst_trade, equity, peak_equity, max_drawdown)
+                VALUES (k.scope, k.bucket, 1, (v_pnl > 0)::int, (v_pnl < 0)::int, v_pnl,
+                        v_pnl, v_pnl, v_pnl, GREATEST(0, v_pnl), GREATEST(0, -v_pnl))
+                ON CONFLICT (scope, bucket) DO UPDATE SET
+                    total_trades = s.total_trades + 1,
+                    winning_trades = s.winning_trades + EXCLUDED.winning_trades,
+                    losing_trades = s.losing_trades + EXCLUDED.losing_trades,
+                    total_pnl = s.total_pnl + v_pnl,
+                    best_trade = GREATEST(s.best_trade, v_pnl),
+                    worst_trade = LEAST(s.worst_trade, v_pnl),
+                    equity = s.equity + v_pnl,
+                    peak_equity = GREATEST(s.peak_equity, s.equity + v_pnl),
+                    max_drawdown = GREATEST(s.max_drawdown, GREATEST(s.peak_equity, s.equity + v_pnl) - s.equity - v_pnl);
+            ELSE
+                UPDATE trade_stats AS s SET
+                    total_trades = s.total_trades - 1,
+                    winning_trades = s.winning_trades - (v_pnl > 0)::int,
+                    losing_trades = s.losing_trades - (v_pnl < 0)::int,
+                    total_pnl = s.total_pnl - v_pnl,
+                    equity = s.equity - v_pnl
+                WHERE s.scope = k.scope AND s.bucket = k.bucket
+                RETURNING s.best_trade, s.worst_trade INTO v_best, v_worst;
+                
+                -- best / worst chỉ tính lại (theo index) khi trade bị bỏ đang là best / worst
+                IF v_pnl >= v_best OR v_pnl <= v_worst THEN
+                    IF k.scope = 'all' THEN
+                        SELECT MAX(pnl), MIN(pnl) INTO v_best, v_worst FROM trades;
+                    ELSIF k.scope = 'day' THEN
+                        SELECT MAX(pnl), MIN(pnl) INTO v_best, v_worst FROM trades
+                        WHERE timestamp >= v_day_ms AND timestamp < v_day_ms + 86400000;
+                    ELSE
+                        SELECT MAX(pnl), MIN(pnl) INTO v_best, v_worst FROM trades WHERE symbol = t.symbol;
+                    END IF;
+                    UPDATE trade_stats SET best_trade = v_best, worst_trade = v_worst
+                    WHERE scope = k.scope AND bucket = k.bucket;
+                END IF;
+            END IF;
+        END LOOP;
+        
+        IF sign < 0 THEN
+            DELETE FROM trade_stats WHERE total_trades <= 0;
+        END IF;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    CREATE OR REPLACE FUNCTION trades_stats_trigger() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP IN ('DELETE', 'UPDATE') THEN
+            PERFORM trade_stats_apply(OLD, -1);
+        END IF;
+        IF TG_OP IN ('INSERT', 'UPDATE') THEN
+            PERFORM trade_stats_apply(NEW, 1);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql;
+    
+    DROP TRIGGER IF EXISTS trades_stats ON trades;
+    CREATE TRIGGER trades_stats AFTER INSERT OR DELETE OR UPDATE OF timestamp, symbol, pnl ON trades
+        FOR EACH ROW EXECUTE FUNCTION trades_stats_trigger();
+    
+    DO $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM pg_extension WHERE extname = 'timescaledb') THEN
+            PERFORM create_hypertable('market_data', 'timestamp', chunk_time_interval => 86400000,
+                                      if_not_exists => TRUE, migrate_data => TRUE);
+        END IF;
+    END
+    $$;
+'''
+
+POSTGRES_MIGRATIONS: List[Tuple[int, str, str]] = [
+    (1, 'initial schema', _POSTGRES_SCHEMA),
+    (2, 'market ohlc', '''
+        CREATE TABLE IF NOT EXISTS market_ohlc (
+            symbol TEXT NOT NULL,
+            interval_ms INTEGER NOT NULL,
+            timestamp BIGINT NOT NULL,
+            open DOUBLE PRECISION NOT NULL,
+            high DOUBLE PRECISION NOT NULL,
+            low DOUBLE PRECISION NOT NULL,
+            close DOUBLE PRECISION NOT NULL,
+            samples INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (symbol, interval_ms, timestamp)
+        );
+    '''),
+]
+
+# Dựng lại trade_stats từ bảng trades (tương đương reconcile_trade_stats)
+POSTGRES_RECONCILE_SQL = '''
+    DELETE FROM trade_stats;
+    INSERT INTO trade_stats (scope, bucket, total_trades, winning_trades, losing_trades, total_pnl,
+                             best_trade, worst_trade, equity, peak_equity, max_drawdown)
+    WITH t AS (
+        SELECT id, timestamp, symbol, COALESCE(pnl, 0) AS pnl FROM trades
+    ), buckets AS (
+        SELECT 'all' AS scope, '' AS bucket, id, timestamp, pnl FROM t
+        UNION ALL
+        SELECT 'day', to_char(to_timestamp(timestamp / 1000.0) AT TIME ZONE 'UTC', 'YYYY-MM-DD'), id, timestamp, pnl FROM t
+        UNION ALL
+        SELECT 'symbol', symbol, id, timestamp, pnl FROM t
+    ), equity AS (
+        SELECT scope, bucket, id, timestamp, pnl,
+               SUM(pnl) OVER (PARTITION BY scope, bucket ORDER BY timestamp, id) AS equity
+        FROM buckets
+    ), peaks AS (
+        SELECT scope, bucket, pnl, equity,
+               GREATEST(0, MAX(equity) OVER (PARTITION BY scope, bucket ORDER BY timestamp, id)) AS peak
+        FROM equity
+    )
+    SELECT scope, bucket, COUNT(*), SUM((pnl > 0)::int), SUM((pnl < 0)::int), SUM(pnl),
+           MAX(pnl), MIN(pnl), SUM(pnl), MAX(peak), GREATEST(0, MAX(peak - equity))
+    FROM peaks
+    GROUP BY scope, bucket;
+'''
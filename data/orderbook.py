@@ -0,0 +1,187 @@
+"""
+Order Book - Sổ lệnh local đầy đủ, dựng từ REST snapshot + Binance depth diff stream
+"""
+import logging
+from collections import deque
+from operator import mul
+from typing import Dict, List, Any, Optional, Tuple, Iterable
+from sortedcontainers import SortedDict
+
+logger = logging.getLogger(__name__)
+
+Level = Tuple[float, float]
+
+class OrderBook:
+    """
+    Sổ lệnh của một symbol, giữ mọi price level trong SortedDict
+    
+    Cập nhật một level là O(log n); best bid/ask là O(log n), depth trong
+    X% quanh mid chỉ cắt (slice) các level nằm trong khoảng đó.
+    
+    Đồng bộ theo quy trình của Binance (<symbol>@depth): diff nhận trước
+    khi có snapshot được giữ lại, snapshot bỏ các diff có u <= lastUpdateId,
+    mỗi diff sau đó phải có U <= lastUpdateId + 1 <= u. Sai thứ tự => gap,
+    sổ lệnh bị xóa và cần snapshot mới.
+    """
+    
+    def __init__(self, symbol: str = '', max_pending: int = 1000):
+        self.symbol = symbol
+        self.bids: SortedDict = SortedDict()  # price -> qty, best bid ở cuối
+        self.asks: SortedDict = SortedDict()  # price -> qty, best ask ở đầu
+        self.last_update_id: Optional[int] = None  # None = chưa đồng bộ
+        self.snapshot_pending = False
+        self._pending = deque(maxlen=max_pending)
+        
+        self.stats = {
+            'updates': 0,
+            'snapshots': 0,
+            'gaps': 0
+        }
+    
+    @classmethod
+    def from_snapshot(cls, orderbook: Dict[str, Any], symbol: str = '') -> 'OrderBook':
+        """Dựng từ dict {'bids': [[price, qty]], 'asks': [...]} (format của get_orderbook)"""
+        book = cls(symbol)
+        book.load_snapshot(orderbook.get('lastUpdateId', 0), orderbook.get('bids', []), orderbook.get('asks', []))
+        return book
+    
+    @property
+    def is_synced(self) -> bool:
+        return self.last_update_id is not None
+    
+    @property
+    def needs_snapshot(self) -> bool:
+        """Chưa đồng bộ và chưa có ai đi lấy snapshot"""
+        return self.last_update_id is None and not self.snapshot_pending
+    
+    def reset(self):
+        """Xóa sổ lệnh, chờ snapshot mới"""
+        self.bids.clear()
+        self.asks.clear()
+        self.last_update_id = None
+        self.snapshot_pending = False
+    
+    def load_snapshot(self, last_update_id: int, bids: Iterable, asks: Iterable) -> bool:
+        """
+        Nạp REST snapshot (/depth) rồi áp dụng các diff đang chờ
+        
+        Returns:
+            False nếu snapshot cũ hơn các diff đang chờ (cần snapshot mới)
+        """
+        self.reset()
+        self.bids.update((float(price), float(qty)) for price, qty in bids if float(qty) > 0)
+        self.asks.update((float(price), float(qty)) for price, qty in asks if float(qty) > 0)
+        self.last_update_id = int(last_update_id)
+        self.stats['snapshots'] += 1
+        
+        pending = list(self._pending)
+        self._pending.clear()
+        for event in pending:
+            if not self.apply_diff(event):
+                return False
+        return True
+    
+    def apply_diff(self, event: Dict[str, Any]) -> bool:
+        """
+        Áp dụng message depthUpdate (U, u, b, a)
+        
+        Returns:
+            False nếu phát hiện gap theo update id (sổ lệnh bị reset)
+        """
+        if self.last_update_id is None:
+            self._pending.append(event)
+            return True
+        
+        first_id, final_id = int(event['U']), int(event['u'])
+        if final_id <= self.last_update_id:
+            return True  # Đã có trong snapshot / message cũ sau reconnect
+        
+        if first_id > self.last_update_id + 1:
+            self.stats['gaps'] += 1
+            self.reset()
+            self._pending.append(event)
+            return False
+        
+        self._apply_levels(self.bids, event['b'])
+        self._apply_levels(self.asks, event['a'])
+        self.last_update_id = final_id
+        self.stats['updates'] += 1
+        return True
+    
+    @staticmethod
+    def _apply_levels(side: SortedDict, levels: Iterable):
+        for price, qty in levels:
+            price, qty = float(price), float(qty)
+            if qty == 0:
+                side.pop(price, None)
+            else:
+                side[price] = qty
+    
+    def best_bid(self) -> Optional[Level]:
+        return self.bids.peekitem(-1) if self.bids else None
+    
+    def best_ask(self) -> Optional[Level]:
+        return self.asks.peekitem(0) if self.asks else None
+    
+    def mid_price(self) -> float:
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return 0.0
+        return (bid[0] + ask[0]) / 2
+    
+    def spread(self) -> float:
+        """Best ask - best bid (0 nếu thiếu một phía)"""
+        bid, ask = self.best_bid(), self.best_ask()
+        if bid is None or ask is None:
+            return 0.0
+        return ask[0] - bid[0]
+    
+    def depth(self, percent: float = 1.0) -> Dict[str, float]:
+        """
+        Thanh khoản (quote, ví dụ USDT) trong khoảng percent% quanh mid price
+        
+        Returns:
+            {'bids': tổng price × qty phía mua, 'asks': tổng phía bán}
+        """
+        mid = self.mid_price()
+        if not mid:
+            return {'bids': 0.0, 'asks': 0.0}
+        
+        band = mid * percent / 100
+        start = self.bids.bisect_left(mid - band)
+        stop = self.asks.bisect_right(mid + band)
+        bids = sum(map(mul, self.bids.keys()[start:], self.bids.values()[start:]))
+        asks = sum(map(mul, self.asks.keys()[:stop], self.asks.values()[:stop]))
+        return {'bids': bids, 'asks': asks}
+    
+    def imbalance(self, percent: float = 1.0) -> float:
+        """(bid - ask) / (bid + ask) trong percent% quanh mid: +1 toàn lệnh mua, -1 toàn lệnh bán"""
+        depth = self.depth(percent)
+        total = depth['bids'] + depth['asks']
+        return (depth['bids'] - depth['asks']) / total if total else 0.0
+    
+    def top(self, levels: int = 10) -> Dict[str, List[List[float]]]:
+        """levels mức giá tốt nhất mỗi phía, format như get_orderbook"""
+        bid_count = min(levels, len(self.bids))
+        ask_count = min(levels, len(self.asks))
+        return {
+            'bids': [list(self.bids.peekitem(-1 - i)) for i in range(bid_count)],
+            'asks': [list(self.asks.peekitem(i)) for i in range(ask_count)]
+        }
+    
+    def liquidity(self, percent: float = 1.0) -> Dict[str, Any]:
+        """Tóm tắt thanh khoản cho market data / signals / risk"""
+        mid = self.mid_price()
+        depth = self.depth(percent)
+        total = depth['bids'] + depth['asks']
+        return {
+            'spread': self.spread(),
+            'spread_percent': self.spread() / mid * 100 if mid else 0.0,
+            'depth_percent': percent,
+            'bid_depth': depth['bids'],
+            'ask_depth': depth['asks'],
+            'imbalance': (depth['bids'] - depth['asks']) / total if total else 0.0,
+            'bid_levels': len(self.bids),
+            'ask_levels': len(self.asks),
+            'synced': self.is_synced
+        }
@@ -0,0 +1,253 @@
+"""
+Session Recording - Ghi lại mọi input của bot (REST + stream) và phát lại offline qua DataCollector
+"""
+import logging
+import asyncio
+import gzip
+import json
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Callable, Awaitable
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+FORMAT_VERSION = 1
+
+# Loại event trong file ghi
+EVENT_REST = 'rest'
+EVENT_STREAM = 'stream'
+EVENT_START_STREAMING = 'start_streaming'
+EVENT_CYCLE = 'cycle'
+
+# REST path => kind của BinanceStream resync (on_gap) đọc response đó
+_RESYNC_KINDS = {'/depth': 'depth', '/klines': 'klines', '/trades': 'trades'}
+
+def request_key(path: str, params: Dict[str, Any] = None) -> str:
+    """Key của REST request: path + params đã sắp xếp, giống nhau khi ghi và khi phát lại"""
+    if not params:
+        return path
+    return f"{path}?" + '&'.join(f"{name}={params[name]}" for name in sorted(params))
+
+def default_path() -> Path:
+    """recordings/session_<YYYYmmdd_HHMMSS>.jsonl.gz"""
+    return Path(Settings().RECORDINGS_DIR) / f"session_{datetime.now():%Y%m%d_%H%M%S}.jsonl.gz"
+
+class SessionRecorder:
+    """
+    Ghi input của một phiên vào file JSONL nén gzip
+    
+    Dòng đầu là header {'version', 'started' (epoch ms)}, mỗi dòng sau là
+    [offset_ms, kind, data] theo thứ tự nhận được. REST body lưu dạng JSON
+    đã parse (không escape lại thành chuỗi) nên file gọn sau khi nén.
+    """
+    
+    def __init__(self, path: Path = None):
+        self.path = Path(path) if path else default_path()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.started_ms = int(time.time() * 1000)
+        self._started = time.monotonic()
+        self._file = gzip.open(self.path, 'wt', encoding='utf-8')
+        self._write({'version': FORMAT_VERSION, 'started': self.started_ms})
+        
+        self.stats = {kind: 0 for kind in (EVENT_REST, EVENT_STREAM, EVENT_START_STREAMING, EVENT_CYCLE)}
+    
+    def record(self, kind: str, data: Any):
+        """Ghi một event với offset (ms) tính từ lúc bắt đầu ghi"""
+        if self._file is None:
+            return
+        offset_ms = int((time.monotonic() - self._started) * 1000)
+        self._write([offset_ms, kind, data])
+        self.stats[kind] = self.stats.get(kind, 0) + 1
+    
+    def record_response(self, path: str, params: Optional[Dict[str, Any]], status: int, body: bytes):
+        """Ghi một REST response (body JSON nếu parse được, ngược lại text)"""
+        data = {'key': request_key(path, params), 'status': status}
+        try:
+            data['json'] = json.loads(body)
+        except ValueError:
+            data['text'] = body.decode('utf-8', 'replace')
+        self.record(EVENT_REST, data)
+    
+    def record_message(self, message: Dict[str, Any]):
+        """Ghi một message stream (dùng làm BinanceStream on_message)"""
+        self.record(EVENT_STREAM, message)
+    
+    def _write(self, row: Any):
+        self._file.write(json.dumps(row, separators=(',', ':')) + '\n')
+    
+    def close(self):
+        """Đóng file ghi (flush phần nén còn lại)"""
+        if self._file is None:
+            return
+        self._file.close()
+        self._file = None
+        logger.info(f"🎞️ Session recorded to {self.path}: {self.stats}")
+
+class RecordedResponse:
+    """Response đã ghi với phần interface aiohttp mà DataCollector dùng (status, headers, json / text / read)"""
+    
+    def __init__(self, status: int, data: Any = None, text: Optional[str] = None):
+        self.status = status
+        self.headers: Dict[str, str] = {}
+        self._data = data
+        self._text = text
+    
+    async def json(self) -> Any:
+        if self._text is not None:
+            return json.loads(self._text)
+        return self._data
+    
+    async def text(self) -> str:
+        return self._text if self._text is not None else json.dumps(self._data)
+    
+    async def read(self) -> bytes:
+        return (await self.text()).encode('utf-8')
+
+class SessionReplayer:
+    """
+    Phát lại file của SessionRecorder qua DataCollector
+    
+    attach(collector) chuyển mọi REST request của collector sang response đã ghi
+    (theo thứ tự ghi, cùng key; hết thì lặp lại response cuối) và cho TTLCache /
+    MarketState dùng đồng hồ của bản ghi, nên cache hit / stale giống phiên gốc.
+    run() đi theo timeline: start_streaming, message stream và mỗi trading cycle
+    (on_cycle) ở tốc độ speed (1 = thời gian thực, N = nhanh N lần, 0 = tối đa).
+    """
+    
+    def __init__(self, path: Path, speed: float = 0.0):
+        self.path = Path(path)
+        self.speed = speed
+        
+        with gzip.open(self.path, 'rt', encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            if header.get('version') != FORMAT_VERSION:
+                raise ValueError(f"Unsupported recording version: {header.get('version')}")
+            self.events: List[list] = [json.loads(line) for line in f if line.strip()]
+        self.started_ms = header['started']
+        self.offset_ms = 0
+        
+        self._responses: Dict[str, deque] = {}
+        self._last: Dict[str, Dict[str, Any]] = {}
+        for offset, kind, data in self.events:
+            if kind == EVENT_REST:
+                self._responses.setdefault(data['key'], deque()).append((offset, data))
+        
+        self.collector = None
+        self.stats = {
+            'events': 0,
+            'rest_served': 0,
+            'rest_repeated': 0,
+            'rest_missing': 0,
+            'stream_messages': 0,
+            'cycles': 0,
+            'elapsed': 0.0
+        }
+    
+    @property
+    def duration(self) -> float:
+        """Độ dài phiên ghi (giây)"""
+        return self.events[-1][0] / 1000 if self.events else 0.0
+    
+    def clock(self) -> float:
+        """Thời điểm (epoch giây) của event gần nhất đã phát lại"""
+        return (self.started_ms + self.offset_ms) / 1000
+    
+    def attach(self, collector):
+        """Gắn vào DataCollector: REST đọc từ bản ghi, cache theo đồng hồ bản ghi"""
+        self.collector = collector
+        collector.replayer = self
+        collector.cache.clock = self.clock
+    
+    def response(self, path: str, params: Dict[str, Any] = None) -> RecordedResponse:
+        """Response đã ghi tiếp theo cho request (503 nếu phiên gốc không có request này)"""
+        key = request_key(path, params)
+        queue = self._responses.get(key)
+        if queue:
+            offset, data = queue.popleft()
+            self.offset_ms = max(self.offset_ms, offset)
+            self._last[key] = data
+            self.stats['rest_served'] += 1
+        elif key in self._last:
+            data = self._last[key]
+            self.stats['rest_repeated'] += 1
+        else:
+            self.stats['rest_missing'] += 1
+            logger.warning(f"⚠️ No recorded response for {key}")
+            return RecordedResponse(503, text='')
+        return RecordedResponse(data['status'], data.get('json'), data.get('text'))
+    
+    async def run(self, on_cycle: Optional[Callable[[], Awaitable[Any]]] = None) -> Dict[str, Any]:
+        """
+        Phát lại toàn bộ timeline
+        
+        Args:
+            on_cycle: Coroutine function gọi tại mỗi trading cycle đã ghi
+                      (ví dụ BitcoinTradingBot.run_trading_cycle)
+        """
+        if self.collector is None:
+            raise RuntimeError("attach(collector) before run()")
+        
+        started = time.perf_counter()
+        for offset, kind, data in self.events:
+            if self.speed > 0:
+                delay = offset / 1000 / self.speed - (time.perf_counter() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            
+            self.offset_ms = max(self.offset_ms, offset)
+            self.stats['events'] += 1
+            
+            if kind == EVENT_STREAM:
+                if self.collector.stream:
+                    await self.collector.stream._handle_message(data)
+                    self.stats['stream_messages'] += 1
+            elif kind == EVENT_REST and self.collector.stream:
+                # Resync của stream chạy nền: để đúng task đó đọc response này tại vị trí như phiên gốc
+                path, _, query = data['key'].partition('?')
+                params = dict(item.split('=', 1) for item in query.split('&')) if query else {}
+                if path in _RESYNC_KINDS and 'symbol' in params:
+                    await self.collector.stream.wait_resync(params['symbol'], _RESYNC_KINDS[path])
+            elif kind == EVENT_START_STREAMING:
+                await self.collector.start_streaming(data['symbols'], interval=data['interval'])
+            elif kind == EVENT_CYCLE:
+                self.stats['cycles'] += 1
+                if on_cycle:
+                    await on_cycle()
+        
+        self.stats['elapsed'] = time.perf_counter() - started
+        logger.info(
+            f"🎞️ Replayed {self.stats['events']} events ({self.duration:.0f}s session) "
+            f"in {self.stats['elapsed']:.2f}s | cycles: {self.stats['cycles']}, "
+            f"missing responses: {self.stats['rest_missing']}"
+        )
+        return dict(self.stats)
+
+async def replay_bot(path: Path, speed: float = 0.0) -> Dict[str, Any]:
+    """Phát lại phiên qua BitcoinTradingBot.run_trading_cycle (không kết nối exchange / AI thật)"""
+    from main import BitcoinTradingBot
+    
+    bot = BitcoinTradingBot()
+    replayer = SessionReplayer(path, speed)
+    replayer.attach(bot.data_collector)
+    try:
+        return await replayer.run(bot.run_trading_cycle)
+    finally:
+        await bot.data_collector.close()
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Phát lại phiên đã ghi qua trading cycle của bot")
+    parser.add_argument('path', help="file .jsonl.gz của SessionRecorder")
+    parser.add_argument('--speed', type=float, default=0.0, help="1 = thời gian thực, N = nhanh N lần, 0 = tối đa")
+    args = parser.parse_args()
+    
+    logging.basicConfig(level=logging.INFO)
+    stats = asyncio.run(replay_bot(Path(args.path), args.speed))
+    print(f"🎞️ REPLAY - {args.path}")
+    print("=" * 40)
+    for name, value in stats.items():
+        print(f"   {name}: {value}")
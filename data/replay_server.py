@@ -0,0 +1,203 @@
+"""
+Stream Replay Server - Giả lập Binance combined stream và /klines để test offline
+"""
+import logging
+import asyncio
+import bisect
+import json
+from pathlib import Path
+from typing import Dict, List, Any, Optional
+from aiohttp import web, WSMsgType
+
+logger = logging.getLogger(__name__)
+
+class StreamReplayServer:
+    """
+    WebSocket server local phát lại các message đã ghi của Binance
+    
+    Client gửi SUBSCRIBE như với Binance thật; server chỉ phát các message
+    thuộc streams đã subscribe. drop_after cắt kết nối đầu tiên sau N message
+    để kiểm tra reconnect, skip_on_reconnect bỏ qua N message để tạo gap.
+    """
+    
+    def __init__(self, messages: List[Dict[str, Any]], host: str = '127.0.0.1', port: int = 0,
+                 delay: float = 0.0, drop_after: Optional[int] = None, skip_on_reconnect: int = 0):
+        self.messages = messages
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.drop_after = drop_after
+        self.skip_on_reconnect = skip_on_reconnect
+        
+        self.cursor = 0
+        self.connections = 0
+        self.subscriptions: List[List[str]] = []
+        self.finished = asyncio.Event()
+        
+        self._runner: Optional[web.AppRunner] = None
+    
+    @staticmethod
+    def load(path: Path) -> List[Dict[str, Any]]:
+        """Đọc file JSONL, mỗi dòng là một message combined stream"""
+        with open(path, 'r', encoding='utf-8') as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    @property
+    def url(self) -> str:
+        """Base URL truyền cho BinanceStream(ws_url=...)"""
+        return f"ws://{self.host}:{self.port}"
+    
+    async def start(self) -> str:
+        """Khởi động server, trả về base URL"""
+        app = web.Application()
+        app.router.add_get('/stream', self._handle_ws)
+        
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        
+        logger.info(f"🎬 Stream replay server listening on {self.url} ({len(self.messages)} messages)")
+        return self.url
+    
+    async def stop(self):
+        """Dừng server"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        
+        self.connections += 1
+        if self.connections > 1:
+            self.cursor += self.skip_on_reconnect
+        
+        subscribed: List[str] = []
+        sent = 0
+        
+        # Chờ SUBSCRIBE trước khi phát
+        msg = await ws.receive()
+        if msg.type == WSMsgType.TEXT:
+            request_data = json.loads(msg.data)
+            if request_data.get('method') == 'SUBSCRIBE':
+                subscribed = request_data.get('params', [])
+                self.subscriptions.append(subscribed)
+                await ws.send_json({'result': None, 'id': request_data.get('id')})
+        
+        while self.cursor < len(self.messages) and not ws.closed:
+            message = self.messages[self.cursor]
+            self.cursor += 1
+            
+            if message.get('stream') not in subscribed:
+                continue
+            
+            await ws.send_json(message)
+            sent += 1
+            
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            
+            if self.drop_after and sent >= self.drop_after and self.connections == 1:
+                await ws.close()
+                return ws
+        
+        if self.cursor >= len(self.messages):
+            self.finished.set()
+        
+        # Giữ kết nối mở như Binance thật cho đến khi client đóng
+        async for _ in ws:
+            pass
+        return ws
+
+class KlineFixtureServer:
+    """
+    Server REST local trả /api/v3/klines từ klines đã ghi của Binance
+    
+    Lọc startTime / endTime / limit như Binance thật. fail_after trả HTTP 500
+    sau N request để kiểm tra resume, delay giả lập độ trễ mạng.
+    """
+    
+    def __init__(self, klines: Dict[tuple, List[list]], host: str = '127.0.0.1', port: int = 0,
+                 delay: float = 0.0, fail_after: Optional[int] = None):
+        self.klines = klines  # (SYMBOL, interval) -> rows /klines (cũ -> mới)
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.fail_after = fail_after
+        
+        self.requests: List[Dict[str, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        
+        self._open_times: Dict[tuple, List[int]] = {}
+        self._runner: Optional[web.AppRunner] = None
+    
+    @staticmethod
+    def load(directory: Path) -> Dict[tuple, List[list]]:
+        """Đọc các file <SYMBOL>_<interval>.json (response /klines đã ghi)"""
+        klines = {}
+        for path in Path(directory).glob('*_*.json'):
+            symbol, _, interval = path.stem.partition('_')
+            with open(path, 'r', encoding='utf-8') as f:
+                klines[(symbol.upper(), interval)] = json.load(f)
+        return klines
+    
+    @staticmethod
+    def save(directory: Path, symbol: str, interval: str, rows: List[list]):
+        """Ghi response /klines thành fixture"""
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        with open(Path(directory) / f"{symbol.upper()}_{interval}.json", 'w', encoding='utf-8') as f:
+            json.dump(rows, f)
+    
+    @property
+    def url(self) -> str:
+        """Base URL thay cho DataCollector.api_endpoints['binance']"""
+        return f"http://{self.host}:{self.port}/api/v3"
+    
+    async def start(self) -> str:
+        """Khởi động server, trả về base URL"""
+        app = web.Application()
+        app.router.add_get('/api/v3/klines', self._handle_klines)
+        
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return self.url
+    
+    async def stop(self):
+        """Dừng server"""
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+    
+    async def _handle_klines(self, request: web.Request) -> web.Response:
+        query = dict(request.query)
+        self.requests.append(query)
+        if self.fail_after is not None and len(self.requests) > self.fail_after:
+            return web.json_response({'code': -1000, 'msg': 'Fixture failure'}, status=500)
+        
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            if self.delay:
+                await asyncio.sleep(self.delay)
+            
+            key = (query['symbol'].upper(), query['interval'])
+            rows = self.klines.get(key, [])
+            if key not in self._open_times:
+                self._open_times[key] = [row[0] for row in rows]
+            open_times = self._open_times[key]
+            limit = min(int(query.get('limit', 500)), 1000)
+            lo = bisect.bisect_left(open_times, int(query['startTime'])) if 'startTime' in query else 0
+            hi = bisect.bisect_right(open_times, int(query['endTime'])) if 'endTime' in query else len(rows)
+            # Có startTime => limit candles đầu tiên, không có => limit candles cuối
+            if 'startTime' in query:
+                return web.json_response(rows[lo:min(hi, lo + limit)])
+            return web.json_response(rows[max(lo, hi - limit):hi])
+        finally:
+            self.in_flight -= 1
@@ -0,0 +1,202 @@
+"""
+Collection Scheduler - Thu thập N symbols × M timeframes qua REST trong một process
+"""
+import logging
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
+from config.settings import Settings
+from data.candles import INTERVAL_MS
+from utils.rate_limiter import endpoint_weight
+
+if TYPE_CHECKING:
+    from data.collector import DataCollector
+
+logger = logging.getLogger(__name__)
+
+MAX_KLINE_LIMIT = 1000
+
+class CollectionScheduler:
+    """
+    Lịch thu thập dữ liệu cho nhiều symbols / timeframes
+    
+    Mỗi lượt refresh chỉ fetch klines của những (symbol, timeframe) vừa có
+    candle đóng kể từ lần fetch trước, với limit vừa đủ số candle đó. Giá,
+    ticker 24h và best bid/ask của mọi symbol đi chung hai request batch.
+    Lượt refresh chỉ lên lịch phần vừa với weight còn trong rate limiter
+    của collector; phần vượt được dời sang lượt sau thay vì xếp hàng. Dữ liệu nằm trong DataCollector.candles và cache của
+    scheduler để get_market_data(symbol, timeframe) không cần gọi mạng.
+    """
+    
+    def __init__(self, collector: 'DataCollector', symbols: List[str], timeframes: List[str] = None):
+        self.settings = Settings()
+        self.collector = collector
+        self.symbols = [symbol.upper() for symbol in symbols]
+        self.timeframes = [tf for tf in (timeframes or self.settings.ANALYSIS_TIMEFRAMES) if tf in INTERVAL_MS]
+        self.bootstrap_candles = self.settings.SCHEDULER_BOOTSTRAP_CANDLES
+        self.tick_seconds = self.settings.SCHEDULER_INTERVAL
+        
+        # Cache theo symbol: ticker 24h (kèm price) và best bid/ask
+        self.tickers: Dict[str, Dict[str, Any]] = {}
+        self.orderbooks: Dict[str, Dict[str, Any]] = {}
+        self.last_ticker_update = 0.0
+        
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._semaphore = asyncio.Semaphore(self.settings.HTTP_POOL_LIMIT_PER_HOST)
+        
+        self.stats = {
+            'cycles': 0,
+            'kline_requests': 0,
+            'candles_fetched': 0,
+            'ticker_requests': 0,
+            'deferred': 0,
+            'weight_used': 0
+        }
+    
+    @property
+    def pairs(self) -> List[Tuple[str, str]]:
+        """Tất cả (symbol, timeframe) được theo dõi"""
+        return [(symbol, tf) for symbol in self.symbols for tf in self.timeframes]
+    
+    def tracks(self, symbol: str, timeframe: str) -> bool:
+        return symbol.upper() in self.symbols and timeframe in self.timeframes
+    
+    def is_fresh(self, symbol: str, timeframe: str) -> bool:
+        """Có dữ liệu cache đủ mới cho (symbol, timeframe) chưa"""
+        if not self.tracks(symbol, timeframe) or symbol.upper() not in self.tickers:
+            return False
+        if not len(self.collector.candles.get(symbol, timeframe)):
+            return False
+        return time.time() - self.last_ticker_update < 3 * self.tick_seconds
+    
+    def snapshot(self, symbol: str) -> Tuple[float, Dict[str, Any], Dict[str, Any]]:
+        """(price, ticker 24h, orderbook) từ cache"""
+        ticker = self.tickers.get(symbol.upper(), {})
+        return ticker.get('price', 0.0), ticker, self.orderbooks.get(symbol.upper(), {})
+    
+    def candles_due(self, symbol: str, timeframe: str, now_ms: int) -> int:
+        """
+        Số candles cần fetch cho (symbol, timeframe), 0 nếu chưa có candle nào đóng thêm
+        
+        Candle cuối trong buffer là candle đang chạy ở lần fetch trước; khi nó
+        đóng thì fetch lại từ nó (giá trị cuối cùng) tới candle đang chạy mới.
+        """
+        last_open = self.collector.candles.get(symbol, timeframe).last_timestamp
+        if last_open is None:
+            return self.bootstrap_candles
+        
+        closed = (now_ms - last_open) // INTERVAL_MS[timeframe]
+        if closed <= 0:
+            return 0
+        return int(min(closed + 1, MAX_KLINE_LIMIT))
+    
+    async def refresh(self, now_ms: int = None) -> Dict[str, int]:
+        """
+        Một lượt thu thập
+        
+        Args:
+            now_ms: Thời điểm hiện tại (ms) - mặc định đồng hồ hệ thống
+        
+        Returns:
+            Số request klines đã gửi và số (symbol, timeframe) bị dời lượt
+        """
+        now_ms = int(time.time() * 1000) if now_ms is None else now_ms
+        budget = self.collector.rate_limiter.available()
+        
+        tasks = []
+        symbols_param = {'symbols': ','.join(self.symbols)}
+        ticker_weight = endpoint_weight('/ticker/24hr', symbols_param) + endpoint_weight('/ticker/bookTicker', symbols_param)
+        if budget >= ticker_weight:
+            budget -= ticker_weight
+            self.stats['weight_used'] += ticker_weight
+            tasks.append(self._refresh_tickers())
+        
+        # Timeframe ngắn trước: candle đóng thường xuyên nhất, trễ là thấy ngay
+        due = sorted(
+            ((symbol, tf, self.candles_due(symbol, tf, now_ms)) for symbol, tf in self.pairs),
+            key=lambda item: INTERVAL_MS[item[1]]
+        )
+        due = [item for item in due if item[2] > 0]
+        
+        scheduled = 0
+        kline_weight = endpoint_weight('/klines')
+        for symbol, timeframe, limit in due:
+            if budget < kline_weight:
+                break
+            budget -= kline_weight
+            self.stats['weight_used'] += kline_weight
+            tasks.append(self._fetch_candles(symbol, timeframe, limit))
+            scheduled += 1
+        
+        deferred = len(due) - scheduled
+        if deferred:
+            self.stats['deferred'] += deferred
+            logger.warning(f"⚠️ Weight limit reached, {deferred} kline fetches deferred")
+        
+        await asyncio.gather(*tasks)
+        self.stats['cycles'] += 1
+        return {'kline_requests': scheduled, 'deferred': deferred}
+    
+    async def _fetch_candles(self, symbol: str, timeframe: str, limit: int):
+        async with self._semaphore:
+            await self.collector.get_candles(symbol, timeframe, limit, use_cache=False)
+        self.stats['kline_requests'] += 1
+        self.stats['candles_fetched'] += limit
+    
+    async def _refresh_tickers(self):
+        tickers, orderbooks = await asyncio.gather(
+            self.collector.get_24h_tickers(self.symbols),
+            self.collector.get_book_tickers(self.symbols)
+        )
+        self.stats['ticker_requests'] += 2
+        if not tickers:
+            return
+        
+        self.tickers.update(tickers)
+        self.orderbooks.update(orderbooks)
+        self.last_ticker_update = time.time()
+        
+        # Candle đang chạy giữa hai lần đóng: cập nhật close/high/low theo giá mới
+        now_ms = int(self.last_ticker_update * 1000)
+        for symbol, timeframe in self.pairs:
+            price = tickers.get(symbol, {}).get('price')
+            buffer = self.collector.candles.get(symbol, timeframe)
+            if price and len(buffer) and buffer.last('timestamp') <= now_ms <= buffer.last('close_time'):
+                buffer.update_last(
+                    close=price,
+                    high=max(buffer.last('high'), price),
+                    low=min(buffer.last('low'), price)
+                )
+    
+    async def start(self):
+        """Bootstrap một lượt rồi chạy refresh định kỳ trong background task"""
+        if self._task and not self._task.done():
+            return
+        
+        await self.refresh()
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🗓️ Collection scheduler started: {len(self.symbols)} symbols × {len(self.timeframes)} timeframes")
+    
+    async def stop(self):
+        """Dừng refresh định kỳ"""
+        self.is_running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("🗓️ Collection scheduler stopped")
+    
+    async def _run(self):
+        while self.is_running:
+            await asyncio.sleep(self.tick_seconds)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Scheduler refresh failed: {e}")
@@ -0,0 +1,221 @@
+"""
+Snapshot Buffer - Write-behind cho market snapshots từ stream, downsample theo symbol
+"""
+import logging
+import asyncio
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Tuple, TYPE_CHECKING
+from config.settings import Settings
+from data.migrations import to_epoch_ms
+
+if TYPE_CHECKING:
+    from data.database import DatabaseManager
+    from data.stream import MarketState
+
+logger = logging.getLogger(__name__)
+
+class SnapshotBuffer:
+    """
+    Gom market snapshots trong bộ nhớ rồi ghi xuống database theo lô
+    
+    Mỗi symbol chỉ giữ snapshot cuối cùng của mỗi khoảng resolution_ms
+    (mặc định 1 giây) và một bar OHLC cho mỗi khoảng ohlc_ms (mặc định 1
+    phút). Một khoảng được chốt khi snapshot đầu tiên của khoảng sau tới;
+    snapshot thuộc khoảng đã chốt bị bỏ (late). Rows đã chốt được ghi bằng
+    save_market_data_many (COPY trên PostgreSQL) khi đủ flush_rows hoặc sau
+    flush_seconds; close() chốt nốt các khoảng đang mở và ghi hết.
+    
+    add() không chờ I/O nên gọi được trực tiếp từ stream handler. Khi
+    database chậm hơn stream, hàng đợi giữ tối đa max_pending rows và bỏ
+    rows cũ nhất (overflow).
+    """
+    
+    def __init__(self, database: 'DatabaseManager', resolution_ms: int = None, ohlc_ms: int = None,
+                 flush_rows: int = None, flush_seconds: float = None, max_pending: int = None):
+        self.settings = Settings()
+        self.database = database
+        self.resolution_ms = self.settings.SNAPSHOT_RESOLUTION_MS if resolution_ms is None else resolution_ms
+        self.ohlc_ms = self.settings.SNAPSHOT_OHLC_MS if ohlc_ms is None else ohlc_ms
+        self.flush_rows = flush_rows or self.settings.SNAPSHOT_FLUSH_ROWS
+        self.flush_seconds = flush_seconds or self.settings.SNAPSHOT_FLUSH_SECONDS
+        self.max_pending = max_pending or self.settings.SNAPSHOT_MAX_PENDING
+        
+        # Khoảng đang mở theo symbol: (bucket, snapshot cuối) và [timestamp, open, high, low, close, samples]
+        self._last: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._bars: Dict[str, List] = {}
+        # Đã chốt, chờ ghi
+        self._rows: deque = deque()
+        self._ohlc: List[Tuple] = []
+        
+        self.is_running = False
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+        self._lock = asyncio.Lock()
+        
+        self.stats = {
+            'received': 0,
+            'coalesced': 0,
+            'invalid': 0,
+            'late': 0,
+            'overflow': 0,
+            'failed': 0,
+            'written': 0,
+            'ohlc_written': 0,
+            'flushes': 0,
+            'flush_seconds': 0.0
+        }
+    
+    def add(self, snapshot: Dict[str, Any]) -> bool:
+        """
+        Nhận một snapshot (cùng dạng với DatabaseManager.save_market_data)
+        
+        Returns:
+            False nếu snapshot bị bỏ (thiếu symbol / price - invalid, hoặc tới muộn - late)
+        """
+        self.stats['received'] += 1
+        symbol, price = snapshot.get('symbol'), snapshot.get('price')
+        if not symbol or not price:
+            self.stats['invalid'] += 1
+            return False
+        timestamp = to_epoch_ms(snapshot.get('timestamp')) or int(time.time() * 1000)
+        
+        if self.resolution_ms > 0:
+            bucket = timestamp // self.resolution_ms
+            current = self._last.get(symbol)
+            if current is not None and bucket < current[0]:
+                self.stats['late'] += 1
+                return False
+            if current is None or bucket > current[0]:
+                if current is not None:
+                    self._push(current[1])
+            else:
+                self.stats['coalesced'] += 1
+            self._last[symbol] = (bucket, dict(snapshot, timestamp=timestamp))
+        else:
+            self._push(dict(snapshot, timestamp=timestamp))
+        
+        if self.ohlc_ms > 0:
+            self._update_bar(symbol, timestamp - timestamp % self.ohlc_ms, float(price))
+        return True
+    
+    def add_state(self, state: 'MarketState') -> bool:
+        """Snapshot từ MarketState của BinanceStream (dùng làm on_update callback)"""
+        indicators = state.indicators or {}
+        best_bid, best_ask = state.book.best_bid(), state.book.best_ask()
+        return self.add({
+            'timestamp': state.last_event_time or int(time.time() * 1000),
+            'symbol': state.symbol,
+            'price': state.price,
+            'volume': state.ticker.get('volume'),
+            'rsi': indicators.get('rsi'),
+            'macd': indicators.get('macd', {}),
+            'bid_price': best_bid[0] if best_bid else None,
+            'ask_price': best_ask[0] if best_ask else None
+        })
+    
+    def _update_bar(self, symbol: str, bucket: int, price: float):
+        bar = self._bars.get(symbol)
+        if bar is not None and bucket < bar[0]:
+            return
+        if bar is None or bucket > bar[0]:
+            if bar is not None:
+                self._ohlc.append((symbol, self.ohlc_ms, *bar))
+            self._bars[symbol] = [bucket, price, price, price, price, 1]
+            return
+        
+        bar[2] = max(bar[2], price)
+        bar[3] = min(bar[3], price)
+        bar[4] = price
+        bar[5] += 1
+    
+    def _push(self, row: Dict[str, Any]):
+        self._rows.append(row)
+        if len(self._rows) > self.max_pending:
+            self._rows.popleft()
+            self.stats['overflow'] += 1
+        if len(self._rows) >= self.flush_rows and self._wake is not None:
+            self._wake.set()
+    
+    async def start(self):
+        """Bắt đầu ghi nền theo flush_rows / flush_seconds"""
+        if self._task and not self._task.done():
+            return
+        self.is_running = True
+        self._wake = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+    
+    async def _run(self):
+        while self.is_running:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+    
+    async def flush(self, final: bool = False) -> int:
+        """
+        Ghi các rows / bars đã chốt
+        
+        Args:
+            final: True => chốt cả các khoảng đang mở (shutdown)
+        
+        Returns:
+            Số rows market data đã ghi
+        """
+        async with self._lock:
+            if final:
+                for _, snapshot in self._last.values():
+                    self._push(snapshot)
+                self._ohlc.extend((symbol, self.ohlc_ms, *bar) for symbol, bar in self._bars.items())
+                self._last.clear()
+                self._bars.clear()
+            
+            rows, self._rows = list(self._rows), deque()
+            bars, self._ohlc = self._ohlc, []
+            if not rows and not bars:
+                return 0
+            
+            started = time.perf_counter()
+            written = await self.database.save_market_data_many(rows) if rows else 0
+            ohlc_written = await self.database.save_ohlc_many(bars) if bars else 0
+            self.stats['failed'] += (len(rows) - written) + (len(bars) - ohlc_written)
+            self.stats['written'] += written
+            self.stats['ohlc_written'] += ohlc_written
+            self.stats['flushes'] += 1
+            self.stats['flush_seconds'] += time.perf_counter() - started
+            return written
+    
+    async def close(self):
+        """Dừng ghi nền, chốt và ghi mọi snapshot còn trong buffer"""
+        self.is_running = False
+        if self._task:
+            self._wake.set()  # Không cancel: flush đang chạy phải ghi xong rows đã lấy ra
+            await self._task
+            self._task = None
+        
+        written = await self.flush(final=True)
+        if self.stats['received']:
+            logger.info(f"💾 Snapshot buffer flushed: {written} rows | total written: {self.stats['written']}, "
+                        f"dropped: {self.dropped}")
+    
+    @property
+    def queue_depth(self) -> int:
+        """Rows / bars đã chốt đang chờ ghi"""
+        return len(self._rows) + len(self._ohlc)
+    
+    @property
+    def dropped(self) -> int:
+        return self.stats['invalid'] + self.stats['late'] + self.stats['overflow'] + self.stats['failed']
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Độ sâu hàng đợi, số snapshot bị gộp / bỏ và thời gian ghi"""
+        received = self.stats['received']
+        return {
+            'queue_depth': self.queue_depth,
+            'open_symbols': max(len(self._last), len(self._bars)),
+            'dropped': self.dropped,
+            'coalesce_rate': self.stats['coalesced'] / received if received else 0.0,
+            **self.stats
+        }
@@ -0,0 +1,396 @@
+"""
+Binance WebSocket Stream - Nhận market data real-time thay cho REST polling
+"""
+import logging
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Tuple
+import aiohttp
+from config.settings import Settings
+from data.candles import FIELDS, INTERVAL_MS, CandleBuffer, CandleWindow
+from data.indicator_engine import IndicatorEngine
+from data.levels import SupportResistance
+from data.orderbook import OrderBook
+
+logger = logging.getLogger(__name__)
+
+GapCallback = Callable[[str, str], Awaitable[None]]
+UpdateCallback = Callable[['MarketState'], Any]
+MessageCallback = Callable[[Dict[str, Any]], Any]
+
+class MarketState:
+    """Trạng thái thị trường in-memory của một symbol, cập nhật từ stream"""
+    
+    def __init__(self, symbol: str, interval: str, max_klines: int = 100, max_trades: int = 50,
+                 clock: Callable[[], float] = time.time):
+        self.symbol = symbol
+        self.interval = interval
+        self.max_klines = max_klines
+        
+        self.price = 0.0
+        self.ticker: Dict[str, float] = {}
+        self.book = OrderBook(symbol)
+        self.trades = deque(maxlen=max_trades)
+        self.candles = CandleBuffer(max_klines, interval)
+        self.indicator_engine = IndicatorEngine()
+        self.levels = SupportResistance(max_klines)
+        
+        # Sequencing cho gap detection
+        self.last_agg_id: Optional[int] = None
+        self.last_event_time = 0
+        self.last_update = 0.0
+        self.clock = clock  # Replay thay bằng đồng hồ của bản ghi
+    
+    @property
+    def is_ready(self) -> bool:
+        """Đã có đủ dữ liệu để build market data chưa"""
+        return self.price > 0 and bool(self.ticker) and len(self.candles) > 0
+    
+    @property
+    def indicators(self) -> Optional[Dict[str, Any]]:
+        """Technical indicators hiện tại (None nếu chưa đủ candles)"""
+        return self.indicator_engine.values
+    
+    @property
+    def support_resistance(self) -> Dict[str, Any]:
+        """Vùng S/R quanh giá hiện tại (gom lại chỉ khi pivots đổi)"""
+        return self.levels.levels(self.price or None)
+    
+    @property
+    def orderbook(self) -> Dict[str, List[List[float]]]:
+        """10 mức giá tốt nhất của sổ lệnh local"""
+        return self.book.top(10)
+    
+    def age(self) -> float:
+        """Số giây kể từ message gần nhất"""
+        return self.clock() - self.last_update if self.last_update else float('inf')
+    
+    def set_candles(self, candles: CandleWindow):
+        """Nạp candles lịch sử (bootstrap hoặc resync qua REST)"""
+        self.candles.load(candles)
+        self.indicator_engine.seed(self.candles.to_klines())
+        self.levels.load(self.candles.window())
+        if len(self.candles) and not self.price:
+            self.price = self.candles.last('close')
+    
+    def set_trades(self, trades: List[Dict[str, Any]]):
+        """Nạp trades gần nhất (resync qua REST)"""
+        self.trades.clear()
+        self.trades.extend(trades)
+    
+    def apply_ticker(self, data: Dict[str, Any]):
+        """Áp dụng message <symbol>@ticker"""
+        self.price = float(data['c'])
+        self.ticker = {
+            'high': float(data['h']),
+            'low': float(data['l']),
+            'volume': float(data['v']),
+            'quoteVolume': float(data['q']),
+            'priceChange': float(data['p']),
+            'priceChangePercent': float(data['P'])
+        }
+    
+    def apply_depth(self, data: Dict[str, Any]) -> bool:
+        """
+        Áp dụng message <symbol>@depth (diff) vào sổ lệnh local
+        
+        Returns:
+            False nếu phát hiện gap trong update id
+        """
+        return self.book.apply_diff(data)
+    
+    def apply_agg_trade(self, data: Dict[str, Any]) -> bool:
+        """
+        Áp dụng message <symbol>@aggTrade
+        
+        Returns:
+            False nếu phát hiện gap trong aggregate trade id
+        """
+        agg_id = int(data['a'])
+        in_sequence = self.last_agg_id is None or agg_id == self.last_agg_id + 1
+        
+        if self.last_agg_id is not None and agg_id <= self.last_agg_id:
+            return True  # Duplicate sau reconnect
+        
+        self.last_agg_id = agg_id
+        self.price = float(data['p'])
+        self.trades.append({
+            'price': float(data['p']),
+            'qty': float(data['q']),
+            'time': int(data['T']),
+            'isBuyerMaker': data['m']
+        })
+        self._tick_live_candle(float(data['p']), float(data['q']), int(data['T']))
+        return in_sequence
+    
+    def _tick_live_candle(self, price: float, qty: float, trade_time: int):
+        """Cập nhật candle đang chạy theo từng trade để indicators luôn mới"""
+        candles = self.candles
+        if not len(candles):
+            return
+        
+        if not candles.last('timestamp') <= trade_time <= candles.last('close_time'):
+            return
+        
+        extends_range = not candles.last('low') <= price <= candles.last('high')
+        candles.update_last(
+            close=price,
+            high=max(candles.last('high'), price),
+            low=min(candles.last('low'), price),
+            volume=candles.last('volume') + qty
+        )
+        self.indicator_engine.update(candles.last_kline())
+        if extends_range:  # pivots chỉ phụ thuộc high / low của candle đang chạy
+            self.levels.update(candles.window(1))
+    
+    def apply_kline(self, data: Dict[str, Any]) -> bool:
+        """
+        Áp dụng message <symbol>@kline_<interval>
+        
+        Returns:
+            False nếu phát hiện thiếu candle giữa candle cuối và candle mới
+        """
+        k = data['k']
+        kline = {
+            'timestamp': int(k['t']),
+            'open': float(k['o']),
+            'high': float(k['h']),
+            'low': float(k['l']),
+            'close': float(k['c']),
+            'volume': float(k['v']),
+            'close_time': int(k['T']),
+            'quote_volume': float(k['q']),
+            'trades_count': int(k['n'])
+        }
+        
+        row = [kline[name] for name in FIELDS]
+        closed = bool(k.get('x', False))
+        
+        last_open = self.candles.last_timestamp
+        if last_open is None:
+            self.candles.append(row)
+            self.indicator_engine.update(kline, closed=closed)
+            self.levels.update(self.candles.window(1))
+            return True
+        
+        if kline['timestamp'] == last_open:
+            self.candles.update_last(**kline)
+            self.indicator_engine.update(kline, closed=closed)
+            self.levels.update(self.candles.window(1))
+            return True
+        if kline['timestamp'] < last_open:
+            return True  # Message cũ sau reconnect
+        
+        in_sequence = kline['timestamp'] - last_open <= INTERVAL_MS.get(self.interval, 0)
+        self.candles.append(row)
+        self.indicator_engine.update(kline, closed=closed)
+        self.levels.update(self.candles.window(1))
+        return in_sequence
+
+class BinanceStream:
+    """
+    Client cho Binance combined stream (ticker, depth, aggTrade, kline)
+    
+    Tự reconnect với exponential backoff, gửi lại SUBSCRIBE sau mỗi lần
+    kết nối và báo gap (thiếu trade id / depth update id / thiếu candle) qua
+    on_gap callback. Sổ lệnh local lấy snapshot qua on_gap(symbol, 'depth').
+    on_gap chạy trong task riêng (tối đa một task mỗi (symbol, kind)) để REST resync
+    không chặn vòng đọc websocket; trong lúc đó sổ lệnh vẫn giữ các diff mới.
+    on_update(state) (đồng bộ) được gọi sau mỗi message làm đổi giá / candle,
+    on_depth(state) (đồng bộ) sau mỗi depth diff đã áp vào sổ lệnh local,
+    on_message(message) (đồng bộ) với mọi message thô trước khi xử lý (SessionRecorder).
+    """
+    
+    def __init__(self, session: aiohttp.ClientSession, symbols: List[str], interval: str = None,
+                 ws_url: str = None, on_gap: Optional[GapCallback] = None,
+                 on_update: Optional[UpdateCallback] = None, on_message: Optional[MessageCallback] = None,
+                 on_depth: Optional[UpdateCallback] = None, clock: Callable[[], float] = time.time):
+        self.settings = Settings()
+        self.session = session
+        self.interval = interval or self.settings.DEFAULT_TIMEFRAME
+        self.ws_url = ws_url or self.settings.BINANCE_WS_URL
+        self.on_gap = on_gap
+        self.on_update = on_update
+        self.on_depth = on_depth
+        self.on_message = on_message
+        self.clock = clock
+        
+        self.states: Dict[str, MarketState] = {
+            symbol.upper(): MarketState(symbol.upper(), self.interval, clock=clock) for symbol in symbols
+        }
+        
+        self.is_running = False
+        self.connected = asyncio.Event()
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._task: Optional[asyncio.Task] = None
+        self._request_id = 0
+        self._resyncs: Dict[Tuple[str, str], asyncio.Task] = {}
+        
+        self.stats = {
+            'messages': 0,
+            'connects': 0,
+            'reconnects': 0,
+            'gaps': 0,
+            'resyncs': 0
+        }
+    
+    @property
+    def streams(self) -> List[str]:
+        """Danh sách stream names cần subscribe"""
+        names = []
+        for symbol in self.states:
+            s = symbol.lower()
+            names.extend([
+                f"{s}@ticker",
+                f"{s}@depth@100ms",
+                f"{s}@aggTrade",
+                f"{s}@kline_{self.interval}"
+            ])
+        return names
+    
+    def get_state(self, symbol: str) -> Optional[MarketState]:
+        """Lấy market state của symbol"""
+        return self.states.get(symbol.upper())
+    
+    async def start(self):
+        """Bắt đầu stream trong background task"""
+        if self._task and not self._task.done():
+            return
+        
+        self.is_running = True
+        self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Dừng stream và đóng websocket"""
+        self.is_running = False
+        if self._ws and not self._ws.closed:
+            await self._ws.close()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for task in list(self._resyncs.values()):
+            task.cancel()
+        await asyncio.gather(*self._resyncs.values(), return_exceptions=True)
+        self._resyncs.clear()
+        self.connected.clear()
+        logger.info("🔌 Market data stream stopped")
+    
+    async def _run(self):
+        """Vòng lặp kết nối / reconnect"""
+        backoff = 1.0
+        
+        while self.is_running:
+            try:
+                async with self.session.ws_connect(f"{self.ws_url}/stream", heartbeat=30) as ws:
+                    self._ws = ws
+                    if self.stats['connects'] > 0:
+                        self.stats['reconnects'] += 1
+                    self.stats['connects'] += 1
+                    
+                    await self._subscribe(ws)
+                    self.connected.set()
+                    backoff = 1.0
+                    logger.info(f"📡 Market data stream connected: {len(self.streams)} streams")
+                    
+                    async for msg in ws:
+                        if msg.type == aiohttp.WSMsgType.TEXT:
+                            await self._handle_message(json.loads(msg.data))
+                        elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                            break
+            
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"⚠️ Stream connection error: {e}")
+            finally:
+                self._ws = None
+                self.connected.clear()
+            
+            if self.is_running:
+                logger.info(f"🔄 Stream reconnecting in {backoff:.0f}s...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, self.settings.STREAM_MAX_BACKOFF)
+    
+    async def _subscribe(self, ws: aiohttp.ClientWebSocketResponse):
+        """Gửi SUBSCRIBE cho toàn bộ streams (cũng dùng khi resubscribe)"""
+        self._request_id += 1
+        await ws.send_json({
+            'method': 'SUBSCRIBE',
+            'params': self.streams,
+            'id': self._request_id
+        })
+    
+    async def _handle_message(self, message: Dict[str, Any]):
+        """Route message của combined stream tới MarketState tương ứng"""
+        if self.on_message:
+            self.on_message(message)
+        
+        stream = message.get('stream')
+        data = message.get('data')
+        if not stream or data is None:
+            return  # Response của SUBSCRIBE
+        
+        symbol = stream.split('@', 1)[0].upper()
+        state = self.states.get(symbol)
+        if state is None:
+            return
+        
+        self.stats['messages'] += 1
+        state.last_update = self.clock()
+        state.last_event_time = data.get('E', state.last_event_time)
+        
+        in_sequence = True
+        kind = None
+        if '@ticker' in stream:
+            state.apply_ticker(data)
+        elif '@depth' in stream:
+            in_sequence = state.apply_depth(data)
+            kind = 'depth'
+        elif '@aggTrade' in stream:
+            in_sequence = state.apply_agg_trade(data)
+            kind = 'trades'
+        elif '@kline' in stream:
+            in_sequence = state.apply_kline(data)
+            kind = 'klines'
+        
+        if kind == 'depth':
+            if self.on_depth:
+                self.on_depth(state)
+        elif self.on_update:
+            self.on_update(state)
+        
+        if not in_sequence:
+            self.stats['gaps'] += 1
+            logger.warning(f"⚠️ Stream gap detected: {stream}")
+            self._schedule_resync(symbol, kind)
+        elif kind == 'depth' and state.book.needs_snapshot:
+            self._schedule_resync(symbol, kind)  # Diff đầu tiên đã được giữ lại => lấy snapshot
+    
+    def _schedule_resync(self, symbol: str, kind: str):
+        """Chạy on_gap(symbol, kind) nền; đã có resync đang chạy cho (symbol, kind) thì bỏ qua"""
+        key = (symbol, kind)
+        if self.on_gap is None or key in self._resyncs:
+            return
+        
+        self.stats['resyncs'] += 1
+        task = asyncio.create_task(self._resync(symbol, kind))
+        self._resyncs[key] = task
+        task.add_done_callback(lambda _: self._resyncs.pop(key, None))
+    
+    async def wait_resync(self, symbol: str, kind: str):
+        """Chờ resync đang chạy của (symbol, kind) xong (SessionReplayer dùng để giữ thứ tự như phiên gốc)"""
+        task = self._resyncs.get((symbol, kind))
+        if task:
+            await task
+    
+    async def _resync(self, symbol: str, kind: str):
+        try:
+            await self.on_gap(symbol, kind)
+        except Exception as e:
+            logger.error(f"❌ Stream resync failed ({symbol} {kind}): {e}")
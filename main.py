@@ -6,6 +6,7 @@ Hệ thống AI trading bot cho Bitcoin với Puter AI (miễn phí)
 
 import asyncio
 import sys
+import time
 import os
 from pathlib import Path
 
@@ -18,9 +19,18 @@ from utils.logger import setup_logger
 from ai_engine.puter_client import PuterAIClient
 from trading.exchange import ExchangeManager
 from trading.signals import SignalGenerator
+from trading.confluence import ConfluenceEngine
+from trading.market_events import (
+    TOPIC_BOOK_IMBALANCE, TOPIC_CANDLE_CLOSED, TOPIC_HEARTBEAT, TOPIC_LEVEL_CROSSED, MarketEventDetector
+)
 from trading.risk_manager import RiskManager
 from data.collector import DataCollector
+from data.database import DatabaseManager
+from data.recording import EVENT_CYCLE
+from data.snapshot_buffer import SnapshotBuffer
 from utils.notifications import NotificationManager
+from utils.event_bus import EventBus
+from utils.pipeline import Pipeline, Stage
 
 logger = setup_logger(__name__)
 
@@ -34,14 +44,25 @@ class BitcoinTradingBot:
         # Chỉ sử dụng Puter AI - Miễn phí, không cần API key
         self.ai_client = PuterAIClient()
         
-        self.exchange = ExchangeManager()
+        self.data_collector = DataCollector()
+        self.database = DatabaseManager()
+        self.snapshot_buffer = SnapshotBuffer(self.database)
+        self.exchange = ExchangeManager(self.data_collector)
         self.signal_generator = SignalGenerator()
+        self.confluence = ConfluenceEngine(self.data_collector) if self.settings.CONFLUENCE_ENABLED else None
         self.risk_manager = RiskManager()
-        self.data_collector = DataCollector()
         self.notifications = NotificationManager()
         
-        self.is_running = False
+        # Trading loop hướng sự kiện: stream -> MarketEventDetector -> EventBus -> cycle
+        self.event_bus = EventBus()
+        self.market_events = MarketEventDetector(self.event_bus)
+        self.last_ai_analysis = None
+        self.last_cycle = 0.0
+        
+        self.cycle_pipeline = self._build_cycle_pipeline()
         
+        self.is_running = False
+    
     async def initialize(self):
         """Khởi tạo các component"""
         logger.info("🚀 Đang khởi tạo Bitcoin AI Trading Bot...")
@@ -56,8 +77,32 @@ class BitcoinTradingBot:
             await self.exchange.initialize()
             logger.info("✅ Exchange kết nối thành công")
             
-            # Setup data collector
+            # Database (lưu market snapshots từ stream qua write-behind buffer)
+            await self.database.initialize()
+            
+            # Setup data collector (ghi phiên từ trước request đầu tiên để phát lại được trọn vẹn)
+            if self.settings.RECORD_SESSION:
+                self.data_collector.start_recording()
             await self.data_collector.initialize()
+            if self.settings.STREAMING_ENABLED:
+                symbol = self.settings.TRADING_PAIR.replace('/', '')
+                callbacks = []
+                if self.settings.SNAPSHOT_PERSIST_ENABLED:
+                    await self.snapshot_buffer.start()
+                    callbacks.append(self.snapshot_buffer.add_state)
+                if self.settings.EVENT_DRIVEN:
+                    callbacks.append(self.market_events.on_update)
+                
+                def on_update(state):
+                    for callback in callbacks:
+                        callback(state)
+                
+                await self.data_collector.start_streaming(
+                    [symbol], on_update=on_update if callbacks else None,
+                    on_depth=self.market_events.on_depth if self.settings.EVENT_DRIVEN else None
+                )
+            if self.settings.SCHEDULER_ENABLED:
+                await self.data_collector.start_scheduler()
             logger.info("✅ Data collector sẵn sàng")
             
             # Send startup notification
@@ -66,44 +111,142 @@ class BitcoinTradingBot:
             
             logger.info("🎉 Bot khởi tạo thành công!")
             return True
-            
+        
         except Exception as e:
             logger.error(f"❌ Lỗi khởi tạo bot: {e}")
             return False
     
-    async def run_trading_cycle(self):
-        """Chu kỳ trading chính"""
+    def _build_cycle_pipeline(self) -> Pipeline:
+        """
+        DAG của trading cycle: AI analysis và technical signals chỉ cần market data nên
+        chạy song song; portfolio metrics chạy nền sau trade, ngoài critical path
+        """
+        timeouts = self.settings.PIPELINE_TIMEOUTS
+        return Pipeline([
+            Stage('market_data', self._stage_market_data, timeout=timeouts.get('market_data')),
+            Stage('ai_analysis', self._stage_ai_analysis, ['market_data', 'analyze'],
+                  timeout=timeouts.get('ai_analysis'), fallback=self._ai_fallback),
+            Stage('technical_signals', self._stage_technical_signals, ['market_data'],
+                  timeout=timeouts.get('technical_signals')),
+            Stage('combined_signal', self._stage_combined_signal, ['ai_analysis', 'technical_signals'],
+                  timeout=timeouts.get('combined_signal')),
+            Stage('risk_check', self._stage_risk_check, ['combined_signal'], timeout=timeouts.get('risk_check')),
+            Stage('trade', self._stage_trade, ['combined_signal', 'risk_check'], timeout=timeouts.get('trade')),
+            Stage('portfolio', self._stage_portfolio, ['trade'], timeout=timeouts.get('portfolio'),
+                  required=False, background=True)
+        ], name='trading_cycle')
+    
+    async def run_trading_cycle(self, analyze: bool = True):
+        """
+        Chu kỳ trading chính
+        
+        Args:
+            analyze: False => dùng lại AI analysis của cycle trước (event giá / sổ lệnh
+                     chỉ đổi technical signals, AI chỉ chạy lại khi nến đóng)
+        """
+        self.last_cycle = time.monotonic()
         try:
-            # 1. Thu thập dữ liệu market
-            market_data = await self.data_collector.get_market_data()
-            
-            # 2. Phân tích AI với Puter AI
-            ai_analysis = await self.ai_client.analyze_market(market_data)
-            
-            # 3. Tạo signals từ technical analysis
-            technical_signals = await self.signal_generator.generate_signals(market_data)
-            
-            # 4. Kết hợp AI analysis và technical signals
-            combined_signal = await self.signal_generator.combine_signals(
-                ai_analysis, technical_signals
-            )
-            
-            # 5. Kiểm tra risk management
-            risk_check = await self.risk_manager.evaluate_risk(combined_signal)
-            
-            # 6. Thực hiện trade nếu signal hợp lệ
-            if risk_check['approved']:
-                trade_result = await self.execute_trade(combined_signal)
-                if trade_result:
-                    self.notifications.send_trade_alert(trade_result)
-            
-            # 7. Cập nhật portfolio và metrics
-            await self.update_portfolio_metrics()
+            # Đánh dấu cycle trong phiên ghi - SessionReplayer gọi lại cycle tại đúng điểm này
+            if self.data_collector.recorder:
+                self.data_collector.recorder.record(EVENT_CYCLE, {})
             
+            run = await self.cycle_pipeline.run(analyze=analyze)
+            logger.info(f"⏱️ Trading cycle: {self.cycle_pipeline.summary(run)}")
+            if not run['ok']:
+                errors = '; '.join(f"{stage}: {error}" for stage, error in run['errors'].items())
+                self.notifications.send_error(f"Trading cycle error: {errors}")
+            return run
+        
         except Exception as e:
             logger.error(f"❌ Lỗi trong trading cycle: {e}")
             self.notifications.send_error(f"Trading cycle error: {e}")
     
+    async def _stage_market_data(self, results):
+        """1. Thu thập dữ liệu market"""
+        fetch_start = time.perf_counter()
+        market_data = await self.data_collector.get_market_data(
+            self.settings.TRADING_PAIR.replace('/', ''), self.settings.DEFAULT_TIMEFRAME
+        )
+        fetch_ms = (time.perf_counter() - fetch_start) * 1000
+        
+        conn_stats = self.data_collector.get_connection_stats()
+        logger.info(
+            f"🔌 Market data fetched in {fetch_ms:.0f}ms | "
+            f"handshakes: {conn_stats['handshakes']}, reused: {conn_stats['connections_reused']} "
+            f"({conn_stats['reuse_rate']:.0%})"
+        )
+        
+        limits = self.data_collector.rate_limiter.metrics()
+        logger.info(
+            f"⚖️ Request weight: {limits['available_weight']}/{limits['capacity']} available | "
+            f"server used (1m): {limits['server_used_weight']} | queued: {limits['queue_length']}"
+        )
+        
+        if self.snapshot_buffer.is_running:
+            snapshots = self.snapshot_buffer.metrics()
+            logger.info(
+                f"💾 Snapshot buffer: queue {snapshots['queue_depth']} | written: {snapshots['written']}, "
+                f"coalesced: {snapshots['coalesced']}, dropped: {snapshots['dropped']}"
+            )
+        
+        cache = self.data_collector.cache.metrics()
+        logger.info(
+            f"🗃️ Cache hit rate: {cache['hit_rate']:.0%} | hits: {cache['hits']}, stale: {cache['stale_hits']}, "
+            f"misses: {cache['misses']}, coalesced: {cache['coalesced']}"
+        )
+        
+        # Mức S/R mới cho event giá vượt mức
+        self.market_events.set_levels(
+            market_data['symbol'], market_data.get('support_levels', []) + market_data.get('resistance_levels', [])
+        )
+        return market_data
+    
+    async def _stage_ai_analysis(self, results):
+        """2. Phân tích AI với Puter AI"""
+        if results['analyze'] or self.last_ai_analysis is None:
+            self.last_ai_analysis = await self.ai_client.analyze_market(results['market_data'])
+        return self.last_ai_analysis
+    
+    def _ai_fallback(self, results):
+        """AI quá timeout => dùng analysis gần nhất (hoặc HOLD) để technical signals vẫn được dùng"""
+        return self.last_ai_analysis or {'action': 'HOLD', 'confidence': 0.5, 'reasoning': 'AI analysis timed out'}
+    
+    async def _stage_technical_signals(self, results):
+        """
+        3. Tạo signals từ technical analysis
+        
+        Bật confluence thì technical signal là confluence của nến đã đóng trên các khung
+        (CONFLUENCE_WEIGHTS) - không gồm orderbook / S/R theo giá live của market_data.
+        Chỉ khi confluence chưa có signal mới chấm market_data như khi tắt confluence.
+        """
+        if self.confluence:
+            # Chấm lại các khung có nến vừa đóng, kết hợp theo CONFLUENCE_WEIGHTS
+            confluence_signal = await self.confluence.refresh()
+            if confluence_signal is not None:
+                return confluence_signal
+        return await self.signal_generator.generate_signals(results['market_data'])
+    
+    async def _stage_combined_signal(self, results):
+        """4. Kết hợp AI analysis và technical signals"""
+        return await self.signal_generator.combine_signals(results['ai_analysis'], results['technical_signals'])
+    
+    async def _stage_risk_check(self, results):
+        """5. Kiểm tra risk management"""
+        return await self.risk_manager.evaluate_risk(results['combined_signal'])
+    
+    async def _stage_trade(self, results):
+        """6. Thực hiện trade nếu signal hợp lệ"""
+        if not results['risk_check']['approved']:
+            return None
+        trade_result = await self.execute_trade(results['combined_signal'])
+        if trade_result:
+            self.notifications.send_trade_alert(trade_result)
+        return trade_result
+    
+    async def _stage_portfolio(self, results):
+        """7. Cập nhật portfolio và metrics (chạy nền)"""
+        await self.update_portfolio_metrics()
+    
     async def execute_trade(self, signal):
         """Thực hiện giao dịch"""
         try:
@@ -126,7 +269,7 @@ class BitcoinTradingBot:
             
             logger.info(f"🎯 Trade executed: {result}")
             return result
-            
+        
         except Exception as e:
             logger.error(f"❌ Lỗi execute trade: {e}")
             return None
@@ -139,7 +282,7 @@ class BitcoinTradingBot:
             
             # Update portfolio tracking
             # TODO: Implement portfolio metrics calculation
-            
+        
         except Exception as e:
             logger.error(f"❌ Lỗi update portfolio: {e}")
     
@@ -153,12 +296,15 @@ class BitcoinTradingBot:
         logger.info("🤖 Bitcoin AI Trading Bot đang chạy...")
         
         try:
-            while self.is_running:
-                await self.run_trading_cycle()
-                
-                # Nghỉ giữa các cycle (30 giây)
-                await asyncio.sleep(30)
-                
+            if self.settings.EVENT_DRIVEN:
+                await self.run_event_loop()
+            else:
+                while self.is_running:
+                    await self.run_trading_cycle()
+                    
+                    # Nghỉ giữa các cycle (30 giây)
+                    await asyncio.sleep(30)
+        
         except KeyboardInterrupt:
             logger.info("👋 Bot đang dừng...")
         except Exception as e:
@@ -166,9 +312,44 @@ class BitcoinTradingBot:
         finally:
             await self.shutdown()
     
+    async def run_event_loop(self):
+        """
+        Trading loop hướng sự kiện thay cho sleep 30 giây cố định
+        
+        Nến đóng chạy cả cycle (AI + technical); giá vượt mức S/R hoặc sổ lệnh
+        lệch chỉ chấm lại technical signals với AI analysis gần nhất. Các event
+        đến trong lúc cycle đang chạy được gộp thành một lần chạy tiếp theo.
+        Heartbeat chạy cycle đầy đủ khi không có event nào trong
+        EVENT_HEARTBEAT_SECONDS (ví dụ không bật streaming).
+        """
+        heartbeat = self.settings.EVENT_HEARTBEAT_SECONDS
+        self.event_bus.subscribe(
+            [TOPIC_CANDLE_CLOSED, TOPIC_LEVEL_CROSSED, TOPIC_BOOK_IMBALANCE, TOPIC_HEARTBEAT],
+            self.on_market_events, debounce=self.settings.EVENT_DEBOUNCE_MS / 1000, name='trading_cycle'
+        )
+        await self.event_bus.start()
+        
+        while self.is_running:
+            idle = time.monotonic() - self.last_cycle
+            if idle >= heartbeat:
+                self.event_bus.publish(TOPIC_HEARTBEAT, {'idle': idle})
+                idle = 0
+            await asyncio.sleep(heartbeat - idle)
+    
+    async def on_market_events(self, events):
+        """Handler của EventBus: chạy cycle đầy đủ hoặc chỉ phần technical theo event"""
+        analyze = TOPIC_CANDLE_CLOSED in events or TOPIC_HEARTBEAT in events
+        logger.info(f"⚡ Market events: {', '.join(events)} -> {'full' if analyze else 'technical'} cycle")
+        await self.run_trading_cycle(analyze=analyze)
+    
     async def shutdown(self):
         """Tắt bot an toàn"""
         self.is_running = False
+        await self.event_bus.stop()
+        await self.cycle_pipeline.drain(timeout=10)
+        await self.data_collector.close()
+        await self.snapshot_buffer.close()  # Stream đã dừng => ghi nốt snapshots còn trong buffer
+        await self.database.close()
         logger.info("🛑 Bitcoin AI Trading Bot đã dừng")
         self.notifications.send_info("Bot đã dừng hoạt động")
 
@@ -180,7 +361,7 @@ def main():
         
         # Chạy bot
         asyncio.run(bot.run())
-        
+    
     except Exception as e:
         print(f"❌ Lỗi khởi động bot: {e}")
         sys.exit(1)
@@ -11,11 +11,15 @@ import json
 from datetime import datetime
 from ai_trading_engine import ai_engine
 from continuous_ai_analyzer import continuous_analyzer
+from config.settings import Settings
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'bitcoin-ai-bot-secret'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Random cho dữ liệu mẫu - đặt RANDOM_SEED để chạy lặp lại được
+rng = random.Random(Settings().RANDOM_SEED)
+
 # Global data với AI Engine
 bot_state = {
     'running': False,
@@ -1360,19 +1364,19 @@ SIMPLE_DASHBOARD = '''
 def get_sample_market_data():
     """Tạo dữ liệu thị trường mẫu"""
     base_price = bot_state['current_price']
-    change_percent = random.uniform(-2, 2)
+    change_percent = rng.uniform(-2, 2)
     new_price = base_price * (1 + change_percent/100)
     bot_state['current_price'] = new_price
     
     return {
         'price': new_price,
         'change': f"{'+' if change_percent > 0 else ''}{change_percent:.2f}%",
-        'volume': f"${random.uniform(40, 60):.1f}B",
-        'market_cap': f"${random.uniform(2.2, 2.4):.2f}T",
-        'rsi': round(random.uniform(30, 80), 1),
-        'macd': random.choice(['Tăng', 'Giảm', 'Trung tính']),
-        'ema': random.choice(['Bullish', 'Bearish', 'Sideways']),
-        'volume_analysis': random.choice(['Cao', 'Trung bình', 'Thấp']),
+        'volume': f"${rng.uniform(40, 60):.1f}B",
+        'market_cap': f"${rng.uniform(2.2, 2.4):.2f}T",
+        'rsi': round(rng.uniform(30, 80), 1),
+        'macd': rng.choice(['Tăng', 'Giảm', 'Trung tính']),
+        'ema': rng.choice(['Bullish', 'Bearish', 'Sideways']),
+        'volume_analysis': rng.choice(['Cao', 'Trung bình', 'Thấp']),
         'support': f"${new_price * 0.97:.0f}",
         'resistance': f"${new_price * 1.03:.0f}"
     }
@@ -1429,10 +1433,10 @@ def get_sample_bot_status():
     
     return {
         'status': 'Online' if bot_state['running'] else 'Offline',
-        'position': random.choice(positions),
-        'pnl': random.choice(pnl_values),
-        'hold_duration': f"{random.randint(5, 120)} phút" if random.choice([True, False]) else '--',
-        'sell_plan': random.choice(['Chờ tín hiệu', 'Take profit tại $118,500', 'Stop loss tại $115,200'])
+        'position': rng.choice(positions),
+        'pnl': rng.choice(pnl_values),
+        'hold_duration': f"{rng.randint(5, 120)} phút" if rng.choice([True, False]) else '--',
+        'sell_plan': rng.choice(['Chờ tín hiệu', 'Take profit tại $118,500', 'Stop loss tại $115,200'])
     }
 
 @app.route('/')
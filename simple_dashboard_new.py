@@ -9,11 +9,15 @@ import time
 import random
 import json
 from datetime import datetime
+from config.settings import Settings
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'bitcoin-ai-bot-secret'
 socketio = SocketIO(app, cors_allowed_origins="*")
 
+# Random cho dữ liệu mẫu - đặt RANDOM_SEED để chạy lặp lại được
+rng = random.Random(Settings().RANDOM_SEED)
+
 # Global data
 bot_state = {
     'running': False,
@@ -724,19 +728,19 @@ SIMPLE_DASHBOARD = '''
 def get_sample_market_data():
     """Tạo dữ liệu thị trường mẫu"""
     base_price = bot_state['current_price']
-    change_percent = random.uniform(-2, 2)
+    change_percent = rng.uniform(-2, 2)
     new_price = base_price * (1 + change_percent/100)
     bot_state['current_price'] = new_price
     
     return {
         'price': new_price,
         'change': f"{'+' if change_percent > 0 else ''}{change_percent:.2f}%",
-        'volume': f"${random.uniform(40, 60):.1f}B",
-        'market_cap': f"${random.uniform(2.2, 2.4):.2f}T",
-        'rsi': round(random.uniform(30, 80), 1),
-        'macd': random.choice(['Tăng', 'Giảm', 'Trung tính']),
-        'ema': random.choice(['Bullish', 'Bearish', 'Sideways']),
-        'volume_analysis': random.choice(['Cao', 'Trung bình', 'Thấp']),
+        'volume': f"${rng.uniform(40, 60):.1f}B",
+        'market_cap': f"${rng.uniform(2.2, 2.4):.2f}T",
+        'rsi': round(rng.uniform(30, 80), 1),
+        'macd': rng.choice(['Tăng', 'Giảm', 'Trung tính']),
+        'ema': rng.choice(['Bullish', 'Bearish', 'Sideways']),
+        'volume_analysis': rng.choice(['Cao', 'Trung bình', 'Thấp']),
         'support': f"${new_price * 0.97:.0f}",
         'resistance': f"${new_price * 1.03:.0f}"
     }
@@ -744,27 +748,27 @@ def get_sample_market_data():
 def get_sample_ai_prediction():
     """Tạo dự đoán AI mẫu"""
     signals = ['BUY', 'SELL', 'HOLD']
-    signal = random.choice(signals)
-    confidence = random.randint(75, 95)
+    signal = rng.choice(signals)
+    confidence = rng.randint(75, 95)
     
     current_price = bot_state['current_price']
     if signal == 'BUY':
-        target_price = current_price * random.uniform(1.02, 1.05)
-        analysis = random.choice([
+        target_price = current_price * rng.uniform(1.02, 1.05)
+        analysis = rng.choice([
             'Xu hướng tăng mạnh với khối lượng cao',
             'RSI oversold, MACD tích cực',
             'Vượt qua vùng kháng cự quan trọng'
         ])
     elif signal == 'SELL':
-        target_price = current_price * random.uniform(0.95, 0.98)
-        analysis = random.choice([
+        target_price = current_price * rng.uniform(0.95, 0.98)
+        analysis = rng.choice([
             'Tín hiệu bán mạnh, áp lực giảm giá',
             'RSI overbought, MACD tiêu cực',
             'Không vượt được vùng kháng cự'
         ])
     else:
-        target_price = current_price * random.uniform(0.99, 1.01)
-        analysis = random.choice([
+        target_price = current_price * rng.uniform(0.99, 1.01)
+        analysis = rng.choice([
             'Thị trường sideway, chờ tín hiệu rõ ràng',
             'Khối lượng thấp, thiếu momentum',
             'Dao động trong vùng hỗ trợ - kháng cự'
@@ -775,7 +779,7 @@ def get_sample_ai_prediction():
         'confidence': f"{confidence}%",
         'target_price': f"${target_price:.0f}",
         'analysis': analysis,
-        'next_signal_seconds': random.randint(30, 120)
+        'next_signal_seconds': rng.randint(30, 120)
     }
 
 def get_sample_bot_status():
@@ -785,10 +789,10 @@ def get_sample_bot_status():
     
     return {
         'status': 'Online' if bot_state['running'] else 'Offline',
-        'position': random.choice(positions),
-        'pnl': random.choice(pnl_values),
-        'hold_duration': f"{random.randint(5, 120)} phút" if random.choice([True, False]) else '--',
-        'sell_plan': random.choice(['Chờ tín hiệu', 'Take profit tại $118,500', 'Stop loss tại $115,200'])
+        'position': rng.choice(positions),
+        'pnl': rng.choice(pnl_values),
+        'hold_duration': f"{rng.randint(5, 120)} phút" if rng.choice([True, False]) else '--',
+        'sell_plan': rng.choice(['Chờ tín hiệu', 'Take profit tại $118,500', 'Stop loss tại $115,200'])
     }
 
 @app.route('/')
@@ -0,0 +1,164 @@
+"""
+Kiểm tra MarketArchive - file nhị phân theo ngày, đọc mmap không copy, importer
+"""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.archive import CANDLE_DTYPE, DAY_MS, HEADER_SIZE, MarketArchive
+from data.candles import parse_klines
+from data.database import DatabaseManager
+from data.history import HistoryStore
+
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+HOUR_MS = 3_600_000
+
+def _candles(count: int, start_ms: int = START_MS, step: int = HOUR_MS):
+    records = np.zeros(count, dtype=CANDLE_DTYPE)
+    records['timestamp'] = start_ms + np.arange(count) * step
+    records['close'] = 40000 + np.arange(count) % 500
+    records['volume'] = 1 + np.arange(count) % 7
+    records['close_time'] = records['timestamp'] + step - 1
+    records['trades_count'] = 300
+    return records
+
+def test_append_and_mmap_read():
+    """Một file mỗi ngày UTC, đọc trong một ngày là view trên mmap, append không ghi trùng"""
+    with tempfile.TemporaryDirectory() as root:
+        archive = MarketArchive(root)
+        records = _candles(60)  # 2.5 ngày
+        assert archive.append('candles', 'btcusdt', '1h', records) == 60
+        assert [path.name for _, path in archive.days('candles', 'BTCUSDT', '1h')] == \
+            ['2024-01-01.bin', '2024-01-02.bin', '2024-01-03.bin']
+        path = archive.days('candles', 'BTCUSDT', '1h')[0][1]
+        assert path.stat().st_size == HEADER_SIZE + 24 * CANDLE_DTYPE.itemsize
+        
+        # Chạy lại + thêm dữ liệu mới: chỉ phần mới được ghi
+        assert archive.append('candles', 'BTCUSDT', '1h', _candles(70)) == 10
+        
+        one_day = archive.read('candles', 'BTCUSDT', '1h', START_MS + 2 * HOUR_MS, START_MS + 5 * HOUR_MS)
+        assert isinstance(one_day.base, np.memmap) or isinstance(one_day, np.memmap)
+        assert one_day['timestamp'].tolist() == [START_MS + i * HOUR_MS for i in range(2, 6)]
+        
+        everything = archive.read('candles', 'BTCUSDT', '1h')
+        assert np.array_equal(everything, _candles(70))
+        
+        window = archive.candles('BTCUSDT', '1h', START_MS + 20 * HOUR_MS, START_MS + 29 * HOUR_MS)
+        assert len(window) == 10 and window.timestamps[0] == START_MS + 20 * HOUR_MS
+        assert np.array_equal(window.closes, _candles(30)['close'][20:])
+        
+        chart = archive.chart_data('BTCUSDT', '1h', max_points=7)
+        assert len(chart['prices']) == 7 and chart['prices'][0] == 40000
+
+def test_incomplete_append_is_ignored():
+    """Bytes ghi dở sau count trong header không được đọc, lần append sau ghi đè lên"""
+    with tempfile.TemporaryDirectory() as root:
+        archive = MarketArchive(root)
+        archive.append('candles', 'BTCUSDT', '1h', _candles(5))
+        path = archive.days('candles', 'BTCUSDT', '1h')[0][1]
+        with open(path, 'ab') as f:
+            f.write(b'\x01' * (CANDLE_DTYPE.itemsize + 13))
+        
+        assert len(archive.read('candles', 'BTCUSDT', '1h')) == 5
+        archive.append('candles', 'BTCUSDT', '1h', _candles(6))
+        assert np.array_equal(archive.read('candles', 'BTCUSDT', '1h'), _candles(6))
+        
+        bad = path.parent / '2024-02-01.bin'
+        bad.write_bytes(b'not an archive' * 10)
+        try:
+            archive.read('candles', 'BTCUSDT', '1h')
+            assert False, "expected ValueError"
+        except ValueError:
+            pass
+
+def test_import_market_data_and_history():
+    """market_data (JSON macd) => ticks; HistoryStore => candles"""
+    async def fill(path):
+        db = DatabaseManager(path)
+        await db.initialize()
+        for i in range(30):
+            await db.save_market_data({
+                'timestamp': START_MS + i * 1000, 'symbol': 'BTCUSDT', 'price': 45000 + i, 'volume': 10.0,
+                'rsi': 50 + i / 10, 'macd': {'macd': i, 'signal': i / 2, 'histogram': i / 2}
+            })
+        await db.save_market_data({'timestamp': START_MS, 'symbol': 'ETHUSDT', 'price': 2500})
+        await db.close()
+    
+    with tempfile.TemporaryDirectory() as root:
+        db_path = Path(root) / 'bot.db'
+        asyncio.run(fill(db_path))
+        archive = MarketArchive(Path(root) / 'archive')
+        
+        assert archive.import_market_data(db_path, batch_size=7) == 31
+        assert archive.import_market_data(db_path) == 0  # Đã import
+        ticks = archive.ticks('BTCUSDT')
+        assert ticks['price'].tolist() == [45000 + i for i in range(30)]
+        assert ticks['macd_signal'][10] == 5.0 and ticks['rsi'][10] == 51.0
+        assert np.isnan(archive.ticks('ETHUSDT')['macd'][0])
+        
+        store = HistoryStore(Path(root) / 'history')
+        rows = [[START_MS + i * HOUR_MS, 1, 2, 0.5, 1.5, 10, START_MS + (i + 1) * HOUR_MS - 1, 15, 3] for i in range(48)]
+        store.write('BTCUSDT', '1h', START_MS, START_MS + 47 * HOUR_MS, parse_klines(rows))
+        assert archive.import_history(store, 'BTCUSDT', '1h') == 48
+        assert archive.candles('BTCUSDT', '1h').column('trades_count').tolist() == [3] * 48
+
+if __name__ == "__main__":
+    MINUTES = 365 * 24 * 60
+    TICKS = 1_000_000
+    
+    with tempfile.TemporaryDirectory() as root:
+        archive = MarketArchive(Path(root) / 'archive')
+        records = _candles(MINUTES, step=60_000)
+        started = time.perf_counter()
+        archive.append('candles', 'BTCUSDT', '1m', records)
+        write_s = time.perf_counter() - started
+        
+        started = time.perf_counter()
+        year = archive.read('candles', 'BTCUSDT', '1m')
+        read_year_ms = (time.perf_counter() - started) * 1000
+        started = time.perf_counter()
+        for _ in range(100):
+            day = archive.read('candles', 'BTCUSDT', '1m', START_MS + 100 * DAY_MS, START_MS + 101 * DAY_MS - 1)
+        read_day_ms = (time.perf_counter() - started) / 100 * 1000
+        
+        # market_data (JSON mỗi row) vs ticks trong archive
+        connection = sqlite3.connect(Path(root) / 'market.db')
+        connection.execute('CREATE TABLE market_data (timestamp INTEGER, symbol TEXT, price REAL, volume REAL, '
+                           'rsi REAL, macd_data TEXT, indicators TEXT)')
+        macd = json.dumps({'macd': 1.5, 'signal': 1.2, 'histogram': 0.3})
+        connection.executemany('INSERT INTO market_data VALUES (?, ?, ?, ?, ?, ?, ?)', (
+            (START_MS + i * 1000, 'BTCUSDT', 45000.0 + i % 100, 10.0, 55.0, macd, '{}') for i in range(TICKS)
+        ))
+        connection.commit()
+        
+        started = time.perf_counter()
+        rows = connection.execute('SELECT timestamp, price, macd_data FROM market_data ORDER BY timestamp').fetchall()
+        parsed = [(ts, price, json.loads(data)['histogram']) for ts, price, data in rows]
+        sqlite_s = time.perf_counter() - started
+        connection.close()
+        
+        started = time.perf_counter()
+        archive.import_market_data(Path(root) / 'market.db')
+        import_s = time.perf_counter() - started
+        started = time.perf_counter()
+        ticks = archive.ticks('BTCUSDT')
+        histogram_mean = ticks['macd_histogram'].mean()
+        archive_ms = (time.perf_counter() - started) * 1000
+    
+    print(f"🗃️ MARKET ARCHIVE - {MINUTES:,} candles 1m, {TICKS:,} ticks")
+    print("=" * 40)
+    print(f"   Ghi 1 năm candles: {write_s:.2f}s ({len(year):,} records)")
+    print(f"   Đọc 1 năm: {read_year_ms:.1f} ms | 1 ngày (mmap view): {read_day_ms:.3f} ms")
+    print(f"   market_data SQLite + json.loads: {sqlite_s:.2f}s")
+    print(f"   Import vào archive: {import_s:.2f}s | Đọc ticks mmap: {archive_ms:.1f} ms")
@@ -0,0 +1,143 @@
+"""
+Kiểm tra Backtester - replay candles qua signal / risk / exchange mô phỏng, pre-screen không đổi kết quả
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from ai_engine.puter_client import AI_MAX_CONFIDENCE, PuterAIClient
+from data.candles import CandleWindow
+from data.history import HistoryStore
+from data.indicators import latest_rows
+from trading.backtest import Backtester
+
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+MINUTE_MS = 60_000
+
+def _candles(count: int, seed: int = 3, interval_ms: int = MINUTE_MS) -> CandleWindow:
+    """Random walk quay về giá đầu (Brownian bridge) + chu kỳ xu hướng, volume lognormal"""
+    rng = np.random.default_rng(seed)
+    steps = np.cumsum(rng.normal(0, 0.0008, count))
+    t = np.arange(count)
+    log_price = steps - t / count * steps[-1] + 0.05 * np.sin(2 * np.pi * t / 5000)
+    closes = 40000 * np.exp(log_price)
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    wick = np.abs(rng.normal(0, 0.0005, count)) * closes
+    timestamps = START_MS + t.astype(np.float64) * interval_ms
+    volumes = rng.lognormal(3, 0.5, count)
+    return CandleWindow(np.vstack([
+        timestamps, opens, np.maximum(opens, closes) + wick, np.minimum(opens, closes) - wick,
+        closes, volumes, timestamps + interval_ms - 1, volumes * closes, np.full(count, 100.0)
+    ]))
+
+def test_prefilter_matches_full_replay():
+    """Bỏ qua bars chắc chắn HOLD cho đúng trades và equity như chạy mọi bar qua signal path"""
+    candles = _candles(6000)
+    screened = asyncio.run(Backtester('BTC/USDT', '1m').run(candles))
+    full = asyncio.run(Backtester('BTC/USDT', '1m', prefilter=False).run(candles))
+    
+    assert screened['stats']['buys'] > 0 and screened['stats']['sells'] > 0
+    assert screened['trades'] == full['trades']
+    assert np.array_equal(screened['equity'], full['equity'])
+    assert screened['stats']['evaluated'] < full['stats']['evaluated'] == len(candles) - 100
+    assert screened['stats']['signals'] == full['stats']['signals']
+    assert len(screened['equity']) == len(screened['timestamps']) == len(candles) - 100
+
+def test_prefilter_ai_rules_match_per_bar():
+    """Action AI vectorized của pre-screen = PuterAIClient._analyze_with_puter chạy từng bar; confidence <= AI_MAX_CONFIDENCE"""
+    candles = _candles(3000)
+    backtester = Backtester('BTC/USDT', '1m')
+    prepared = backtester.prepare(candles)
+    series = prepared['series']
+    bars = np.arange(backtester.warmup, len(candles))
+    supports, resistances = prepared['supports'], prepared['resistances']
+    support_distance, resistance_distance = backtester._sr_distances(series['close'][bars], supports, resistances)
+    expected = backtester._ai_direction(series, bars, support_distance, resistance_distance)
+    
+    client = PuterAIClient()
+    async def per_bar():
+        actions, confidences = [], []
+        rows = zip(bars.tolist(), latest_rows(series, bars), supports.tolist(), resistances.tolist())
+        for i, market_data, support, resistance in rows:
+            market_data.update(price=market_data['moving_averages']['current_price'],
+                               volume=prepared['volume_24h'].item(i), avg_volume=market_data['volume_sma'],
+                               support_levels=[level for level in support if level == level],
+                               resistance_levels=[level for level in resistance if level == level])
+            analysis = await client._analyze_with_puter('', market_data)
+            actions.append({'BUY': 1, 'SELL': -1, 'HOLD': 0}[analysis['action']])
+            confidences.append(analysis['confidence'])
+        return np.array(actions), np.array(confidences)
+    
+    actions, confidences = asyncio.run(per_bar())
+    assert (actions == 1).any() and (actions == -1).any()
+    assert np.array_equal(actions, expected)
+    assert confidences.max() <= AI_MAX_CONFIDENCE
+
+def test_accounting_and_bar_clock():
+    """Equity cuối = vốn + P&L thực hiện + chưa thực hiện; phí đúng fee_percent; daily trades theo giờ bar"""
+    candles = _candles(6000)
+    backtester = Backtester('BTC/USDT', '1m', initial_balance=5000, fee_percent=0.2)
+    result = asyncio.run(backtester.run(candles))
+    stats, trades = result['stats'], result['trades']
+    
+    assert stats['initial_balance'] == 5000
+    assert abs(stats['final_equity'] - (5000 + stats['realized_pnl'] + stats['unrealized_pnl'])) < 1e-6
+    assert abs(stats['fees'] - sum(trade['cost'] * 0.002 for trade in trades)) < 1e-6
+    assert all(trade['timestamp'] in candles.timestamps for trade in trades)
+    assert [trade['timestamp'] for trade in trades] == sorted(trade['timestamp'] for trade in trades)
+    assert 0 <= stats['max_drawdown'] < 1 and 0 < stats['exposure'] < 1
+    
+    # RiskManager đếm lệnh trong ngày theo timestamp của bar, không theo đồng hồ máy
+    last_day = datetime.fromtimestamp(trades[-1]['timestamp'] / 1000, timezone.utc).date()
+    same_day = [trade for trade in trades
+                if datetime.fromtimestamp(trade['timestamp'] / 1000, timezone.utc).date() == last_day]
+    daily = backtester.risk_manager.daily_trades
+    assert len(daily) == len(same_day)
+    assert all(entry['timestamp'].date() == last_day for entry in daily)
+
+def test_run_from_history_store():
+    """Candles đọc từ HistoryStore (nhiều segment) cho cùng kết quả; quá ít candles => ValueError"""
+    candles = _candles(3000)
+    with tempfile.TemporaryDirectory() as root:
+        store = HistoryStore(root)
+        data = np.vstack([
+            candles.timestamps, candles.opens, candles.highs, candles.lows, candles.closes, candles.volumes,
+            candles.timestamps + MINUTE_MS - 1, candles.volumes * candles.closes, np.full(len(candles), 100.0)
+        ])
+        store.write('BTCUSDT', '1m', int(candles.timestamps[0]), int(candles.timestamps[1499]), data[:, :1500])
+        store.write('BTCUSDT', '1m', int(candles.timestamps[1500]), int(candles.timestamps[-1]), data[:, 1500:])
+        loaded = store.load('BTCUSDT', '1m')
+    
+    expected = asyncio.run(Backtester('BTC/USDT', '1m').run(candles))
+    result = asyncio.run(Backtester('BTC/USDT', '1m').run(loaded))
+    assert result['trades'] == expected['trades']
+    
+    try:
+        asyncio.run(Backtester('BTC/USDT', '1m').run(_candles(100)))
+        assert False, "Cần ValueError"
+    except ValueError:
+        pass
+
+if __name__ == "__main__":
+    BARS = 1_000_000
+    
+    candles = _candles(BARS)
+    started = time.perf_counter()
+    result = asyncio.run(Backtester('BTC/USDT', '1m').run(candles))
+    elapsed = time.perf_counter() - started
+    stats = result['stats']
+    print(f"📈 BACKTEST - {BARS:,} candles 1m")
+    print("=" * 40)
+    print(f"   {elapsed:.1f}s ({stats['bars_per_second']:,.0f} bars/s, precompute {stats['precompute_seconds']:.2f}s)")
+    print(f"   Qua signal path: {stats['evaluated']:,} bars | {stats['trades']:,} trades")
+    print(f"   Return {stats['total_return']:+.2%} | max DD {stats['max_drawdown']:.2%} | Sharpe {stats['sharpe']:.2f}")
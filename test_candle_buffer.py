@@ -0,0 +1,156 @@
+"""
+Kiểm tra CandleBuffer - ring buffer OHLCV dạng cột
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.candles import FIELDS, CandleBuffer
+from data.collector import DataCollector
+from trading.signals import SignalGenerator
+from test_indicator_engine import _random_klines
+
+def _row(kline):
+    return [kline.get(name, 0) for name in FIELDS]
+
+def test_window_is_zero_copy_after_wraparound():
+    """Sau khi vòng qua capacity, window vẫn đúng thứ tự và không copy"""
+    klines = _random_klines(250)
+    buffer = CandleBuffer(capacity=100, interval='1h')
+    for kline in klines:
+        buffer.append(_row(kline))
+    
+    assert len(buffer) == 100
+    window = buffer.window()
+    assert window.closes.tolist() == [k['close'] for k in klines[-100:]]
+    assert window.timestamps.tolist() == [k['timestamp'] for k in klines[-100:]]
+    assert np.shares_memory(window.closes, buffer._data)
+    assert buffer.window(10).highs.tolist() == [k['high'] for k in klines[-10:]]
+    assert buffer.to_klines(3) == [{name: kline.get(name, 0) for name in FIELDS} for kline in klines[-3:]]
+
+def test_upsert_update_last_and_gap():
+    """Trùng open time => ghi đè, mới hơn => append, thiếu candle => bắt đầu lại"""
+    klines = _random_klines(30)
+    buffer = CandleBuffer(capacity=20, interval='1h')
+    buffer.extend([_row(k) for k in klines])
+    
+    # Response REST chồng lấn: candle cũ nhất bị bỏ qua, candle giữa được ghi đè
+    assert not buffer.upsert(_row(klines[0]))
+    updated = dict(klines[15], close=1.0)
+    assert buffer.upsert(_row(updated))
+    assert buffer.window().closes[5] == 1.0
+    assert len(buffer) == 20
+    
+    buffer.update_last(close=2.0, volume=3.0)
+    assert buffer.last('close') == 2.0 and buffer.last('volume') == 3.0
+    
+    skipped = dict(klines[-1], timestamp=klines[-1]['timestamp'] + 3 * 3_600_000)
+    buffer.upsert(_row(skipped))
+    assert len(buffer) == 1
+    assert buffer.last_timestamp == skipped['timestamp']
+
+def test_extend_matches_row_by_row_upsert():
+    """extend (vectorized) cho kết quả giống upsert từng candle"""
+    klines = _random_klines(400)
+    responses = [klines[0:100], klines[50:150], klines[149:160], klines[100:120], klines[300:400]]
+    bulk = CandleBuffer(capacity=128, interval='1h')
+    single = CandleBuffer(capacity=128, interval='1h')
+    
+    for response in responses:
+        response = [_row(dict(k, volume=k['volume'] + len(response))) for k in response]
+        bulk.extend([[str(value) for value in row] for row in response])
+        for row in response:
+            single.upsert(row)
+        assert bulk.to_klines() == single.to_klines()
+
+def test_collector_accepts_buffer_and_klines():
+    """Indicators / S/R / avg volume trên CandleWindow bằng với list dict"""
+    collector = DataCollector()
+    klines = _random_klines(150)
+    window = CandleBuffer.from_klines(klines, '1h').window()
+    
+    assert asyncio.run(collector.calculate_technical_indicators(window)) == \
+        asyncio.run(collector.calculate_technical_indicators(klines))
+    assert collector.calculate_support_resistance(window) == collector.calculate_support_resistance(klines)
+    assert collector._calculate_avg_volume(window) == collector._calculate_avg_volume(klines)
+
+def test_market_data_candles_survive_append():
+    """market_data giữ bản copy: append vào buffer sau đó không làm lệch candles đã lấy"""
+    klines = _random_klines(130)
+    buffer = CandleBuffer.from_klines(klines[:100], '1h')
+    book = {'bids': [[99.0, 1.0]], 'asks': [[101.0, 1.0]]}
+    market_data = asyncio.run(DataCollector()._build_market_data('BTCUSDT', 100.0, {}, book, buffer.window()))
+    
+    for kline in klines[100:]:
+        buffer.append(_row(kline))
+    assert market_data['candles'].timestamps.tolist() == [k['timestamp'] for k in klines[:100]]
+    assert not np.shares_memory(market_data['candles'].closes, buffer._data)
+
+def test_fallback_market_data_has_same_keys():
+    """Fallback khi API lỗi trả cùng key với market_data thường (liquidity / sr_zones / candles rỗng)"""
+    collector = DataCollector()
+    window = CandleBuffer.from_klines(_random_klines(100), '1h').window()
+    book = {'bids': [[99.0, 1.0]], 'asks': [[101.0, 1.0]]}
+    market_data = asyncio.run(collector._build_market_data('BTCUSDT', 100.0, {}, book, window))
+    fallback = collector._get_fallback_market_data()
+    
+    assert set(fallback) == set(market_data)
+    assert fallback['liquidity'] is None and fallback['sr_zones'] == []
+    assert len(fallback['candles']) == 0 and fallback['candles'].closes.shape == (0,)
+    assert asyncio.run(SignalGenerator().generate_signals(fallback))['action'] in ('BUY', 'SELL', 'HOLD')
+
+def test_signal_confidence_unchanged_by_candles():
+    """Volume signal vẫn theo volume 24h / avg_volume: có candles (candle đang chạy volume thấp) không đổi confidence"""
+    klines = _random_klines(120)
+    klines[-1] = dict(klines[-1], volume=klines[-2]['volume'] * 0.5)
+    market_data = {
+        'price': 100.0, 'rsi': 50, 'macd': {'macd': 1.0, 'signal': 0.5, 'histogram': 0.5},
+        'moving_averages': {'sma_20': 99, 'sma_50': 98, 'ema_12': 99.5, 'ema_26': 99, 'current_price': 100.0},
+        'volume': 24000.0, 'avg_volume': 1000.0, 'support_levels': [90.0], 'resistance_levels': [110.0]
+    }
+    generator = SignalGenerator()
+    before = asyncio.run(generator.generate_signals(market_data))
+    window = CandleBuffer.from_klines(klines, '1h').window()
+    after = asyncio.run(generator.generate_signals({**market_data, 'candles': window}))
+    
+    assert before['signal_scores']['volume_signal'] == after['signal_scores']['volume_signal'] == 'CONFIRM'
+    assert before['action'] == after['action'] == 'BUY'
+    assert before['confidence'] == after['confidence']
+    assert abs(after['confidence'] - 10 / 19) < 1e-12
+
+if __name__ == "__main__":
+    klines = _random_klines(100)
+    rows = [[str(value) for value in _row(k)] for k in klines]  # Giống response /klines
+    collector = DataCollector()
+    buffer = CandleBuffer(1000, '1h')
+    
+    start = time.perf_counter()
+    for _ in range(1000):
+        parsed = [
+            {'timestamp': int(r[0]), 'open': float(r[1]), 'high': float(r[2]), 'low': float(r[3]),
+             'close': float(r[4]), 'volume': float(r[5]), 'close_time': int(r[6])}
+            for r in rows
+        ]
+        collector._calculate_avg_volume(parsed)
+        [k['close'] for k in parsed], [k['high'] for k in parsed], [k['low'] for k in parsed]
+    dict_us = (time.perf_counter() - start) / 1000 * 1e6
+    
+    start = time.perf_counter()
+    for _ in range(1000):
+        buffer.extend(rows)
+        window = buffer.window(100)
+        window.closes, window.highs, window.lows
+    buffer_us = (time.perf_counter() - start) / 1000 * 1e6
+    
+    print("🕯️ CANDLE BUFFER - 100 candles mỗi cycle")
+    print("=" * 40)
+    print(f"   List dict parse + extract: {dict_us:,.1f} µs")
+    print(f"   Buffer upsert + views:     {buffer_us:,.1f} µs")
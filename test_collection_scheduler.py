@@ -0,0 +1,154 @@
+"""
+Kiểm tra CollectionScheduler - nhiều symbols × timeframes với stub Binance REST
+"""
+
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.candles import INTERVAL_MS
+from data.scheduler import CollectionScheduler
+from test_helpers import stub_collector
+from utils.rate_limiter import RateLimiter
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT']
+TIMEFRAMES = ['1m', '1h']
+
+def _routes(clock: dict, calls: list):
+    """Stub trả klines kết thúc tại clock['now'] (candle cuối là candle đang chạy)"""
+    async def klines(request):
+        interval = request.query['interval']
+        limit = int(request.query['limit'])
+        calls.append((request.query['symbol'], interval, limit))
+        step = INTERVAL_MS[interval]
+        live_open = clock['now'] // step * step
+        rows = []
+        for i in range(limit):
+            open_time = live_open - (limit - 1 - i) * step
+            price = 100 + (open_time // step) % 50
+            rows.append([open_time, str(price), str(price + 1), str(price - 1), str(price + 0.5),
+                         '10', open_time + step - 1, '1000', 5, '5', '500', '0'])
+        return web.json_response(rows)
+    
+    async def ticker(request):
+        calls.append(('ticker', None, None))
+        return web.json_response([
+            {'symbol': symbol, 'lastPrice': str(1000 + i), 'highPrice': '1100', 'lowPrice': '900',
+             'volume': '50', 'quoteVolume': '50000', 'priceChange': '5', 'priceChangePercent': '0.5'}
+            for i, symbol in enumerate(json.loads(request.query['symbols']))
+        ])
+    
+    async def book(request):
+        calls.append(('book', None, None))
+        return web.json_response([
+            {'symbol': symbol, 'bidPrice': str(999 + i), 'bidQty': '1', 'askPrice': str(1001 + i), 'askQty': '2'}
+            for i, symbol in enumerate(json.loads(request.query['symbols']))
+        ])
+    
+    return {'/klines': klines, '/ticker/24hr': ticker, '/ticker/bookTicker': book}
+
+async def _with_scheduler(scenario, weight_limit: int = 6000):
+    now = int(time.time() * 1000) // 3_600_000 * 3_600_000 + 90_000  # 1m30s sau đầu giờ
+    clock = {'now': now}
+    calls = []
+    async with stub_collector(_routes(clock, calls)) as collector:
+        collector.rate_limiter = RateLimiter(weight_limit, safety_margin=0)
+        scheduler = CollectionScheduler(collector, SYMBOLS, TIMEFRAMES)
+        return await scenario(collector, scheduler, clock, calls)
+
+def _kline_calls(calls):
+    return [call for call in calls if call[0] not in ('ticker', 'book')]
+
+def test_fetches_only_closed_candles():
+    """Bootstrap một lần, sau đó chỉ fetch timeframe vừa có candle đóng"""
+    async def scenario(collector, scheduler, clock, calls):
+        await scheduler.refresh(clock['now'])
+        assert sorted(_kline_calls(calls)) == sorted((s, tf, 100) for s in SYMBOLS for tf in TIMEFRAMES)
+        assert calls.count(('ticker', None, None)) == 1
+        assert calls.count(('book', None, None)) == 1
+        
+        # Cùng phút => không có candle nào đóng thêm
+        calls.clear()
+        clock['now'] += 10_000
+        result = await scheduler.refresh(clock['now'])
+        assert result['kline_requests'] == 0 and _kline_calls(calls) == []
+        
+        # 3 phút sau: 3 candle 1m đã đóng => fetch 4 (3 đóng + candle đang chạy mới)
+        calls.clear()
+        clock['now'] += 3 * 60_000
+        await scheduler.refresh(clock['now'])
+        assert sorted(_kline_calls(calls)) == sorted((s, '1m', 4) for s in SYMBOLS)
+        
+        buffer = collector.candles.get('BTCUSDT', '1m')
+        assert len(buffer) == 103
+        assert buffer.last_timestamp == clock['now'] // 60_000 * 60_000
+        timestamps = buffer.window().timestamps
+        assert ((timestamps[1:] - timestamps[:-1]) == 60_000).all()
+    
+    asyncio.run(_with_scheduler(scenario))
+
+def test_market_data_served_from_cache():
+    """get_market_data(symbol, timeframe) không gọi REST khi scheduler có dữ liệu"""
+    async def scenario(collector, scheduler, clock, calls):
+        collector.scheduler = scheduler
+        await scheduler.refresh(clock['now'])
+        calls.clear()
+        
+        market_data = await collector.get_market_data('ETHUSDT', '1m')
+        assert calls == []
+        assert market_data['symbol'] == 'ETHUSDT'
+        assert market_data['price'] == 1001.0
+        assert market_data['bid_price'] == 1000.0
+        assert market_data['ask_price'] == 1002.0
+        assert market_data['liquidity'] is None  # Chỉ có best bid/ask, không tính depth
+        assert len(market_data['candles']) == 100
+        assert market_data['rsi'] != 50.0
+    
+    asyncio.run(_with_scheduler(scenario))
+
+def test_weight_limit_defers_fetches():
+    """Vượt weight budget => phần còn lại dời sang lượt sau, ưu tiên timeframe ngắn"""
+    async def scenario(collector, scheduler, clock, calls):
+        # ticker (2) + book (4) + 3 klines (2 mỗi request)
+        result = await scheduler.refresh(clock['now'])
+        assert result == {'kline_requests': 3, 'deferred': 3}
+        assert {call[1] for call in _kline_calls(calls)} == {'1m'}
+        assert collector.rate_limiter.available() == 0
+        
+        # Bucket nạp lại => phần bị dời được fetch
+        collector.rate_limiter.tokens = collector.rate_limiter.capacity
+        calls.clear()
+        await scheduler.refresh(clock['now'])
+        assert sorted(_kline_calls(calls)) == sorted((s, '1h', 100) for s in SYMBOLS)
+    
+    asyncio.run(_with_scheduler(scenario, weight_limit=12))
+
+if __name__ == "__main__":
+    async def fifty_pairs(collector, scheduler, clock, calls):
+        scheduler.symbols = [f"SYM{i}USDT" for i in range(50)]
+        scheduler.timeframes = ['1m', '5m', '15m', '1h', '4h', '1d']
+        start = time.perf_counter()
+        await scheduler.refresh(clock['now'])
+        bootstrap_ms = (time.perf_counter() - start) * 1000
+        
+        clock['now'] += 60_000
+        start = time.perf_counter()
+        await scheduler.refresh(clock['now'])
+        minute_ms = (time.perf_counter() - start) * 1000
+        return bootstrap_ms, minute_ms, dict(scheduler.stats)
+    
+    bootstrap_ms, minute_ms, stats = asyncio.run(_with_scheduler(fifty_pairs))
+    print("🗓️ COLLECTION SCHEDULER - 50 symbols × 6 timeframes")
+    print("=" * 40)
+    print(f"   Bootstrap refresh: {bootstrap_ms:,.0f} ms")
+    print(f"   Refresh sau 1 phút: {minute_ms:,.0f} ms")
+    for key, value in stats.items():
+        print(f"   {key}: {value}")
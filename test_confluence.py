@@ -0,0 +1,219 @@
+"""
+Kiểm tra ConfluenceEngine - nến khung cao gộp từ 1m khớp resample trực tiếp, chỉ chấm khung có nến vừa đóng
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.candles import CandleWindow
+from data.collector import DataCollector
+from data.replay_server import KlineFixtureServer
+from test_backtest import START_MS, _candles
+from trading.confluence import ConfluenceEngine
+from trading.signals import SignalGenerator
+
+MINUTES = {'1m': 1, '5m': 5, '15m': 15, '1h': 60, '4h': 240, '1d': 1440}
+TIMEFRAMES = ['1m', '5m', '15m', '1h', '4h']
+
+logging.getLogger('trading').setLevel(logging.WARNING)
+
+def _bar(data: np.ndarray, minutes: int) -> list:
+    """Một nến khung cao từ các nến 1m của nó (cột theo FIELDS)"""
+    timestamp = data[0, 0] - (data[0, 0] - START_MS) % (minutes * 60000)
+    return [timestamp, data[1, 0], data[2].max(), data[3].min(), data[4, -1], data[5].sum(),
+            timestamp + minutes * 60000 - 1, data[7].sum(), data[8].sum()]
+
+def _resample(base: CandleWindow, minutes: int, end: int) -> np.ndarray:
+    """Nến đã đóng của khung minutes từ base[:end] (base bắt đầu ở START_MS)"""
+    data = np.vstack([base.column(field) for field in
+                      ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_volume', 'trades_count')])
+    groups = end // minutes
+    return np.array([_bar(data[:, i * minutes:(i + 1) * minutes], minutes) for i in range(groups)]).T
+
+def _rows(base: CandleWindow, interval: str, now_index: int) -> list:
+    """Response /klines tại lúc nến 1m thứ now_index đang chạy: nến đã đóng + nến đang chạy"""
+    minutes = MINUTES[interval]
+    data = np.vstack([base.column(field) for field in
+                      ('timestamp', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'quote_volume', 'trades_count')])
+    forming = now_index // minutes * minutes
+    bars = _resample(base, minutes, forming).T.tolist()
+    bars.append(_bar(data[:, forming:now_index + 1], minutes))
+    return [[int(row[0]), *map(str, row[1:6]), int(row[6]), str(row[7]), int(row[8])] for row in bars]
+
+def _assert_bars(window: CandleWindow, expected: np.ndarray):
+    assert len(window) == min(100, expected.shape[1])
+    expected = expected[:, -len(window):]
+    for i, field in enumerate(('timestamp', 'open', 'high', 'low', 'close')):
+        assert np.array_equal(window.column(field), expected[i]), field
+    assert np.allclose(window.volumes, expected[5], rtol=1e-12)
+
+def test_cascade_matches_resample():
+    """Nạp 1m từng nến: mọi khung khớp resample, mỗi khung báo đóng đúng một lần mỗi nến của nó"""
+    base = _candles(1440)
+    engine = ConfluenceEngine(None, 'BTCUSDT', TIMEFRAMES, clock=lambda: 4e9)
+    assert engine.sources == {'5m': '1m', '15m': '5m', '1h': '15m', '4h': '1h'}
+    
+    closes = {tf: 0 for tf in TIMEFRAMES}
+    for i in range(len(base)):
+        for tf in engine.update(base.slice(max(i - 2, 0), i + 1)):  # chồng lấn như REST window
+            closes[tf] += 1
+    
+    assert closes == {tf: 1440 // MINUTES[tf] for tf in TIMEFRAMES}
+    for tf in TIMEFRAMES:
+        _assert_bars(engine.buffers[tf].window(), _resample(base, MINUTES[tf], 1440))
+    
+    # Nến 1m chưa đóng (close_time >= now) không được gộp
+    engine = ConfluenceEngine(None, 'BTCUSDT', TIMEFRAMES, clock=lambda: (START_MS + 300 * 60000) / 1000)
+    assert engine.update(base.slice(0, 400)) == TIMEFRAMES
+    assert engine.buffers['1m'].last_timestamp == START_MS + 299 * 60000
+    _assert_bars(engine.buffers['4h'].window(), _resample(base, 240, 300))
+
+def test_partial_bars_and_gap():
+    """Nến đầu thiếu phần đầu bị bỏ; mất nến 1m => xóa hết và chờ seed lại"""
+    base = _candles(600)
+    engine = ConfluenceEngine(None, 'BTCUSDT', TIMEFRAMES, clock=lambda: 4e9)
+    engine.needs_seed = False
+    engine.update(base.slice(3, 200))
+    assert engine.buffers['5m'].window().timestamps[0] == START_MS + 5 * 60000
+    assert engine.buffers['1h'].window().timestamps[0] == START_MS + 60 * 60000
+    assert not engine.needs_seed and engine.stats['gaps'] == 0
+    
+    assert engine.update(base.slice(250, 400))
+    assert engine.needs_seed and engine.stats['gaps'] == 1
+    assert engine.buffers['5m'].window().timestamps[0] == START_MS + 250 * 60000 and len(engine.buffers['5m']) == 30
+    assert len(engine.buffers['1h']) == 1 and not engine.signals
+
+def test_refresh_seed_and_weights():
+    """Seed qua REST mọi khung, sau đó chỉ fetch 1m; chỉ chấm khung có weight khi nến của nó đóng"""
+    base = _candles(3000)
+    now = {'index': 1500}
+    clock = lambda: (START_MS + now['index'] * 60000 + 30000) / 1000
+    
+    async def run():
+        server = KlineFixtureServer({})
+        
+        def publish():
+            server.klines = {('BTCUSDT', tf): _rows(base, tf, now['index']) for tf in TIMEFRAMES}
+            server._open_times.clear()
+        
+        publish()
+        collector = DataCollector()
+        collector.api_endpoints['binance'] = await server.start()
+        collector.cache.clock = clock
+        engine = ConfluenceEngine(collector, 'BTCUSDT', TIMEFRAMES, weights={'1h': 1.0, '4h': 0}, clock=clock)
+        try:
+            results = [await engine.refresh()]
+            seeded = {tf: engine.buffers[tf].window().copy() for tf in TIMEFRAMES}
+            requests = len(server.requests)
+            for _ in range(60):
+                now['index'] += 1
+                publish()
+                results.append(await engine.refresh())
+            stepped = {tf: engine.buffers[tf].window().copy() for tf in TIMEFRAMES}
+            
+            # Nến 1h tự gộp cho cùng signal như generate_signals trên nến 1h của exchange
+            candles = CandleWindow(_resample(base, 60, 1560)[:, -100:])
+            levels = collector.calculate_support_resistance(candles)
+            expected = await SignalGenerator().generate_signals({
+                'price': candles.closes.item(-1),
+                **await collector.calculate_technical_indicators(candles),
+                'support_levels': levels['support'], 'resistance_levels': levels['resistance'],
+                'candles': candles
+            })
+            
+            now['index'] += 200  # mất hơn một window 1m => seed lại
+            publish()
+            await engine.refresh()
+            return engine, results, seeded, stepped, server.requests, requests, expected
+        finally:
+            await collector.close()
+            await server.stop()
+    
+    engine, results, seeded, stepped, requests, seed_requests, expected = asyncio.run(run())
+    
+    assert seed_requests == len(TIMEFRAMES)
+    assert {query['interval'] for query in requests[seed_requests:-len(TIMEFRAMES)]} == {'1m'}
+    for tf in TIMEFRAMES:
+        _assert_bars(stepped[tf], _resample(base, MINUTES[tf], 1560))
+        assert len(seeded[tf]) == min(100, 1500 // MINUTES[tf])
+    assert engine.buffers['1h'].last_timestamp == START_MS + 28 * 3600000
+    
+    # Chấm 1h lúc seed và khi nến 25h đóng; 4h weight 0 không bao giờ chấm
+    assert engine.stats['evaluations'] == {'1m': 0, '5m': 0, '15m': 0, '1h': 3, '4h': 0}
+    assert engine.stats['seeds'] == 2 and engine.stats['gaps'] == 1
+    signal = results[-1]['timeframes']['1h']
+    assert signal['bar_time'] == START_MS + 1500 * 60000
+    assert (signal['action'], signal['confidence']) == (expected['action'], expected['confidence'])
+    assert results[-1]['score'] == signal['score'] and results[-1]['action'] == signal['action']
+    assert results[-1]['confidence'] == min(abs(signal['score'] - 0.5) * 2, 1.0)
+
+def test_combine_weights():
+    """Score kết hợp là trung bình theo weight; khung không có trong weights bị bỏ"""
+    engine = ConfluenceEngine(None, 'BTCUSDT', ['1m', '1h', '1d', '3m'], weights={'1h': 3, '1d': 1})
+    assert engine.timeframes == ['1m', '3m', '1h', '1d'] and engine.sources['1h'] == '3m'
+    assert engine.combine() is None
+    
+    engine.signals = {
+        '1m': {'action': 'SELL', 'score': 0.0, 'confidence': 1.0},
+        '1h': {'action': 'BUY', 'score': 0.9, 'confidence': 0.8},
+        '1d': {'action': 'HOLD', 'score': 0.5, 'confidence': 0.0}
+    }
+    result = engine.combine()
+    assert result['score'] == (0.9 * 3 + 0.5) / 4
+    assert result['action'] == 'BUY' and result['key_indicators'] == ['1h: BUY']
+    assert set(result['timeframes']) == {'1h', '1d'}  # 1m weight 0
+
+if __name__ == "__main__":
+    CANDLES = 100_000
+    STEPS = 2000
+    
+    base = _candles(CANDLES)
+    engine = ConfluenceEngine(None, 'BTCUSDT', list(MINUTES), clock=lambda: 4e9)
+    started = time.perf_counter()
+    engine.update(base)
+    bulk_ms = (time.perf_counter() - started) * 1000
+    
+    class _Collector(DataCollector):
+        async def get_candles(self, symbol='BTCUSDT', interval='1h', limit=100, use_cache=True):
+            return base.slice(max(position - limit, 0), position)
+    
+    collector = _Collector()
+    engine = ConfluenceEngine(collector, 'BTCUSDT', list(MINUTES), weights={tf: 1.0 for tf in MINUTES}, clock=lambda: 4e9)
+    engine.needs_seed = False
+    position = 1440 * 10
+    engine.update(base.slice(0, position))
+    
+    async def incremental():
+        global position
+        for _ in range(STEPS):
+            position += 1
+            await engine.refresh()
+    
+    async def every_timeframe():
+        for _ in range(STEPS // 10):
+            await engine.evaluate(list(MINUTES))
+    
+    started = time.perf_counter()
+    asyncio.run(incremental())
+    incremental_ms = (time.perf_counter() - started) / STEPS * 1000
+    evaluations = dict(engine.stats['evaluations'])
+    started = time.perf_counter()
+    asyncio.run(every_timeframe())
+    full_ms = (time.perf_counter() - started) / (STEPS // 10) * 1000
+    asyncio.run(collector.close())
+    
+    print(f"🧭 CONFLUENCE - {', '.join(MINUTES)}")
+    print("=" * 40)
+    print(f"   Gộp {CANDLES:,} nến 1m vào mọi khung: {bulk_ms:.1f}ms")
+    print(f"   refresh mỗi nến 1m (chỉ chấm khung vừa đóng): {incremental_ms:.2f}ms")
+    print(f"   Chấm lại mọi khung mỗi cycle: {full_ms:.2f}ms ({full_ms / incremental_ms:.1f}x)")
+    print(f"   Lần chấm trong {STEPS} nến 1m: {evaluations}")
@@ -0,0 +1,92 @@
+"""
+Kiểm tra shared HTTP session của DataCollector - chạy offline với stub server
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.collector import DataCollector
+from test_helpers import stub_collector
+
+KLINE = [1700000000000, "45000", "45100", "44900", "45050", "12.5", 1700003599999, "562500", 100, "6", "270000", "0"]
+
+def _routes(depth_limits: list = None):
+    """Handlers trả về response giống Binance REST API (depth_limits ghi lại limit của /depth)"""
+    async def ping(request):
+        return web.json_response({})
+    
+    async def price(request):
+        return web.json_response({'symbol': 'BTCUSDT', 'price': '45050.00'})
+    
+    async def ticker(request):
+        return web.json_response({
+            'highPrice': '46000', 'lowPrice': '44000', 'volume': '1000',
+            'quoteVolume': '45000000', 'priceChange': '500', 'priceChangePercent': '1.12'
+        })
+    
+    async def depth(request):
+        if depth_limits is not None:
+            depth_limits.append(int(request.query['limit']))
+        return web.json_response({'lastUpdateId': 1, 'bids': [['45040', '1.0']], 'asks': [['45060', '2.0']]})
+    
+    async def trades(request):
+        return web.json_response([{'price': '45050', 'qty': '0.1', 'time': 1700000000000, 'isBuyerMaker': True}])
+    
+    async def klines(request):
+        return web.json_response([KLINE] * int(request.query.get('limit', 100)))
+    
+    return {'/ping': ping, '/ticker/price': price, '/ticker/24hr': ticker, '/depth': depth,
+            '/trades': trades, '/klines': klines}
+
+async def _run_cycles(cycles: int = 3):
+    depth_limits = []
+    async with stub_collector(_routes(depth_limits)) as collector:
+        assert await collector.initialize()
+        for _ in range(cycles):
+            collector.cache.clear()
+            market_data = await collector.get_market_data('BTCUSDT')
+            assert market_data['price'] == 45050.0
+            assert market_data['liquidity']['bid_depth'] == 45040.0
+        # Sổ lệnh đủ level cho depth ±ORDERBOOK_DEPTH_PERCENT, không phải mẫu 10 level
+        assert depth_limits == [collector.settings.ORDERBOOK_SNAPSHOT_LIMIT] * cycles
+        return collector.get_connection_stats()
+
+def test_connections_are_reused_across_cycles():
+    """Nhiều cycle get_market_data dùng lại connection thay vì handshake mới"""
+    stats = asyncio.run(_run_cycles(3))
+    
+    # ping + 3 cycles x 5 requests
+    assert stats['requests'] == 16
+    # Tối đa 5 request song song trong một cycle => tối đa 5 connection
+    assert stats['handshakes'] <= 5
+    assert stats['connections_reused'] >= 11
+    assert stats['connections_reused'] + stats['handshakes'] == stats['requests']
+
+def test_close_releases_session():
+    """close() đóng session và cho phép mở lại"""
+    async def run():
+        collector = DataCollector()
+        session = await collector._get_session()
+        await collector.close()
+        assert session.closed
+        assert collector.session is None
+        
+        reopened = await collector._get_session()
+        assert not reopened.closed
+        await collector.close()
+    
+    asyncio.run(run())
+
+if __name__ == "__main__":
+    stats = asyncio.run(_run_cycles(3))
+    print("🔌 CONNECTION POOL STATS")
+    print("=" * 40)
+    for key, value in stats.items():
+        print(f"   {key}: {value}")
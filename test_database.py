@@ -0,0 +1,176 @@
+"""
+Kiểm tra DatabaseManager - SQLite WAL, thread ghi với group commit, reader riêng
+"""
+
+import asyncio
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager
+from test_helpers import with_database
+
+def _trade(i: int):
+    return {
+        'timestamp': datetime.now().isoformat(),
+        'symbol': 'BTC/USDT',
+        'side': 'buy' if i % 2 == 0 else 'sell',
+        'amount': 0.01,
+        'price': 45000 + i,
+        'cost': 450 + i / 100,
+        'pnl': (i % 5) - 2,
+        'status': 'closed'
+    }
+
+def test_round_trip_in_wal_mode():
+    """Ghi qua writer, đọc qua reader connection, database ở chế độ WAL"""
+    async def scenario(db):
+        await db.save_trade(_trade(0))
+        now = datetime.now().isoformat()
+        await db.save_signal({'timestamp': now, 'action': 'BUY', 'confidence': 0.8, 'entry_price': 45000})
+        await db.save_market_data({'timestamp': now, 'symbol': 'BTCUSDT', 'price': 45000, 'candles': [1, 2, 3], 'spread': 0.5})
+        await db.backend.writer.flush()
+        
+        trades = await db.get_trades()
+        assert len(trades) == 1 and trades[0]['price'] == 45000
+        assert (await db.get_signals())[0]['action'] == 'BUY'
+        assert (await db.get_performance_stats())['total_trades'] == 1
+        
+        mode = await db.backend.read(lambda connection: connection.execute('PRAGMA journal_mode').fetchone()[0])
+        assert mode == 'wal'
+        extra = await db.backend.read(lambda connection: connection.execute('SELECT indicators FROM market_data').fetchone()[0])
+        assert 'candles' not in extra and 'spread' in extra
+    
+    asyncio.run(with_database(scenario))
+
+def test_concurrent_writes_are_group_committed():
+    """Nhiều coroutine ghi cùng lúc => ít transaction hơn số insert"""
+    async def scenario(db):
+        batches_before = db.backend.writer.stats['batches']
+        await asyncio.gather(*(db.save_trade(_trade(i)) for i in range(200)))
+        
+        stats = await db.get_performance_stats()
+        assert stats['total_trades'] == 200
+        assert stats['winning_trades'] == 80 and stats['losing_trades'] == 80
+        assert db.backend.writer.stats['batches'] - batches_before < 200
+        assert db.backend.writer.stats['max_batch'] > 1
+    
+    asyncio.run(with_database(scenario))
+
+def test_failed_write_does_not_drop_batch():
+    """Một câu lệnh lỗi trong batch chỉ làm hỏng chính nó"""
+    async def scenario(db):
+        results = await asyncio.gather(
+            db.backend.writer.execute("INSERT INTO trades (timestamp, symbol, side, amount, price, cost, status) "
+                              "VALUES ('t', 'BTC', 'buy', 1, 1, 1, 'open')"),
+            db.backend.writer.execute("INSERT INTO trades (symbol) VALUES (?)", ('BTC',)),  # Thiếu cột NOT NULL
+            db.backend.writer.execute("INSERT INTO trades (timestamp, symbol, side, amount, price, cost, status) "
+                              "VALUES ('t', 'ETH', 'buy', 1, 1, 1, 'open')"),
+            return_exceptions=True
+        )
+        assert isinstance(results[1], sqlite3.IntegrityError)
+        assert isinstance(results[0], int) and isinstance(results[2], int)
+        assert sorted(trade['symbol'] for trade in await db.get_trades()) == ['BTC', 'ETH']
+        assert db.backend.writer.stats['errors'] == 1
+    
+    asyncio.run(with_database(scenario))
+
+def test_close_flushes_pending_writes():
+    """save_signal không chờ commit, nhưng close() vẫn ghi đủ"""
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / 'bot.db'
+        
+        async def write():
+            db = DatabaseManager(path)
+            await db.initialize()
+            for i in range(50):
+                await db.save_signal({'timestamp': datetime.now().isoformat(), 'action': 'HOLD', 'confidence': i / 100})
+            await db.close()
+            assert not db.backend.writer.is_running
+        
+        asyncio.run(write())
+        connection = sqlite3.connect(path)
+        assert connection.execute('SELECT COUNT(*) FROM signals').fetchone()[0] == 50
+        connection.close()
+
+if __name__ == "__main__":
+    CYCLES = 100
+    ROWS_PER_CYCLE = 20  # signal + market data cho nhiều symbol mỗi cycle
+    INSERTS = CYCLES * ROWS_PER_CYCLE
+    SQL = ("INSERT INTO trades (timestamp, symbol, side, amount, price, cost, status) "
+           "VALUES (?, 'BTC/USDT', 'buy', 0.01, ?, 450, 'closed')")
+    
+    async def measure(write):
+        """Thời gian insert + p99 độ trễ của một task tick mỗi 1ms trên event loop"""
+        lags = []
+        running = True
+        
+        async def ticker():
+            while running:
+                before = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - before - 0.001)
+        
+        task = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        started = time.perf_counter()
+        await write()
+        elapsed = time.perf_counter() - started
+        running = False
+        await task
+        return INSERTS / elapsed, statistics.quantiles(lags, n=100)[98] * 1000
+    
+    async def legacy(path):
+        # Cách cũ: sqlite3 chặn ngay trên event loop, commit mỗi insert
+        connection = sqlite3.connect(path)
+        connection.execute("CREATE TABLE trades (id INTEGER PRIMARY KEY, timestamp TEXT, symbol TEXT, side TEXT, "
+                           "amount REAL, price REAL, cost REAL, status TEXT)")
+        connection.commit()
+        
+        async def write():
+            for cycle in range(CYCLES):
+                for i in range(ROWS_PER_CYCLE):
+                    connection.execute(SQL, (str(cycle), 45000 + i))
+                    connection.commit()
+                await asyncio.sleep(0.001)
+        
+        try:
+            return await measure(write)
+        finally:
+            connection.close()
+    
+    async def writer(path):
+        db = DatabaseManager(path)
+        await db.initialize()
+        
+        async def write():
+            # Ghi không chờ commit (như save_signal / save_market_data), flush ở cuối
+            for cycle in range(CYCLES):
+                for i in range(ROWS_PER_CYCLE):
+                    await db.backend.writer.execute(SQL, (str(cycle), 45000 + i), wait=False)
+                await asyncio.sleep(0.001)
+            await db.backend.writer.flush()
+        
+        try:
+            result = await measure(write)
+            return result + (db.backend.writer.metrics()['avg_batch'],)
+        finally:
+            await db.close()
+    
+    with tempfile.TemporaryDirectory() as root:
+        legacy_rate, legacy_p99 = asyncio.run(legacy(Path(root) / 'legacy.db'))
+        writer_rate, writer_p99, avg_batch = asyncio.run(writer(Path(root) / 'writer.db'))
+    
+    print(f"🗄️ DATABASE - {INSERTS:,} inserts")
+    print("=" * 40)
+    print(f"   Cũ (commit mỗi insert trên loop): {legacy_rate:,.0f} inserts/s | loop p99 lag {legacy_p99:.2f} ms")
+    print(f"   SQLiteWriter (WAL, group commit): {writer_rate:,.0f} inserts/s | loop p99 lag {writer_p99:.2f} ms")
+    print(f"   Batch trung bình: {avg_batch:.1f} inserts/commit")
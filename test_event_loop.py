@@ -0,0 +1,235 @@
+"""
+Kiểm tra EventBus + MarketEventDetector - trading loop hướng sự kiện thay cho sleep 30 giây
+"""
+
+import asyncio
+import logging
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.stream import BinanceStream
+from trading.market_events import (
+    TOPIC_BOOK_IMBALANCE, TOPIC_CANDLE_CLOSED, TOPIC_LEVEL_CROSSED, MarketEventDetector
+)
+from utils.event_bus import EventBus
+
+START_MS = 1_704_067_200_000
+
+logging.getLogger('utils.event_bus').setLevel(logging.CRITICAL)
+
+def _kline(open_time: int, close: float) -> dict:
+    return {'stream': 'btcusdt@kline_1m', 'data': {'e': 'kline', 'E': open_time, 'k': {
+        't': open_time, 'T': open_time + 59999, 'o': '100', 'c': str(close), 'h': '110', 'l': '90',
+        'v': '1', 'n': 1, 'x': False, 'q': '100'
+    }}}
+
+def _trade(trade_id: int, price: float) -> dict:
+    return {'stream': 'btcusdt@aggTrade', 'data': {
+        'e': 'aggTrade', 'E': START_MS, 'a': trade_id, 'p': str(price), 'q': '0.1', 'T': START_MS + trade_id, 'm': False
+    }}
+
+def _depth(update_id: int, bids: list, asks: list) -> dict:
+    return {'stream': 'btcusdt@depth@100ms', 'data': {
+        'e': 'depthUpdate', 'E': START_MS, 'U': update_id, 'u': update_id, 'b': bids, 'a': asks
+    }}
+
+async def _polling_latency(event_times: list, interval: float) -> list:
+    """Loop cũ: cycle rồi sleep(interval) - latency từ lúc event xảy ra tới cycle kế tiếp"""
+    started = time.perf_counter()
+    latencies, pending = [], list(event_times)
+    while pending:
+        now = time.perf_counter() - started
+        while pending and pending[0] <= now:
+            latencies.append(now - pending.pop(0))
+        await asyncio.sleep(interval)
+    return latencies
+
+async def _event_latency(event_times: list, debounce: float = 0.0) -> list:
+    """Loop mới: event publish -> handler của EventBus"""
+    bus = EventBus()
+    latencies = []
+    
+    async def handler(events):
+        latencies.append(time.perf_counter() - events[TOPIC_LEVEL_CROSSED].data)
+    
+    subscription = bus.subscribe(TOPIC_LEVEL_CROSSED, handler, debounce=debounce)
+    await bus.start()
+    started = time.perf_counter()
+    for at in event_times:
+        await asyncio.sleep(max(at - (time.perf_counter() - started), 0))
+        bus.publish(TOPIC_LEVEL_CROSSED, time.perf_counter())
+    await asyncio.sleep(debounce + 0.05)
+    await bus.stop()
+    assert subscription.stats['runs'] == len(event_times)
+    return latencies
+
+def test_burst_is_coalesced():
+    """10k tick dồn dập trong lúc handler chạy => vài lần chạy, mỗi topic nhận bản mới nhất"""
+    async def run():
+        bus = EventBus()
+        calls = []
+        
+        async def handler(events):
+            calls.append({topic: event.data for topic, event in events.items()})
+            await asyncio.sleep(0.05)
+        
+        subscription = bus.subscribe(['tick', 'candle'], handler)
+        await bus.start()
+        bus.publish('tick', -1)
+        await asyncio.sleep(0.01)  # handler đang chạy
+        for i in range(10_000):
+            bus.publish('tick', i)
+        bus.publish('candle', 'closed')
+        bus.publish('unknown')
+        await asyncio.sleep(0.15)
+        await bus.stop()
+        return calls, subscription.stats, bus.stats
+    
+    calls, stats, bus_stats = asyncio.run(run())
+    assert calls == [{'tick': -1}, {'tick': 9999, 'candle': 'closed'}]
+    assert stats['events'] == 10_002 and stats['coalesced'] == 9_999 and stats['runs'] == 2
+    assert bus_stats == {'published': 10_003, 'dropped': 1}
+
+def test_debounce_and_errors():
+    """Event đến trong cửa sổ debounce gộp vào một lần chạy; handler lỗi không dừng subscription"""
+    async def run():
+        bus = EventBus()
+        calls = []
+        
+        async def handler(events):
+            calls.append(events['price'].data)
+            if len(calls) == 1:
+                raise ValueError("boom")
+        
+        subscription = bus.subscribe('price', handler, debounce=0.05)
+        await bus.start()
+        for price in (1, 2, 3):
+            bus.publish('price', price)
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        bus.publish('price', 4)
+        await asyncio.sleep(0.1)
+        await bus.stop()
+        return calls, subscription.stats
+    
+    calls, stats = asyncio.run(run())
+    assert calls == [3, 4]
+    assert stats['runs'] == 2 and stats['errors'] == 1 and stats['coalesced'] == 2
+    assert stats['max_latency_ms'] >= 50  # tính từ event đầu tiên được gộp
+
+def test_detector_publishes_on_zone_change():
+    """Chỉ publish khi nến đóng, giá sang vùng S/R khác hoặc imbalance đổi phía - tick trong vùng thì không"""
+    bus = EventBus()
+    published = []
+    bus.publish = lambda topic, data=None: published.append((topic, data))
+    detector = MarketEventDetector(bus, imbalance_threshold=0.3, depth_percent=5)
+    stream = BinanceStream(None, ['BTCUSDT'], interval='1m', on_update=detector.on_update, on_depth=detector.on_depth)
+    state = stream.get_state('BTCUSDT')
+    state.book.load_snapshot(1, [['99', '5']], [['101', '5']])
+    detector.set_levels('btcusdt', [105, 95, 105])
+    
+    async def feed(messages):
+        for message in messages:
+            await stream._handle_message(message)
+    
+    asyncio.run(feed([_kline(START_MS, 100), _trade(1, 101), _trade(2, 104), _trade(3, 106), _trade(4, 107)]))
+    assert published == [(TOPIC_LEVEL_CROSSED, {'symbol': 'BTCUSDT', 'level': 105.0, 'price': 106.0, 'direction': 'up'})]
+    
+    published.clear()
+    asyncio.run(feed([_trade(5, 94), _kline(START_MS, 94), _kline(START_MS + 60000, 94)]))
+    assert [topic for topic, _ in published] == [TOPIC_LEVEL_CROSSED, TOPIC_CANDLE_CLOSED]
+    assert published[0][1]['level'] == 95.0 and published[0][1]['direction'] == 'down'
+    assert published[1][1] == {'symbol': 'BTCUSDT', 'interval': '1m', 'timestamp': START_MS}
+    
+    # Imbalance xét ngay ở depth diff, trade sau đó không publish lại
+    published.clear()
+    asyncio.run(feed([_depth(2, [['98', '20']], []), _trade(6, 94), _trade(7, 94)]))
+    assert published == [(TOPIC_BOOK_IMBALANCE, {'symbol': 'BTCUSDT', 'imbalance': published[0][1]['imbalance'], 'side': 1})]
+    assert published[0][1]['imbalance'] > 0.3
+    assert detector.stats[TOPIC_LEVEL_CROSSED] == 2 and detector.stats['updates'] == 10
+    assert detector.stats['depth_updates'] == 1
+
+def test_depth_diffs_alone_move_imbalance():
+    """Chỉ có depth diff (giá không đổi) vẫn publish book_imbalance; on_update vẫn không nhận depth"""
+    bus = EventBus()
+    published = []
+    bus.publish = lambda topic, data=None: published.append((topic, data))
+    detector = MarketEventDetector(bus, imbalance_threshold=0.3, depth_percent=5)
+    updates = []
+    stream = BinanceStream(None, ['BTCUSDT'], interval='1m', on_update=updates.append, on_depth=detector.on_depth)
+    stream.get_state('BTCUSDT').book.load_snapshot(1, [['99', '5']], [['101', '5']])
+    
+    async def feed(messages):
+        for message in messages:
+            await stream._handle_message(message)
+    
+    asyncio.run(feed([_depth(2, [['98', '20']], []), _depth(3, [['98', '25']], [])]))
+    assert [(topic, data['side']) for topic, data in published] == [(TOPIC_BOOK_IMBALANCE, 1)]
+    
+    asyncio.run(feed([_depth(4, [], [['102', '30']])]))
+    assert [(topic, data['side']) for topic, data in published][1:] == [(TOPIC_BOOK_IMBALANCE, 0)]
+    asyncio.run(feed([_depth(5, [['98', '0']], [])]))
+    assert [(topic, data['side']) for topic, data in published][2:] == [(TOPIC_BOOK_IMBALANCE, -1)]
+    assert updates == [] and detector.stats['depth_updates'] == 4 and detector.stats['updates'] == 0
+
+def test_event_latency_beats_polling():
+    """Cùng chuỗi event: handler chạy ngay khi publish thay vì chờ tới lượt polling kế tiếp"""
+    rng = random.Random(3)
+    event_times = sorted(rng.uniform(0, 0.6) for _ in range(10))
+    event_times = [at + i * 0.02 for i, at in enumerate(event_times)]  # cách nhau đủ để không bị gộp
+    
+    polling = asyncio.run(_polling_latency(event_times, 0.1))
+    events = asyncio.run(_event_latency(event_times))
+    assert len(polling) == len(events) == 10
+    assert sum(events) / len(events) < sum(polling) / len(polling) / 4
+
+if __name__ == "__main__":
+    EVENTS = 100
+    POLL_INTERVAL = 0.5  # thu nhỏ của sleep(30): latency tỉ lệ thuận với interval
+    DEBOUNCE = 0.01
+    
+    rng = random.Random(1)
+    event_times = []
+    at = 0.0
+    for _ in range(EVENTS):
+        at += rng.expovariate(1 / 0.1) + DEBOUNCE * 2
+        event_times.append(at)
+    
+    polling = sorted(asyncio.run(_polling_latency(event_times, POLL_INTERVAL)))
+    events = sorted(asyncio.run(_event_latency(event_times, DEBOUNCE)))
+    
+    async def burst():
+        bus = EventBus()
+        
+        async def handler(events):
+            await asyncio.sleep(0.001)
+        
+        subscription = bus.subscribe('tick', handler)
+        await bus.start()
+        started = time.perf_counter()
+        for i in range(100_000):
+            bus.publish('tick', i)
+            if i % 1000 == 0:
+                await asyncio.sleep(0)
+        elapsed = time.perf_counter() - started
+        await asyncio.sleep(0.01)
+        await bus.stop()
+        return elapsed, subscription.stats
+    
+    elapsed, stats = asyncio.run(burst())
+    
+    print(f"⚡ EVENT LOOP - {EVENTS} market events")
+    print("=" * 40)
+    print(f"   Polling sleep({POLL_INTERVAL}s): latency TB {sum(polling) / EVENTS * 1000:.0f}ms, "
+          f"p95 {polling[int(EVENTS * 0.95)] * 1000:.0f}ms")
+    print(f"   EventBus (debounce {DEBOUNCE * 1000:.0f}ms): latency TB {sum(events) / EVENTS * 1000:.1f}ms, "
+          f"p95 {events[int(EVENTS * 0.95)] * 1000:.1f}ms")
+    print(f"   Với sleep(30) thật: TB ~{30 / 2:.0f}s => ~{sum(events) / EVENTS * 1000:.0f}ms")
+    print(f"   Burst 100k tick: {100_000 / elapsed:,.0f} publish/s, {stats['runs']} lần chạy handler "
+          f"({stats['coalesced']:,} tick được gộp)")
@@ -0,0 +1,69 @@
+"""
+Helper dùng chung cho các test - database tạm và stub Binance REST
+"""
+
+import sys
+import tempfile
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Dict
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.collector import DataCollector
+from data.database import DatabaseManager
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+async def with_database(scenario, path: Path = None):
+    """
+    Chạy scenario(db) trên DatabaseManager đã initialize, đóng db sau đó
+    
+    Không có path => file tạm bot.db, xoá cùng thư mục tạm khi xong.
+    """
+    if path is None:
+        with tempfile.TemporaryDirectory() as root:
+            return await with_database(scenario, Path(root) / 'bot.db')
+    
+    db = DatabaseManager(path)
+    assert await db.initialize()
+    try:
+        return await scenario(db)
+    finally:
+        await db.close()
+
+@asynccontextmanager
+async def stub_binance(routes: Dict[str, Handler]):
+    """
+    Stub server cho Binance REST trên cổng ngẫu nhiên, yield base URL (.../api/v3)
+    
+    routes: path dưới /api/v3 (ví dụ '/klines', '/{tail:.*}') -> handler GET
+    """
+    app = web.Application()
+    for path, handler in routes.items():
+        app.router.add_get(f'/api/v3{path}', handler)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    try:
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        yield f"http://127.0.0.1:{port}/api/v3"
+    finally:
+        await runner.cleanup()
+
+@asynccontextmanager
+async def stub_collector(routes: Dict[str, Handler]):
+    """DataCollector trỏ vào stub_binance(routes); đóng collector rồi tới server"""
+    async with stub_binance(routes) as base_url:
+        collector = DataCollector()
+        collector.api_endpoints['binance'] = base_url
+        try:
+            yield collector
+        finally:
+            await collector.close()
@@ -0,0 +1,142 @@
+"""
+Kiểm tra HistoryLoader - tải klines lịch sử theo trang, resume sau khi bị dừng
+"""
+
+import asyncio
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.collector import DataCollector
+from data.history import HistoryLoader, HistoryStore
+from data.replay_server import KlineFixtureServer
+from utils.rate_limiter import RateLimiter
+
+HOUR_MS = 3_600_000
+LISTED_MS = 1_704_067_200_000  # 2024-01-01 UTC
+CANDLES = 6000  # 6 trang
+
+def _fixture_rows(count: int = CANDLES):
+    """Klines 1h theo format response /klines"""
+    rows = []
+    for i in range(count):
+        open_time = LISTED_MS + i * HOUR_MS
+        price = 40000 + (i % 500)
+        rows.append([open_time, f"{price}.00", f"{price + 20}.00", f"{price - 20}.00", f"{price + 5}.00",
+                     "12.5", open_time + HOUR_MS - 1, "500000.0", 300 + i % 7, "6.0", "240000.0", "0"])
+    return rows
+
+async def _with_loader(scenario, **server_options):
+    rows = _fixture_rows()
+    server = KlineFixtureServer({('BTCUSDT', '1h'): rows}, **server_options)
+    base_url = await server.start()
+    collector = DataCollector()
+    collector.api_endpoints['binance'] = base_url
+    collector.rate_limiter = RateLimiter(6000, safety_margin=0)
+    
+    try:
+        with tempfile.TemporaryDirectory() as root:
+            loader = HistoryLoader(collector, HistoryStore(root), concurrency=3)
+            return await scenario(loader, server, rows)
+    finally:
+        await collector.close()
+        await server.stop()
+
+def _assert_matches_fixture(candles, rows):
+    expected = np.array([row[:9] for row in rows], dtype=np.float64).T
+    assert len(candles) == len(rows)
+    assert np.array_equal(candles.timestamps, expected[0])
+    assert np.array_equal(candles.closes, expected[4])
+    assert np.array_equal(candles.column('trades_count'), expected[8])
+
+def test_pages_backwards_concurrently():
+    """Tải ngược từ mới về cũ, nhiều trang song song, không trùng / thiếu candle"""
+    async def scenario(loader, server, rows):
+        end_ms = rows[-1][0]
+        result = await loader.load('BTCUSDT', '1h', LISTED_MS, end_ms)
+        assert result == {'pages': 6, 'candles': CANDLES, 'failed_pages': 0}
+        
+        # Trang đầu tiên là trang mới nhất, mỗi trang đủ 1000 candles
+        first = server.requests[0]
+        assert int(first['endTime']) == end_ms and first['limit'] == '1000'
+        assert 1 < server.max_in_flight <= 3
+        assert loader.collector.rate_limiter.metrics()['weight_consumed'] == 6 * 2
+        
+        _assert_matches_fixture(loader.store.load('BTCUSDT', '1h'), rows)
+        assert len(loader.store.segments('BTCUSDT', '1h')) == 1  # Đã compact
+        
+        # Đã đủ => không gọi thêm request
+        server.requests.clear()
+        assert (await loader.load('BTCUSDT', '1h', LISTED_MS, end_ms))['pages'] == 0
+        assert server.requests == []
+        
+        # Khoảng con
+        window = loader.store.load('BTCUSDT', '1h', LISTED_MS + 10 * HOUR_MS, LISTED_MS + 19 * HOUR_MS)
+        assert window.timestamps.tolist() == [LISTED_MS + i * HOUR_MS for i in range(10, 20)]
+    
+    asyncio.run(_with_loader(scenario, delay=0.02))
+
+def test_resume_after_interruption():
+    """Trang lỗi giữa chừng không được ghi; lần chạy sau chỉ tải các trang còn thiếu"""
+    async def scenario(loader, server, rows):
+        end_ms = rows[-1][0]
+        start_ms = LISTED_MS - 30 * 24 * HOUR_MS  # Trước ngày niêm yết => trang rỗng
+        
+        first = await loader.load('BTCUSDT', '1h', start_ms, end_ms)
+        assert first['pages'] == 2 and first['failed_pages'] == 5
+        stored = len(loader.store.load('BTCUSDT', '1h'))
+        assert stored == 2000
+        
+        server.fail_after = None
+        server.requests.clear()
+        second = await loader.load('BTCUSDT', '1h', start_ms, end_ms)
+        assert second == {'pages': 5, 'candles': CANDLES - stored, 'failed_pages': 0}
+        assert len(server.requests) == 5
+        
+        _assert_matches_fixture(loader.store.load('BTCUSDT', '1h'), rows)
+        
+        # Khoảng trước ngày niêm yết đã ghi nhận => không tải lại
+        server.requests.clear()
+        await loader.load('BTCUSDT', '1h', start_ms, end_ms)
+        assert server.requests == []
+    
+    asyncio.run(_with_loader(scenario, fail_after=2))
+
+if __name__ == "__main__":
+    async def year_of_minutes():
+        step = 60_000
+        end = (int(time.time() * 1000) // step - 1) * step
+        start = end - 365 * 24 * 60 * step
+        rows = [[t, "1", "2", "0.5", "1.5", "10", t + step - 1, "15", 3, "5", "7", "0"]
+                for t in range(start, end + step, step)]
+        server = KlineFixtureServer({('BTCUSDT', '1m'): rows})
+        base_url = await server.start()
+        collector = DataCollector()
+        collector.api_endpoints['binance'] = base_url
+        collector.rate_limiter = RateLimiter(10 ** 9, safety_margin=0)
+        try:
+            with tempfile.TemporaryDirectory() as root:
+                loader = HistoryLoader(collector, HistoryStore(root), concurrency=8)
+                started = time.perf_counter()
+                result = await loader.load('BTCUSDT', '1m', start, end)
+                elapsed = time.perf_counter() - started
+                started = time.perf_counter()
+                candles = loader.store.load('BTCUSDT', '1m')
+                read_ms = (time.perf_counter() - started) * 1000
+                return result, elapsed, len(candles), read_ms
+        finally:
+            await collector.close()
+            await server.stop()
+    
+    result, elapsed, count, read_ms = asyncio.run(year_of_minutes())
+    print("📥 HISTORY LOADER - 1 năm klines 1m từ fixture server")
+    print("=" * 40)
+    print(f"   Trang: {result['pages']} | Candles: {count:,}")
+    print(f"   Tải + ghi: {elapsed:.2f}s | Đọc lại: {read_ms:.0f} ms")
@@ -0,0 +1,202 @@
+"""
+Kiểm tra database migrations - epoch-ms timestamps, index, xoá dữ liệu cũ theo chunk
+"""
+
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager
+from data.migrations import LATEST_VERSION, MIGRATIONS, schema_version, to_epoch_ms
+from test_helpers import with_database
+
+DAY_MS = 86_400_000
+
+def _legacy_database(path: Path):
+    """Database tạo bởi phiên bản cũ: schema v1, timestamp TEXT, user_version = 0"""
+    connection = sqlite3.connect(path)
+    MIGRATIONS[0][2](connection)
+    connection.executemany(
+        "INSERT INTO trades (timestamp, symbol, side, amount, price, cost, pnl, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+        [('2024-03-01T10:00:00.500000', 'BTC/USDT', 'buy', 0.1, 60000, 6000, 0, 'closed'),
+         ('2024-03-02T09:30:00', 'BTC/USDT', 'sell', 0.1, 61000, 6100, 100, 'closed')]
+    )
+    connection.execute("INSERT INTO market_data (timestamp, symbol, price) VALUES ('2024-03-01T10:00:00', 'BTCUSDT', 60000)")
+    connection.commit()
+    connection.close()
+
+def test_migrates_legacy_database():
+    """Database cũ được nâng lên schema mới, timestamp ISO => epoch ms"""
+    async def scenario(db):
+        version = await db.backend.read(schema_version)
+        assert version == LATEST_VERSION
+        
+        trades = await db.get_trades()
+        assert [trade['timestamp'] for trade in trades] == [
+            to_epoch_ms('2024-03-02T09:30:00'), to_epoch_ms('2024-03-01T10:00:00.500000')
+        ]
+        assert trades[1]['timestamp'] % 1000 == 500
+        assert (await db.get_performance_stats())['total_pnl'] == 100
+        
+        market = await db.get_market_data('BTCUSDT')
+        assert market[0]['timestamp'] == to_epoch_ms(datetime(2024, 3, 1, 10))
+        
+        # Record mới nhận datetime / ISO / số đều lưu thành epoch ms
+        await db.save_trade({'timestamp': datetime(2024, 3, 3), 'symbol': 'BTC/USDT', 'side': 'buy',
+                             'amount': 0.1, 'price': 62000, 'cost': 6200, 'status': 'open'})
+        assert (await db.get_trades(limit=1))[0]['timestamp'] == to_epoch_ms(datetime(2024, 3, 3))
+    
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / 'bot.db'
+        _legacy_database(path)
+        asyncio.run(with_database(scenario, path))
+        
+        # Mở lại: không chạy migration lần nữa
+        asyncio.run(with_database(lambda db: db.get_trades(), path))
+        connection = sqlite3.connect(path)
+        assert schema_version(connection) == LATEST_VERSION
+        assert connection.execute('SELECT COUNT(*) FROM trades').fetchone()[0] == 3
+        connection.close()
+
+def test_queries_use_timestamp_indexes():
+    """Truy vấn mới nhất / theo symbol / xoá theo timestamp không quét toàn bảng"""
+    async def scenario(db):
+        queries = [
+            ('SELECT * FROM trades ORDER BY timestamp DESC, id DESC LIMIT 50', ()),
+            ('SELECT * FROM signals ORDER BY timestamp DESC, id DESC LIMIT 50', ()),
+            ('SELECT * FROM market_data WHERE symbol = ? AND timestamp BETWEEN ? AND ? '
+             'ORDER BY timestamp DESC LIMIT 100', ('BTCUSDT', 0, 1)),
+            ('SELECT id FROM market_data WHERE timestamp < ? ORDER BY timestamp LIMIT 100', (1,)),
+        ]
+        for sql, params in queries:
+            detail = await db.backend.read(
+                lambda connection: ' | '.join(row[3] for row in connection.execute(f'EXPLAIN QUERY PLAN {sql}', params))
+            )
+            assert 'USING INDEX' in detail or 'USING COVERING INDEX' in detail, detail
+            assert 'TEMP B-TREE' not in detail, detail
+    
+    asyncio.run(with_database(scenario))
+
+def test_cleanup_deletes_in_bounded_chunks():
+    """Mỗi chunk là một transaction riêng; chỉ xoá rows cũ hơn days ngày"""
+    async def scenario(db):
+        db.settings.DB_RETENTION_CHUNK = 100
+        now_ms = int(time.time() * 1000)
+        rows = [(now_ms - 40 * DAY_MS + i, 'BTCUSDT', 60000.0) for i in range(1050)]
+        rows += [(now_ms - i * 1000, 'BTCUSDT', 61000.0) for i in range(10)]
+        await db.backend.writer.executemany('INSERT INTO market_data (timestamp, symbol, price) VALUES (?, ?, ?)', rows)
+        
+        batches_before = db.backend.writer.stats['batches']
+        assert await db.cleanup_old_data(days=30) == 1050
+        assert db.backend.writer.stats['batches'] - batches_before == 11  # 10 chunk đầy + 1 chunk cuối
+        
+        remaining = await db.get_market_data('BTCUSDT')
+        assert len(remaining) == 10 and all(row['price'] == 61000.0 for row in remaining)
+    
+    asyncio.run(with_database(scenario))
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Benchmark schema cũ vs migrated trên market_data tổng hợp")
+    parser.add_argument('--rows', type=int, default=50_000_000)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--dir', default=None, help="Thư mục chứa file database tạm")
+    args = parser.parse_args()
+    
+    SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'SOLUSDT', 'XRPUSDT', 'ADAUSDT', 'DOGEUSDT', 'AVAXUSDT', 'DOTUSDT', 'LINKUSDT']
+    
+    def timed(fn, runs=5):
+        started = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return (time.perf_counter() - started) / runs * 1000
+    
+    def queries(connection, latest_ms, text_timestamps):
+        day_start = latest_ms - DAY_MS
+        bound = (datetime.fromtimestamp(day_start / 1000).isoformat() if text_timestamps else day_start)
+        return {
+            '50 rows mới nhất': timed(lambda: connection.execute(
+                'SELECT * FROM market_data ORDER BY timestamp DESC LIMIT 50').fetchall(), 1),
+            '100 rows mới nhất của 1 symbol': timed(lambda: connection.execute(
+                'SELECT * FROM market_data WHERE symbol = ? ORDER BY timestamp DESC LIMIT 100',
+                ('ETHUSDT',)).fetchall(), 1),
+            '1 ngày của 1 symbol': timed(lambda: connection.execute(
+                'SELECT COUNT(*) FROM market_data WHERE symbol = ? AND timestamp >= ?',
+                ('ETHUSDT', bound)).fetchall(), 1),
+        }
+    
+    async def retention(path: Path, writes_during: float = 0.01):
+        """Xoá 30 ngày cũ nhất theo chunk trong khi một task vẫn ghi mỗi 10ms"""
+        db = DatabaseManager(path)
+        await db.initialize()
+        latencies = []
+        running = True
+        
+        async def writer():
+            while running:
+                started = time.perf_counter()
+                await db.backend.writer.execute('INSERT INTO market_data (timestamp, symbol, price) VALUES (?, ?, ?)',
+                                        (int(time.time() * 1000), 'BTCUSDT', 1.0))
+                latencies.append(time.perf_counter() - started)
+                await asyncio.sleep(writes_during)
+        
+        task = asyncio.create_task(writer())
+        started = time.perf_counter()
+        deleted = await db.cleanup_old_data(days=args.days - 30)
+        elapsed = time.perf_counter() - started
+        running = False
+        await task
+        stats = db.backend.writer.metrics()
+        await db.close()
+        return deleted, elapsed, max(latencies) * 1000, stats['batches']
+    
+    with tempfile.TemporaryDirectory(dir=args.dir) as root:
+        path = Path(root) / 'history.db'
+        now_ms = int(time.time() * 1000)
+        step_ms = max(1, args.days * DAY_MS // args.rows)
+        first_ms = now_ms - args.rows * step_ms
+        
+        # Schema cũ: timestamp TEXT (ISO local), không index
+        connection = sqlite3.connect(path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        MIGRATIONS[0][2](connection)
+        started = time.perf_counter()
+        connection.execute(f'''
+            WITH RECURSIVE n(i) AS (SELECT 0 UNION ALL SELECT i + 1 FROM n WHERE i < {args.rows - 1})
+            INSERT INTO market_data (timestamp, symbol, price, volume, rsi)
+            SELECT strftime('%Y-%m-%dT%H:%M:%f', ({first_ms} + i * {step_ms}) / 1000.0, 'unixepoch', 'localtime'),
+                   CASE i % 10 {' '.join(f"WHEN {k} THEN '{s}'" for k, s in enumerate(SYMBOLS))} END,
+                   40000 + (i % 1000), i % 97, 50
+            FROM n
+        ''')
+        connection.commit()
+        generate_s = time.perf_counter() - started
+        legacy = queries(connection, now_ms, text_timestamps=True)
+        connection.close()
+        
+        started = time.perf_counter()
+        asyncio.run(with_database(lambda db: db.get_trades(limit=1), path))
+        migrate_s = time.perf_counter() - started
+        
+        connection = sqlite3.connect(path)
+        migrated = queries(connection, now_ms, text_timestamps=False)
+        connection.close()
+        
+        deleted, prune_s, max_write_ms, batches = asyncio.run(retention(path))
+    
+    print(f"🗄️ DATABASE SCHEMA - {args.rows:,} rows market_data, {args.days} ngày, {len(SYMBOLS)} symbols")
+    print("=" * 40)
+    print(f"   Sinh dữ liệu (schema cũ): {generate_s:.1f}s | Migrate v0 -> v{LATEST_VERSION}: {migrate_s:.1f}s")
+    for name in legacy:
+        print(f"   {name}: {legacy[name]:,.1f} ms -> {migrated[name]:,.2f} ms")
+    print(f"   Xoá 30 ngày cũ nhất: {deleted:,} rows trong {prune_s:.1f}s ({batches} transactions)")
+    print(f"   Ghi đồng thời trong lúc xoá: chậm nhất {max_write_ms:.1f} ms")
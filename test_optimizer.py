@@ -0,0 +1,116 @@
+"""
+Kiểm tra Optimizer - search / walk-forward song song trên shared memory cho cùng kết quả với Backtester
+"""
+
+import asyncio
+import csv
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from test_backtest import _candles
+from trading.backtest import Backtester
+from trading.optimizer import SEARCH_SPACE, Optimizer, _settings_params, grid, random_sample
+
+PARAM_SETS = [
+    {'MIN_CONFIDENCE_SCORE': 0.6, 'RSI_OVERSOLD': 25, 'RSI_OVERBOUGHT': 75, 'AI_SIGNAL_WEIGHT': 0.5,
+     'STOP_LOSS_PERCENT': 1.0, 'TAKE_PROFIT_PERCENT': 2.0},
+    {'MIN_CONFIDENCE_SCORE': 0.7, 'RSI_OVERSOLD': 30, 'RSI_OVERBOUGHT': 70, 'AI_SIGNAL_WEIGHT': 0.6,
+     'STOP_LOSS_PERCENT': 2.0, 'TAKE_PROFIT_PERCENT': 4.0},
+    {'MIN_CONFIDENCE_SCORE': 0.65, 'RSI_OVERSOLD': 35, 'RSI_OVERBOUGHT': 65, 'AI_SIGNAL_WEIGHT': 0.7,
+     'STOP_LOSS_PERCENT': 0.5, 'TAKE_PROFIT_PERCENT': 1.0}
+]
+
+def test_search_matches_backtester():
+    """Mỗi dòng kết quả khớp với Backtester chạy trực tiếp; xếp hạng theo metric giảm dần"""
+    candles = _candles(4000)
+    with Optimizer(candles, 'BTC/USDT', '1m', workers=1, min_trades=0) as optimizer:
+        results = optimizer.search(PARAM_SETS)
+    
+    assert [row['rank'] for row in results] == [1, 2, 3]
+    assert [row['sharpe'] for row in results] == sorted((row['sharpe'] for row in results), reverse=True)
+    for row in results:
+        backtester = Backtester('BTC/USDT', '1m', params=_settings_params(row['params']), stops=True)
+        stats = asyncio.run(backtester.run(candles))['stats']
+        assert (row['sharpe'], row['total_return'], row['trades']) == (stats['sharpe'], stats['total_return'], stats['trades'])
+    
+    # Weights bù nhau và đi vào SignalGenerator / RiskManager của lần chạy
+    assert backtester.signal_generator.settings.TECHNICAL_SIGNAL_WEIGHT == 0.3
+    assert backtester.risk_manager.settings.STOP_LOSS_PERCENT == 0.5
+    try:
+        Backtester(params={'NOT_A_SETTING': 1})
+        assert False, "Cần ValueError"
+    except ValueError:
+        pass
+
+def test_process_pool_matches_in_process():
+    """Workers gắn vào shared memory cho cùng kết quả như chạy trong process; shared memory được giải phóng"""
+    candles = _candles(3000)
+    with Optimizer(candles, 'BTC/USDT', '1m', workers=1) as optimizer:
+        expected = optimizer.search(PARAM_SETS)
+    with Optimizer(candles, 'BTC/USDT', '1m', workers=2) as optimizer:
+        results = optimizer.search(PARAM_SETS)
+        name = optimizer._shm.name
+    
+    assert [(row['params'], row['sharpe'], row['trades']) for row in results] == \
+        [(row['params'], row['sharpe'], row['trades']) for row in expected]
+    assert not os.path.exists(f"/dev/shm/{name}")
+
+def test_walk_forward_and_table():
+    """Mỗi fold chọn bộ tốt nhất trên đoạn train và đánh giá trên đoạn test ngay sau; ghi bảng CSV"""
+    candles = _candles(6000)
+    with Optimizer(candles, 'BTC/USDT', '1m', workers=1, min_trades=0) as optimizer:
+        windows = optimizer.folds(3, train_segments=2)
+        assert windows[0] == (0, 2400, 2300, 3600) and windows[-1] == (2400, 4800, 4700, 6000)
+        
+        results = optimizer.walk_forward(PARAM_SETS, folds=3, train_segments=2)
+        assert [row['fold'] for row in results] == [1, 2, 3]
+        for row, (train_start, train_end, test_start, test_end) in zip(results, windows):
+            best = optimizer.search(PARAM_SETS, train_start, train_end)[0]
+            assert row['params'] == best['params'] and row['train_sharpe'] == best['sharpe']
+            tested = optimizer.search([row['params']], test_start, test_end)[0]
+            assert row['total_return'] == tested['total_return']
+            assert row['test_start'] == int(candles.timestamps[train_end])
+        
+        with tempfile.TemporaryDirectory() as root:
+            path = optimizer.write_table(results, Path(root) / 'walk_forward.csv')
+            with open(path) as f:
+                rows = list(csv.DictReader(f))
+    
+    assert len(rows) == 3 and rows[0]['fold'] == '1'
+    assert float(rows[0]['AI_SIGNAL_WEIGHT']) == results[0]['params']['AI_SIGNAL_WEIGHT']
+    assert float(rows[2]['sharpe']) == results[2]['sharpe']
+
+def test_search_space():
+    """Grid = tích các giá trị; random_sample không trùng và lặp lại được với cùng seed"""
+    combinations = 1
+    for values in SEARCH_SPACE.values():
+        combinations *= len(values)
+    assert len(grid()) == combinations
+    
+    sample = random_sample(50, seed=7)
+    assert len(sample) == 50 and len({tuple(params.items()) for params in sample}) == 50
+    assert sample == random_sample(50, seed=7)
+    assert len(random_sample(10, {'RSI_OVERSOLD': (20, 30)})) == 2
+
+if __name__ == "__main__":
+    BARS = 100_000
+    SAMPLES = 8
+    
+    candles = _candles(BARS)
+    with Optimizer(candles, 'BTC/USDT', '1m') as optimizer:
+        started = time.perf_counter()
+        results = optimizer.random_search(SAMPLES, seed=1)
+        elapsed = time.perf_counter() - started
+    per_run = elapsed / SAMPLES
+    print(f"🔧 OPTIMIZER - {SAMPLES} bộ tham số × {BARS:,} candles 1m")
+    print("=" * 40)
+    print(f"   {elapsed:.1f}s ({optimizer.workers} workers, {per_run:.2f}s / bộ tham số)")
+    print(f"   Grid đầy đủ {len(grid())} bộ: ~{per_run * len(grid()) / 60:.0f} phút")
+    print(f"   Tốt nhất: sharpe {results[0]['sharpe']:.2f}, return {results[0]['total_return']:+.2%}, {results[0]['params']}")
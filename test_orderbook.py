@@ -0,0 +1,121 @@
+"""
+Kiểm tra OrderBook - snapshot + depth diff theo update id, truy vấn thanh khoản
+"""
+
+import asyncio
+import random
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.orderbook import OrderBook
+from trading.risk_manager import RiskManager
+from trading.signals import SignalGenerator
+
+def _diff(first_id, final_id, bids=(), asks=()):
+    return {'e': 'depthUpdate', 'U': first_id, 'u': final_id,
+            'b': [[str(p), str(q)] for p, q in bids], 'a': [[str(p), str(q)] for p, q in asks]}
+
+def test_snapshot_replays_buffered_diffs():
+    """Diff nhận trước snapshot được giữ lại; diff đã nằm trong snapshot bị bỏ qua"""
+    book = OrderBook('BTCUSDT')
+    assert book.needs_snapshot
+    assert book.apply_diff(_diff(95, 100, bids=[(99, 9)]))      # u <= lastUpdateId => bỏ
+    assert book.apply_diff(_diff(101, 103, bids=[(100, 2)], asks=[(101, 0)]))
+    assert book.apply_diff(_diff(104, 104, asks=[(102, 4)]))
+    assert not book.is_synced
+    
+    assert book.load_snapshot(102, bids=[['100', '1'], ['99', '1']], asks=[['101', '1'], ['103', '3']])
+    assert book.last_update_id == 104
+    assert book.best_bid() == (100.0, 2.0)
+    assert book.best_ask() == (102.0, 4.0)  # 101 bị xóa bởi qty 0
+    assert book.spread() == 2.0
+    assert book.top(2) == {'bids': [[100.0, 2.0], [99.0, 1.0]], 'asks': [[102.0, 4.0], [103.0, 3.0]]}
+
+def test_gap_resets_book():
+    """U > lastUpdateId + 1 => gap, sổ lệnh bị xóa và cần snapshot mới"""
+    book = OrderBook('BTCUSDT')
+    book.load_snapshot(10, bids=[['100', '1']], asks=[['101', '1']])
+    assert book.apply_diff(_diff(11, 12, bids=[(100, 3)]))
+    assert not book.apply_diff(_diff(20, 21, bids=[(100, 5)]))
+    assert not book.is_synced and book.needs_snapshot
+    assert book.best_bid() is None and book.stats['gaps'] == 1
+    
+    # Snapshot cũ hơn diff đang chờ => vẫn chưa đồng bộ
+    assert not book.load_snapshot(15, bids=[['100', '1']], asks=[['101', '1']])
+    assert book.load_snapshot(19, bids=[['100', '1']], asks=[['101', '1']])
+    assert book.best_bid() == (100.0, 5.0) and book.last_update_id == 21
+
+def test_depth_and_imbalance_feed_signal_and_risk():
+    """Depth trong ±X% quanh mid, imbalance => orderbook signal và liquidity risk check"""
+    book = OrderBook.from_snapshot({
+        'bids': [[99.5, 10], [99.0, 10], [90.0, 1000]],
+        'asks': [[100.5, 2], [101.0, 2], [110.0, 1000]]
+    })
+    depth = book.depth(percent=1.0)
+    assert depth['bids'] == 99.5 * 10 + 99.0 * 10  # 90 nằm ngoài ±1% quanh mid 100
+    assert depth['asks'] == 100.5 * 2 + 101.0 * 2
+    assert book.imbalance(1.0) > 0.6
+    
+    liquidity = book.liquidity(1.0)
+    signal = SignalGenerator()._analyze_orderbook(liquidity)
+    assert signal['action'] == 'BUY' and signal['strength'] == 'STRONG'
+    
+    risk = RiskManager()
+    check = risk._check_liquidity({'action': 'BUY', 'liquidity': liquidity})
+    assert not check['passed']  # ~$400 phía ask < position tối đa (5% của 10000)
+    check = risk._check_liquidity({'action': 'BUY', 'liquidity': dict(liquidity, ask_depth=1e6)})
+    assert not check['passed']  # Spread 1% > MAX_SPREAD_PERCENT
+    assert risk._check_liquidity({'action': 'BUY'})['passed']  # Không có dữ liệu sổ lệnh
+
+def test_liquidity_check_vetoes_order():
+    """Chỉ liquidity fail (5/6 checks pass) vẫn bị từ chối; không có sổ lệnh thì không chặn"""
+    signal = {'action': 'BUY', 'confidence': 0.9, 'entry_price': 100.0, 'stop_loss': 98.0,
+              'take_profit': 104.0, 'risk_level': 'LOW'}
+    liquidity = {'spread_percent': 0.01, 'depth_percent': 1.0, 'bid_depth': 1e6, 'ask_depth': 100.0,
+                 'imbalance': 0.0}
+    risk = RiskManager()
+    
+    thin = asyncio.run(risk.evaluate_risk({**signal, 'liquidity': liquidity}))
+    assert [check['name'] for check in thin['checks'] if not check['passed']] == ['Liquidity']
+    assert not thin['approved']
+    
+    assert asyncio.run(risk.evaluate_risk({**signal, 'liquidity': dict(liquidity, ask_depth=1e6)}))['approved']
+    assert asyncio.run(risk.evaluate_risk(signal))['approved']
+
+if __name__ == "__main__":
+    random.seed(7)
+    book = OrderBook('BTCUSDT')
+    book.load_snapshot(
+        0,
+        bids=[[45000 - i * 0.5, random.uniform(0.01, 2)] for i in range(5000)],
+        asks=[[45000.5 + i * 0.5, random.uniform(0.01, 2)] for i in range(5000)]
+    )
+    diffs = [
+        _diff(i, i, bids=[(45000 - random.randint(0, 400) * 0.5, random.choice([0, 0.5, 1]))],
+              asks=[(45000.5 + random.randint(0, 400) * 0.5, random.choice([0, 0.5, 1]))])
+        for i in range(1, 100_001)
+    ]
+    
+    start = time.perf_counter()
+    for diff in diffs:
+        book.apply_diff(diff)
+    update_us = (time.perf_counter() - start) / len(diffs) * 1e6
+    
+    def timed(fn, runs=10_000):
+        start = time.perf_counter()
+        for _ in range(runs):
+            fn()
+        return (time.perf_counter() - start) / runs * 1e6
+    
+    print("📚 ORDER BOOK - 10,000 levels, 100,000 diffs")
+    print("=" * 40)
+    print(f"   apply_diff: {update_us:.2f} µs/diff")
+    print(f"   best bid/ask: {timed(lambda: (book.best_bid(), book.best_ask())):.2f} µs")
+    print(f"   spread: {timed(book.spread):.2f} µs")
+    print(f"   depth ±0.1%: {timed(lambda: book.depth(0.1), 1000):.2f} µs")
+    print(f"   imbalance ±1%: {timed(lambda: book.imbalance(1.0), 100):.2f} µs")
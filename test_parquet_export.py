@@ -0,0 +1,135 @@
+"""
+Kiểm tra export Parquet - partition theo ngày / symbol, export tiếp phần mới, đọc có lọc
+"""
+
+import asyncio
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager, query_parquet
+from test_helpers import with_database
+
+DAY_MS = 86_400_000
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+INSERT = "INSERT INTO trades (timestamp, symbol, side, amount, price, cost, pnl, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+def _trades(count: int, start: int = 0, seed: int = 5):
+    rng = random.Random(seed + start)
+    return [
+        (START_MS + i * 3_600_000, SYMBOLS[i % 3], 'sell', 0.1, 100.0, 10.0, round(rng.uniform(-50, 50), 2), 'closed')
+        for i in range(start, start + count)
+    ]
+
+def _exporting(scenario):
+    """scenario(db, root): chunk export nhỏ, Parquet ghi vào thư mục tạm của database"""
+    async def run(db):
+        db.settings.DB_EXPORT_CHUNK = 40
+        return await scenario(db, db.backend.path.parent / 'parquet')
+    return run
+
+def test_export_partitions_and_resume():
+    """Partition day=/symbol=, export lần hai chỉ ghi rows mới, không trùng"""
+    async def scenario(db, root):
+        trades = _trades(100)
+        await db.backend.writer.executemany(INSERT, trades)
+        await db.save_signal({'timestamp': START_MS, 'action': 'BUY', 'confidence': 0.7,
+                              'technical_component': {'rsi': 30}})
+        await db.backend.writer.flush()
+        
+        assert await db.export_parquet(root) == {'trades': 100, 'signals': 1}
+        days = sorted(path.name for path in (root / 'trades').iterdir() if path.is_dir())
+        assert days[0] == 'day=2024-01-01' and len(days) == 5
+        assert len(list((root / 'trades' / 'day=2024-01-01').iterdir())) == 3  # 3 symbols
+        
+        await db.backend.writer.executemany(INSERT, _trades(20, start=100))
+        assert await db.export_parquet(root) == {'trades': 20, 'signals': 0}
+        
+        table = query_parquet('trades', root=root)
+        assert table.num_rows == 120
+        assert sorted(table['id'].to_pylist()) == list(range(1, 121))
+        assert set(table['symbol'].to_pylist()) == set(SYMBOLS)
+        
+        signals = query_parquet('signals', root=root)
+        assert signals['action'].to_pylist() == ['BUY'] and signals['executed'].to_pylist() == [False]
+    
+    asyncio.run(with_database(_exporting(scenario)))
+
+def test_query_prunes_columns_and_filters():
+    """Chỉ cột được chọn, lọc theo thời gian / symbol / biểu thức bổ sung"""
+    async def scenario(db, root):
+        trades = _trades(120)
+        await db.backend.writer.executemany(INSERT, trades)
+        await db.export_parquet(root)
+        
+        start_ms, end_ms = START_MS + DAY_MS + 3_600_000, START_MS + 3 * DAY_MS
+        table = query_parquet('trades', columns=['timestamp', 'pnl'], start_ms=start_ms, end_ms=end_ms,
+                              symbol='ETH/USDT', where=ds.field('pnl') < 0, root=root)
+        assert table.column_names == ['timestamp', 'pnl']
+        
+        expected = [t for t in trades if start_ms <= t[0] <= end_ms and t[1] == 'ETH/USDT' and t[6] < 0]
+        assert sorted(table['timestamp'].to_pylist()) == [t[0] for t in expected]
+        assert abs(pc.sum(table['pnl']).as_py() - sum(t[6] for t in expected)) < 1e-9
+    
+    asyncio.run(with_database(_exporting(scenario)))
+
+if __name__ == "__main__":
+    TRADES = 1_000_000
+    
+    async def benchmark():
+        with tempfile.TemporaryDirectory() as root:
+            db = DatabaseManager(Path(root) / 'bot.db')
+            await db.initialize()
+            rng = random.Random(1)
+            for i in range(0, TRADES, 50_000):
+                await db.backend.writer.executemany(INSERT, [
+                    (START_MS + j * 60_000, SYMBOLS[j % 3], 'sell', 0.1, 100.0, 10.0, rng.uniform(-50, 50), 'closed')
+                    for j in range(i, i + 50_000)
+                ])
+            
+            # Cách cũ: đi qua SQLite từng row, cộng PnL theo (ngày, symbol) trong Python
+            started = time.perf_counter()
+            connection = sqlite3.connect(Path(root) / 'bot.db')
+            connection.row_factory = sqlite3.Row
+            attribution = {}
+            for row in connection.execute('SELECT * FROM trades'):
+                trade = dict(row)
+                key = (trade['timestamp'] // DAY_MS, trade['symbol'])
+                attribution[key] = attribution.get(key, 0) + trade['pnl']
+            connection.close()
+            sqlite_s = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            await db.export_parquet(Path(root) / 'parquet')
+            export_s = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            table = query_parquet('trades', columns=['day', 'symbol', 'pnl'], root=Path(root) / 'parquet')
+            grouped = table.group_by(['day', 'symbol']).aggregate([('pnl', 'sum'), ('pnl', 'count')])
+            parquet_s = time.perf_counter() - started
+            
+            started = time.perf_counter()
+            last_week = query_parquet('trades', columns=['symbol', 'pnl'], start_ms=START_MS + 687 * DAY_MS - 7 * DAY_MS,
+                                      root=Path(root) / 'parquet')
+            week_ms = (time.perf_counter() - started) * 1000
+            await db.close()
+            return sqlite_s, export_s, parquet_s, len(attribution), grouped.num_rows, week_ms, last_week.num_rows
+    
+    sqlite_s, export_s, parquet_s, buckets, grouped, week_ms, week_rows = asyncio.run(benchmark())
+    print(f"📦 PARQUET EXPORT - {TRADES:,} trades")
+    print("=" * 40)
+    print(f"   PnL theo ngày/symbol qua SQLite từng row: {sqlite_s:.2f}s ({buckets} buckets)")
+    print(f"   Export Parquet: {export_s:.2f}s")
+    print(f"   PnL theo ngày/symbol từ Parquet: {parquet_s:.2f}s ({grouped} buckets)")
+    print(f"   7 ngày gần nhất (partition pruning): {week_ms:.1f} ms ({week_rows:,} trades)")
@@ -0,0 +1,167 @@
+"""
+Kiểm tra performance aggregates - trigger cập nhật khi insert, reconcile từ bảng trades
+"""
+
+import asyncio
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager
+from test_helpers import with_database
+
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+
+def _trades(count: int, seed: int = 3):
+    rng = random.Random(seed)
+    return [
+        (START_MS + i * 3_600_000, rng.choice(SYMBOLS), 'sell', 0.1, 100.0, 10.0, round(rng.uniform(-50, 50), 2), 'closed')
+        for i in range(count)
+    ]
+
+def _expected(trades):
+    """Thống kê tính trực tiếp từ danh sách trades (cách cũ)"""
+    buckets = {}
+    for timestamp, symbol, *_, pnl, _ in trades:
+        day = datetime.fromtimestamp(timestamp / 1000, timezone.utc).strftime('%Y-%m-%d')
+        for key in (('all', ''), ('day', day), ('symbol', symbol)):
+            buckets.setdefault(key, []).append(pnl)
+    
+    stats = {}
+    for key, pnls in buckets.items():
+        equity = peak = drawdown = 0.0
+        for pnl in pnls:
+            equity += pnl
+            peak = max(peak, equity)
+            drawdown = max(drawdown, peak - equity)
+        stats[key] = {
+            'total_trades': len(pnls),
+            'winning_trades': sum(pnl > 0 for pnl in pnls),
+            'losing_trades': sum(pnl < 0 for pnl in pnls),
+            'total_pnl': sum(pnls),
+            'best_trade': max(pnls),
+            'worst_trade': min(pnls),
+            'max_drawdown': drawdown
+        }
+    return stats
+
+def _assert_stats(actual, expected):
+    for field, value in expected.items():
+        assert abs(actual[field] - value) < 1e-6, (field, actual[field], value)
+
+INSERT = "INSERT INTO trades (timestamp, symbol, side, amount, price, cost, pnl, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+def test_triggers_match_full_scan():
+    """Aggregate sau mỗi insert khớp với thống kê tính lại từ đầu"""
+    async def scenario(db):
+        assert (await db.get_performance_stats())['total_trades'] == 0
+        trades = _trades(300)
+        for i in range(0, len(trades), 50):
+            await db.backend.writer.executemany(INSERT, trades[i:i + 50])
+        
+        expected = _expected(trades)
+        stats = await db.get_performance_stats()
+        _assert_stats(stats, expected[('all', '')])
+        assert stats['win_rate'] == expected[('all', '')]['winning_trades'] / 300
+        
+        by_day = await db.get_performance_breakdown('day')
+        by_symbol = await db.get_performance_breakdown('symbol')
+        assert len(by_day) == 13 and sorted(by_symbol) == sorted(SYMBOLS)
+        for day, actual in by_day.items():
+            _assert_stats(actual, expected[('day', day)])
+        for symbol, actual in by_symbol.items():
+            _assert_stats(actual, expected[('symbol', symbol)])
+        
+        # Đọc stats là tra primary key, không quét trades
+        plan = await db.backend.read(lambda connection: ' | '.join(row[3] for row in connection.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM trade_stats WHERE scope = 'all' AND bucket = ''")))
+        assert 'PRIMARY KEY' in plan and 'trades' not in plan.replace('trade_stats', '')
+    
+    asyncio.run(with_database(scenario))
+
+def test_delete_update_and_reconcile():
+    """Sửa / xoá trade cập nhật count, PnL, best/worst; reconcile dựng lại cả drawdown"""
+    async def scenario(db):
+        trades = _trades(120, seed=11)
+        await db.backend.writer.executemany(INSERT, trades)
+        best = max(trades, key=lambda trade: trade[6])
+        
+        await db.backend.writer.execute('DELETE FROM trades WHERE timestamp = ?', (best[0],))
+        await db.backend.writer.execute('UPDATE trades SET pnl = 500 WHERE timestamp = ?', (trades[5][0],))
+        await db.backend.writer.execute('UPDATE trades SET symbol = ? WHERE timestamp = ?', ('XRP/USDT', trades[6][0]))
+        
+        remaining = [trade for trade in trades if trade[0] != best[0]]
+        remaining[5] = remaining[5][:6] + (500.0,) + remaining[5][7:]
+        remaining[6] = (remaining[6][0], 'XRP/USDT') + remaining[6][2:]
+        expected = _expected(remaining)
+        
+        stats = await db.get_performance_stats()
+        for field in ('total_trades', 'winning_trades', 'losing_trades', 'total_pnl', 'best_trade', 'worst_trade'):
+            assert abs(stats[field] - expected[('all', '')][field]) < 1e-6, field
+        assert (await db.get_performance_breakdown('symbol'))['XRP/USDT']['total_trades'] == 1
+        
+        # Giả lập aggregate bị lệch (ví dụ sửa tay database) => reconcile sửa lại
+        await db.backend.writer.execute("UPDATE trade_stats SET total_trades = 0, max_drawdown = -1 WHERE scope = 'day'")
+        assert await db.reconcile_performance_stats() == len(expected)
+        _assert_stats(await db.get_performance_stats(), expected[('all', '')])
+        for day, actual in (await db.get_performance_breakdown('day')).items():
+            _assert_stats(actual, expected[('day', day)])
+    
+    asyncio.run(with_database(scenario))
+
+if __name__ == "__main__":
+    TRADES = 1_000_000
+    
+    def legacy_stats(connection):
+        # 5 truy vấn quét toàn bảng như get_performance_stats cũ
+        connection.execute('SELECT COUNT(*) FROM trades').fetchone()
+        connection.execute('SELECT COUNT(*) FROM trades WHERE pnl > 0').fetchone()
+        connection.execute('SELECT COUNT(*) FROM trades WHERE pnl < 0').fetchone()
+        connection.execute('SELECT SUM(pnl) FROM trades').fetchone()
+        connection.execute('SELECT MAX(pnl), MIN(pnl) FROM trades').fetchone()
+    
+    async def benchmark():
+        with tempfile.TemporaryDirectory() as root:
+            db = DatabaseManager(Path(root) / 'bot.db')
+            await db.initialize()
+            trades = _trades(TRADES)
+            
+            started = time.perf_counter()
+            for i in range(0, TRADES, 10_000):
+                await db.backend.writer.executemany(INSERT, trades[i:i + 10_000])
+            insert_s = time.perf_counter() - started
+            
+            connection = sqlite3.connect(Path(root) / 'bot.db')
+            started = time.perf_counter()
+            for _ in range(5):
+                legacy_stats(connection)
+            legacy_ms = (time.perf_counter() - started) / 5 * 1000
+            connection.close()
+            
+            started = time.perf_counter()
+            for _ in range(100):
+                await db.get_performance_stats()
+            stats_ms = (time.perf_counter() - started) / 100 * 1000
+            
+            started = time.perf_counter()
+            await db.reconcile_performance_stats()
+            reconcile_s = time.perf_counter() - started
+            await db.close()
+            return insert_s, legacy_ms, stats_ms, reconcile_s
+    
+    insert_s, legacy_ms, stats_ms, reconcile_s = asyncio.run(benchmark())
+    print(f"📊 PERFORMANCE STATS - {TRADES:,} trades")
+    print("=" * 40)
+    print(f"   Insert (có trigger): {TRADES / insert_s:,.0f} trades/s")
+    print(f"   5 truy vấn quét bảng (cũ): {legacy_ms:,.1f} ms")
+    print(f"   get_performance_stats (aggregate): {stats_ms:.3f} ms")
+    print(f"   Reconcile toàn bộ: {reconcile_s:.1f}s")
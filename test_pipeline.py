@@ -0,0 +1,178 @@
+"""
+Kiểm tra Pipeline - stage độc lập chạy song song, timeout / fallback / hủy, stage nền ngoài critical path
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from utils.pipeline import Pipeline, Stage
+
+logging.getLogger('utils.pipeline').setLevel(logging.CRITICAL)
+
+def _sleeper(seconds: float, value=None, log: list = None, name: str = None):
+    """Stage giả lập: chờ seconds rồi trả value; ghi 'start' / 'done' / 'cancelled' vào log"""
+    async def func(results):
+        if log is not None:
+            log.append((name, 'start'))
+        try:
+            await asyncio.sleep(seconds)
+        except asyncio.CancelledError:
+            if log is not None:
+                log.append((name, 'cancelled'))
+            raise
+        if log is not None:
+            log.append((name, 'done'))
+        return value(results) if callable(value) else value
+    return func
+
+def _cycle(delays: dict, **options) -> Pipeline:
+    """Cùng DAG với BitcoinTradingBot._build_cycle_pipeline, stage là sleep"""
+    return Pipeline([
+        Stage('market_data', _sleeper(delays['market_data'], 1)),
+        Stage('ai_analysis', _sleeper(delays['ai_analysis'], 'BUY'), ['market_data'], **options),
+        Stage('technical_signals', _sleeper(delays['technical_signals'], 'BUY'), ['market_data']),
+        Stage('combined_signal', _sleeper(delays['combined_signal'],
+                                          lambda r: (r['ai_analysis'], r['technical_signals'])),
+              ['ai_analysis', 'technical_signals']),
+        Stage('risk_check', _sleeper(delays['risk_check'], True), ['combined_signal']),
+        Stage('trade', _sleeper(delays['trade'], 'filled'), ['combined_signal', 'risk_check']),
+        Stage('portfolio', _sleeper(delays['portfolio']), ['trade'], required=False, background=True)
+    ], name='cycle')
+
+DELAYS = {'market_data': 0.02, 'ai_analysis': 0.1, 'technical_signals': 0.1, 'combined_signal': 0.0,
+          'risk_check': 0.0, 'trade': 0.01, 'portfolio': 0.2}
+
+def test_independent_stages_run_concurrently():
+    """AI và technical chạy cùng lúc; portfolio chạy nền - critical path ~ market + max(AI, technical) + trade"""
+    async def run():
+        pipeline = _cycle(DELAYS)
+        result = await pipeline.run()
+        background = pipeline._background['portfolio']
+        running = not background.done()
+        await pipeline.drain()
+        return pipeline, result, running
+    
+    pipeline, result, background_running = asyncio.run(run())
+    assert result['ok'] and result['results']['combined_signal'] == ('BUY', 'BUY')
+    assert result['results']['trade'] == 'filled'
+    assert 120 <= result['elapsed_ms'] < 220  # tuần tự: 230ms + 200ms portfolio
+    assert result['status']['portfolio'] == 'background' and background_running
+    assert set(result['timings']) == set(DELAYS) - {'portfolio'}
+    assert result['timings']['ai_analysis'] >= 100
+    assert pipeline.stats['stages']['portfolio']['runs'] == 1 and pipeline.stats['runs'] == 1
+
+def test_timeout_fallback_and_cancellation():
+    """Stage quá timeout dùng fallback; stage required lỗi hủy stage đang chạy và dừng pipeline"""
+    result = asyncio.run(_cycle(DELAYS, timeout=0.03, fallback='HOLD').run())
+    assert result['ok'] and result['status']['ai_analysis'] == 'timeout'
+    assert result['results']['combined_signal'] == ('HOLD', 'BUY')
+    assert result['errors'] == {'ai_analysis': 'timeout after 0.03s'}
+    
+    log = []
+    
+    async def fail(results):
+        await asyncio.sleep(0.01)
+        raise RuntimeError("exchange down")
+    
+    async def run():
+        pipeline = Pipeline([
+            Stage('market_data', _sleeper(0, 1)),
+            Stage('ai_analysis', _sleeper(1.0, 'BUY', log, 'ai_analysis'), ['market_data']),
+            Stage('technical_signals', fail, ['market_data']),
+            Stage('combined_signal', _sleeper(0, 'BUY', log, 'combined_signal'), ['ai_analysis', 'technical_signals'])
+        ])
+        started = time.perf_counter()
+        return await pipeline.run(), time.perf_counter() - started, pipeline.stats
+    
+    result, elapsed, stats = asyncio.run(run())
+    assert not result['ok'] and elapsed < 0.5
+    assert result['status'] == {'market_data': 'ok', 'technical_signals': 'error', 'ai_analysis': 'cancelled',
+                                'combined_signal': 'cancelled'}
+    assert log == [('ai_analysis', 'start'), ('ai_analysis', 'cancelled')]
+    assert result['errors'] == {'technical_signals': 'exchange down'}
+    assert stats['failed_runs'] == 1 and stats['stages']['technical_signals']['errors'] == 1
+    
+    # Stage không required lỗi => chỉ các stage phụ thuộc bị bỏ qua
+    pipeline = Pipeline([
+        Stage('a', fail, required=False),
+        Stage('b', _sleeper(0, 'b'), ['a']),
+        Stage('c', _sleeper(0, 'c'))
+    ])
+    result = asyncio.run(pipeline.run())
+    assert result['ok'] and result['status'] == {'a': 'error', 'b': 'skipped', 'c': 'ok'}
+
+def test_background_is_not_stacked():
+    """Portfolio của lần trước chưa xong => lần sau bỏ qua thay vì chồng task; drain chờ phần còn lại"""
+    async def run():
+        pipeline = _cycle({**DELAYS, 'ai_analysis': 0, 'technical_signals': 0})
+        for _ in range(3):
+            await pipeline.run()
+        skipped = pipeline.stats['background_skipped']
+        await pipeline.drain()
+        return skipped, pipeline.stats
+    
+    skipped, stats = asyncio.run(run())
+    assert skipped == 2 and stats['stages']['portfolio']['runs'] == 1
+
+def test_invalid_graphs():
+    """Chu trình, phụ thuộc stage nền, trùng tên và thiếu input đều báo ValueError"""
+    invalid = [
+        [Stage('a', _sleeper(0), ['b']), Stage('b', _sleeper(0), ['a'])],
+        [Stage('a', _sleeper(0), background=True), Stage('b', _sleeper(0), ['a'])],
+        [Stage('a', _sleeper(0)), Stage('a', _sleeper(0))]
+    ]
+    for stages in invalid:
+        try:
+            Pipeline(stages)
+            assert False, "Cần ValueError"
+        except ValueError:
+            pass
+    
+    pipeline = Pipeline([Stage('a', lambda results: asyncio.sleep(0, results['analyze']), ['analyze'])])
+    try:
+        asyncio.run(pipeline.run())
+        assert False, "Cần ValueError"
+    except ValueError:
+        pass
+    assert asyncio.run(pipeline.run(analyze=False))['results'] == {'a': False}
+
+if __name__ == "__main__":
+    CYCLE = {'market_data': 0.12, 'ai_analysis': 0.8, 'technical_signals': 0.15, 'combined_signal': 0.001,
+             'risk_check': 0.001, 'trade': 0.05, 'portfolio': 0.3}
+    RUNS = 2000
+    
+    async def sequential():
+        for name, delay in CYCLE.items():
+            await asyncio.sleep(delay)
+    
+    async def bench():
+        started = time.perf_counter()
+        await sequential()
+        sequential_ms = (time.perf_counter() - started) * 1000
+        
+        pipeline = _cycle(CYCLE)
+        result = await pipeline.run()
+        await pipeline.drain()
+        
+        instant = _cycle({name: 0 for name in CYCLE})
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            await instant.run()
+        overhead_ms = (time.perf_counter() - started) / RUNS * 1000
+        await instant.drain()
+        return sequential_ms, result, pipeline.summary(result), overhead_ms
+    
+    sequential_ms, result, summary, overhead_ms = asyncio.run(bench())
+    print("⏱️ PIPELINE - trading cycle DAG")
+    print("=" * 40)
+    print(f"   Tuần tự (như trước): {sequential_ms:.0f}ms")
+    print(f"   DAG: {result['elapsed_ms']:.0f}ms ({sequential_ms / result['elapsed_ms']:.2f}x nhanh hơn)")
+    print(f"   {summary}")
+    print(f"   Overhead executor (7 stage rỗng): {overhead_ms:.3f}ms / cycle")
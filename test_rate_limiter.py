@@ -0,0 +1,134 @@
+"""
+Kiểm tra RateLimiter - token bucket theo request weight với stub Binance REST
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from test_helpers import stub_collector
+from utils.rate_limiter import (
+    PRIORITY_ORDER, PRIORITY_MARKET_DATA, PRIORITY_BACKGROUND, RateLimiter, endpoint_weight
+)
+
+def _routes(state: dict):
+    """Stub trả header X-MBX-USED-WEIGHT-1M; state['status'] để giả lập 429 / 418"""
+    async def handler(request):
+        state['used'] += state['weight']
+        headers = {'X-MBX-USED-WEIGHT-1M': str(state['used'])}
+        if state['status'] != 200:
+            headers['Retry-After'] = state['retry_after']
+            return web.json_response({'code': -1003, 'msg': 'Too many requests'},
+                                     status=state['status'], headers=headers)
+        return web.json_response({'symbol': 'BTCUSDT', 'price': '45000'}, headers=headers)
+    
+    return {'/{tail:.*}': handler}
+
+def test_endpoint_weights():
+    """Weight theo endpoint và tham số"""
+    assert endpoint_weight('/klines', {'symbol': 'BTCUSDT', 'limit': 1000}) == 2
+    assert endpoint_weight('/depth', {'limit': 10}) == 5
+    assert endpoint_weight('/depth', {'limit': 500}) == 25
+    assert endpoint_weight('/depth', {'limit': 5000}) == 250
+    assert endpoint_weight('/trades') == 25
+    assert endpoint_weight('/ticker/24hr', {'symbol': 'BTCUSDT'}) == 2
+    assert endpoint_weight('/ticker/24hr', {'symbols': ','.join(['X'] * 50)}) == 40
+    assert endpoint_weight('/ticker/24hr') == 80
+    assert endpoint_weight('/ticker/price') == 4
+    assert endpoint_weight('/order') == 1
+
+def test_orders_jump_the_queue():
+    """Khi hết weight, lệnh được phục vụ trước market data và background"""
+    async def run():
+        limiter = RateLimiter(weight_limit=100, window_seconds=1, safety_margin=0)
+        limiter.tokens = 0
+        granted = []
+        
+        async def request(name, weight, priority):
+            await limiter.acquire(weight, priority)
+            granted.append(name)
+        
+        tasks = [asyncio.create_task(request(f"market{i}", 10, PRIORITY_MARKET_DATA)) for i in range(3)]
+        tasks.append(asyncio.create_task(request('history', 10, PRIORITY_BACKGROUND)))
+        await asyncio.sleep(0.01)
+        tasks.append(asyncio.create_task(request('order', 5, PRIORITY_ORDER)))
+        await asyncio.sleep(0)
+        assert limiter.metrics()['queued_by_priority'] == {PRIORITY_MARKET_DATA: 3, PRIORITY_BACKGROUND: 1,
+                                                           PRIORITY_ORDER: 1}
+        
+        await asyncio.wait_for(asyncio.gather(*tasks), timeout=5)
+        return granted
+    
+    assert asyncio.run(run()) == ['order', 'market0', 'market1', 'market2', 'history']
+
+def test_cancelled_waiter_leaves_queue():
+    """Request bị hủy khi đang chờ không chặn các request phía sau"""
+    async def run():
+        limiter = RateLimiter(weight_limit=100, window_seconds=1, safety_margin=0)
+        limiter.tokens = 0
+        first = asyncio.create_task(limiter.acquire(50))
+        second = asyncio.create_task(limiter.acquire(5))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        await asyncio.wait_for(second, timeout=1)
+        return limiter.metrics()['queue_length']
+    
+    assert asyncio.run(run()) == 0
+
+def test_headers_and_rate_limit_responses():
+    """Collector đồng bộ weight theo header, 429 / 418 tạm dừng request theo Retry-After"""
+    async def run():
+        state = {'used': 0, 'weight': 2, 'status': 200, 'retry_after': '0.3'}
+        async with stub_collector(_routes(state)) as collector:
+            limiter = collector.rate_limiter = RateLimiter(weight_limit=1000, safety_margin=0)
+            
+            # Server đếm weight cao hơn (app khác dùng chung IP) => bucket kéo xuống theo header
+            state['used'] = 700
+            assert await collector.get_current_price('BTCUSDT') == 45000.0
+            metrics = limiter.metrics()
+            assert metrics['server_used_weight'] == 702
+            assert metrics['available_weight'] <= 1000 - 702
+            assert metrics['weight_consumed'] == 2
+            
+            state['status'] = 429
+            collector.cache.clear()
+            assert await collector.get_current_price('BTCUSDT') == 45000.0  # Fallback price
+            assert limiter.metrics()['paused_for'] > 0
+            assert limiter.available() == 0
+            
+            # Request tiếp theo chờ hết Retry-After
+            state['status'] = 200
+            collector.cache.clear()
+            start = time.perf_counter()
+            await collector.get_current_price('BTCUSDT')
+            assert time.perf_counter() - start >= 0.25
+            
+            state['status'] = 418
+            collector.cache.clear()
+            await collector.get_current_price('BTCUSDT')
+            return limiter.metrics()
+    
+    metrics = asyncio.run(run())
+    assert metrics['rate_limited'] == 1
+    assert metrics['banned'] == 1
+
+if __name__ == "__main__":
+    async def burst():
+        limiter = RateLimiter(weight_limit=600, window_seconds=1, safety_margin=0)
+        start = time.perf_counter()
+        await asyncio.gather(*(limiter.acquire(2) for _ in range(1000)))
+        return time.perf_counter() - start, limiter.metrics()
+    
+    elapsed, metrics = asyncio.run(burst())
+    print("⚖️ RATE LIMITER - 1000 requests × weight 2, limit 600/s")
+    print("=" * 40)
+    print(f"   Thời gian: {elapsed:.2f}s (lý thuyết ≥ {(2000 - 600) / 600:.2f}s)")
+    for key, value in metrics.items():
+        print(f"   {key}: {value}")
@@ -0,0 +1,163 @@
+"""
+Kiểm tra ghi / phát lại phiên - DataCollector phát lại REST + stream đã ghi cho cùng market data, không cần network
+"""
+
+import asyncio
+import gzip
+import json
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from ai_trading_engine import AITradingEngine
+from continuous_ai_analyzer import ContinuousAIAnalyzer
+from data.collector import DataCollector
+from data.recording import EVENT_CYCLE, SessionRecorder, SessionReplayer
+from data.replay_server import StreamReplayServer
+from test_stream_replay import _build_messages, _start_stub_rest
+
+async def _record(path: Path, trades: int = 40, **server_options):
+    """Ghi một phiên streaming (bootstrap + resync qua REST stub) rồi một cycle đọc market data"""
+    counter = {'klines': 0, 'trades': 0, 'depth': 0, 'other': 0}
+    rest_runner, rest_url = await _start_stub_rest(counter)
+    server = StreamReplayServer(_build_messages(trades), **server_options)
+    ws_url = await server.start()
+    
+    collector = DataCollector()
+    collector.api_endpoints['binance'] = rest_url
+    collector.start_recording(path)
+    try:
+        assert await collector.start_streaming(['BTCUSDT'], interval='1h', ws_url=ws_url)
+        await asyncio.wait_for(server.finished.wait(), timeout=60)
+        await asyncio.sleep(0.2)
+        
+        collector.recorder.record(EVENT_CYCLE, {})
+        market_data = await collector.get_market_data('BTCUSDT')
+        price = await collector.get_current_price('ETHUSDT')  # REST ngoài stream - stub trả 500 => fallback
+        return market_data, price, collector.stream.stats, counter
+    finally:
+        await collector.close()
+        await server.stop()
+        await rest_runner.cleanup()
+
+async def _replay(path: Path, speed: float = 0.0):
+    """Phát lại phiên vào DataCollector không có server nào (network bị chặn)"""
+    collector = DataCollector()
+    collector.api_endpoints['binance'] = 'http://127.0.0.1:9/api/v3'
+    replayer = SessionReplayer(path, speed)
+    replayer.attach(collector)
+    results = []
+    
+    async def on_cycle():
+        results.append(await collector.get_market_data('BTCUSDT'))
+        results.append(await collector.get_current_price('ETHUSDT'))
+    
+    try:
+        stats = await replayer.run(on_cycle)
+        return results, stats, collector.stream.stats, collector.get_connection_stats()
+    finally:
+        await collector.close()
+
+def _assert_same_market_data(replayed, recorded):
+    assert replayed.keys() == recorded.keys()
+    for name, value in recorded.items():
+        if name == 'timestamp':
+            continue
+        if name == 'candles':
+            assert np.array_equal(replayed['candles'].closes, value.closes)
+            assert np.array_equal(replayed['candles'].timestamps, value.timestamps)
+        else:
+            assert replayed[name] == value, name
+
+def test_replay_matches_recorded_session():
+    """Phát lại cho cùng market data, gap / resync như phiên gốc, không request network nào"""
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / 'session.jsonl.gz'
+        market_data, price, recorded_stats, counter = asyncio.run(
+            _record(path, drop_after=20, skip_on_reconnect=10)
+        )
+        results, stats, stream_stats, connections = asyncio.run(_replay(path))
+        
+        with gzip.open(path, 'rt') as f:
+            header = json.loads(f.readline())
+            kinds = [json.loads(line)[1] for line in f]
+    
+    assert header['version'] == 1 and kinds[0] == 'start_streaming'
+    assert kinds.count('rest') == sum(counter.values())
+    assert kinds.count('stream') == recorded_stats['messages'] + 2  # + 2 response SUBSCRIBE
+    
+    assert recorded_stats['gaps'] >= 1 and counter['depth'] >= 2
+    _assert_same_market_data(results[0], market_data)
+    assert results[1] == price
+    assert stream_stats['gaps'] == recorded_stats['gaps']
+    assert stream_stats['messages'] == recorded_stats['messages']
+    assert stats['cycles'] == 1 and stats['rest_missing'] == 0
+    assert stats['rest_served'] == sum(counter.values())
+    assert connections['requests'] == 0
+
+def test_replayer_responses_and_clock():
+    """Response theo thứ tự ghi, hết thì lặp lại response cuối; không có => 503; clock theo bản ghi"""
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / 'session.jsonl.gz'
+        recorder = SessionRecorder(path)
+        recorder.record_response('/ticker/price', {'symbol': 'BTCUSDT'}, 200, b'{"price":"1"}')
+        recorder.record_response('/ticker/price', {'symbol': 'BTCUSDT'}, 200, b'{"price":"2"}')
+        recorder.record_response('/ping', None, 502, b'Bad Gateway')
+        recorder.close()
+        
+        replayer = SessionReplayer(path)
+    
+    async def read(path, params=None):
+        response = replayer.response(path, params)
+        return response.status, await response.text()
+    
+    assert asyncio.run(read('/ticker/price', {'symbol': 'BTCUSDT'})) == (200, '{"price": "1"}')
+    assert asyncio.run(replayer.response('/ticker/price', {'symbol': 'BTCUSDT'}).json()) == {'price': '2'}
+    assert asyncio.run(read('/ticker/price', {'symbol': 'BTCUSDT'}))[0] == 200
+    assert asyncio.run(read('/ping')) == (502, 'Bad Gateway')
+    assert asyncio.run(read('/ticker/price', {'symbol': 'ETHUSDT'}))[0] == 503
+    assert (replayer.stats['rest_served'], replayer.stats['rest_repeated'], replayer.stats['rest_missing']) == (3, 1, 1)
+    assert replayer.clock() == (replayer.started_ms + replayer.offset_ms) / 1000
+    
+    collector = DataCollector()
+    replayer.attach(collector)
+    assert collector.replayer is replayer and collector.cache.clock() == replayer.clock()
+
+def test_seeded_engines_repeat():
+    """Cùng seed => AITradingEngine / ContinuousAIAnalyzer cho cùng chuỗi kết quả"""
+    first, second = AITradingEngine(seed=7), AITradingEngine(seed=7)
+    for _ in range(3):
+        assert first.calculate_technical_indicators(45000) == second.calculate_technical_indicators(45000)
+        assert first._calculate_timing('15m', 'BUY', 'morning_session') == second._calculate_timing('15m', 'BUY', 'morning_session')
+    
+    first, second = ContinuousAIAnalyzer(seed=7), ContinuousAIAnalyzer(seed=7)
+    for _ in range(3):
+        first._update_market_indicators()
+        second._update_market_indicators()
+    assert first.indicators == second.indicators
+    assert AITradingEngine(seed=8).calculate_technical_indicators(45000) != \
+        AITradingEngine(seed=7).calculate_technical_indicators(45000)
+
+if __name__ == "__main__":
+    TRADES = 5000
+    
+    with tempfile.TemporaryDirectory() as root:
+        path = Path(root) / 'session.jsonl.gz'
+        started = time.perf_counter()
+        market_data, price, recorded_stats, counter = asyncio.run(_record(path, trades=TRADES))
+        recorded = time.perf_counter() - started
+        size = path.stat().st_size
+        results, stats, stream_stats, connections = asyncio.run(_replay(path))
+    
+    print(f"🎞️ SESSION REPLAY - {recorded_stats['messages']:,} stream messages + {sum(counter.values())} REST responses")
+    print("=" * 40)
+    print(f"   Ghi: {recorded:.2f}s | file {size / 1024:.0f} KB ({size / stats['events']:.1f} bytes/event)")
+    print(f"   Phát lại tối đa: {stats['elapsed']:.2f}s ({stats['events'] / stats['elapsed']:,.0f} events/s)")
+    print(f"   Market data khớp: {results[0]['price'] == market_data['price'] and results[0]['rsi'] == market_data['rsi']}")
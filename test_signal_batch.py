@@ -0,0 +1,115 @@
+"""
+Kiểm tra SignalGenerator.generate_signals_batch - cùng action / confidence với generate_signals từng symbol
+"""
+
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from test_backtest import _candles
+from trading.signals import BATCH_FIELDS, SignalGenerator
+
+logging.getLogger('trading.signals').setLevel(logging.CRITICAL)  # log mỗi lần gọi, kể cả lỗi price = 0 cố ý
+
+def _markets(count: int, seed: int = 5):
+    """Market data ngẫu nhiên quanh các ngưỡng (RSI 30 / 70, volume 0.5x / 1.5x, S/R 2%, imbalance ±0.3)"""
+    rng = np.random.default_rng(seed)
+    candles = _candles(400, seed=seed)
+    markets = []
+    for i in range(count):
+        price = float(rng.choice([40000, 40000 + rng.normal(0, 500)]))
+        sma_20 = price * (1 + rng.choice([-0.01, 0, 0.01]))
+        market_data = {
+            'price': price,
+            'rsi': float(rng.choice([30, 70, 20, 80, rng.uniform(0, 100)])),
+            'macd': {'macd': rng.normal(), 'signal': rng.normal(), 'histogram': float(rng.choice([-1, 0, 1]))},
+            'moving_averages': {
+                'sma_20': sma_20, 'sma_50': sma_20 * (1 + rng.choice([-0.01, 0.01])),
+                'ema_12': price + rng.choice([-1, 0, 1]), 'ema_26': price, 'current_price': price
+            },
+            'volume': float(rng.choice([0, 100, 160, 40])),
+            'avg_volume': float(rng.choice([0, 100])),
+            'support_levels': sorted(price * (1 - rng.uniform(0, 0.05, rng.integers(0, 6)))),
+            'resistance_levels': sorted(price * (1 + rng.uniform(0, 0.05, rng.integers(0, 6))))
+        }
+        if i % 3 == 0:
+            market_data['candles'] = candles.slice(i % 200, i % 200 + 100)
+        if i % 4 == 0:
+            market_data['liquidity'] = {
+                'imbalance': float(rng.choice([0.3, -0.3, 0.5, -0.7, rng.uniform(-1, 1)])),
+                'bid_depth': float(rng.choice([0, 1e6])), 'ask_depth': 1e6, 'depth_percent': 1
+            }
+        elif i % 4 == 1:
+            market_data['liquidity'] = None
+        if i % 50 == 7:
+            market_data = {'price': 0, 'resistance_levels': [1.0]}  # generate_signals lỗi => neutral
+        elif i % 50 == 9:
+            market_data = {}
+        markets.append(market_data)
+    return markets
+
+def test_batch_matches_per_symbol():
+    """Từng symbol: action giống và confidence bằng đúng từng bit như generate_signals"""
+    generator = SignalGenerator()
+    markets = _markets(600)
+    result = generator.generate_signals_batch(*generator.batch_matrix(markets))
+    
+    expected = [asyncio.run(generator.generate_signals(market_data)) for market_data in markets]
+    assert result['action'].tolist() == [signal['action'] for signal in expected]
+    assert result['confidence'].tolist() == [signal['confidence'] for signal in expected]
+    assert set(result['action']) == {'BUY', 'SELL', 'HOLD'}
+    assert result['direction'].tolist() == [{'BUY': 1, 'SELL': -1, 'HOLD': 0}[action] for action in result['action']]
+
+def test_batch_uses_generator_settings():
+    """Ngưỡng RSI lấy từ settings của generator (như Backtester params); thiếu S/R levels vẫn chạy"""
+    generator = SignalGenerator()
+    generator.settings.RSI_OVERSOLD, generator.settings.RSI_OVERBOUGHT = 40, 60
+    markets = _markets(200, seed=11)
+    for market_data in markets:
+        market_data.pop('support_levels', None)
+        market_data.pop('resistance_levels', None)
+    
+    values, supports, resistances = generator.batch_matrix(markets)
+    assert values.shape == (len(BATCH_FIELDS), 200) and supports.shape == (200, 0)
+    result = generator.generate_signals_batch(values)
+    expected = [asyncio.run(generator.generate_signals(market_data)) for market_data in markets]
+    assert result['action'].tolist() == [signal['action'] for signal in expected]
+    assert result['confidence'].tolist() == [signal['confidence'] for signal in expected]
+
+if __name__ == "__main__":
+    SYMBOLS = 200
+    RUNS = 1000
+    
+    generator = SignalGenerator()
+    markets = _markets(SYMBOLS)
+    inputs = generator.batch_matrix(markets)
+    
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        generator.generate_signals_batch(*inputs)
+    batch_ms = (time.perf_counter() - started) / RUNS * 1000
+    
+    started = time.perf_counter()
+    generator.batch_matrix(markets)
+    matrix_ms = (time.perf_counter() - started) * 1000
+    
+    async def per_symbol():
+        for market_data in markets:
+            await generator.generate_signals(market_data)
+    started = time.perf_counter()
+    asyncio.run(per_symbol())
+    loop_ms = (time.perf_counter() - started) * 1000
+    
+    print(f"🧮 SIGNAL BATCH - {SYMBOLS} symbols")
+    print("=" * 40)
+    print(f"   generate_signals_batch: {batch_ms:.3f}ms / lần")
+    print(f"   batch_matrix (từ market data dicts): {matrix_ms:.2f}ms")
+    print(f"   generate_signals từng symbol: {loop_ms:.2f}ms ({loop_ms / batch_ms:.0f}x chậm hơn)")
@@ -0,0 +1,165 @@
+"""
+Kiểm tra SnapshotBuffer - snapshot cuối mỗi giây + OHLC mỗi phút, ghi theo lô, flush khi dừng
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager
+from data.snapshot_buffer import SnapshotBuffer
+from data.stream import BinanceStream
+from test_helpers import with_database
+
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+
+def _updates(seconds: int, per_second: int = 10, symbols=('BTCUSDT', 'ETHUSDT'), seed: int = 1):
+    """per_second updates / giây / symbol, giá random walk"""
+    rng = random.Random(seed)
+    prices = {symbol: 40000.0 for symbol in symbols}
+    for i in range(seconds * per_second):
+        for symbol in symbols:
+            prices[symbol] = round(prices[symbol] + rng.uniform(-5, 5), 2)
+            yield {'timestamp': START_MS + i * 1000 // per_second, 'symbol': symbol, 'price': prices[symbol],
+                   'volume': 100.0 + i, 'rsi': 50.0, 'macd': {'histogram': 0.1}}
+
+def test_downsample_last_per_second_and_ohlc():
+    """Snapshot cuối mỗi giây và OHLC mỗi phút khớp với tính trực tiếp từ toàn bộ updates"""
+    async def scenario(db):
+        buffer = SnapshotBuffer(db, resolution_ms=1000, ohlc_ms=60_000)
+        updates = list(_updates(150))
+        for update in updates:
+            assert buffer.add(update)
+        assert not buffer.add(dict(updates[0]))  # Giây đã chốt => late
+        await buffer.close()
+        
+        metrics = buffer.metrics()
+        assert metrics['received'] == len(updates) + 1 and metrics['late'] == 1
+        assert metrics['written'] == 300 and metrics['coalesced'] == len(updates) - 300
+        assert metrics['ohlc_written'] == 6 and metrics['queue_depth'] == 0
+        
+        last_per_second = {}
+        for update in updates:
+            last_per_second[(update['symbol'], update['timestamp'] // 1000)] = update
+        rows = await db.get_market_data('BTCUSDT', limit=1000)
+        assert len(rows) == 150
+        for row in rows:
+            expected = last_per_second[('BTCUSDT', row['timestamp'] // 1000)]
+            assert row['timestamp'] == expected['timestamp'] and row['price'] == expected['price']
+        
+        bars = await db.get_ohlc('ETHUSDT', 60_000)
+        assert [bar['timestamp'] for bar in bars] == [START_MS, START_MS + 60_000, START_MS + 120_000]
+        for bar in bars:
+            prices = [u['price'] for u in updates
+                      if u['symbol'] == 'ETHUSDT' and bar['timestamp'] <= u['timestamp'] < bar['timestamp'] + 60_000]
+            assert (bar['open'], bar['high'], bar['low'], bar['close'], bar['samples']) == \
+                (prices[0], max(prices), min(prices), prices[-1], len(prices))
+        
+        # Phút 3 (đang dở lúc close) tiếp tục sau khi chạy lại => bar được gộp, không ghi trùng
+        resumed = SnapshotBuffer(db, resolution_ms=1000, ohlc_ms=60_000)
+        resumed.add({'timestamp': START_MS + 170_000, 'symbol': 'ETHUSDT', 'price': 1.0})
+        await resumed.close()
+        merged = (await db.get_ohlc('ETHUSDT', 60_000))[-1]
+        assert merged['low'] == 1.0 and merged['close'] == 1.0 and merged['open'] == bars[-1]['open']
+        assert merged['samples'] == bars[-1]['samples'] + 1
+    
+    asyncio.run(with_database(scenario))
+
+def test_flush_thresholds_and_overflow():
+    """Ghi nền khi đủ flush_rows hoặc sau flush_seconds; hàng đợi đầy thì bỏ rows cũ nhất"""
+    async def scenario(db):
+        buffer = SnapshotBuffer(db, resolution_ms=0, ohlc_ms=0, flush_rows=50, flush_seconds=30)
+        await buffer.start()
+        for update in _updates(10, symbols=('BTCUSDT',)):
+            buffer.add(update)
+        await asyncio.sleep(0.1)
+        assert buffer.stats['written'] == 100 and buffer.stats['flushes'] == 1  # Theo kích thước, trước 30s
+        
+        buffer.flush_seconds = 0.05
+        buffer._wake.set()  # Áp dụng timeout mới
+        await asyncio.sleep(0.05)
+        buffer.add({'timestamp': START_MS + 20_000, 'symbol': 'BTCUSDT', 'price': 1.0})
+        await asyncio.sleep(0.2)
+        assert buffer.stats['written'] == 101 and buffer.queue_depth == 0  # Theo thời gian
+        await buffer.close()
+        
+        # Database không theo kịp (buffer chưa start): giữ max_pending rows mới nhất
+        slow = SnapshotBuffer(db, resolution_ms=0, ohlc_ms=0, flush_rows=10_000, max_pending=30)
+        for update in _updates(10, symbols=('ETHUSDT',)):
+            slow.add(update)
+        assert slow.queue_depth == 30 and slow.stats['overflow'] == 70
+        assert not slow.add({'symbol': 'ETHUSDT', 'price': None})
+        await slow.close()
+        assert slow.metrics()['dropped'] == 71
+        rows = await db.get_market_data('ETHUSDT')
+        assert rows[-1]['timestamp'] == START_MS + 7000
+    
+    asyncio.run(with_database(scenario))
+
+def test_stream_updates_feed_buffer():
+    """BinanceStream gọi on_update sau message giá (không phải depth); close ghi nốt"""
+    async def scenario(db):
+        buffer = SnapshotBuffer(db)
+        stream = BinanceStream(None, ['BTCUSDT'], interval='1h', on_update=buffer.add_state)
+        for i in range(30):
+            await stream._handle_message({'stream': 'btcusdt@aggTrade', 'data': {
+                'E': START_MS + i * 100, 'a': i + 1, 'p': str(46000 + i), 'q': '0.01', 'T': START_MS + i * 100, 'm': False
+            }})
+            await stream._handle_message({'stream': 'btcusdt@depth@100ms', 'data': {
+                'E': START_MS + i * 100, 'U': i + 1, 'u': i + 1, 'b': [], 'a': []
+            }})
+        assert buffer.stats['received'] == 30
+        await buffer.close()
+        
+        rows = await db.get_market_data('BTCUSDT')
+        assert [row['price'] for row in rows] == [46029.0, 46019.0, 46009.0]
+        assert (await db.get_ohlc('BTCUSDT'))[0]['high'] == 46029.0
+    
+    asyncio.run(with_database(scenario))
+
+if __name__ == "__main__":
+    SECONDS = 600
+    PER_SECOND = 20
+    SYMBOLS = ('BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'BNBUSDT', 'XRPUSDT')
+    
+    async def benchmark():
+        updates = list(_updates(SECONDS, PER_SECOND, SYMBOLS))
+        results = {}
+        with tempfile.TemporaryDirectory() as root:
+            # Cách cũ: save_market_data cho mọi update
+            db = DatabaseManager(Path(root) / 'direct.db')
+            await db.initialize()
+            started = time.perf_counter()
+            for update in updates:
+                await db.save_market_data(update)
+            enqueue_s = time.perf_counter() - started
+            await db.backend.flush()
+            results['direct'] = (enqueue_s, time.perf_counter() - started, len(updates))
+            await db.close()
+            
+            db = DatabaseManager(Path(root) / 'buffered.db')
+            await db.initialize()
+            buffer = SnapshotBuffer(db)
+            await buffer.start()
+            started = time.perf_counter()
+            for update in updates:
+                buffer.add(update)
+            enqueue_s = time.perf_counter() - started
+            await buffer.close()
+            results['buffered'] = (enqueue_s, time.perf_counter() - started, buffer.stats['written'])
+            await db.close()
+        return len(updates), results
+    
+    total, results = asyncio.run(benchmark())
+    print(f"💾 SNAPSHOT BUFFER - {total:,} updates ({len(SYMBOLS)} symbols × {PER_SECOND}/s × {SECONDS}s)")
+    print("=" * 40)
+    for name, (enqueue_s, total_s, rows) in results.items():
+        print(f"   {name}: stream handler {enqueue_s / total * 1e6:.1f} µs/update | "
+              f"ghi xong {total_s:.2f}s | {rows:,} rows")
@@ -0,0 +1,197 @@
+"""
+Kiểm tra storage backends - chọn theo DATABASE_URL, PostgreSQL (pgserver nhúng) cùng hành vi với SQLite
+"""
+
+import asyncio
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pgserver
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.database import DatabaseManager
+from data.storage import PostgresBackend, SQLiteBackend, StorageBackend, _postgres_sql, create_backend
+
+START_MS = 1_704_067_200_000  # 2024-01-01 UTC
+SYMBOLS = ['BTC/USDT', 'ETH/USDT', 'SOL/USDT']
+INSERT = "INSERT INTO trades (timestamp, symbol, side, amount, price, cost, pnl, status) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+
+_server = None
+
+def _postgres_url(root: Path) -> str:
+    """PostgreSQL nhúng (pgserver), một database mới cho mỗi test"""
+    global _server
+    if _server is None:
+        _server = pgserver.get_server(tempfile.mkdtemp(prefix='pgtest-'), cleanup_mode='delete')
+    name = f"bot_{Path(root).name.lower().replace('-', '_')}"
+    _server.psql(f'CREATE DATABASE {name};')
+    return _server.get_uri(name)
+
+def _trades(count: int, seed: int = 7):
+    rng = random.Random(seed)
+    return [
+        (START_MS + i * 3_600_000, SYMBOLS[i % 3], 'sell', 0.1, 100.0, 10.0, round(rng.uniform(-50, 50), 2), 'closed')
+        for i in range(count)
+    ]
+
+def _assert_close(actual, expected, path='result'):
+    if isinstance(expected, dict):
+        assert sorted(actual) == sorted(expected), path
+        for key in expected:
+            _assert_close(actual[key], expected[key], f'{path}.{key}')
+    elif isinstance(expected, (list, tuple)):
+        assert len(actual) == len(expected), path
+        for i, (a, b) in enumerate(zip(actual, expected)):
+            _assert_close(a, b, f'{path}[{i}]')
+    else:
+        assert abs(actual - expected) < 1e-6, (path, actual, expected)
+
+def test_backend_from_url():
+    """sqlite:/// => SQLiteBackend, postgresql:// => PostgresBackend, '?' => $n"""
+    backend = create_backend('sqlite:///data/bot.db')
+    assert isinstance(backend, SQLiteBackend) and backend.path == Path('data/bot.db')
+    assert create_backend('sqlite:////tmp/bot.db').path == Path('/tmp/bot.db')
+    assert isinstance(create_backend('postgresql://bot@localhost/bot'), PostgresBackend)
+    assert isinstance(create_backend('postgres://bot@localhost/bot'), PostgresBackend)
+    for url in ('mysql://bot@localhost/bot', 'sqlite://'):
+        try:
+            create_backend(url)
+            assert False, f"expected ValueError for {url}"
+        except ValueError:
+            pass
+    
+    assert _postgres_sql('SELECT * FROM t WHERE a = ? AND b BETWEEN ? AND ?') == \
+        'SELECT * FROM t WHERE a = $1 AND b BETWEEN $2 AND $3'
+    assert isinstance(DatabaseManager(Path('bot.db')).backend, SQLiteBackend)
+    
+    # Backend thiếu method lỗi ngay khi khởi tạo, không phải giữa trading cycle
+    class PartialBackend(StorageBackend):
+        async def fetch(self, sql, params=()):
+            return []
+    
+    try:
+        PartialBackend()
+        assert False, "expected TypeError for incomplete backend"
+    except TypeError as e:
+        assert 'execute' in str(e)
+
+def test_postgres_matches_sqlite():
+    """Cùng thao tác trên SQLite và PostgreSQL cho cùng kết quả (stats, reconcile, COPY, retention)"""
+    async def scenario(db):
+        assert await db.initialize()
+        try:
+            trades = _trades(90)
+            await db.backend.executemany(INSERT, trades)
+            await db.save_trade({'timestamp': START_MS + 200 * 3_600_000, 'symbol': 'BTC/USDT', 'side': 'buy',
+                                 'amount': 0.5, 'price': 45000.0, 'cost': 22500.0, 'pnl': 75.5, 'status': 'closed',
+                                 'signal_data': {'rsi': 28}})
+            await db.backend.execute('DELETE FROM trades WHERE timestamp = ?', (trades[4][0],))
+            await db.backend.execute('UPDATE trades SET pnl = 999 WHERE timestamp = ?', (trades[8][0],))
+            await db.save_signal({'timestamp': START_MS, 'action': 'BUY', 'confidence': 0.8})
+            
+            old = [{'timestamp': START_MS + i, 'symbol': 'BTCUSDT', 'price': 40000.0 + i, 'volume': 1.0, 'rsi': 50.0,
+                    'macd': {'histogram': 0.1}} for i in range(25)]
+            recent = int(time.time() * 1000)
+            assert await db.save_market_data_many(old) == 25
+            await db.save_market_data({'timestamp': recent, 'symbol': 'BTCUSDT', 'price': 45000.0, 'trend': 'up'})
+            await db.backend.flush()
+            
+            stats = await db.get_performance_stats()
+            by_symbol = await db.get_performance_breakdown('symbol')
+            await db.backend.execute("UPDATE trade_stats SET max_drawdown = -1")
+            buckets = await db.reconcile_performance_stats()
+            
+            db.settings.DB_RETENTION_CHUNK = 10
+            deleted = await db.cleanup_old_data(days=30)
+            market = await db.get_market_data('BTCUSDT')
+            return {
+                'trades': [(t['timestamp'], t['pnl'], t['signal_data']) for t in await db.get_trades(limit=5)],
+                'signals': [(s['action'], bool(s['executed'])) for s in await db.get_signals()],
+                'stats': stats,
+                'by_symbol': by_symbol,
+                'reconciled': (buckets, await db.get_performance_stats(), await db.get_performance_breakdown('day')),
+                'deleted': deleted,
+                'market': [(m['price'], m['indicators']) for m in market]
+            }
+        finally:
+            await db.close()
+    
+    with tempfile.TemporaryDirectory() as root:
+        sqlite_result = asyncio.run(scenario(DatabaseManager(Path(root) / 'bot.db')))
+        postgres_result = asyncio.run(scenario(DatabaseManager(url=_postgres_url(root))))
+    
+    assert sqlite_result['deleted'] == 25 and sqlite_result['market'] == [(45000.0, {'trend': 'up'})]
+    assert sqlite_result['trades'][0] == (START_MS + 200 * 3_600_000, 75.5, {'rsi': 28})
+    for key in ('trades', 'signals', 'deleted', 'market'):
+        assert postgres_result[key] == sqlite_result[key], key
+    
+    _assert_close(postgres_result['stats'], sqlite_result['stats'])
+    _assert_close(postgres_result['by_symbol'], sqlite_result['by_symbol'])
+    _assert_close(postgres_result['reconciled'], sqlite_result['reconciled'])
+    assert postgres_result['stats']['best_trade'] == 999
+
+def test_postgres_concurrent_managers():
+    """Hai process (hai DatabaseManager) cùng migrate và ghi vào một database"""
+    async def scenario(url):
+        first, second = DatabaseManager(url=url), DatabaseManager(url=url)
+        assert all(await asyncio.gather(first.initialize(), second.initialize()))
+        try:
+            trades = _trades(200)
+            await asyncio.gather(
+                *(first.backend.executemany(INSERT, trades[i:i + 20]) for i in range(0, 100, 20)),
+                *(second.backend.executemany(INSERT, trades[i:i + 20]) for i in range(100, 200, 20))
+            )
+            stats = await second.get_performance_stats()
+            assert stats['total_trades'] == 200
+            assert abs(stats['total_pnl'] - sum(trade[6] for trade in trades)) < 1e-6
+            assert first.backend.metrics()['errors'] == 0
+        finally:
+            await first.close()
+            await second.close()
+    
+    with tempfile.TemporaryDirectory() as root:
+        asyncio.run(scenario(_postgres_url(root)))
+
+if __name__ == "__main__":
+    ROWS = 200_000
+    
+    async def benchmark(db):
+        await db.initialize()
+        records = [{'timestamp': START_MS + i * 1000, 'symbol': 'BTCUSDT', 'price': 45000.0 + i % 100,
+                    'volume': 1.0, 'rsi': 50.0, 'macd': {'histogram': 0.1}} for i in range(ROWS)]
+        
+        started = time.perf_counter()
+        for record in records[:5000]:
+            await db.save_market_data(record)
+        await db.backend.flush()
+        single_per_s = 5000 / (time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        for i in range(5000, ROWS, 10_000):
+            await db.save_market_data_many(records[i:i + 10_000])
+        bulk_per_s = (ROWS - 5000) / (time.perf_counter() - started)
+        
+        started = time.perf_counter()
+        for _ in range(200):
+            await db.get_market_data('BTCUSDT', START_MS + 100_000_000, START_MS + 100_060_000, limit=60)
+        query_ms = (time.perf_counter() - started) / 200 * 1000
+        await db.close()
+        return single_per_s, bulk_per_s, query_ms
+    
+    with tempfile.TemporaryDirectory() as root:
+        results = {
+            'SQLite': asyncio.run(benchmark(DatabaseManager(Path(root) / 'bot.db'))),
+            'PostgreSQL': asyncio.run(benchmark(DatabaseManager(url=_postgres_url(root))))
+        }
+    
+    print(f"🗄️ STORAGE BACKENDS - {ROWS:,} market data rows")
+    print("=" * 40)
+    for name, (single_per_s, bulk_per_s, query_ms) in results.items():
+        print(f"   {name}: từng row {single_per_s:,.0f} rows/s | bulk {bulk_per_s:,.0f} rows/s | "
+              f"query 1 phút {query_ms:.2f} ms")
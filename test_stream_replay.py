@@ -0,0 +1,196 @@
+"""
+Kiểm tra streaming mode của DataCollector - phát lại stream qua replay server local
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.collector import DataCollector
+from data.replay_server import StreamReplayServer
+from data.stream import BinanceStream
+
+HOUR_MS = 3_600_000
+START_MS = 1_700_000_000_000 - (1_700_000_000_000 % HOUR_MS)
+
+def _rest_kline(i: int):
+    open_time = START_MS + i * HOUR_MS
+    price = 45000 + i
+    return [open_time, str(price), str(price + 50), str(price - 50), str(price + 10), "10",
+            open_time + HOUR_MS - 1, "450000", 100, "5", "225000", "0"]
+
+def _build_messages(trades: int = 40):
+    """Tạo session stream giả lập: ticker, depth, aggTrade, kline cho BTCUSDT"""
+    messages = []
+    for i in range(trades):
+        price = 46000 + i
+        messages.append({'stream': 'btcusdt@aggTrade', 'data': {
+            'e': 'aggTrade', 'E': START_MS + i, 's': 'BTCUSDT', 'a': 1000 + i,
+            'p': str(price), 'q': '0.01', 'T': START_MS + i, 'm': i % 2 == 0
+        }})
+        messages.append({'stream': 'btcusdt@ticker', 'data': {
+            'e': '24hrTicker', 'E': START_MS + i, 's': 'BTCUSDT', 'c': str(price),
+            'h': '47000', 'l': '45000', 'v': '1234', 'q': '56000000', 'p': '800', 'P': '1.77'
+        }})
+        messages.append({'stream': 'btcusdt@depth@100ms', 'data': {
+            'e': 'depthUpdate', 'E': START_MS + i, 's': 'BTCUSDT', 'U': 5001 + i, 'u': 5001 + i,
+            'b': [[str(price - 1), '1.5'], [str(price - 2), '0']],
+            'a': [[str(price + 1), '2.5'], [str(price), '0']]
+        }})
+        messages.append({'stream': 'btcusdt@kline_1h', 'data': {
+            'e': 'kline', 'E': START_MS + i, 's': 'BTCUSDT', 'k': {
+                't': START_MS + 100 * HOUR_MS, 'T': START_MS + 101 * HOUR_MS - 1, 's': 'BTCUSDT',
+                'i': '1h', 'o': '46000', 'c': str(price), 'h': str(price + 5), 'l': '45990',
+                'v': str(1 + i), 'n': i + 1, 'x': False, 'q': '46000'
+            }
+        }})
+        # Stream không subscribe - server phải bỏ qua
+        messages.append({'stream': 'ethusdt@ticker', 'data': {}})
+    return messages
+
+async def _start_stub_rest(counter: dict):
+    """Stub REST cho bootstrap / resync klines, trades và depth snapshot"""
+    async def klines(request):
+        counter['klines'] += 1
+        limit = int(request.query.get('limit', 100))
+        return web.json_response([_rest_kline(i) for i in range(limit)])
+    
+    async def trades(request):
+        counter['trades'] += 1
+        return web.json_response([{'price': '46000', 'qty': '0.1', 'time': START_MS, 'isBuyerMaker': True}])
+    
+    async def depth(request):
+        # Snapshot đầu tiên ở update id 5000; snapshot sau (resync) là trạng thái cuối phiên
+        counter['depth'] += 1
+        if counter['depth'] == 1:
+            return web.json_response({'lastUpdateId': 5000, 'bids': [['45998', '1'], ['45900', '3']],
+                                      'asks': [['46000', '1'], ['46100', '3']]})
+        return web.json_response({'lastUpdateId': 5040, 'bids': [['46038', '1.5'], ['45900', '3']],
+                                  'asks': [['46040', '2.5'], ['46100', '3']]})
+    
+    async def other(request):
+        counter['other'] += 1
+        return web.json_response({}, status=500)
+    
+    app = web.Application()
+    app.router.add_get('/api/v3/klines', klines)
+    app.router.add_get('/api/v3/trades', trades)
+    app.router.add_get('/api/v3/depth', depth)
+    app.router.add_get('/api/v3/{tail:.*}', other)
+    
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}/api/v3"
+
+async def _run_replay(**server_options):
+    counter = {'klines': 0, 'trades': 0, 'depth': 0, 'other': 0}
+    rest_runner, rest_url = await _start_stub_rest(counter)
+    server = StreamReplayServer(_build_messages(), **server_options)
+    ws_url = await server.start()
+    
+    collector = DataCollector()
+    collector.api_endpoints['binance'] = rest_url
+    
+    try:
+        assert await collector.start_streaming(['BTCUSDT'], interval='1h', ws_url=ws_url)
+        await asyncio.wait_for(server.finished.wait(), timeout=10)
+        await asyncio.sleep(0.2)
+        
+        rest_calls_before = dict(counter)
+        market_data = await collector.get_market_data('BTCUSDT')
+        assert counter == rest_calls_before, "Streaming mode không được gọi REST"
+        
+        return collector.stream.stats, server, counter, market_data
+    finally:
+        await collector.close()
+        await server.stop()
+        await rest_runner.cleanup()
+
+def test_market_data_served_from_stream_state():
+    """get_market_data đọc từ state in-memory, không cần REST round trip"""
+    stats, server, counter, market_data = asyncio.run(_run_replay())
+    
+    assert stats['gaps'] == 0
+    assert counter['klines'] == 1  # Chỉ bootstrap
+    assert counter['depth'] == 1  # Một snapshot, sau đó chỉ diff
+    assert counter['other'] == 0
+    assert market_data['price'] == 46039.0
+    assert market_data['bid_price'] == 46038.0
+    assert market_data['ask_price'] == 46040.0
+    assert market_data['liquidity']['bid_levels'] == 2  # Level cũ bị xóa bởi qty 0
+    assert market_data['liquidity']['ask_depth'] == 46040 * 2.5 + 46100 * 3
+    assert market_data['high_24h'] == 47000.0
+    assert market_data['rsi'] != 50.0  # Indicators tính trên klines bootstrap + stream
+    assert server.subscriptions[0] == [
+        'btcusdt@ticker', 'btcusdt@depth@100ms', 'btcusdt@aggTrade', 'btcusdt@kline_1h'
+    ]
+
+def test_reconnect_resubscribes_and_detects_gap():
+    """Mất kết nối => reconnect, SUBSCRIBE lại, phát hiện gap và resync qua REST"""
+    stats, server, counter, market_data = asyncio.run(
+        _run_replay(drop_after=20, skip_on_reconnect=10)
+    )
+    
+    assert stats['reconnects'] == 1
+    assert len(server.subscriptions) == 2
+    assert server.subscriptions[0] == server.subscriptions[1]
+    assert stats['gaps'] >= 1
+    assert counter['trades'] >= 1  # Resync trades sau gap aggTrade id
+    assert counter['depth'] >= 2  # Snapshot mới sau gap depth update id
+    assert market_data['price'] == 46039.0
+    assert market_data['bid_price'] == 46038.0
+
+def test_resync_does_not_block_message_loop():
+    """Snapshot chậm chạy nền: message vẫn được xử lý, một resync mỗi (symbol, kind), diff chờ được áp sau snapshot"""
+    async def run():
+        calls = []
+        release = asyncio.Event()
+        
+        async def on_gap(symbol, kind):
+            calls.append((symbol, kind))
+            state.book.snapshot_pending = True
+            await release.wait()
+            state.book.load_snapshot(1, [['100', '1']], [['101', '1']])
+        
+        stream = BinanceStream(None, ['BTCUSDT', 'ETHUSDT'], interval='1m', on_gap=on_gap)
+        state = stream.get_state('BTCUSDT')
+        
+        def depth(symbol, update_id, bids):
+            return {'stream': f'{symbol}@depth@100ms', 'data': {
+                'e': 'depthUpdate', 'E': 0, 'U': update_id, 'u': update_id, 'b': bids, 'a': []
+            }}
+        
+        for update_id in range(2, 6):
+            await asyncio.wait_for(stream._handle_message(depth('btcusdt', update_id, [[str(95 + update_id), '2']])),
+                                   timeout=0.1)
+        await asyncio.wait_for(stream._handle_message({'stream': 'ethusdt@aggTrade', 'data': {
+            'a': 1, 'p': '3000', 'q': '1', 'T': 0, 'm': False}}), timeout=0.1)
+        assert stream.get_state('ETHUSDT').price == 3000.0  # Symbol khác không chờ snapshot BTCUSDT
+        
+        await asyncio.sleep(0)
+        assert calls == [('BTCUSDT', 'depth')] and not state.book.is_synced
+        release.set()
+        await stream.wait_resync('BTCUSDT', 'depth')
+        await stream.stop()
+        return state.book, stream.stats
+    
+    book, stats = asyncio.run(run())
+    assert book.last_update_id == 5 and book.best_bid() == (100.0, 2.0)
+    assert stats['resyncs'] == 1
+
+if __name__ == "__main__":
+    stats, server, counter, market_data = asyncio.run(_run_replay(drop_after=20, skip_on_reconnect=10))
+    print("📡 STREAM REPLAY")
+    print("=" * 40)
+    print(f"   Stream stats: {stats}")
+    print(f"   REST calls: {counter}")
+    print(f"   Price: ${market_data['price']:,.2f} | RSI: {market_data['rsi']:.2f}")
@@ -0,0 +1,181 @@
+"""
+Kiểm tra vùng Support/Resistance - pivot vectorized, gom vùng theo lần chạm / volume, cập nhật dần khớp tính lại
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from ai_engine.puter_client import PuterAIClient
+from data.collector import DataCollector
+from data.levels import SupportResistance, _cluster, _select, detect, pivot_points, zone_levels
+from data.stream import MarketState
+from test_backtest import _candles
+from trading.signals import SignalGenerator
+
+def _legacy_pivots(highs: list, lows: list):
+    """Vòng lặp cũ của calculate_support_resistance: pivot 2 bars mỗi bên"""
+    supports, resistances = [], []
+    for i in range(2, len(lows) - 2):
+        if lows[i] < lows[i-1] and lows[i] < lows[i-2] and lows[i] < lows[i+1] and lows[i] < lows[i+2]:
+            supports.append((i, lows[i]))
+        if highs[i] > highs[i-1] and highs[i] > highs[i-2] and highs[i] > highs[i+1] and highs[i] > highs[i+2]:
+            resistances.append((i, highs[i]))
+    return supports, resistances
+
+def _legacy_levels(candles, window: int = 50) -> dict:
+    """calculate_support_resistance cũ: top 5 theo giá (không theo độ mạnh) trong 50 candles cuối"""
+    candles = candles.tail(window)
+    supports, resistances = _legacy_pivots(candles.highs.tolist(), candles.lows.tolist())
+    return {'support': sorted({price for _, price in supports})[-5:],
+            'resistance': sorted({price for _, price in resistances})[-5:]}
+
+def _kline(candles, i: int, fraction: float = 1.0) -> dict:
+    """Message kline của candle i, đang chạy (fraction < 1: high / low mới đi được một phần) hoặc đã đóng"""
+    open_price, close = candles.opens.item(i), candles.closes.item(i)
+    high = open_price + (candles.highs.item(i) - open_price) * fraction
+    low = open_price - (open_price - candles.lows.item(i)) * fraction
+    return {'k': {
+        't': int(candles.timestamps[i]), 'T': int(candles.column('close_time')[i]), 'o': str(open_price),
+        'h': str(high), 'l': str(low), 'c': str(close if fraction == 1 else open_price),
+        'v': str(candles.volumes.item(i) * fraction), 'q': '0', 'n': 100, 'x': fraction == 1
+    }}
+
+def test_pivots_match_legacy_loop():
+    """find_pivots giống vòng lặp cũ, kể cả giá bằng nhau (làm tròn) - không tính là pivot"""
+    candles = _candles(3000)
+    for decimals in (None, -1):
+        highs = candles.highs if decimals is None else np.round(candles.highs, decimals)
+        lows = candles.lows if decimals is None else np.round(candles.lows, decimals)
+        index, prices, volumes = pivot_points(highs, lows, candles.volumes)
+        supports, resistances = _legacy_pivots(highs.tolist(), lows.tolist())
+        
+        expected = sorted(supports + resistances, key=lambda pivot: pivot[0])
+        assert sorted(zip(index.tolist(), prices.tolist()), key=lambda pivot: pivot[0]) == expected
+        assert np.array_equal(volumes, candles.volumes[index])
+        assert np.all(np.diff(index) >= 0)
+
+def test_zones_weighted_by_touches_and_volume():
+    """Vùng rộng tối đa tolerance từ pivot thấp nhất; strength theo lần chạm và volume; chọn vùng mạnh nhất"""
+    prices = np.array([[100.0, 100.2, 100.25, 101.0, 100.1, 100.5, np.nan]])
+    volumes = np.array([[1.0, 1.0, 2.0, 1.0, 4.0, 1.0, 0.0]])
+    zones = _cluster(prices, volumes, 0.003)
+    
+    # 100.5 nối tiếp 100.25 (< 0.3%) nhưng cách 100 quá 0.3% => vùng mới
+    assert zones['touches'].tolist() == [[4, 1, 1]]
+    assert zones['low'].tolist() == [[100.0, 100.5, 101.0]] and zones['high'].tolist() == [[100.25, 100.5, 101.0]]
+    assert zones['volume'].tolist() == [[8.0, 1.0, 1.0]]
+    assert abs(zones['price'][0, 0] - (100 + 100.1 * 4 + 100.2 + 100.25 * 2) / 8) < 1e-9
+    mean_volume = 10 / 6
+    assert np.allclose(zones['strength'][0], [(4 + 8 / mean_volume) / 2, (1 + 1 / mean_volume) / 2,
+                                              (1 + 1 / mean_volume) / 2])
+    
+    # Vùng 100.1 xa giá hơn nhưng mạnh hơn vùng 100.5; cùng strength thì vùng gần giá trước
+    support, resistance = _select(zones, np.array([100.7]), 1)
+    assert support.tolist() == [[0]] and resistance.tolist() == [[2]]
+    support, _ = _select(zones, np.array([101.5]), 2)
+    assert support.tolist() == [[0, 2]]
+    
+    candles = _candles(800)
+    levels = detect(candles)
+    assert len(levels['support']) == len(levels['resistance']) == 5 and levels['support'] == sorted(levels['support'])
+    assert max(levels['support']) < candles.closes[-1] < min(levels['resistance'])
+    assert [zone['price'] for zone in levels['zones']] == sorted(levels['support'] + levels['resistance'])
+    assert all(zone['low'] <= zone['price'] <= zone['high'] <= zone['low'] * 1.003 for zone in levels['zones'])
+
+def test_incremental_matches_batch():
+    """SupportResistance cập nhật theo candle (cả candle đang chạy) = detect / zone_levels tính lại từ đầu"""
+    candles = _candles(2000)
+    state = MarketState('BTCUSDT', '1m')
+    state.set_candles(candles.slice(0, 100).copy())
+    
+    bars = np.arange(100, 2000)
+    supports, resistances = zone_levels(candles, bars, 100)
+    for i in bars.tolist():
+        state.apply_kline(_kline(candles, i, 0.5))
+        state.apply_agg_trade({'a': i, 'p': str(candles.highs.item(i)), 'q': '0.1',
+                               'T': int(candles.timestamps[i]) + 1000, 'm': False})
+        assert state.support_resistance == detect(state.candles.window(), state.price)
+        state.apply_kline(_kline(candles, i))
+        
+        expected = detect(candles.slice(i - 99, i + 1))
+        assert state.levels.levels() == expected
+        row = i - 100
+        assert [level for level in supports[row] if level == level] == expected['support']
+        assert [level for level in resistances[row] if level == level] == expected['resistance']
+    
+    # Chỉ gom lại khi tập pivots đổi
+    assert state.levels.stats['clusters'] < len(bars) * 2
+    assert DataCollector().calculate_support_resistance(candles.slice(1900, 2000), state.price) == state.support_resistance
+
+def test_signals_and_ai_use_zones():
+    """Vùng chạm nhiều lần => STRONG / key factor; action và confidence không đổi so với chỉ có levels"""
+    zones = [{'price': 99.5, 'low': 99.4, 'high': 99.6, 'touches': 4, 'volume': 10.0, 'strength': 5.0, 'side': 'support'},
+             {'price': 104.0, 'low': 104.0, 'high': 104.0, 'touches': 1, 'volume': 1.0, 'strength': 0.8,
+              'side': 'resistance'}]
+    generator = SignalGenerator()
+    plain = generator._analyze_support_resistance(100, [99.5], [104.0])
+    zoned = generator._analyze_support_resistance(100, [99.5], [104.0], zones)
+    assert plain['action'] == zoned['action'] == 'BUY'
+    assert (plain['strength'], zoned['strength']) == ('MEDIUM', 'STRONG') and '4 touches' in zoned['reason']
+    
+    market_data = {'price': 100, 'rsi': 50, 'support_levels': [99.5], 'resistance_levels': [104.0]}
+    client = PuterAIClient()
+    plain = asyncio.run(client._analyze_with_puter('', market_data))
+    zoned = asyncio.run(client._analyze_with_puter('', {**market_data, 'sr_zones': zones}))
+    assert (plain['action'], plain['confidence']) == (zoned['action'], zoned['confidence'])
+    assert 'strong_support_zone' in zoned['key_factors'] and 'strong_support_zone' not in plain['key_factors']
+    assert '4 lần chạm' in client._create_market_analysis_prompt({**market_data, 'sr_zones': zones})
+
+if __name__ == "__main__":
+    CANDLES = 100_000
+    SAMPLES = 2000
+    candles = _candles(CANDLES)
+    
+    started = time.perf_counter()
+    _legacy_pivots(candles.highs.tolist(), candles.lows.tolist())
+    legacy_ms = (time.perf_counter() - started) * 1000
+    started = time.perf_counter()
+    levels = detect(candles)
+    detect_ms = (time.perf_counter() - started) * 1000
+    
+    # Mỗi bar (backtest): detect trên 100 candles cuối vs zone_levels cả chuỗi
+    sample = np.linspace(100, CANDLES - 1, SAMPLES).astype(int).tolist()
+    started = time.perf_counter()
+    for i in sample:
+        detect(candles.slice(i - 99, i + 1))
+    per_bar_ms = (time.perf_counter() - started) / SAMPLES * 1000
+    started = time.perf_counter()
+    zone_levels(candles, np.arange(100, CANDLES), 100)
+    vector_ms = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    for i in sample:
+        _legacy_levels(candles.slice(i - 99, i + 1))
+    legacy_bar_ms = (time.perf_counter() - started) / SAMPLES * 1000
+    
+    # Stream: mỗi candle đóng chỉ kiểm tra một bar
+    detector = SupportResistance(100).load(candles.slice(0, 100))
+    started = time.perf_counter()
+    for i in range(100, CANDLES):
+        detector.update(candles.slice(i, i + 1))
+        detector.levels()
+    incremental_us = (time.perf_counter() - started) / (CANDLES - 100) * 1e6
+    
+    print(f"🧱 SUPPORT / RESISTANCE - {CANDLES:,} candles")
+    print("=" * 40)
+    print(f"   Vòng lặp pivot cũ trên cả lịch sử: {legacy_ms:.1f}ms")
+    print(f"   detect() cả lịch sử (pivot + gom vùng): {detect_ms:.1f}ms "
+          f"({len(levels['zones'])} vùng, mạnh nhất {max(zone['touches'] for zone in levels['zones'])} lần chạm)")
+    print(f"   Mỗi bar: calculate_support_resistance cũ {legacy_bar_ms * 1000:.0f}µs, detect() {per_bar_ms * 1000:.0f}µs")
+    print(f"   zone_levels mọi bar: {vector_ms:.0f}ms (detect từng bar ~{per_bar_ms * CANDLES / 1000:.1f}s, "
+          f"{per_bar_ms * CANDLES / vector_ms:.0f}x)")
+    print(f"   SupportResistance.update + levels mỗi candle: {incremental_us:.0f}µs "
+          f"({detector.stats['clusters']:,} lần gom vùng / {CANDLES - 100:,} candles)")
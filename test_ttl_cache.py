@@ -0,0 +1,122 @@
+"""
+Kiểm tra TTLCache - hit/miss, stale-while-revalidate, request coalescing với stub Binance REST
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data.cache import TTLCache
+from test_helpers import stub_collector
+
+def _routes(state: dict):
+    """Stub /ticker/price chậm state['delay'] giây, đếm số request"""
+    async def handler(request):
+        state['requests'] += 1
+        await asyncio.sleep(state['delay'])
+        return web.json_response({'symbol': request.query['symbol'], 'price': str(state['price'])})
+    
+    return {'/ticker/price': handler}
+
+def test_concurrent_callers_share_one_request():
+    """N caller đồng thời cùng symbol => 1 request, sau đó hit cache"""
+    async def run():
+        state = {'requests': 0, 'delay': 0.05, 'price': 45123.5}
+        async with stub_collector(_routes(state)) as collector:
+            prices = await asyncio.gather(*(collector.get_current_price('BTCUSDT') for _ in range(20)))
+            assert prices == [45123.5] * 20
+            assert state['requests'] == 1
+            
+            await collector.get_current_price('BTCUSDT')
+            assert state['requests'] == 1
+            return collector.cache.metrics()
+    
+    metrics = asyncio.run(run())
+    assert metrics['misses'] == 1
+    assert metrics['coalesced'] == 19
+    assert metrics['hits'] == 1
+
+def test_stale_while_revalidate():
+    """Quá ttl: trả giá trị cũ ngay, refresh nền; quá hạn hẳn thì fetch lại"""
+    async def run():
+        cache = TTLCache(stale_seconds=0.2)
+        calls = []
+        
+        async def fetch():
+            calls.append(1)
+            await asyncio.sleep(0.02)
+            return len(calls)
+        
+        assert await cache.get_or_fetch('k', fetch, ttl=0.05) == 1
+        await asyncio.sleep(0.06)
+        
+        start = time.perf_counter()
+        assert await cache.get_or_fetch('k', fetch, ttl=0.05) == 1  # Stale, không chờ fetch
+        assert time.perf_counter() - start < 0.01
+        assert await cache.get_or_fetch('k', fetch, ttl=0.05) == 1  # Refresh đang chạy => không fetch thêm
+        await asyncio.sleep(0.03)
+        assert await cache.get_or_fetch('k', fetch, ttl=0.05) == 2
+        
+        await asyncio.sleep(0.3)
+        assert await cache.get_or_fetch('k', fetch, ttl=0.05) == 3
+        return cache.metrics()
+    
+    metrics = asyncio.run(run())
+    assert metrics['stale_hits'] == 2
+    assert metrics['refreshes'] == 1
+    assert metrics['misses'] == 2
+
+def test_errors_not_cached_and_lru_eviction():
+    """Kết quả rỗng / exception không vào cache; vượt max_entries bỏ key ít dùng nhất"""
+    async def run():
+        cache = TTLCache(max_entries=2)
+        
+        async def empty():
+            return {}
+        
+        async def fail():
+            raise RuntimeError('boom')
+        
+        assert await cache.get_or_fetch('empty', empty, ttl=10) == {}
+        assert cache.peek('empty') is None
+        try:
+            await cache.get_or_fetch('fail', fail, ttl=10)
+            assert False, 'exception expected'
+        except RuntimeError:
+            pass
+        assert cache.metrics()['inflight'] == 0
+        
+        for key in ('a', 'b'):
+            await cache.get_or_fetch(key, lambda key=key: asyncio.sleep(0, key), ttl=10)
+        await cache.get_or_fetch('a', empty, ttl=10)  # Hit => 'a' mới dùng
+        await cache.get_or_fetch('c', lambda: asyncio.sleep(0, 'c'), ttl=10)
+        assert cache.peek('a') == 'a' and cache.peek('b') is None and cache.peek('c') == 'c'
+        return cache.metrics()
+    
+    metrics = asyncio.run(run())
+    assert metrics['errors'] == 2
+    assert metrics['evictions'] == 1
+    assert metrics['entries'] == 2
+
+if __name__ == "__main__":
+    async def dashboard_burst():
+        state = {'requests': 0, 'delay': 0.02, 'price': 45000}
+        async with stub_collector(_routes(state)) as collector:
+            start = time.perf_counter()
+            for _ in range(10):
+                await asyncio.gather(*(collector.get_current_price('BTCUSDT') for _ in range(50)))
+            return time.perf_counter() - start, state['requests'], collector.cache.metrics()
+    
+    elapsed, requests, metrics = asyncio.run(dashboard_burst())
+    print("🗃️ TTL CACHE - 10 đợt × 50 caller get_current_price")
+    print("=" * 40)
+    print(f"   Thời gian: {elapsed * 1000:.0f} ms, request tới server: {requests}")
+    for key, value in metrics.items():
+        print(f"   {key}: {value}")
@@ -0,0 +1,82 @@
+"""
+Kiểm tra data/indicators.py - mỗi điểm của chuỗi vectorized khớp với list helpers
+"""
+
+import math
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+project_root = Path(__file__).parent
+sys.path.insert(0, str(project_root))
+
+from data import indicators
+from data.collector import DataCollector
+from test_indicator_engine import _random_klines
+
+def _close(a, b):
+    return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-9)
+
+def test_series_match_list_helpers_at_every_index():
+    """series[i] == _calculate_*(prices[:i+1]) cho mọi i"""
+    collector = DataCollector()
+    klines = _random_klines(150)
+    closes = [k['close'] for k in klines]
+    highs = [k['high'] for k in klines]
+    lows = [k['low'] for k in klines]
+    volumes = [k['volume'] for k in klines]
+    
+    series = indicators.compute_indicators(np.array(highs), np.array(lows), np.array(closes), np.array(volumes))
+    
+    for i in range(len(klines)):
+        n = i + 1
+        assert _close(series['rsi'][i], collector._calculate_rsi(closes[:n]))
+        assert _close(series['sma_20'][i], collector._calculate_sma(closes[:n], 20))
+        assert _close(series['sma_50'][i], collector._calculate_sma(closes[:n], 50))
+        assert _close(series['ema_12'][i], collector._calculate_ema(closes[:n], 12))
+        assert _close(series['ema_26'][i], collector._calculate_ema(closes[:n], 26))
+        assert _close(series['volume_sma'][i], collector._calculate_sma(volumes[:n], 20))
+        
+        macd = collector._calculate_macd(closes[:n])
+        assert _close(series['macd'][i], macd['macd'])
+        assert _close(series['macd_signal'][i], macd['signal'])
+        assert _close(series['macd_histogram'][i], macd['histogram'])
+        
+        bollinger = collector._calculate_bollinger_bands(closes[:n])
+        assert _close(series['bb_upper'][i], bollinger['upper'])
+        assert _close(series['bb_middle'][i], bollinger['middle'])
+        assert _close(series['bb_lower'][i], bollinger['lower'])
+        
+        stoch = collector._calculate_stochastic(highs[:n], lows[:n], closes[:n])
+        assert _close(series['stoch_k'][i], stoch['k'])
+        assert _close(series['stoch_d'][i], stoch['d'])
+
+def test_atr_matches_wilder_loop():
+    """ATR vectorized khớp với vòng lặp Wilder"""
+    klines = _random_klines(100)
+    highs = np.array([k['high'] for k in klines])
+    lows = np.array([k['low'] for k in klines])
+    closes = np.array([k['close'] for k in klines])
+    
+    true_ranges = [highs[0] - lows[0]] + [
+        max(highs[i] - lows[i], abs(highs[i] - closes[i - 1]), abs(lows[i] - closes[i - 1]))
+        for i in range(1, len(klines))
+    ]
+    expected = sum(true_ranges[:14]) / 14
+    for tr in true_ranges[14:]:
+        expected = (expected * 13 + tr) / 14
+    
+    assert _close(indicators.atr(highs, lows, closes)[-1], expected)
+
+def test_short_and_empty_inputs():
+    """Input ngắn / rỗng không lỗi và trả về giá trị mặc định"""
+    empty = np.array([])
+    assert len(indicators.compute_indicators(empty, empty, empty, empty)['rsi']) == 0
+    
+    closes = np.array([100.0, 101.0, 102.0])
+    assert list(indicators.rsi(closes)) == [50.0, 50.0, 50.0]
+    assert list(indicators.macd(closes)['macd']) == [0.0, 0.0, 0.0]
+    assert list(indicators.bollinger_bands(closes)['middle']) == [100.0, 101.0, 102.0]
+    assert list(indicators.stochastic(closes, closes, closes)['k']) == [50.0, 50.0, 50.0]
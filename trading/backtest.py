@@ -0,0 +1,541 @@
+"""
+Backtester - Replay candles lịch sử qua đúng đường signal / risk / execution của bot
+"""
+import logging
+import asyncio
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Any, Optional
+import numpy as np
+from config.settings import Settings
+from ai_engine.puter_client import (
+    AI_MAX_CONFIDENCE, AI_RSI_OVERBOUGHT, AI_RSI_OVERSOLD, AI_SR_PROXIMITY, PuterAIClient
+)
+from data.candles import INTERVAL_MS, CandleWindow
+from data.indicators import compute_indicators, latest_rows
+from data.levels import zone_levels
+from trading.exchange import ExchangeManager
+from trading.risk_manager import RiskManager
+from trading.signals import SIGNAL_WEIGHTS, SR_PROXIMITY, SignalGenerator
+
+logger = logging.getLogger(__name__)
+
+DAY_MS = 86_400_000
+YEAR_MS = 365 * DAY_MS
+
+# Như DataCollector: market data và vùng S/R dựng từ 100 candles cuối
+WINDOW = 100
+
+# Hằng số của SignalGenerator dùng cho pre-screen (luật AI import từ ai_engine.puter_client)
+BUY_SCORE, SELL_SCORE = 0.6, 0.4  # _convert_score_to_action
+ANY_DIRECTION = 2  # pre-screen không biết trước hướng (không áp dụng luật bỏ SELL khi chưa giữ BTC)
+# Technical score trên bars không có order book: RSI, MACD, MA, S/R (volume HOLD chỉ kéo về 0.5)
+_SCORED = ('rsi_signal', 'macd_signal', 'moving_averages', 'support_resistance')
+_SR_WEIGHT = SIGNAL_WEIGHTS['support_resistance']
+_SCORED_WEIGHT = sum(SIGNAL_WEIGHTS[name] for name in _SCORED)
+
+# Loggers INFO mỗi lần gọi - tắt trong lúc replay
+_QUIET_LOGGERS = ('ai_engine.puter_client', 'trading.signals', 'trading.risk_manager', 'trading.exchange')
+
+CHUNK_ROWS = 65_536  # số bars mỗi lượt khi pre-screen vectorized
+
+class SimulatedExchange(ExchangeManager):
+    """
+    ExchangeManager ở demo mode trên dữ liệu lịch sử
+    
+    Giá hiện tại là close của bar đang replay; lệnh khớp ngay tại giá đặt
+    như demo mode, trừ phí fee_percent. Mỗi lệnh ghi timestamp của bar,
+    phí và P&L thực hiện (bán so với giá vốn bình quân, đã gồm phí mua).
+    Không đủ số dư thì trả None (đếm vào rejected_orders) thay vì raise
+    như demo mode - trong backtest đó là chuyện thường, không phải lỗi.
+    """
+    
+    def __init__(self, initial_balance: float = None, fee_percent: float = None):
+        super().__init__()
+        self.is_demo = True
+        self.fee_rate = (self.settings.BACKTEST_FEE_PERCENT if fee_percent is None else fee_percent) / 100
+        self.demo_balance = {'USDT': initial_balance or self.settings.INITIAL_BALANCE, 'BTC': 0.0}
+        self.position_cost = 0.0  # giá vốn của BTC đang giữ
+        self.price = 0.0
+        self.timestamp_ms = 0
+        self.rejected_orders = 0
+    
+    def set_bar(self, timestamp_ms: int, price: float):
+        """Chuyển sang bar tiếp theo"""
+        self.timestamp_ms = timestamp_ms
+        self.price = price
+    
+    async def initialize(self):
+        return True
+    
+    async def get_current_price(self, symbol: str = None) -> float:
+        return self.price
+    
+    async def _demo_buy_order(self, symbol: str, amount: float, price: float = None) -> Optional[Dict[str, Any]]:
+        """Mua tại giá đặt (hoặc close), phí tính vào giá vốn"""
+        fill_price = price or self.price
+        cost = amount * fill_price
+        fee = cost * self.fee_rate
+        if self.demo_balance['USDT'] < cost + fee:
+            return self._reject('buy', amount, "Insufficient USDT balance")
+        
+        self.demo_balance['USDT'] -= cost + fee
+        self.demo_balance['BTC'] += amount
+        self.position_cost += cost + fee
+        return self._record(symbol, 'buy', amount, fill_price, cost, fee, 0.0)
+    
+    async def _demo_sell_order(self, symbol: str, amount: float, price: float = None) -> Optional[Dict[str, Any]]:
+        """Bán tại giá đặt (hoặc close), P&L = tiền thu về - phí - giá vốn bình quân"""
+        fill_price = price or self.price
+        if self.demo_balance['BTC'] < amount:
+            return self._reject('sell', amount, "Insufficient BTC balance")
+        
+        proceeds = amount * fill_price
+        fee = proceeds * self.fee_rate
+        basis = self.position_cost * amount / self.demo_balance['BTC']
+        self.demo_balance['BTC'] -= amount
+        self.demo_balance['USDT'] += proceeds - fee
+        self.position_cost -= basis
+        return self._record(symbol, 'sell', amount, fill_price, proceeds, fee, proceeds - fee - basis)
+    
+    def _reject(self, side: str, amount: float, reason: str) -> None:
+        self.rejected_orders += 1
+        logger.debug(f"🎮 BACKTEST {side.upper()} {amount:.6f} rejected: {reason}")
+        return None
+    
+    def _record(self, symbol: str, side: str, amount: float, price: float, cost: float,
+                fee: float, pnl: float) -> Dict[str, Any]:
+        trade = {
+            'id': f"backtest_{len(self.demo_trades)}",
+            'symbol': symbol,
+            'side': side,
+            'amount': amount,
+            'price': price,
+            'cost': cost,
+            'fee': fee,
+            'pnl': pnl,
+            'timestamp': self.timestamp_ms,
+            'status': 'closed'
+        }
+        self.demo_trades.append(trade)
+        logger.debug(f"🎮 BACKTEST {side.upper()}: {amount:.6f} at ${price:,.2f}")
+        return trade
+
+class Backtester:
+    """
+    Backtest trên candles đã lưu (HistoryStore / MarketArchive)
+    
+    Mỗi bar được xử lý như một trading cycle của BitcoinTradingBot:
+    PuterAIClient._analyze_with_puter -> SignalGenerator.generate_signals ->
+    combine_signals -> RiskManager.evaluate_risk -> execute_trade trên
+    SimulatedExchange, với market data dựng từ các chuỗi indicators tính
+    sẵn một lần (data.indicators) thay vì tính lại trên 100 candles mỗi bar.
+    Không có order book lịch sử nên 'liquidity' luôn là None; 'volume' là
+    tổng volume 24h như ticker. Như bot, chỉ thoát lệnh bằng tín hiệu SELL;
+    stops=True thì bán cả vị thế khi low / high của bar chạm stop loss /
+    take profit do RiskManager đề xuất cho lệnh BUY gần nhất (chạm cả hai
+    trong một bar => tính stop loss).
+    
+    params ghi đè Settings của SignalGenerator / RiskManager cho lần chạy
+    (MIN_CONFIDENCE_SCORE, RSI_OVERSOLD, AI_SIGNAL_WEIGHT, STOP_LOSS_PERCENT...);
+    prepare() tính phần không phụ thuộc tham số một lần cho nhiều lần chạy.
+    
+    Với prefilter (mặc định), bars không thể ra lệnh được bỏ qua mà không
+    đổi kết quả: technical score và AI action tính vectorized (cùng luật
+    với SignalGenerator / _analyze_with_puter); nếu kể cả khi AI đạt
+    confidence tối đa vẫn không đạt MIN_CONFIDENCE_SCORE, hoặc mọi tổ hợp
+    AI / technical action có thể có đều cho HOLD, thì combined signal chắc
+    chắn là HOLD. Bars chỉ có thể ra SELL khi chưa giữ BTC thì lệnh bán
+    chắc chắn thất bại.
+    """
+    
+    def __init__(self, symbol: str = None, interval: str = '1m', initial_balance: float = None,
+                 fee_percent: float = None, warmup: int = None, prefilter: bool = True,
+                 params: Dict[str, float] = None, stops: bool = False):
+        self.settings = Settings()
+        self.symbol = symbol or self.settings.TRADING_PAIR
+        self.interval = interval
+        self.interval_ms = INTERVAL_MS[interval]
+        self.initial_balance = float(initial_balance or self.settings.INITIAL_BALANCE)
+        self.fee_percent = fee_percent
+        self.warmup = max(warmup or self.settings.BACKTEST_WARMUP_CANDLES, WINDOW)
+        self.prefilter = prefilter
+        self.stops = stops
+        self.params = dict(params or {})
+        unknown = [name for name in self.params if not hasattr(Settings, name)]
+        if unknown:
+            raise ValueError(f"Tham số không có trong Settings: {', '.join(unknown)}")
+    
+    def _components(self):
+        """Bộ components mới cho mỗi lần chạy (state của risk manager / exchange không lẫn giữa các lần)"""
+        self.exchange = SimulatedExchange(self.initial_balance, self.fee_percent)
+        self.ai_client = PuterAIClient()
+        self.signal_generator = SignalGenerator()
+        self.risk_manager = RiskManager(clock=self._bar_time)
+        
+        settings = Settings()
+        for name, value in self.params.items():
+            setattr(settings, name, value)
+        settings.INITIAL_BALANCE = self.initial_balance
+        self.signal_generator.settings = settings
+        self.signal_generator.min_confidence = settings.MIN_CONFIDENCE_SCORE
+        self.risk_manager.settings = settings
+        self.risk_manager.peak_balance = self.initial_balance
+        
+        self._position_stops = None  # (stop loss, take profit) của vị thế đang giữ
+        self._stops_checked = 0  # bars trước index này đã kiểm tra stops
+    
+    def _bar_time(self) -> datetime:
+        return datetime.fromtimestamp(self.exchange.timestamp_ms / 1000, timezone.utc)
+    
+    def prepare(self, candles: CandleWindow) -> Dict[str, Any]:
+        """
+        Phần không phụ thuộc tham số: chuỗi indicators, S/R levels tại mỗi bar từ warmup, volume 24h
+        
+        Tính một lần rồi truyền vào run() cho nhiều bộ params trên cùng candles.
+        """
+        n = len(candles)
+        if n <= self.warmup:
+            raise ValueError(f"Cần nhiều hơn {self.warmup} candles, chỉ có {n}")
+        
+        started = time.perf_counter()
+        supports, resistances = zone_levels(candles, np.arange(self.warmup, n), WINDOW)
+        return {
+            'size': n,
+            'series': compute_indicators(candles.highs, candles.lows, candles.closes, candles.volumes),
+            'supports': supports,
+            'resistances': resistances,
+            'volume_24h': self._rolling_sum(candles.volumes, max(DAY_MS // self.interval_ms, 1)),
+            'seconds': time.perf_counter() - started
+        }
+    
+    async def run(self, candles: CandleWindow, prepared: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Chạy backtest trên toàn bộ candles (cũ -> mới)
+        
+        Args:
+            candles: Candles lịch sử
+            prepared: Kết quả prepare(candles) nếu đã tính sẵn
+        
+        Returns:
+            {'timestamps', 'equity'} (np.ndarray, một điểm mỗi bar từ warmup),
+            'trades' (list dict như lệnh của exchange) và 'stats'
+        """
+        started = time.perf_counter()
+        if prepared is None or prepared['size'] != len(candles):
+            prepared = self.prepare(candles)
+        timestamps = candles.timestamps
+        closes = candles.closes
+        series, volume_24h = prepared['series'], prepared['volume_24h']
+        
+        with self._quiet():
+            self._components()
+            bars = np.arange(self.warmup, len(candles))
+            partial = self._technical_partial(series, bars)
+            if self.prefilter:
+                keep = self._could_trade(partial, None)
+                bars, partial = bars[keep], partial[keep]
+            precomputed_s = prepared['seconds'] + time.perf_counter() - started
+            
+            fills = []
+            counts = {'evaluated': 0, 'signals': 0, 'rejected': 0, 'stopped': 0}
+            exchange = self.exchange
+            for start in range(0, len(bars), CHUNK_ROWS):
+                chunk = bars[start:start + CHUNK_ROWS]
+                supports = prepared['supports'][chunk - self.warmup]
+                resistances = prepared['resistances'][chunk - self.warmup]
+                direction = np.full(len(chunk), ANY_DIRECTION, dtype=np.int8)
+                if self.prefilter:
+                    direction = self._direction(series, chunk, partial[start:start + CHUNK_ROWS], supports, resistances)
+                    keep = direction != 0
+                    chunk, direction, supports, resistances = chunk[keep], direction[keep], supports[keep], resistances[keep]
+                
+                rows = zip(chunk.tolist(), direction.tolist(), latest_rows(series, chunk),
+                           supports.tolist(), resistances.tolist())
+                for i, side, indicators, support, resistance in rows:
+                    if self._position_stops is not None:
+                        await self._check_stops(candles, i, fills, counts)
+                    if side < 0 and exchange.demo_balance['BTC'] <= 0:
+                        continue
+                    counts['evaluated'] += 1
+                    exchange.set_bar(int(timestamps[i]), indicators['moving_averages']['current_price'])
+                    
+                    market_data = indicators
+                    market_data.update(
+                        symbol=self.symbol,
+                        timestamp=exchange.timestamp_ms,
+                        price=exchange.price,
+                        volume=volume_24h.item(i),
+                        avg_volume=indicators['volume_sma'],
+                        liquidity=None,
+                        support_levels=[level for level in support if level == level],  # bỏ NaN
+                        resistance_levels=[level for level in resistance if level == level],
+                        candles=candles.slice(i - WINDOW + 1, i + 1)
+                    )
+                    
+                    signal = await self.analyze(market_data)
+                    if signal['action'] == 'HOLD':
+                        continue
+                    counts['signals'] += 1
+                    
+                    risk_check = await self.risk_manager.evaluate_risk(signal)
+                    if not risk_check['approved']:
+                        counts['rejected'] += 1
+                        continue
+                    
+                    trade = await self.execute_trade(signal)
+                    if trade:
+                        self.risk_manager.update_trade_result(trade)
+                        fills.append((i, exchange.demo_balance['USDT'], exchange.demo_balance['BTC']))
+                        if self.stops and trade['side'] == 'buy':
+                            self._position_stops = (risk_check['suggested_stop_loss'], risk_check['suggested_take_profit'])
+                            self._stops_checked = i + 1
+            
+            if self._position_stops is not None:
+                await self._check_stops(candles, len(candles) - 1, fills, counts)
+        
+        equity, position = self._equity_curve(closes, fills)
+        trades = list(self.exchange.demo_trades)
+        stats = self._stats(equity, position, trades, closes[-1])
+        stats.update(counts)
+        stats['rejected_orders'] = self.exchange.rejected_orders
+        stats['bars'] = len(equity)
+        stats['precompute_seconds'] = precomputed_s
+        stats['elapsed_seconds'] = time.perf_counter() - started
+        stats['bars_per_second'] = stats['bars'] / stats['elapsed_seconds']
+        
+        logger.info(f"📈 Backtest {self.symbol} {self.interval}: {stats['bars']:,} bars, {stats['trades']} trades, "
+                    f"return {stats['total_return']:+.2%}, max DD {stats['max_drawdown']:.2%} "
+                    f"({stats['elapsed_seconds']:.1f}s)")
+        return {'timestamps': timestamps[self.warmup:], 'equity': equity, 'trades': trades, 'stats': stats}
+    
+    async def _check_stops(self, candles: CandleWindow, end: int, fills: List[tuple], counts: Dict[str, int]):
+        """Bán cả vị thế tại bar đầu tiên trong [đã kiểm tra, end] chạm stop loss / take profit"""
+        start, self._stops_checked = self._stops_checked, end + 1
+        if self.exchange.demo_balance['BTC'] <= 0:
+            self._position_stops = None
+            return
+        
+        stop_loss, take_profit = self._position_stops
+        lows, highs = candles.lows[start:end + 1], candles.highs[start:end + 1]
+        hits = np.flatnonzero((lows <= stop_loss) | (highs >= take_profit))
+        if not len(hits):
+            return
+        
+        i = start + int(hits[0])
+        price = stop_loss if lows[hits[0]] <= stop_loss else take_profit
+        self._position_stops = None
+        self.exchange.set_bar(int(candles.timestamps[i]), price)
+        trade = await self.exchange.place_sell_order(self.symbol, self.exchange.demo_balance['BTC'], price=price)
+        if trade:
+            counts['stopped'] += 1
+            self.risk_manager.update_trade_result(trade)
+            fills.append((i, self.exchange.demo_balance['USDT'], self.exchange.demo_balance['BTC']))
+    
+    async def analyze(self, market_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Bước 2-4 của trading cycle: AI + technical -> combined signal"""
+        ai_analysis = await self.ai_client._analyze_with_puter('', market_data)
+        technical_signals = await self.signal_generator.generate_signals(market_data)
+        return await self.signal_generator.combine_signals(ai_analysis, technical_signals)
+    
+    async def execute_trade(self, signal: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Như BitcoinTradingBot.execute_trade, trên SimulatedExchange"""
+        position_size = self.risk_manager.calculate_position_size(signal)
+        if signal['action'] == 'BUY':
+            return await self.exchange.place_buy_order(self.symbol, position_size, price=signal['entry_price'])
+        if signal['action'] == 'SELL':
+            return await self.exchange.place_sell_order(self.symbol, position_size, price=signal['entry_price'])
+        return None
+    
+    def _technical_partial(self, series: Dict[str, np.ndarray], bars: np.ndarray) -> np.ndarray:
+        """
+        Phần RSI + MACD + MA của technical score (cùng luật với SignalGenerator) tại mỗi bar
+        
+        Technical score = (partial + weight S/R × S/R score) / tổng weight;
+        volume 'HOLD' chỉ kéo score về 0.5 nên bỏ qua nó cho cận trên của confidence.
+        """
+        names = ('rsi', 'macd', 'macd_signal', 'macd_histogram', 'sma_20', 'sma_50', 'ema_12', 'ema_26')
+        columns = {name: series[name][bars] for name in names}
+        columns['current_price'] = series['close'][bars]
+        scores = self.signal_generator._vector_scores(columns)
+        return (SIGNAL_WEIGHTS['rsi_signal'] * scores['rsi_signal'] + SIGNAL_WEIGHTS['macd_signal'] * scores['macd_signal']
+                + SIGNAL_WEIGHTS['moving_averages'] * scores['moving_averages'])
+    
+    @staticmethod
+    def _sr_distances(prices: np.ndarray, supports: np.ndarray, resistances: np.ndarray):
+        """Khoảng cách tương đối tới support gần nhất bên dưới / resistance gần nhất bên trên (1 nếu không có)"""
+        current = prices[:, None]
+        support = np.where(supports < current, supports, -np.inf).max(axis=1)
+        resistance = np.where(resistances > current, resistances, np.inf).min(axis=1)
+        support_distance = np.where(support > 0, (prices - support) / prices, 1.0)
+        resistance_distance = np.where(np.isfinite(resistance), (resistance - prices) / prices, 1.0)
+        return support_distance, resistance_distance
+    
+    @staticmethod
+    def _ai_direction(series: Dict[str, np.ndarray], bars: np.ndarray, support_distance: np.ndarray,
+                      resistance_distance: np.ndarray) -> np.ndarray:
+        """Action của PuterAIClient._analyze_with_puter tại mỗi bar: +1 BUY, -1 SELL, 0 HOLD (theo thứ tự luật)"""
+        rsi = series['rsi'][bars]
+        macd, signal, histogram = series['macd'][bars], series['macd_signal'][bars], series['macd_histogram'][bars]
+        ai = np.where(rsi < AI_RSI_OVERSOLD, 1, np.where(rsi > AI_RSI_OVERBOUGHT, -1, 0))
+        ai = np.where((macd > signal) & (histogram > 0) & (ai != -1), 1,
+                      np.where((macd < signal) & (histogram < 0) & (ai != 1), -1, ai))
+        ai = np.where((support_distance < AI_SR_PROXIMITY) & (ai != -1), 1, ai)
+        return np.where((resistance_distance < AI_SR_PROXIMITY) & (ai != 1), -1, ai)
+    
+    def _could_trade(self, partial: np.ndarray, sr_score: Optional[np.ndarray]) -> np.ndarray:
+        """
+        Mask bars mà technical confidence đủ để combined signal khác HOLD
+        
+        Cần AI_SIGNAL_WEIGHT × confidence AI + TECHNICAL_SIGNAL_WEIGHT × confidence
+        technical >= MIN_CONFIDENCE_SCORE, với confidence AI tối đa AI_MAX_CONFIDENCE.
+        sr_score None => chưa tính S/R, lấy trường hợp tốt nhất (BUY hoặc SELL).
+        """
+        settings = self.signal_generator.settings
+        if settings.TECHNICAL_SIGNAL_WEIGHT <= 0:
+            return np.ones(len(partial), dtype=bool)
+        required = (self.signal_generator.min_confidence - settings.AI_SIGNAL_WEIGHT * AI_MAX_CONFIDENCE) \
+            / settings.TECHNICAL_SIGNAL_WEIGHT - 1e-9
+        def confidence(score):
+            return np.abs((partial + _SR_WEIGHT * score) / _SCORED_WEIGHT - 0.5) * 2
+        
+        if sr_score is None:
+            return np.maximum(confidence(1.0), confidence(0.0)) >= required
+        return confidence(sr_score) >= required
+    
+    def _direction(self, series: Dict[str, np.ndarray], bars: np.ndarray, partial: np.ndarray,
+                   supports: np.ndarray, resistances: np.ndarray) -> np.ndarray:
+        """
+        Hướng combined signal có thể có tại mỗi bar: +1 BUY, -1 SELL, 0 chắc chắn HOLD, ANY_DIRECTION chưa biết
+        
+        AI action tính theo đúng thứ tự luật của _analyze_with_puter; technical
+        action là hướng của technical score, hoặc HOLD nếu confidence <= 0.2
+        (chỉ xét khi confidence đó vẫn có thể đạt MIN_CONFIDENCE_SCORE). Combined
+        action của từng tổ hợp tính như combine_signals (với weights: AI ngược
+        chiều technical => 0.6 × 0 + 0.4 × 1 = 0.4 => HOLD).
+        """
+        prices = series['close'][bars]
+        support_distance, resistance_distance = self._sr_distances(prices, supports, resistances)
+        near_support = support_distance < SR_PROXIMITY
+        near_resistance = resistance_distance < SR_PROXIMITY
+        sr_score = np.where(near_support, 1.0, np.where(near_resistance, 0.0, 0.5))
+        technical = np.where((partial + _SR_WEIGHT * sr_score) / _SCORED_WEIGHT > 0.5, 1.0, 0.0)
+        
+        ai = self._ai_direction(series, bars, support_distance, resistance_distance)
+        
+        settings = self.signal_generator.settings
+        ai_score = (ai + 1) / 2
+        def combined(tech_score):
+            score = ai_score * settings.AI_SIGNAL_WEIGHT + tech_score * settings.TECHNICAL_SIGNAL_WEIGHT
+            return np.where(score > BUY_SCORE, 1, np.where(score < SELL_SCORE, -1, 0))
+        
+        possible = self._could_trade(partial, sr_score)
+        direction = np.where(possible, combined(technical), 0)
+        technical_hold_possible = settings.AI_SIGNAL_WEIGHT * AI_MAX_CONFIDENCE \
+            + settings.TECHNICAL_SIGNAL_WEIGHT * 0.2 >= self.signal_generator.min_confidence - 1e-9
+        if technical_hold_possible:
+            held = np.where(possible, combined(0.5), 0)
+            direction = np.where(direction == 0, held,
+                                 np.where((held != 0) & (held != direction), ANY_DIRECTION, direction))
+        return direction.astype(np.int8)
+    
+    @staticmethod
+    def _rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+        """Tổng window phần tử cuối tại mỗi index (ít hơn ở đầu chuỗi)"""
+        total = np.cumsum(values)
+        result = total.copy()
+        result[window:] -= total[:-window]
+        return result
+    
+    def _equity_curve(self, closes: np.ndarray, fills: List[tuple]):
+        """Equity (USDT + BTC × close) và BTC đang giữ tại mỗi bar từ warmup, số dư giữ nguyên giữa các lệnh"""
+        bars = np.arange(self.warmup, len(closes))
+        usdt = np.full(len(bars), self.initial_balance)
+        btc = np.zeros(len(bars))
+        if fills:
+            fill_bars, fill_usdt, fill_btc = (np.array(column) for column in zip(*fills))
+            last_fill = np.searchsorted(fill_bars, bars, side='right') - 1
+            filled = last_fill >= 0
+            usdt[filled] = fill_usdt[last_fill[filled]]
+            btc[filled] = fill_btc[last_fill[filled]]
+        return usdt + btc * closes[self.warmup:], btc
+    
+    def _stats(self, equity: np.ndarray, position: np.ndarray, trades: List[Dict[str, Any]],
+               last_close: float) -> Dict[str, Any]:
+        """Return, drawdown, Sharpe (annualized theo interval), win rate, phí"""
+        peak = np.maximum.accumulate(equity)
+        returns = np.diff(equity) / equity[:-1]
+        std = returns.std() if len(returns) else 0.0
+        sells = [trade for trade in trades if trade['side'] == 'sell']
+        gains = sum(trade['pnl'] for trade in sells if trade['pnl'] > 0)
+        losses = -sum(trade['pnl'] for trade in sells if trade['pnl'] < 0)
+        wins = sum(1 for trade in sells if trade['pnl'] > 0)
+        final_equity = float(equity[-1])
+        
+        return {
+            'initial_balance': self.initial_balance,
+            'final_equity': final_equity,
+            'total_return': final_equity / self.initial_balance - 1,
+            'max_drawdown': float(((peak - equity) / peak).max()),
+            'sharpe': float(returns.mean() / std * np.sqrt(YEAR_MS / self.interval_ms)) if std > 0 else 0.0,
+            'trades': len(trades),
+            'buys': len(trades) - len(sells),
+            'sells': len(sells),
+            'win_rate': wins / len(sells) if sells else 0.0,
+            'profit_factor': gains / losses if losses > 0 else (float('inf') if gains > 0 else 0.0),
+            'realized_pnl': sum(trade['pnl'] for trade in sells),
+            'unrealized_pnl': self.exchange.demo_balance['BTC'] * float(last_close) - self.exchange.position_cost,
+            'fees': sum(trade['fee'] for trade in trades),
+            'exposure': float((position > 0).mean())
+        }
+    
+    @staticmethod
+    @contextmanager
+    def _quiet():
+        """Tắt log INFO của components trong lúc replay (mỗi bar log vài dòng)"""
+        loggers = [logging.getLogger(name) for name in _QUIET_LOGGERS]
+        levels = [item.level for item in loggers]
+        for item in loggers:
+            item.setLevel(logging.WARNING)
+        try:
+            yield
+        finally:
+            for item, level in zip(loggers, levels):
+                item.setLevel(level)
+
+if __name__ == "__main__":
+    import argparse
+    from data.archive import MarketArchive
+    from data.history import HistoryStore
+    
+    parser = argparse.ArgumentParser(description="Backtest trên candles đã lưu")
+    parser.add_argument('symbol')
+    parser.add_argument('interval', choices=list(INTERVAL_MS))
+    parser.add_argument('start', nargs='?', help="YYYY-MM-DD (UTC)")
+    parser.add_argument('end', nargs='?', help="YYYY-MM-DD (UTC)")
+    parser.add_argument('--source', choices=['history', 'archive'], default='history')
+    parser.add_argument('--balance', type=float, default=None)
+    parser.add_argument('--fee', type=float, default=None, help="% mỗi lệnh")
+    args = parser.parse_args()
+    
+    def to_ms(day: Optional[str]) -> Optional[int]:
+        if not day:
+            return None
+        return int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+    
+    logging.basicConfig(level=logging.INFO)
+    store = HistoryStore() if args.source == 'history' else MarketArchive()
+    loader = store.load if args.source == 'history' else store.candles
+    history = loader(args.symbol.upper(), args.interval, to_ms(args.start), to_ms(args.end))
+    
+    backtester = Backtester(args.symbol.upper(), args.interval, args.balance, args.fee)
+    result = asyncio.run(backtester.run(history))
+    stats = result['stats']
+    print(f"📈 BACKTEST {args.symbol.upper()} {args.interval} - {stats['bars']:,} bars")
+    print("=" * 40)
+    print(f"   Equity: ${stats['initial_balance']:,.2f} -> ${stats['final_equity']:,.2f} ({stats['total_return']:+.2%})")
+    print(f"   Max drawdown: {stats['max_drawdown']:.2%} | Sharpe: {stats['sharpe']:.2f}")
+    print(f"   Trades: {stats['trades']} ({stats['buys']} buy / {stats['sells']} sell) | "
+          f"win rate {stats['win_rate']:.0%} | phí ${stats['fees']:,.2f}")
+    print(f"   {stats['bars_per_second']:,.0f} bars/s ({stats['evaluated']:,} bars qua signal path)")
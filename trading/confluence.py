@@ -0,0 +1,282 @@
+"""
+Confluence Engine - Technical signal đa khung thời gian (ANALYSIS_TIMEFRAMES) dựng từ candles khung thấp nhất
+"""
+import logging
+import time
+from typing import Dict, List, Any, Optional, Callable, Tuple
+import numpy as np
+from config.settings import Settings
+from data.candles import FIELDS, INTERVAL_MS, CandleBuffer, CandleWindow
+from trading.signals import SignalGenerator
+
+logger = logging.getLogger(__name__)
+
+# Binance mở nến 1w vào thứ Hai 00:00 UTC (epoch là thứ Năm)
+WEEK_OFFSET_MS = 4 * INTERVAL_MS['1d']
+
+_TIMESTAMP, _OPEN, _HIGH, _LOW, _CLOSE, _VOLUME, _CLOSE_TIME, _QUOTE_VOLUME, _TRADES = range(len(FIELDS))
+
+def bucket_start(timestamps: np.ndarray, interval: str) -> np.ndarray:
+    """Open time của nến interval chứa mỗi timestamp (ms)"""
+    offset = WEEK_OFFSET_MS if interval == '1w' else 0
+    interval_ms = INTERVAL_MS[interval]
+    return (timestamps - offset) // interval_ms * interval_ms + offset
+
+def _columns(candles: CandleWindow) -> np.ndarray:
+    """Mảng (len(FIELDS), n) của window"""
+    return np.vstack([candles.column(field) for field in FIELDS])
+
+def _aggregate(data: np.ndarray, interval: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Gộp các nến khung thấp liên tiếp (cột theo FIELDS) thành nến interval
+    
+    Returns:
+        (bars, complete_start, last_close_time): complete_start = nến đầu tiên của
+        nhóm mở đúng lúc nến interval mở; last_close_time của nến cuối trong nhóm
+    """
+    buckets = bucket_start(data[_TIMESTAMP], interval)
+    starts = np.flatnonzero(np.diff(buckets, prepend=np.nan))
+    ends = np.append(starts[1:], data.shape[1]) - 1
+    
+    bars = np.empty((len(FIELDS), len(starts)))
+    bars[_TIMESTAMP] = buckets[starts]
+    bars[_OPEN] = data[_OPEN, starts]
+    bars[_HIGH] = np.maximum.reduceat(data[_HIGH], starts)
+    bars[_LOW] = np.minimum.reduceat(data[_LOW], starts)
+    bars[_CLOSE] = data[_CLOSE, ends]
+    bars[_CLOSE_TIME] = bars[_TIMESTAMP] + INTERVAL_MS[interval] - 1
+    for field in (_VOLUME, _QUOTE_VOLUME, _TRADES):
+        bars[field] = np.add.reduceat(data[field], starts)
+    return bars, data[_TIMESTAMP, starts] == bars[_TIMESTAMP], data[_CLOSE_TIME, ends]
+
+class ConfluenceEngine:
+    """
+    Kết hợp technical signals của mọi khung trong ANALYSIS_TIMEFRAMES
+    
+    Chỉ khung thấp nhất được fetch mỗi cycle; mỗi khung cao hơn được gộp từ
+    nến đã đóng của khung thấp hơn gần nhất chia hết nó (1m -> 5m -> 15m ->
+    1h -> 4h -> 1d), nên chỉ cần REST cho lần seed đầu (và sau khi mất nến).
+    Nến chưa đóng được giữ riêng (forming); nến có phần đầu không được gộp
+    (bắt đầu giữa chừng / sau gap) bị bỏ thay vì lưu thiếu dữ liệu.
+    
+    Một khung chỉ được chấm lại khi có nến của nó vừa đóng - các khung đóng
+    cùng lúc được chấm chung một lần SignalGenerator.generate_signals_batch.
+    Kết quả là trung bình các score theo CONFLUENCE_WEIGHTS, cùng format với
+    generate_signals để đưa vào combine_signals.
+    """
+    
+    def __init__(self, collector, symbol: str = None, timeframes: List[str] = None,
+                 weights: Dict[str, float] = None, clock: Callable[[], float] = time.time):
+        self.settings = Settings()
+        self.collector = collector
+        self.symbol = (symbol or self.settings.TRADING_PAIR.replace('/', '')).upper()
+        self.weights = dict(self.settings.CONFLUENCE_WEIGHTS if weights is None else weights)
+        self.window = self.settings.CONFLUENCE_WINDOW
+        self.clock = clock
+        self.signal_generator = SignalGenerator()
+        
+        # Khung nguồn của mỗi khung: khung thấp hơn lớn nhất chia hết nó
+        ordered = sorted({tf for tf in (timeframes or self.settings.ANALYSIS_TIMEFRAMES) if tf in INTERVAL_MS},
+                         key=INTERVAL_MS.get)
+        if not ordered:
+            raise ValueError("Không có timeframe hợp lệ cho confluence")
+        self.timeframes = [ordered[0]]
+        self.sources: Dict[str, str] = {}
+        for tf in ordered[1:]:
+            source = next((lower for lower in reversed(self.timeframes)
+                           if INTERVAL_MS[tf] % INTERVAL_MS[lower] == 0), None)
+            if source is None:
+                logger.warning(f"⚠️ Confluence bỏ {tf}: không gộp được từ {', '.join(self.timeframes)}")
+                continue
+            self.sources[tf] = source
+            self.timeframes.append(tf)
+        self.base_interval = self.timeframes[0]
+        
+        self.buffers = {tf: CandleBuffer(self.window, tf) for tf in self.timeframes}  # chỉ nến đã đóng
+        self.signals: Dict[str, Dict[str, Any]] = {}
+        self._forming: Dict[str, Optional[Tuple[np.ndarray, bool]]] = {}
+        self._last_base: Optional[float] = None
+        self.needs_seed = True
+        
+        self.stats = {
+            'updates': 0,
+            'seeds': 0,
+            'gaps': 0,
+            'evaluations': {tf: 0 for tf in self.timeframes}
+        }
+    
+    def reset(self):
+        """Xóa toàn bộ nến và signals (seed lại ở refresh tiếp theo)"""
+        for buffer in self.buffers.values():
+            buffer.clear()
+        self._forming.clear()
+        self.signals.clear()
+        self._last_base = None
+        self.needs_seed = True
+    
+    async def refresh(self) -> Optional[Dict[str, Any]]:
+        """
+        Một lượt của trading cycle: lấy nến khung thấp nhất, chấm lại khung có nến vừa đóng
+        
+        Returns:
+            Confluence signal (None nếu chưa khung nào có signal)
+        """
+        try:
+            if self.needs_seed:
+                closed = await self.seed()
+            else:
+                candles = await self.collector.get_candles(self.symbol, self.base_interval, self.window)
+                closed = self.update(candles)
+                if self.needs_seed:  # mất nến khung thấp nhất => nến khung cao thiếu dữ liệu
+                    closed = await self.seed()
+            
+            if closed:
+                await self.evaluate(closed)
+            return self.combine()
+        
+        except Exception as e:
+            logger.error(f"❌ Confluence refresh failed: {e}")
+            return None
+    
+    async def seed(self) -> List[str]:
+        """
+        Nạp nến đã đóng của từng khung qua REST (thấp -> cao) và dựng lại nến đang chạy
+        từ nến đã đóng của khung nguồn
+        
+        Returns:
+            Các khung cần chấm
+        """
+        self.reset()
+        now_ms = self.clock() * 1000
+        for tf in self.timeframes:
+            candles = await self.collector.get_candles(self.symbol, tf, self.window + 1, use_cache=False)
+            closed = np.count_nonzero(candles.column('close_time') < now_ms)
+            self.buffers[tf].load(candles.slice(0, closed))
+            
+            source = self.sources.get(tf)
+            if source and len(self.buffers[tf]) and len(self.buffers[source]):
+                lower = _columns(self.buffers[source].window())
+                forming_start = self.buffers[tf].last_timestamp + INTERVAL_MS[tf]
+                self._fold(tf, lower[:, lower[_TIMESTAMP] >= forming_start])
+        
+        self._last_base = self.buffers[self.base_interval].last_timestamp
+        self.needs_seed = False
+        self.stats['seeds'] += 1
+        logger.info(f"🧭 Confluence seeded {self.symbol}: " + ', '.join(
+            f"{tf} {len(self.buffers[tf])}" for tf in self.timeframes))
+        return [tf for tf in self.timeframes if len(self.buffers[tf])]
+    
+    def update(self, candles: CandleWindow) -> List[str]:
+        """
+        Gộp nến đã đóng mới của khung thấp nhất vào mọi khung
+        
+        Args:
+            candles: Nến khung thấp nhất (cũ -> mới), nến chưa đóng (close_time >= now) bị bỏ qua
+        
+        Returns:
+            Các khung có nến vừa đóng
+        """
+        self.stats['updates'] += 1
+        data = _columns(candles)
+        data = data[:, data[_CLOSE_TIME] < self.clock() * 1000]
+        if self._last_base is not None:
+            data = data[:, data[_TIMESTAMP] > self._last_base]
+        if not data.shape[1]:
+            return []
+        
+        if self._last_base is not None and data[_TIMESTAMP, 0] - self._last_base > INTERVAL_MS[self.base_interval]:
+            self.stats['gaps'] += 1
+            logger.warning(f"⚠️ Confluence {self.symbol} thiếu nến {self.base_interval}, seed lại")
+            self.reset()
+        self._last_base = data[_TIMESTAMP, -1]
+        
+        closed = []
+        bars = self._fold(self.base_interval, data)
+        for tf in self.timeframes:
+            if tf != self.base_interval:
+                bars = self._fold(tf, bars)
+            if not bars.shape[1]:
+                break
+            closed.append(tf)
+        return closed
+    
+    def _fold(self, tf: str, lower: np.ndarray) -> np.ndarray:
+        """
+        Gộp nến đã đóng của khung nguồn vào nến đang chạy của tf
+        
+        Returns:
+            Nến tf vừa đóng và đầy đủ (đã ghi vào buffer) - input cho khung cao hơn
+        """
+        if not lower.shape[1]:
+            return lower
+        bars, complete, last_close = _aggregate(lower, tf)
+        
+        forming = self._forming.pop(tf, None)
+        if forming is not None and forming[0][_TIMESTAMP] == bars[_TIMESTAMP, 0]:
+            row, started = forming
+            bars[_OPEN, 0] = row[_OPEN]
+            bars[_HIGH, 0] = max(row[_HIGH], bars[_HIGH, 0])
+            bars[_LOW, 0] = min(row[_LOW], bars[_LOW, 0])
+            for field in (_VOLUME, _QUOTE_VOLUME, _TRADES):
+                bars[field, 0] += row[field]
+            complete[0] = started
+        
+        closed = last_close == bars[_CLOSE_TIME]
+        if not closed[-1]:
+            self._forming[tf] = (bars[:, -1].copy(), bool(complete[-1]))
+        bars = bars[:, closed & complete]
+        if bars.shape[1]:
+            self.buffers[tf].extend(bars.T)
+        return bars
+    
+    async def evaluate(self, timeframes: List[str]):
+        """Chấm technical signal trên nến đã đóng của các khung (một lần generate_signals_batch)"""
+        timeframes = [tf for tf in timeframes if self.weights.get(tf, 0) > 0 and len(self.buffers[tf])]
+        if not timeframes:
+            return
+        
+        markets = []
+        for tf in timeframes:
+            candles = self.buffers[tf].window()
+            levels = self.collector.calculate_support_resistance(candles)
+            markets.append({
+                'price': candles.closes.item(-1),
+                **await self.collector.calculate_technical_indicators(candles),
+                'support_levels': levels['support'],
+                'resistance_levels': levels['resistance'],
+                'candles': candles
+            })
+        
+        result = self.signal_generator.generate_signals_batch(*self.signal_generator.batch_matrix(markets))
+        for i, tf in enumerate(timeframes):
+            self.signals[tf] = {
+                'action': str(result['action'][i]),
+                'confidence': float(result['confidence'][i]),
+                'score': float(result['score'][i]),
+                'bar_time': self.buffers[tf].last_timestamp
+            }
+            self.stats['evaluations'][tf] += 1
+    
+    def combine(self) -> Optional[Dict[str, Any]]:
+        """Trung bình score các khung theo CONFLUENCE_WEIGHTS -> action / confidence như generate_signals"""
+        weighted = [(tf, self.weights[tf]) for tf in self.timeframes if tf in self.signals and self.weights.get(tf, 0) > 0]
+        total_weight = sum(weight for _, weight in weighted)
+        if total_weight <= 0:
+            return None
+        
+        score = sum(self.signals[tf]['score'] * weight for tf, weight in weighted) / total_weight
+        action = self.signal_generator._convert_score_to_action(score)
+        confidence = min(abs(score - 0.5) * 2, 1.0)
+        key_indicators = [f"{tf}: {self.signals[tf]['action']}" for tf, _ in weighted
+                          if self.signals[tf]['action'] != 'HOLD']
+        
+        logger.info(f"🧭 Confluence {self.symbol}: {action} - {confidence:.2%} ({', '.join(key_indicators) or 'HOLD'})")
+        return {
+            'action': action,
+            'confidence': confidence,
+            'score': score,
+            'key_indicators': key_indicators,
+            'reasoning': 'Confluence ' + ', '.join(
+                f"{tf} {self.signals[tf]['action']} ({weight / total_weight:.0%})" for tf, weight in weighted),
+            'timeframes': {tf: dict(self.signals[tf]) for tf, _ in weighted}
+        }
@@ -7,18 +7,28 @@ from typing import Dict, List, Any, Optional
 from datetime import datetime
 import ccxt.async_support as ccxt
 from config.settings import Settings
+from utils.rate_limiter import (
+    PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_MARKET_DATA, endpoint_weight, get_rate_limiter
+)
 
 logger = logging.getLogger(__name__)
 
 class ExchangeManager:
     """Quản lý kết nối exchange và thực hiện giao dịch"""
     
-    def __init__(self):
+    def __init__(self, data_collector=None):
         self.settings = Settings()
         self.exchange = None
         self.is_testnet = self.settings.BINANCE_TESTNET
         self.is_demo = self.settings.BOT_MODE == 'demo'
         
+        # Request weight dùng chung với DataCollector - lệnh được ưu tiên trước market data
+        self.rate_limiter = get_rate_limiter()
+        
+        # Demo mode lấy giá thật qua DataCollector dùng chung (session + cache)
+        self.data_collector = data_collector
+        self._owns_collector = False
+        
         # Demo trading state
         self.demo_balance = {
             'USDT': self.settings.INITIAL_BALANCE,
@@ -45,8 +55,8 @@ class ExchangeManager:
             })
             
             # Test connection
-            await self.exchange.load_markets()
-            balance = await self.exchange.fetch_balance()
+            await self._call(endpoint_weight('/exchangeInfo'), PRIORITY_ACCOUNT, self.exchange.load_markets)
+            balance = await self._call(endpoint_weight('/account'), PRIORITY_ACCOUNT, self.exchange.fetch_balance)
             
             logger.info(f"✅ Exchange connected - Balance: ${balance.get('USDT', {}).get('free', 0)}")
             return True
@@ -62,12 +72,16 @@ class ExchangeManager:
             
             if self.is_demo:
                 # Get real price even in demo mode for accuracy
-                from data.collector import DataCollector
-                collector = DataCollector()
-                real_price = await collector.get_current_price(symbol)
-                return real_price
+                if self.data_collector is None:
+                    from data.collector import DataCollector
+                    self.data_collector = DataCollector()
+                    self._owns_collector = True
+                return await self.data_collector.get_current_price(symbol.replace('/', ''))
             
-            ticker = await self.exchange.fetch_ticker(symbol)
+            ticker = await self._call(
+                endpoint_weight('/ticker/24hr', {'symbol': symbol}), PRIORITY_MARKET_DATA,
+                self.exchange.fetch_ticker, symbol
+            )
             return ticker['last']
             
         except Exception as e:
@@ -80,7 +94,7 @@ class ExchangeManager:
             if self.is_demo:
                 return self.demo_balance.copy()
             
-            balance = await self.exchange.fetch_balance()
+            balance = await self._call(endpoint_weight('/account'), PRIORITY_ACCOUNT, self.exchange.fetch_balance)
             return {
                 'USDT': balance.get('USDT', {}).get('free', 0),
                 'BTC': balance.get('BTC', {}).get('free', 0)
@@ -98,10 +112,16 @@ class ExchangeManager:
             
             if price:
                 # Limit order
-                order = await self.exchange.create_limit_buy_order(symbol, amount, price)
+                order = await self._call(
+                    endpoint_weight('/order'), PRIORITY_ORDER,
+                    self.exchange.create_limit_buy_order, symbol, amount, price
+                )
             else:
                 # Market order
-                order = await self.exchange.create_market_buy_order(symbol, amount)
+                order = await self._call(
+                    endpoint_weight('/order'), PRIORITY_ORDER,
+                    self.exchange.create_market_buy_order, symbol, amount
+                )
             
             logger.info(f"🟢 BUY order placed: {order}")
             return order
@@ -118,10 +138,16 @@ class ExchangeManager:
             
             if price:
                 # Limit order
-                order = await self.exchange.create_limit_sell_order(symbol, amount, price)
+                order = await self._call(
+                    endpoint_weight('/order'), PRIORITY_ORDER,
+                    self.exchange.create_limit_sell_order, symbol, amount, price
+                )
             else:
                 # Market order
-                order = await self.exchange.create_market_sell_order(symbol, amount)
+                order = await self._call(
+                    endpoint_weight('/order'), PRIORITY_ORDER,
+                    self.exchange.create_market_sell_order, symbol, amount
+                )
             
             logger.info(f"🔴 SELL order placed: {order}")
             return order
@@ -165,7 +191,10 @@ class ExchangeManager:
             if self.is_demo:
                 return self.demo_trades[-limit:]
             
-            orders = await self.exchange.fetch_orders(symbol, limit=limit)
+            orders = await self._call(
+                endpoint_weight('/allOrders'), PRIORITY_ACCOUNT,
+                self.exchange.fetch_orders, symbol, limit=limit
+            )
             return orders
             
         except Exception as e:
@@ -181,7 +210,10 @@ class ExchangeManager:
                 logger.info(f"🚫 DEMO: Cancel order {order_id}")
                 return True
             
-            result = await self.exchange.cancel_order(order_id, symbol)
+            result = await self._call(
+                endpoint_weight('/order'), PRIORITY_ORDER,
+                self.exchange.cancel_order, order_id, symbol
+            )
             logger.info(f"🚫 Order cancelled: {result}")
             return True
             
@@ -189,6 +221,27 @@ class ExchangeManager:
             logger.error(f"❌ Cancel order failed: {e}")
             return False
     
+    async def _call(self, weight: int, priority: int, method, *args, **kwargs):
+        """
+        Gọi ccxt qua rate limiter dùng chung
+        
+        Sau mỗi call (kể cả lỗi 429/418 mà ccxt đổi thành RateLimitExceeded /
+        DDoSProtection) limiter được đồng bộ theo response headers.
+        """
+        await self.rate_limiter.acquire(weight, priority)
+        status = 200
+        try:
+            return await method(*args, **kwargs)
+        except ccxt.RateLimitExceeded:
+            status = 429
+            raise
+        except ccxt.DDoSProtection:
+            status = 418
+            raise
+        finally:
+            headers = getattr(self.exchange, 'last_response_headers', None) or {}
+            self.rate_limiter.update_from_response(status, headers)
+    
     async def _demo_buy_order(self, symbol: str, amount: float, price: float = None) -> Dict[str, Any]:
         """Mô phỏng lệnh mua trong demo mode"""
         current_price = price or await self.get_current_price()
@@ -270,3 +323,5 @@ class ExchangeManager:
         if self.exchange:
             await self.exchange.close()
             logger.info("🔌 Exchange connection closed")
+        if self._owns_collector:
+            await self.data_collector.close()
@@ -0,0 +1,93 @@
+"""
+Market Events - Chuyển update của stream thành event cho EventBus (nến đóng, giá vượt mức, lệch sổ lệnh)
+"""
+import logging
+from typing import Dict, Optional, Sequence
+import numpy as np
+from config.settings import Settings
+from data.stream import MarketState
+from trading.signals import ORDERBOOK_IMBALANCE
+from utils.event_bus import EventBus
+
+logger = logging.getLogger(__name__)
+
+# Topics
+TOPIC_CANDLE_CLOSED = 'candle_closed'
+TOPIC_LEVEL_CROSSED = 'level_crossed'
+TOPIC_BOOK_IMBALANCE = 'book_imbalance'
+TOPIC_HEARTBEAT = 'heartbeat'
+
+class MarketEventDetector:
+    """
+    Theo dõi MarketState sau mỗi update (dùng làm BinanceStream on_update / on_depth) và chỉ
+    publish khi trạng thái đổi vùng:
+    
+    - candle_closed: nến của stream interval mở nến mới => nến trước đã đóng
+    - level_crossed: giá sang vùng khác giữa các mức S/R (set_levels)
+    - book_imbalance: imbalance sổ lệnh đổi giữa bán (<= -threshold) / cân bằng / mua (>= threshold),
+      xét sau mỗi depth diff (on_depth) - chỉ depth mới làm đổi sổ lệnh
+    
+    Mỗi update chỉ tốn vài phép so sánh, tick trong cùng vùng không tạo event.
+    """
+    
+    def __init__(self, bus: EventBus, imbalance_threshold: float = None, depth_percent: float = None):
+        self.settings = Settings()
+        self.bus = bus
+        self.imbalance_threshold = ORDERBOOK_IMBALANCE if imbalance_threshold is None else imbalance_threshold
+        self.depth_percent = depth_percent or self.settings.ORDERBOOK_DEPTH_PERCENT
+        
+        self.levels: Dict[str, np.ndarray] = {}
+        self._candle: Dict[str, Optional[float]] = {}
+        self._zone: Dict[str, int] = {}
+        self._book_side: Dict[str, int] = {}
+        
+        self.stats = {
+            'updates': 0,
+            'depth_updates': 0,
+            TOPIC_CANDLE_CLOSED: 0,
+            TOPIC_LEVEL_CROSSED: 0,
+            TOPIC_BOOK_IMBALANCE: 0
+        }
+    
+    def set_levels(self, symbol: str, levels: Sequence[float]):
+        """Mức giá cần theo dõi (ví dụ support_levels + resistance_levels của market data gần nhất)"""
+        symbol = symbol.upper()
+        self.levels[symbol] = np.unique(np.asarray(levels, dtype=np.float64))
+        self._zone.pop(symbol, None)  # vùng tính lại ở update tiếp theo, không tạo event
+    
+    def on_update(self, state: MarketState):
+        """BinanceStream on_update: so sánh trạng thái mới với lần trước"""
+        self.stats['updates'] += 1
+        symbol = state.symbol
+        
+        candle = state.candles.last_timestamp
+        previous = self._candle.get(symbol)
+        self._candle[symbol] = candle
+        if previous is not None and candle is not None and candle > previous:
+            self._publish(TOPIC_CANDLE_CLOSED, {'symbol': symbol, 'interval': state.interval, 'timestamp': previous})
+        
+        levels = self.levels.get(symbol)
+        if levels is not None and len(levels) and state.price > 0:
+            zone = int(np.searchsorted(levels, state.price, side='right'))
+            previous_zone = self._zone.get(symbol)
+            self._zone[symbol] = zone
+            if previous_zone is not None and zone != previous_zone:
+                level = levels[zone - 1] if zone > previous_zone else levels[zone]  # mức vừa vượt qua gần giá nhất
+                self._publish(TOPIC_LEVEL_CROSSED, {'symbol': symbol, 'level': float(level), 'price': state.price,
+                                                    'direction': 'up' if zone > previous_zone else 'down'})
+    
+    def on_depth(self, state: MarketState):
+        """BinanceStream on_depth: imbalance sổ lệnh đổi phía sau depth diff"""
+        self.stats['depth_updates'] += 1
+        symbol = state.symbol
+        
+        if state.book.is_synced:
+            imbalance = state.book.imbalance(self.depth_percent)
+            side = 1 if imbalance >= self.imbalance_threshold else -1 if imbalance <= -self.imbalance_threshold else 0
+            if side != self._book_side.get(symbol, 0):
+                self._publish(TOPIC_BOOK_IMBALANCE, {'symbol': symbol, 'imbalance': imbalance, 'side': side})
+            self._book_side[symbol] = side
+    
+    def _publish(self, topic: str, data: Dict):
+        self.stats[topic] += 1
+        self.bus.publish(topic, data)
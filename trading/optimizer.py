@@ -0,0 +1,303 @@
+"""
+Optimizer - Grid / random search và walk-forward cho tham số trading trên Backtester
+"""
+import logging
+import asyncio
+import csv
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from functools import lru_cache
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Any, Optional, Tuple
+import numpy as np
+from config.settings import Settings
+from data.candles import FIELDS, CandleWindow
+from trading.backtest import Backtester
+
+logger = logging.getLogger(__name__)
+
+# Giá trị thử cho mỗi tham số (tên như trong Settings); TECHNICAL_SIGNAL_WEIGHT = 1 - AI_SIGNAL_WEIGHT
+SEARCH_SPACE = {
+    'MIN_CONFIDENCE_SCORE': (0.6, 0.65, 0.7, 0.75),
+    'RSI_OVERSOLD': (20, 25, 30, 35),
+    'RSI_OVERBOUGHT': (65, 70, 75, 80),
+    'AI_SIGNAL_WEIGHT': (0.5, 0.6, 0.7),
+    'STOP_LOSS_PERCENT': (1.0, 2.0, 3.0),
+    'TAKE_PROFIT_PERCENT': (2.0, 4.0, 6.0)
+}
+
+# Cột kết quả lấy từ stats của Backtester
+RESULT_STATS = ('sharpe', 'total_return', 'max_drawdown', 'trades', 'win_rate', 'profit_factor', 'fees', 'exposure')
+
+def grid(space: Dict[str, Tuple] = None) -> List[Dict[str, float]]:
+    """Mọi tổ hợp giá trị trong space (mặc định SEARCH_SPACE)"""
+    space = space or SEARCH_SPACE
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def random_sample(count: int, space: Dict[str, Tuple] = None, seed: int = None) -> List[Dict[str, float]]:
+    """count tổ hợp khác nhau chọn ngẫu nhiên từ grid(space)"""
+    candidates = grid(space)
+    return random.Random(seed).sample(candidates, min(count, len(candidates)))
+
+def _settings_params(params: Dict[str, float]) -> Dict[str, float]:
+    """Tham số truyền cho Backtester: thêm TECHNICAL_SIGNAL_WEIGHT bù với AI_SIGNAL_WEIGHT"""
+    result = dict(params)
+    if 'AI_SIGNAL_WEIGHT' in result and 'TECHNICAL_SIGNAL_WEIGHT' not in result:
+        result['TECHNICAL_SIGNAL_WEIGHT'] = round(1 - result['AI_SIGNAL_WEIGHT'], 10)
+    return result
+
+# State của mỗi worker process: candles trên shared memory + options của Backtester
+_worker: Dict[str, Any] = {}
+
+def _attach(shm: shared_memory.SharedMemory, size: int, options: Dict[str, Any]):
+    _worker['shm'] = shm
+    _worker['candles'] = CandleWindow(np.ndarray((len(FIELDS), size), dtype=np.float64, buffer=shm.buf))
+    _worker['options'] = options
+    _prepared.cache_clear()
+
+def _init_worker(name: str, size: int, options: Dict[str, Any]):
+    """Gắn vào shared memory của candles (không copy) - initializer của process pool"""
+    _attach(shared_memory.SharedMemory(name=name), size, options)
+
+@lru_cache(maxsize=4)
+def _prepared(start: int, end: int) -> Dict[str, Any]:
+    """prepare() của một đoạn candles, dùng lại cho mọi bộ tham số trên đoạn đó"""
+    return Backtester(**_worker['options']).prepare(_worker['candles'].slice(start, end))
+
+def _evaluate(task: Tuple[Dict[str, float], int, int]) -> Dict[str, Any]:
+    """Backtest một bộ tham số trên candles [start, end)"""
+    params, start, end = task
+    backtester = Backtester(params=_settings_params(params), **_worker['options'])
+    result = asyncio.run(backtester.run(_worker['candles'].slice(start, end), _prepared(start, end)))
+    stats = result['stats']
+    return {'params': params, **{name: stats[name] for name in RESULT_STATS}, 'seconds': stats['elapsed_seconds']}
+
+class Optimizer:
+    """
+    Tìm tham số tốt nhất cho bot bằng cách backtest nhiều bộ tham số song song
+    
+    Candles được copy một lần vào shared memory; mỗi worker của process pool
+    gắn vào đó (không pickle / copy candles theo task), tính phần không phụ
+    thuộc tham số (indicators, S/R) một lần cho mỗi đoạn candles rồi chạy
+    Backtester với params của từng task. workers=1 chạy ngay trong process
+    hiện tại. Kết quả xếp hạng theo metric (một key trong stats của
+    Backtester); bộ tham số có ít hơn min_trades lệnh xếp sau cùng.
+    """
+    
+    def __init__(self, candles: CandleWindow, symbol: str = None, interval: str = '1m',
+                 metric: str = None, workers: int = None, min_trades: int = None,
+                 initial_balance: float = None, fee_percent: float = None, stops: bool = True):
+        self.settings = Settings()
+        self.metric = metric or self.settings.OPTIMIZER_METRIC
+        if self.metric not in RESULT_STATS:
+            raise ValueError(f"Metric phải là một trong: {', '.join(RESULT_STATS)}")
+        self.workers = workers or self.settings.OPTIMIZER_WORKERS or os.cpu_count() or 1
+        self.min_trades = self.settings.OPTIMIZER_MIN_TRADES if min_trades is None else min_trades
+        self.size = len(candles)
+        self.options = {
+            'symbol': symbol or self.settings.TRADING_PAIR,
+            'interval': interval,
+            'initial_balance': initial_balance,
+            'fee_percent': fee_percent,
+            'stops': stops
+        }
+        self.warmup = Backtester(**self.options).warmup
+        
+        self._shm = shared_memory.SharedMemory(create=True, size=max(len(FIELDS) * self.size * 8, 1))
+        shared = self._candles()
+        for name in FIELDS:
+            shared.column(name)[:] = candles.column(name)
+        self._pool: Optional[ProcessPoolExecutor] = None
+    
+    def _candles(self) -> CandleWindow:
+        return CandleWindow(np.ndarray((len(FIELDS), self.size), dtype=np.float64, buffer=self._shm.buf))
+    
+    def __enter__(self) -> 'Optimizer':
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+    
+    def _map(self, tasks: List[Tuple[Dict[str, float], int, int]]) -> List[Dict[str, Any]]:
+        if self.workers <= 1:
+            if _worker.get('shm') is not self._shm:
+                _attach(self._shm, self.size, self.options)
+            return [_evaluate(task) for task in tasks]
+        
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(self._shm.name, self.size, self.options))
+        # Task cùng đoạn candles liền nhau => cache prepare() của worker trúng
+        chunksize = max(len(tasks) // (self.workers * 4), 1)
+        return list(self._pool.map(_evaluate, tasks, chunksize=chunksize))
+    
+    def rank(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Xếp hạng (tốt nhất trước) và đánh số 'rank'"""
+        ranked = sorted(results, key=lambda row: (row['trades'] >= self.min_trades, row[self.metric],
+                                                  row['total_return']), reverse=True)
+        for rank, row in enumerate(ranked, 1):
+            row['rank'] = rank
+        return ranked
+    
+    def search(self, param_sets: List[Dict[str, float]], start: int = 0, end: int = None) -> List[Dict[str, Any]]:
+        """
+        Backtest mọi bộ tham số trên candles [start, end)
+        
+        Returns:
+            Kết quả đã xếp hạng: {'rank', 'params', sharpe, total_return, ...}
+        """
+        end = self.size if end is None else end
+        started = time.perf_counter()
+        results = self.rank(self._map([(params, start, end) for params in param_sets]))
+        elapsed = time.perf_counter() - started
+        logger.info(f"🔧 Optimizer: {len(param_sets)} bộ tham số × {end - start:,} candles "
+                    f"trong {elapsed:.1f}s ({self.workers} workers)")
+        return results
+    
+    def grid_search(self, space: Dict[str, Tuple] = None) -> List[Dict[str, Any]]:
+        return self.search(grid(space))
+    
+    def random_search(self, count: int, space: Dict[str, Tuple] = None, seed: int = None) -> List[Dict[str, Any]]:
+        return self.search(random_sample(count, space, seed))
+    
+    def folds(self, count: int, train_segments: int = 3) -> List[Tuple[int, int, int, int]]:
+        """
+        Các cửa sổ walk-forward (train_start, train_end, test_start, test_end)
+        
+        Candles chia thành count + train_segments đoạn bằng nhau; fold k train
+        trên train_segments đoạn bắt đầu từ đoạn k, test trên đoạn ngay sau.
+        Đoạn test lấy thêm warmup candles trước đó (chỉ để tính indicators).
+        """
+        segment = self.size // (count + train_segments)
+        if segment <= self.warmup:
+            raise ValueError(f"Mỗi đoạn walk-forward cần nhiều hơn {self.warmup} candles, chỉ có {segment}")
+        windows = []
+        for k in range(count):
+            train_start, train_end = k * segment, (k + train_segments) * segment
+            test_end = self.size if k == count - 1 else train_end + segment
+            windows.append((train_start, train_end, train_end - self.warmup, test_end))
+        return windows
+    
+    def walk_forward(self, param_sets: List[Dict[str, float]], folds: int = 4,
+                     train_segments: int = 3) -> List[Dict[str, Any]]:
+        """
+        Chọn tham số tốt nhất trên mỗi đoạn train rồi đánh giá trên đoạn test kế tiếp (out-of-sample)
+        
+        Returns:
+            Mỗi fold một dòng: {'fold', 'train_start', 'test_start', 'test_end' (open time, ms),
+            'params', 'train_<metric>', <stats của đoạn test>...}
+        """
+        windows = self.folds(folds, train_segments)
+        train_tasks = [(params, train_start, train_end)
+                       for train_start, train_end, _, _ in windows for params in param_sets]
+        train_results = self._map(train_tasks)
+        
+        best = [self.rank(train_results[k * len(param_sets):(k + 1) * len(param_sets)])[0] for k in range(folds)]
+        test_results = self._map([(chosen['params'], test_start, test_end)
+                                  for chosen, (_, _, test_start, test_end) in zip(best, windows)])
+        
+        timestamps = self._candles().timestamps
+        results = []
+        for k, (chosen, tested) in enumerate(zip(best, test_results)):
+            train_start, train_end, test_start, test_end = windows[k]
+            results.append({
+                'fold': k + 1,
+                'train_start': int(timestamps[train_start]),
+                'test_start': int(timestamps[test_start + self.warmup]),
+                'test_end': int(timestamps[test_end - 1]),
+                'params': chosen['params'],
+                f"train_{self.metric}": chosen[self.metric],
+                **{name: tested[name] for name in RESULT_STATS}
+            })
+        
+        mean = float(np.mean([row[self.metric] for row in results]))
+        logger.info(f"🔧 Walk-forward {folds} folds: {self.metric} out-of-sample trung bình {mean:.3f}")
+        return results
+    
+    def write_table(self, results: List[Dict[str, Any]], path: str = None) -> Path:
+        """Ghi kết quả (search hoặc walk-forward) ra CSV, tham số thành từng cột"""
+        if path is None:
+            stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+            symbol = self.options['symbol'].replace('/', '')
+            path = Path(self.settings.OPTIMIZER_RESULTS_DIR) / f"{symbol}_{self.options['interval']}_{stamp}.csv"
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        
+        param_names = list(dict.fromkeys(name for row in results for name in row['params']))
+        leading = [name for name in ('rank', 'fold', 'train_start', 'test_start', 'test_end', f"train_{self.metric}")
+                   if results and name in results[0]]
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(leading + param_names + list(RESULT_STATS))
+            for row in results:
+                writer.writerow([row[name] for name in leading]
+                                + [row['params'].get(name, '') for name in param_names]
+                                + [row[name] for name in RESULT_STATS])
+        return path
+    
+    def close(self):
+        """Dừng process pool và giải phóng shared memory"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        if _worker.get('shm') is self._shm:
+            _worker.clear()
+            _prepared.cache_clear()
+        self._shm.close()
+        self._shm.unlink()
+
+if __name__ == "__main__":
+    import argparse
+    from data.archive import MarketArchive
+    from data.history import HistoryStore
+    
+    parser = argparse.ArgumentParser(description="Tối ưu tham số trading trên candles đã lưu")
+    parser.add_argument('symbol')
+    parser.add_argument('interval')
+    parser.add_argument('start', nargs='?', help="YYYY-MM-DD (UTC)")
+    parser.add_argument('end', nargs='?', help="YYYY-MM-DD (UTC)")
+    parser.add_argument('--source', choices=['history', 'archive'], default='history')
+    parser.add_argument('--mode', choices=['grid', 'random', 'walk-forward'], default='random')
+    parser.add_argument('--samples', type=int, default=100, help="số bộ tham số cho random / walk-forward")
+    parser.add_argument('--folds', type=int, default=4)
+    parser.add_argument('--metric', choices=RESULT_STATS, default=None)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--output', default=None, help="file CSV kết quả")
+    args = parser.parse_args()
+    
+    def to_ms(day: Optional[str]) -> Optional[int]:
+        if not day:
+            return None
+        return int(datetime.strptime(day, '%Y-%m-%d').replace(tzinfo=timezone.utc).timestamp() * 1000)
+    
+    logging.basicConfig(level=logging.INFO)
+    store = HistoryStore() if args.source == 'history' else MarketArchive()
+    loader = store.load if args.source == 'history' else store.candles
+    history = loader(args.symbol.upper(), args.interval, to_ms(args.start), to_ms(args.end))
+    
+    with Optimizer(history, args.symbol.upper(), args.interval, metric=args.metric, workers=args.workers) as optimizer:
+        started = time.perf_counter()
+        if args.mode == 'grid':
+            results = optimizer.grid_search()
+        elif args.mode == 'random':
+            results = optimizer.random_search(args.samples, seed=args.seed)
+        else:
+            results = optimizer.walk_forward(random_sample(args.samples, seed=args.seed), folds=args.folds)
+        path = optimizer.write_table(results, args.output)
+        elapsed = time.perf_counter() - started
+    
+    print(f"🔧 OPTIMIZER {args.symbol.upper()} {args.interval} - {args.mode}, {len(history):,} candles")
+    print("=" * 40)
+    for row in results[:10]:
+        label = f"#{row['rank']}" if 'rank' in row else f"fold {row['fold']}"
+        params = ', '.join(f"{name}={value}" for name, value in row['params'].items())
+        print(f"   {label}: {optimizer.metric} {row[optimizer.metric]:.3f} | return {row['total_return']:+.2%} | "
+              f"{row['trades']} trades | {params}")
+    print(f"   {elapsed:.1f}s ({optimizer.workers} workers) -> {path}")
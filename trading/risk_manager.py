@@ -2,7 +2,7 @@
 Risk Manager - Quản lý rủi ro và position sizing
 """
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Callable
 from datetime import datetime, timedelta
 from config.settings import Settings
 
@@ -11,20 +11,22 @@ logger = logging.getLogger(__name__)
 class RiskManager:
     """Quản lý rủi ro giao dịch"""
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], datetime] = None):
         self.settings = Settings()
+        # Thời gian "hiện tại" cho daily limit (backtest truyền thời gian của bar)
+        self.clock = clock or datetime.now
         self.daily_trades = []
         self.daily_pnl = 0
         self.max_drawdown = 0
         self.peak_balance = self.settings.INITIAL_BALANCE
-        
+    
     async def evaluate_risk(self, signal: Dict[str, Any]) -> Dict[str, Any]:
         """
         Đánh giá rủi ro cho signal
         
         Args:
             signal: Trading signal
-            
+        
         Returns:
             Risk evaluation result
         """
@@ -51,12 +53,17 @@ class RiskManager:
             market_check = self._check_market_conditions(signal)
             risk_checks.append(market_check)
             
+            # 6. Order book liquidity
+            liquidity_check = self._check_liquidity(signal)
+            risk_checks.append(liquidity_check)
+            
             # Overall risk assessment
             passed_checks = sum(1 for check in risk_checks if check['passed'])
             total_checks = len(risk_checks)
             
-            # Approve if more than 70% checks pass
-            approved = passed_checks / total_checks >= 0.7
+            # Approve if more than 70% checks pass; sổ lệnh không đủ thanh khoản => từ chối luôn
+            # (không có dữ liệu sổ lệnh thì liquidity check pass, không chặn)
+            approved = passed_checks / total_checks >= 0.7 and liquidity_check['passed']
             
             risk_evaluation = {
                 'approved': approved,
@@ -71,7 +78,7 @@ class RiskManager:
             logger.info(f"🛡️ Risk evaluation: {'✅ APPROVED' if approved else '❌ REJECTED'} ({passed_checks}/{total_checks} checks passed)")
             
             return risk_evaluation
-            
+        
         except Exception as e:
             logger.error(f"❌ Risk evaluation failed: {e}")
             return self._get_conservative_evaluation()
@@ -83,7 +90,7 @@ class RiskManager:
         Args:
             signal: Trading signal
             account_balance: Current account balance
-            
+        
         Returns:
             Position size in base currency
         """
@@ -121,7 +128,7 @@ class RiskManager:
             logger.info(f"💰 Position size calculated: {final_position_size:.6f} BTC (${final_position_size * (entry_price or 45000):.2f})")
             
             return final_position_size
-            
+        
         except Exception as e:
             logger.error(f"❌ Position size calculation failed: {e}")
             return 0.001  # Minimal position size
@@ -130,16 +137,17 @@ class RiskManager:
         """Cập nhật kết quả trade để tracking"""
         try:
             trade_data = {
-                'timestamp': datetime.now(),
+                'timestamp': self.clock(),
                 'side': trade_result.get('side'),
                 'amount': trade_result.get('amount', 0),
                 'price': trade_result.get('price', 0),
                 'pnl': trade_result.get('pnl', 0)
             }
             
-            # Add to daily trades
-            today = datetime.now().date()
-            self.daily_trades = [t for t in self.daily_trades if t['timestamp'].date() == today]
+            # Add to daily trades (list chỉ giữ trades của một ngày => sang ngày mới thì làm lại)
+            today = trade_data['timestamp'].date()
+            if self.daily_trades and self.daily_trades[-1]['timestamp'].date() != today:
+                self.daily_trades = []
             self.daily_trades.append(trade_data)
             
             # Update daily P&L
@@ -154,7 +162,7 @@ class RiskManager:
             self.max_drawdown = max(self.max_drawdown, drawdown)
             
             logger.info(f"📊 Trade recorded: P&L {trade_data['pnl']:+.2f}, Daily P&L: {self.daily_pnl:+.2f}")
-            
+        
         except Exception as e:
             logger.error(f"❌ Trade result update failed: {e}")
     
@@ -173,9 +181,9 @@ class RiskManager:
     
     def _check_daily_trade_limit(self) -> Dict[str, Any]:
         """Check daily trade limit"""
-        today = datetime.now().date()
-        today_trades = [t for t in self.daily_trades if t['timestamp'].date() == today]
-        trade_count = len(today_trades)
+        today = self.clock().date()
+        same_day = self.daily_trades and self.daily_trades[-1]['timestamp'].date() == today
+        trade_count = len(self.daily_trades) if same_day else 0
         max_trades = self.settings.MAX_DAILY_TRADES
         
         return {
@@ -245,6 +253,33 @@ class RiskManager:
             'message': f"Market risk level: {risk_level}"
         }
     
+    def _check_liquidity(self, signal: Dict[str, Any]) -> Dict[str, Any]:
+        """Check spread và depth của sổ lệnh đủ cho position tối đa"""
+        liquidity = signal.get('liquidity')
+        if not liquidity:
+            return {
+                'name': 'Liquidity',
+                'passed': True,
+                'value': None,
+                'threshold': self.settings.MAX_SPREAD_PERCENT,
+                'message': "No order book data"
+            }
+        
+        # Lệnh BUY ăn phía ask, SELL ăn phía bid
+        depth = liquidity['bid_depth'] if signal.get('action') == 'SELL' else liquidity['ask_depth']
+        order_value = self.settings.INITIAL_BALANCE * self._calculate_max_position_size()
+        spread_ok = liquidity['spread_percent'] <= self.settings.MAX_SPREAD_PERCENT
+        depth_ok = depth >= order_value
+        
+        return {
+            'name': 'Liquidity',
+            'passed': spread_ok and depth_ok,
+            'value': liquidity['spread_percent'],
+            'threshold': self.settings.MAX_SPREAD_PERCENT,
+            'message': f"Spread {liquidity['spread_percent']:.3f}%, depth ±{liquidity['depth_percent']}%: "
+                       f"${depth:,.0f} vs order ${order_value:,.0f}"
+        }
+    
     def _get_risk_recommendation(self, checks: list) -> str:
         """Get risk management recommendation"""
         failed_checks = [check for check in checks if not check['passed']]
@@ -3,12 +3,46 @@ Signal Generator - Tạo tín hiệu giao dịch từ AI và technical analysis
 """
 import logging
 import numpy as np
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Mapping, Tuple
 from datetime import datetime
 from config.settings import Settings
+from data.levels import STRONG_TOUCHES, zone_at
 
 logger = logging.getLogger(__name__)
 
+# Weight các indicators trong technical score
+SIGNAL_WEIGHTS = {
+    'rsi_signal': 0.25,
+    'macd_signal': 0.25,
+    'moving_averages': 0.25,
+    'support_resistance': 0.20,
+    'volume_signal': 0.05,
+    'orderbook_signal': 0.10
+}
+
+ACTION_SCORES = {
+    'BUY': 1.0,
+    'SELL': 0.0,
+    'HOLD': 0.5
+}
+
+# Batch scoring: hướng -1 / 0 / +1 tra bảng ra action và score (SELL / HOLD / BUY)
+ACTION_NAMES = np.array(['SELL', 'HOLD', 'BUY'])
+DIRECTION_SCORES = np.array([ACTION_SCORES[action] for action in ACTION_NAMES])
+
+# Các hàng của ma trận input cho generate_signals_batch (shape (len(BATCH_FIELDS), số symbols))
+BATCH_FIELDS = (
+    'price', 'rsi', 'macd', 'macd_signal', 'macd_histogram',
+    'sma_20', 'sma_50', 'ema_12', 'ema_26', 'current_price',
+    'volume', 'avg_volume',  # volume 24h / trung bình từ ticker như _volume_inputs
+    'imbalance', 'bid_depth', 'ask_depth'  # imbalance NaN = không có liquidity
+)
+
+# Ngưỡng volume ratio: trên HIGH => CONFIRM, dưới LOW => CAUTION (không tính điểm)
+VOLUME_HIGH_RATIO, VOLUME_LOW_RATIO = 1.5, 0.5
+ORDERBOOK_IMBALANCE = 0.3
+SR_PROXIMITY = 0.02
+
 class SignalGenerator:
     """Tạo và quản lý tín hiệu giao dịch"""
     
@@ -22,7 +56,7 @@ class SignalGenerator:
         
         Args:
             market_data: Dữ liệu thị trường
-            
+        
         Returns:
             Technical signals
         """
@@ -31,21 +65,27 @@ class SignalGenerator:
                 'rsi_signal': self._analyze_rsi(market_data.get('rsi', 50)),
                 'macd_signal': self._analyze_macd(market_data.get('macd', {})),
                 'moving_averages': self._analyze_moving_averages(market_data.get('moving_averages', {})),
-                'volume_signal': self._analyze_volume(market_data.get('volume', 0), market_data.get('avg_volume', 0)),
+                'volume_signal': self._analyze_volume(*self._volume_inputs(market_data)),
                 'support_resistance': self._analyze_support_resistance(
                     market_data.get('price', 0),
                     market_data.get('support_levels', []),
-                    market_data.get('resistance_levels', [])
+                    market_data.get('resistance_levels', []),
+                    market_data.get('sr_zones')
                 )
             }
             
+            # Sổ lệnh: imbalance trong ±X% quanh mid
+            if market_data.get('liquidity'):
+                signals['orderbook_signal'] = self._analyze_orderbook(market_data['liquidity'])
+            
             # Tổng hợp tín hiệu
             combined_signal = self._combine_technical_signals(signals)
+            combined_signal['liquidity'] = market_data.get('liquidity')
             
             logger.info(f"📊 Technical signals generated: {combined_signal['action']} - {combined_signal['confidence']:.2%}")
             
             return combined_signal
-            
+        
         except Exception as e:
             logger.error(f"❌ Signal generation failed: {e}")
             return self._get_neutral_signal()
@@ -57,14 +97,14 @@ class SignalGenerator:
         Args:
             ai_analysis: Kết quả phân tích AI
             technical_signals: Technical signals
-            
+        
         Returns:
             Combined signal
         """
         try:
-            # Weighted combination (AI: 60%, Technical: 40%)
-            ai_weight = 0.6
-            tech_weight = 0.4
+            # Weighted combination (mặc định AI: 60%, Technical: 40%)
+            ai_weight = self.settings.AI_SIGNAL_WEIGHT
+            tech_weight = self.settings.TECHNICAL_SIGNAL_WEIGHT
             
             ai_score = self._convert_action_to_score(ai_analysis.get('action', 'HOLD'))
             tech_score = self._convert_action_to_score(technical_signals.get('action', 'HOLD'))
@@ -100,6 +140,7 @@ class SignalGenerator:
                     'confidence': tech_confidence,
                     'key_indicators': technical_signals.get('key_indicators', [])
                 },
+                'liquidity': technical_signals.get('liquidity'),
                 'timestamp': datetime.now().isoformat()
             }
             
@@ -111,11 +152,145 @@ class SignalGenerator:
             logger.info(f"🎯 Combined signal: {combined_action} - {combined_confidence:.2%}")
             
             return combined_signal
-            
+        
         except Exception as e:
             logger.error(f"❌ Signal combination failed: {e}")
             return self._get_neutral_signal()
     
+    def batch_matrix(self, markets: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Ma trận input của generate_signals_batch từ danh sách market data
+        
+        Cùng giá trị mặc định như generate_signals (rsi 50, MACD / MA 0...).
+        
+        Returns:
+            (values (len(BATCH_FIELDS), n), supports (n, k), resistances (n, k)) - levels thiếu là NaN
+        """
+        values = np.empty((len(BATCH_FIELDS), len(markets)))
+        for i, market_data in enumerate(markets):
+            macd = market_data.get('macd', {})
+            ma = market_data.get('moving_averages', {})
+            liquidity = market_data.get('liquidity') or {}
+            volume, avg_volume = self._volume_inputs(market_data)
+            values[:, i] = (
+                market_data.get('price', 0), market_data.get('rsi', 50),
+                macd.get('macd', 0), macd.get('signal', 0), macd.get('histogram', 0),
+                ma.get('sma_20', 0), ma.get('sma_50', 0), ma.get('ema_12', 0), ma.get('ema_26', 0),
+                ma.get('current_price', 0), volume, avg_volume,
+                liquidity.get('imbalance', 0) if liquidity else np.nan,
+                liquidity.get('bid_depth') or 0, liquidity.get('ask_depth') or 0
+            )
+        
+        def levels(name):
+            width = max((len(market_data.get(name, [])) for market_data in markets), default=0)
+            result = np.full((len(markets), width), np.nan)
+            for i, market_data in enumerate(markets):
+                row = market_data.get(name, [])
+                result[i, :len(row)] = row
+            return result
+        
+        return values, levels('support_levels'), levels('resistance_levels')
+    
+    def generate_signals_batch(self, values: np.ndarray, supports: Optional[np.ndarray] = None,
+                               resistances: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """
+        Technical signals cho nhiều symbols trong một lần gọi
+        
+        Cùng luật RSI / MACD / MA / volume / S/R / order book và cùng thứ tự cộng
+        điểm như generate_signals, nên action / confidence giống hệt từng symbol
+        chạy riêng (kể cả HOLD 0.5 khi generate_signals lỗi vì price = 0).
+        
+        Args:
+            values: Ma trận (len(BATCH_FIELDS), n), ví dụ từ batch_matrix()
+            supports: Support levels (n, k), NaN = không có level
+            resistances: Resistance levels (n, k), NaN = không có level
+        
+        Returns:
+            {'action' (tên action), 'direction' (+1 / 0 / -1), 'score', 'confidence'}
+        """
+        columns = dict(zip(BATCH_FIELDS, values))
+        n = values.shape[1]
+        scores = self._vector_scores(columns)
+        
+        # Volume chỉ tính điểm khi HOLD (CONFIRM / CAUTION là xác nhận, bỏ qua)
+        volume, avg_volume = columns['volume'], columns['avg_volume']
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = volume / np.where(avg_volume == 0, np.nan, avg_volume)
+        volume_scored = (avg_volume == 0) | ~((ratio > VOLUME_HIGH_RATIO) | (ratio < VOLUME_LOW_RATIO))
+        scores['volume_signal'] = np.full(n, ACTION_SCORES['HOLD'])
+        
+        price = columns['price']
+        empty = np.empty((n, 0))
+        supports = empty if supports is None else supports
+        resistances = empty if resistances is None else resistances
+        current = price[:, None]
+        nearest_support = np.where(supports < current, supports, -np.inf).max(axis=1, initial=-np.inf)
+        nearest_resistance = np.where(resistances > current, resistances, np.inf).min(axis=1, initial=np.inf)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            support_distance = np.where(nearest_support > 0, (price - nearest_support) / price, 1)
+            resistance_distance = np.where(np.isfinite(nearest_resistance), (nearest_resistance - price) / price, 1)
+        scores['support_resistance'] = DIRECTION_SCORES[1 + np.where(
+            support_distance < SR_PROXIMITY, 1, np.where(resistance_distance < SR_PROXIMITY, -1, 0))]
+        
+        imbalance = columns['imbalance']
+        has_book = ~np.isnan(imbalance)
+        has_depth = (columns['bid_depth'] != 0) & (columns['ask_depth'] != 0)
+        scores['orderbook_signal'] = DIRECTION_SCORES[1 + np.where(
+            has_depth & (imbalance > ORDERBOOK_IMBALANCE), 1,
+            np.where(has_depth & (imbalance < -ORDERBOOK_IMBALANCE), -1, 0))]
+        
+        # Cộng theo đúng thứ tự signals của generate_signals (float cộng không kết hợp)
+        included = {'volume_signal': volume_scored, 'orderbook_signal': has_book}
+        total_score = np.zeros(n)
+        total_weight = np.zeros(n)
+        for name in ('rsi_signal', 'macd_signal', 'moving_averages', 'volume_signal',
+                     'support_resistance', 'orderbook_signal'):
+            weight = SIGNAL_WEIGHTS[name]
+            mask = included.get(name)
+            if mask is None:
+                total_score += scores[name] * weight
+                total_weight += weight
+            else:
+                total_score += np.where(mask, scores[name] * weight, 0.0)
+                total_weight += np.where(mask, weight, 0.0)
+        
+        avg_score = total_score / total_weight
+        confidence = np.minimum(np.abs(avg_score - 0.5) * 2, 1.0)
+        direction = np.where(avg_score > 0.6, 1, np.where(avg_score < 0.4, -1, 0)).astype(np.int8)
+        
+        # generate_signals lỗi chia cho price = 0 khi có resistance => neutral signal
+        failed = (price == 0) & np.isfinite(nearest_resistance)
+        direction[failed] = 0
+        confidence[failed] = 0.5
+        
+        return {
+            'action': ACTION_NAMES[direction + 1],
+            'direction': direction,
+            'score': avg_score,
+            'confidence': confidence
+        }
+    
+    def _vector_scores(self, columns: Mapping[str, np.ndarray]) -> Dict[str, np.ndarray]:
+        """
+        Score RSI / MACD / MA dạng mảng (cùng luật _analyze_rsi / _analyze_macd / _analyze_moving_averages)
+        
+        columns: rsi, macd, macd_signal, macd_histogram, current_price, sma_20, sma_50, ema_12, ema_26
+        """
+        rsi = columns['rsi']
+        macd, signal, histogram = columns['macd'], columns['macd_signal'], columns['macd_histogram']
+        price, sma_20, sma_50 = columns['current_price'], columns['sma_20'], columns['sma_50']
+        ema_12, ema_26 = columns['ema_12'], columns['ema_26']
+        
+        bullish = ((price > sma_20) & (sma_20 > sma_50)).astype(np.int8) + (ema_12 > ema_26)
+        bearish = ((price < sma_20) & (sma_20 < sma_50)).astype(np.int8) + (ema_12 < ema_26)
+        return {
+            'rsi_signal': DIRECTION_SCORES[1 + np.where(
+                rsi <= self.settings.RSI_OVERSOLD, 1, np.where(rsi >= self.settings.RSI_OVERBOUGHT, -1, 0))],
+            'macd_signal': DIRECTION_SCORES[1 + np.where(
+                (macd > signal) & (histogram > 0), 1, np.where((macd < signal) & (histogram < 0), -1, 0))],
+            'moving_averages': DIRECTION_SCORES[1 + np.sign(bullish - bearish)]
+        }
+    
     def _analyze_rsi(self, rsi: float) -> Dict[str, Any]:
         """Phân tích RSI indicator"""
         if rsi <= self.settings.RSI_OVERSOLD:
@@ -208,6 +383,15 @@ class SignalGenerator:
             'reason': f'MA analysis: {len(signals)} signals detected'
         }
     
+    def _volume_inputs(self, market_data: Dict[str, Any]):
+        """
+        Volume 24h và volume trung bình từ ticker - cùng input với trước khi có CandleBuffer
+        
+        Không đọc candle đang chạy trong market_data['candles']: volume của candle chưa đóng
+        thường thấp hơn trung bình => HOLD và được tính điểm, làm đổi confidence kỹ thuật.
+        """
+        return market_data.get('volume', 0), market_data.get('avg_volume', 0)
+    
     def _analyze_volume(self, current_volume: float, avg_volume: float) -> Dict[str, Any]:
         """Phân tích Volume"""
         if avg_volume == 0:
@@ -215,14 +399,14 @@ class SignalGenerator:
         
         volume_ratio = current_volume / avg_volume
         
-        if volume_ratio > 1.5:  # High volume
+        if volume_ratio > VOLUME_HIGH_RATIO:  # High volume
             return {
                 'action': 'CONFIRM',  # Volume confirms other signals
                 'strength': 'STRONG',
                 'ratio': volume_ratio,
                 'reason': f'High volume: {volume_ratio:.1f}x average'
             }
-        elif volume_ratio < 0.5:  # Low volume
+        elif volume_ratio < VOLUME_LOW_RATIO:  # Low volume
             return {
                 'action': 'CAUTION',
                 'strength': 'WEAK',
@@ -237,9 +421,45 @@ class SignalGenerator:
                 'reason': 'Normal volume'
             }
     
-    def _analyze_support_resistance(self, current_price: float, support_levels: List[float], 
-                                  resistance_levels: List[float]) -> Dict[str, Any]:
-        """Phân tích Support/Resistance levels"""
+    def _analyze_orderbook(self, liquidity: Dict[str, Any]) -> Dict[str, Any]:
+        """Phân tích Order Book imbalance"""
+        imbalance = liquidity.get('imbalance', 0)
+        band = liquidity.get('depth_percent', 1)
+        
+        if not liquidity.get('bid_depth') or not liquidity.get('ask_depth'):
+            return {'action': 'HOLD', 'strength': 'WEAK', 'imbalance': imbalance, 'reason': 'No order book depth'}
+        
+        if imbalance > ORDERBOOK_IMBALANCE:  # Bên mua dày hơn
+            return {
+                'action': 'BUY',
+                'strength': 'STRONG' if imbalance > 0.6 else 'MEDIUM',
+                'imbalance': imbalance,
+                'reason': f'Bid-heavy order book: {imbalance:+.0%} within ±{band}%'
+            }
+        elif imbalance < -ORDERBOOK_IMBALANCE:  # Bên bán dày hơn
+            return {
+                'action': 'SELL',
+                'strength': 'STRONG' if imbalance < -0.6 else 'MEDIUM',
+                'imbalance': imbalance,
+                'reason': f'Ask-heavy order book: {imbalance:+.0%} within ±{band}%'
+            }
+        else:
+            return {
+                'action': 'HOLD',
+                'strength': 'MEDIUM',
+                'imbalance': imbalance,
+                'reason': 'Balanced order book'
+            }
+    
+    def _analyze_support_resistance(self, current_price: float, support_levels: List[float],
+                                  resistance_levels: List[float],
+                                  zones: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        Phân tích Support/Resistance levels
+        
+        zones (market_data['sr_zones']) chỉ chấm độ mạnh theo số lần chạm của vùng,
+        action giữ nguyên để generate_signals_batch / backtest cho cùng kết quả.
+        """
         if not support_levels and not resistance_levels:
             return {'action': 'HOLD', 'reason': 'No S/R levels'}
         
@@ -250,19 +470,21 @@ class SignalGenerator:
         support_distance = (current_price - nearest_support) / current_price if nearest_support > 0 else 1
         resistance_distance = (nearest_resistance - current_price) / current_price if nearest_resistance < float('inf') else 1
         
-        if support_distance < 0.02:  # Within 2% of support
+        if support_distance < SR_PROXIMITY:  # Within 2% of support
+            zone = zone_at(zones, nearest_support)
             return {
                 'action': 'BUY',
-                'strength': 'MEDIUM',
+                'strength': self._zone_strength(zone),
                 'level': nearest_support,
-                'reason': f'Near support at ${nearest_support:.2f}'
+                'reason': f'Near support at ${nearest_support:.2f}' + self._zone_touches(zone)
             }
-        elif resistance_distance < 0.02:  # Within 2% of resistance
+        elif resistance_distance < SR_PROXIMITY:  # Within 2% of resistance
+            zone = zone_at(zones, nearest_resistance)
             return {
                 'action': 'SELL',
-                'strength': 'MEDIUM',
+                'strength': self._zone_strength(zone),
                 'level': nearest_resistance,
-                'reason': f'Near resistance at ${nearest_resistance:.2f}'
+                'reason': f'Near resistance at ${nearest_resistance:.2f}' + self._zone_touches(zone)
             }
         else:
             return {
@@ -271,26 +493,27 @@ class SignalGenerator:
                 'reason': 'Not near significant S/R levels'
             }
     
+    @staticmethod
+    def _zone_strength(zone: Optional[Dict[str, Any]]) -> str:
+        """STRONG khi vùng được chạm từ STRONG_TOUCHES lần"""
+        return 'STRONG' if zone and zone['touches'] >= STRONG_TOUCHES else 'MEDIUM'
+    
+    @staticmethod
+    def _zone_touches(zone: Optional[Dict[str, Any]]) -> str:
+        """Số lần chạm của vùng, thêm vào reason"""
+        return f" ({zone['touches']} touches)" if zone else ''
+    
     def _combine_technical_signals(self, signals: Dict[str, Any]) -> Dict[str, Any]:
         """Tổng hợp các technical signals"""
-        # Weight các indicators
-        weights = {
-            'rsi_signal': 0.25,
-            'macd_signal': 0.25,
-            'moving_averages': 0.25,
-            'support_resistance': 0.20,
-            'volume_signal': 0.05
-        }
-        
         total_score = 0
         total_weight = 0
         key_indicators = []
         reasoning_parts = []
         
         for signal_name, signal_data in signals.items():
-            if signal_name in weights:
+            if signal_name in SIGNAL_WEIGHTS:
                 action = signal_data.get('action', 'HOLD')
-                weight = weights[signal_name]
+                weight = SIGNAL_WEIGHTS[signal_name]
                 
                 # Skip volume signal for scoring (it's confirmation only)
                 if action not in ['CONFIRM', 'CAUTION']:
@@ -321,12 +544,7 @@ class SignalGenerator:
     
     def _convert_action_to_score(self, action: str) -> float:
         """Convert action to numerical score"""
-        action_map = {
-            'BUY': 1.0,
-            'SELL': 0.0,
-            'HOLD': 0.5
-        }
-        return action_map.get(action, 0.5)
+        return ACTION_SCORES.get(action, 0.5)
     
     def _convert_score_to_action(self, score: float) -> str:
         """Convert numerical score to action"""
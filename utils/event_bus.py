@@ -0,0 +1,179 @@
+"""
+Event Bus - Pub/sub async trong process cho trading loop hướng sự kiện
+"""
+import logging
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterable
+
+logger = logging.getLogger(__name__)
+
+EventHandler = Callable[[Dict[str, 'Event']], Awaitable[Any]]
+
+class Event:
+    """Một event đã publish: topic, payload và thời điểm publish (perf_counter)"""
+    
+    __slots__ = ('topic', 'data', 'published')
+    
+    def __init__(self, topic: str, data: Any = None):
+        self.topic = topic
+        self.data = data
+        self.published = time.perf_counter()
+    
+    def __repr__(self) -> str:
+        return f"Event({self.topic!r}, {self.data!r})"
+
+class Subscription:
+    """
+    Một handler đăng ký một hoặc nhiều topic, chạy tuần tự trong task riêng
+    
+    Backpressure: trong lúc handler đang chạy, event mới chỉ ghi đè event chờ
+    cùng topic (mỗi topic giữ bản mới nhất), nên một loạt tick dồn dập chỉ
+    tạo ra một lần chạy tiếp theo thay vì một hàng đợi dài. Debounce: sau
+    event đầu tiên đợi thêm debounce giây để gom các event đến ngay sau đó.
+    """
+    
+    def __init__(self, topics: Iterable[str], handler: EventHandler, debounce: float = 0.0, name: str = None):
+        self.topics = tuple(topics)
+        self.handler = handler
+        self.debounce = debounce
+        self.name = name or getattr(handler, '__name__', 'handler')
+        
+        self.pending: Dict[str, Event] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        
+        self.stats = {
+            'events': 0,
+            'coalesced': 0,
+            'runs': 0,
+            'errors': 0,
+            'latency_ms': 0.0,      # publish (event cũ nhất của lần chạy) -> handler bắt đầu, lần gần nhất
+            'max_latency_ms': 0.0,
+            'handler_ms': 0.0       # thời gian chạy handler, lần gần nhất
+        }
+        self._latency_total = 0.0
+    
+    def offer(self, event: Event):
+        """Nhận event (không chặn): ghi đè event chờ cùng topic"""
+        previous = self.pending.get(event.topic)
+        if previous is not None:
+            event.published = previous.published  # latency tính từ event đầu tiên chưa được xử lý
+            self.stats['coalesced'] += 1
+        self.pending[event.topic] = event
+        self.stats['events'] += 1
+        self._wakeup.set()
+    
+    def start(self):
+        """Chạy worker task (trong event loop hiện tại)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        """Hủy worker task, event đang chờ bị bỏ"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    @property
+    def avg_latency_ms(self) -> float:
+        """Latency trung bình publish -> handler (ms)"""
+        return self._latency_total / self.stats['runs'] if self.stats['runs'] else 0.0
+    
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if self.debounce > 0:
+                await asyncio.sleep(self.debounce)
+            self._wakeup.clear()
+            events, self.pending = self.pending, {}
+            if not events:
+                continue
+            
+            started = time.perf_counter()
+            latency_ms = (started - min(event.published for event in events.values())) * 1000
+            self.stats['runs'] += 1
+            self.stats['latency_ms'] = latency_ms
+            self.stats['max_latency_ms'] = max(self.stats['max_latency_ms'], latency_ms)
+            self._latency_total += latency_ms
+            try:
+                await self.handler(events)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['errors'] += 1
+                logger.error(f"❌ Event handler {self.name} failed: {e}")
+            self.stats['handler_ms'] = (time.perf_counter() - started) * 1000
+
+class EventBus:
+    """
+    Pub/sub async: publish() đồng bộ, gọi được từ stream callbacks
+    
+    Mỗi subscription có task riêng nên handler chậm không chặn stream hay
+    các subscription khác; publish chỉ ghi event vào subscription của topic.
+    """
+    
+    def __init__(self):
+        self.subscriptions: List[Subscription] = []
+        self._by_topic: Dict[str, List[Subscription]] = {}
+        self.is_running = False
+        self.stats = {
+            'published': 0,
+            'dropped': 0  # topic không có subscriber
+        }
+    
+    def subscribe(self, topics: Iterable[str], handler: EventHandler, debounce: float = 0.0,
+                  name: str = None) -> Subscription:
+        """
+        Đăng ký handler(events) cho các topic
+        
+        Args:
+            topics: Một topic hoặc danh sách topic
+            handler: Coroutine function nhận dict topic -> Event mới nhất của topic đó
+            debounce: Giây chờ gom event sau event đầu tiên
+        """
+        if isinstance(topics, str):
+            topics = [topics]
+        subscription = Subscription(topics, handler, debounce, name)
+        self.subscriptions.append(subscription)
+        for topic in subscription.topics:
+            self._by_topic.setdefault(topic, []).append(subscription)
+        if self.is_running:
+            subscription.start()
+        return subscription
+    
+    def publish(self, topic: str, data: Any = None):
+        """Publish event cho mọi subscription của topic (không chặn)"""
+        self.stats['published'] += 1
+        subscriptions = self._by_topic.get(topic)
+        if not subscriptions:
+            self.stats['dropped'] += 1
+            return
+        for subscription in subscriptions:
+            subscription.offer(Event(topic, data))
+    
+    async def start(self):
+        """Chạy task của mọi subscription"""
+        self.is_running = True
+        for subscription in self.subscriptions:
+            subscription.start()
+    
+    async def stop(self):
+        """Dừng mọi subscription (event đang chờ bị bỏ)"""
+        self.is_running = False
+        for subscription in self.subscriptions:
+            await subscription.stop()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Stats của bus và từng subscription"""
+        return {
+            **self.stats,
+            'subscriptions': {
+                subscription.name: {**subscription.stats, 'avg_latency_ms': subscription.avg_latency_ms}
+                for subscription in self.subscriptions
+            }
+        }
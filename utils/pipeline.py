@@ -0,0 +1,241 @@
+"""
+Pipeline - DAG executor async: chạy song song các stage độc lập, timeout / hủy theo từng stage
+"""
+import logging
+import asyncio
+import time
+from typing import Dict, List, Any, Optional, Callable, Awaitable, Iterable
+
+logger = logging.getLogger(__name__)
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+# Trạng thái stage sau một lần chạy
+STATUS_OK = 'ok'
+STATUS_TIMEOUT = 'timeout'
+STATUS_ERROR = 'error'
+STATUS_SKIPPED = 'skipped'        # dependency không có kết quả
+STATUS_CANCELLED = 'cancelled'    # stage required khác lỗi => hủy phần còn lại
+STATUS_BACKGROUND = 'background'  # đã chạy nền, không chờ
+
+_NO_FALLBACK = object()
+
+class Stage:
+    """
+    Một bước của pipeline
+    
+    func(results) nhận dict kết quả của các stage đã xong (và input của run()),
+    giá trị trả về được lưu vào results[name].
+    
+    Args:
+        depends: Tên các stage (hoặc input) cần có trước
+        timeout: Giây tối đa (None = không giới hạn)
+        fallback: Giá trị (hoặc callable(results)) dùng khi lỗi / timeout để stage sau vẫn chạy
+        required: Lỗi không có fallback => hủy các stage đang chạy và dừng pipeline
+        background: Chạy nền, run() không chờ (không stage nào được phụ thuộc vào nó)
+    """
+    
+    def __init__(self, name: str, func: StageFunc, depends: Iterable[str] = (), timeout: Optional[float] = None,
+                 fallback: Any = _NO_FALLBACK, required: bool = True, background: bool = False):
+        self.name = name
+        self.func = func
+        self.depends = tuple(depends)
+        self.timeout = timeout
+        self.fallback = fallback
+        self.required = required
+        self.background = background
+    
+    @property
+    def has_fallback(self) -> bool:
+        """Có giá trị thay thế khi lỗi / timeout"""
+        return self.fallback is not _NO_FALLBACK
+    
+    def fallback_value(self, results: Dict[str, Any]) -> Any:
+        """Giá trị thay thế (gọi fallback(results) nếu là callable)"""
+        return self.fallback(results) if callable(self.fallback) else self.fallback
+
+class Pipeline:
+    """
+    Chạy các Stage theo thứ tự phụ thuộc, mỗi stage bắt đầu ngay khi đủ dependency
+    
+    Stage background (ví dụ cập nhật portfolio) chạy ngoài critical path: run()
+    trả kết quả không chờ nó, và lần chạy sau bỏ qua stage đó nếu lần trước
+    chưa xong thay vì chồng thêm task.
+    """
+    
+    def __init__(self, stages: List[Stage], name: str = 'pipeline'):
+        self.name = name
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise ValueError(f"Pipeline {name}: trùng tên stage")
+        self._validate()
+        
+        self._background: Dict[str, asyncio.Task] = {}
+        self.stats = {
+            'runs': 0,
+            'failed_runs': 0,
+            'background_skipped': 0,
+            'stages': {
+                stage: {'runs': 0, 'timeouts': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'last_ms': 0.0}
+                for stage in self.stages
+            }
+        }
+    
+    def _validate(self):
+        """Dependency của stage khác phải tồn tại, không có chu trình, không phụ thuộc stage background"""
+        for stage in self.stages.values():
+            for dependency in stage.depends:
+                if dependency in self.stages and self.stages[dependency].background:
+                    raise ValueError(f"Stage {stage.name} phụ thuộc stage background {dependency}")
+        
+        visiting, done = set(), set()
+        
+        def visit(name: str):
+            if name in done or name not in self.stages:
+                return
+            if name in visiting:
+                raise ValueError(f"Pipeline {self.name}: chu trình tại stage {name}")
+            visiting.add(name)
+            for dependency in self.stages[name].depends:
+                visit(dependency)
+            visiting.discard(name)
+            done.add(name)
+        
+        for name in self.stages:
+            visit(name)
+    
+    async def run(self, **inputs) -> Dict[str, Any]:
+        """
+        Chạy một lượt pipeline
+        
+        Args:
+            inputs: Giá trị có sẵn cho stage (dependency không phải tên stage phải có ở đây)
+        
+        Returns:
+            Dict với results, status, timings (ms), errors, elapsed_ms (critical path), ok
+        """
+        missing = {dependency for stage in self.stages.values() for dependency in stage.depends
+                   if dependency not in self.stages and dependency not in inputs}
+        if missing:
+            raise ValueError(f"Pipeline {self.name}: thiếu input {', '.join(sorted(missing))}")
+        
+        started = time.perf_counter()
+        results: Dict[str, Any] = dict(inputs)
+        status: Dict[str, str] = {}
+        timings: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        running: Dict[asyncio.Task, Stage] = {}
+        ok = True
+        
+        try:
+            while True:
+                for stage in self.stages.values():
+                    if stage.name in status or stage in running.values():
+                        continue
+                    if any(status.get(dependency) not in (None, STATUS_OK) and dependency not in results
+                           for dependency in stage.depends):
+                        status[stage.name] = STATUS_SKIPPED
+                    elif all(dependency in results for dependency in stage.depends):
+                        if stage.background:
+                            self._start_background(stage, results)
+                            status[stage.name] = STATUS_BACKGROUND
+                        else:
+                            running[asyncio.create_task(self._run_stage(stage, results))] = stage
+                
+                if not running:
+                    break
+                done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+                failed = None
+                for task in done:
+                    stage = running.pop(task)
+                    value, status[stage.name], timings[stage.name], error = task.result()
+                    if error:
+                        errors[stage.name] = error
+                    if status[stage.name] == STATUS_OK:
+                        results[stage.name] = value
+                    elif stage.has_fallback:
+                        results[stage.name] = stage.fallback_value(results)
+                    elif stage.required:
+                        failed = stage
+                
+                if failed:
+                    ok = False
+                    for task, stage in running.items():
+                        task.cancel()
+                        status[stage.name] = STATUS_CANCELLED
+                    await asyncio.gather(*running, return_exceptions=True)
+                    running.clear()
+                    for name in self.stages:
+                        status.setdefault(name, STATUS_CANCELLED)
+                    logger.warning(f"⚠️ Pipeline {self.name} stopped: stage {failed.name} {status[failed.name]}")
+                    break
+        except asyncio.CancelledError:
+            for task in running:  # caller bị hủy (ví dụ bot dừng) => không để stage chạy mồ côi
+                task.cancel()
+            raise
+        
+        self.stats['runs'] += 1
+        if not ok:
+            self.stats['failed_runs'] += 1
+        return {
+            'results': {name: results[name] for name in self.stages if name in results},
+            'status': status,
+            'timings': timings,
+            'errors': errors,
+            'elapsed_ms': (time.perf_counter() - started) * 1000,
+            'ok': ok
+        }
+    
+    async def _run_stage(self, stage: Stage, results: Dict[str, Any]):
+        """Chạy một stage với timeout: (value, status, ms, error)"""
+        started = time.perf_counter()
+        value, status, error = None, STATUS_OK, None
+        try:
+            value = await asyncio.wait_for(stage.func(results), stage.timeout)
+        except asyncio.TimeoutError:
+            status, error = STATUS_TIMEOUT, f"timeout after {stage.timeout}s"
+        except Exception as e:
+            status, error = STATUS_ERROR, str(e)
+        
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        stats = self.stats['stages'][stage.name]
+        stats['runs'] += 1
+        stats['last_ms'] = elapsed_ms
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+        if status == STATUS_TIMEOUT:
+            stats['timeouts'] += 1
+            logger.warning(f"⚠️ Stage {stage.name} timed out after {stage.timeout}s")
+        elif status == STATUS_ERROR:
+            stats['errors'] += 1
+            logger.error(f"❌ Stage {stage.name} failed: {error}")
+        return value, status, elapsed_ms, error
+    
+    def _start_background(self, stage: Stage, results: Dict[str, Any]):
+        """Chạy stage nền; lần trước chưa xong thì bỏ qua lần này"""
+        previous = self._background.get(stage.name)
+        if previous and not previous.done():
+            self.stats['background_skipped'] += 1
+            return
+        self._background[stage.name] = asyncio.create_task(self._run_stage(stage, dict(results)))
+    
+    async def drain(self, timeout: Optional[float] = None):
+        """Chờ các stage background đang chạy (ví dụ khi tắt bot); quá timeout thì hủy"""
+        tasks = [task for task in self._background.values() if not task.done()]
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    
+    def summary(self, run: Dict[str, Any]) -> str:
+        """Một dòng log: thời gian từng stage và critical path"""
+        parts = []
+        for name in self.stages:
+            state = run['status'].get(name)
+            if name in run['timings']:
+                parts.append(f"{name} {run['timings'][name]:.0f}ms" + ('' if state == STATUS_OK else f" ({state})"))
+            elif state:
+                parts.append(f"{name} ({state})")
+        return f"{' | '.join(parts)} => {run['elapsed_ms']:.0f}ms"
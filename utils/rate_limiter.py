@@ -0,0 +1,244 @@
+"""
+Rate Limiter - Token bucket theo request weight của Binance REST API
+"""
+import logging
+import asyncio
+import heapq
+import itertools
+import time
+from typing import Dict, Any, Optional, Mapping
+from config.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Độ ưu tiên (số nhỏ được phục vụ trước)
+PRIORITY_ORDER = 0         # Đặt / hủy lệnh
+PRIORITY_ACCOUNT = 1       # Balance, lịch sử lệnh
+PRIORITY_MARKET_DATA = 2   # Giá, orderbook, klines cho trading cycle
+PRIORITY_BACKGROUND = 3    # Tải lịch sử, dashboard
+
+# Weight cố định theo endpoint (GET /api/v3/...); endpoint phụ thuộc tham số xem endpoint_weight()
+ENDPOINT_WEIGHTS = {
+    '/ping': 1,
+    '/time': 1,
+    '/exchangeInfo': 20,
+    '/trades': 25,
+    '/historicalTrades': 25,
+    '/aggTrades': 2,
+    '/klines': 2,
+    '/uiKlines': 2,
+    '/avgPrice': 2,
+    '/order': 1,
+    '/account': 20,
+    '/allOrders': 20,
+    '/myTrades': 20
+}
+
+def endpoint_weight(path: str, params: Optional[Mapping[str, Any]] = None) -> int:
+    """
+    Request weight của một endpoint Binance spot
+    
+    Args:
+        path: Đường dẫn sau /api/v3, ví dụ '/klines'
+        params: Query params (weight của depth / ticker phụ thuộc tham số)
+    """
+    params = params or {}
+    path = '/' + path.strip('/')
+    
+    if path == '/depth':
+        limit = int(params.get('limit', 100))
+        if limit <= 100:
+            return 5
+        if limit <= 500:
+            return 25
+        if limit <= 1000:
+            return 50
+        return 250
+    
+    if path == '/ticker/24hr':
+        if 'symbol' in params:
+            return 2
+        if 'symbols' in params:
+            count = str(params['symbols']).count(',') + 1
+            return 2 if count <= 20 else 40 if count <= 100 else 80
+        return 80
+    
+    if path in ('/ticker/price', '/ticker/bookTicker'):
+        return 2 if 'symbol' in params else 4
+    
+    if path == '/openOrders':
+        return 6 if 'symbol' in params else 80
+    
+    return ENDPOINT_WEIGHTS.get(path, 1)
+
+class _Waiter:
+    """Request đang xếp hàng chờ weight"""
+    
+    __slots__ = ('priority', 'sequence', 'weight', 'future')
+    
+    def __init__(self, priority: int, sequence: int, weight: int):
+        self.priority = priority
+        self.sequence = sequence
+        self.weight = weight
+        self.future: Optional[asyncio.Future] = None
+    
+    def __lt__(self, other: '_Waiter') -> bool:
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+    
+    def wake(self):
+        if self.future is not None and not self.future.done():
+            self.future.set_result(None)
+
+class RateLimiter:
+    """
+    Token bucket dùng chung cho mọi REST call tới Binance
+    
+    Bucket chứa tối đa BINANCE_WEIGHT_LIMIT weight (trừ phần dự phòng) và
+    nạp lại đều trong 60s. Request lấy đủ weight mới được gửi; khi thiếu thì
+    xếp hàng theo độ ưu tiên (lệnh trước market data). Header
+    X-MBX-USED-WEIGHT-1M kéo bucket về số weight server đã đếm; 429/418
+    tạm dừng toàn bộ request theo Retry-After.
+    """
+    
+    def __init__(self, weight_limit: int = None, window_seconds: float = 60.0, safety_margin: float = None):
+        self.settings = Settings()
+        weight_limit = weight_limit or self.settings.BINANCE_WEIGHT_LIMIT
+        margin = self.settings.RATE_LIMIT_SAFETY_MARGIN if safety_margin is None else safety_margin
+        
+        self.weight_limit = weight_limit
+        self.capacity = max(1, int(weight_limit * (1 - margin)))
+        self.refill_rate = weight_limit / window_seconds  # weight / giây
+        self.tokens = float(self.capacity)
+        self.paused_until = 0.0
+        self.server_used_weight: Optional[int] = None
+        
+        self._updated = time.monotonic()
+        self._queue: list = []
+        self._sequence = itertools.count()
+        
+        self.stats = {
+            'requests': 0,
+            'weight_consumed': 0,
+            'queued': 0,
+            'rate_limited': 0,  # HTTP 429
+            'banned': 0         # HTTP 418
+        }
+    
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.refill_rate)
+            self._updated = now
+    
+    def _delay(self, weight: int, now: float) -> float:
+        """Số giây phải chờ để có đủ weight (0 = gửi được ngay)"""
+        if now < self.paused_until:
+            return self.paused_until - now
+        missing = min(weight, self.capacity) - self.tokens
+        return missing / self.refill_rate if missing > 0 else 0.0
+    
+    def _take(self, weight: int):
+        self.tokens -= weight
+        self.stats['requests'] += 1
+        self.stats['weight_consumed'] += weight
+    
+    def available(self) -> int:
+        """Weight có thể dùng ngay (không tính request đang xếp hàng)"""
+        now = time.monotonic()
+        self._refill(now)
+        if now < self.paused_until:
+            return 0
+        return max(0, int(self.tokens))
+    
+    async def acquire(self, weight: int, priority: int = PRIORITY_MARKET_DATA):
+        """
+        Chờ tới khi đủ weight cho request
+        
+        Args:
+            weight: Request weight (xem endpoint_weight)
+            priority: PRIORITY_* - số nhỏ được phục vụ trước
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if not self._queue and self._delay(weight, now) == 0:
+            self._take(weight)
+            return
+        
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._sequence), weight)
+        previous_head = self._queue[0] if self._queue else None
+        heapq.heappush(self._queue, waiter)
+        self.stats['queued'] += 1
+        if previous_head is not None and self._queue[0] is waiter:
+            previous_head.wake()  # Request ưu tiên hơn chen lên đầu hàng
+        
+        try:
+            while True:
+                waiter.future = loop.create_future()
+                if self._queue[0] is waiter:
+                    now = time.monotonic()
+                    self._refill(now)
+                    delay = self._delay(weight, now)
+                    if delay == 0:
+                        heapq.heappop(self._queue)
+                        self._take(weight)
+                        if self._queue:
+                            self._queue[0].wake()
+                        return
+                    await asyncio.wait([waiter.future], timeout=delay)
+                else:
+                    await waiter.future
+        except BaseException:
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                if self._queue:
+                    self._queue[0].wake()
+            raise
+    
+    def update_from_response(self, status: int, headers: Mapping[str, str]):
+        """Đồng bộ bucket theo header weight và xử lý 429 / 418"""
+        used = headers.get('X-MBX-USED-WEIGHT-1M') or headers.get('X-MBX-USED-WEIGHT')
+        if used is not None:
+            self.server_used_weight = int(used)
+            self._refill(time.monotonic())
+            self.tokens = min(self.tokens, self.capacity - self.server_used_weight)
+        
+        if status in (418, 429):
+            retry_after = float(headers.get('Retry-After', 60))
+            self.tokens = min(self.tokens, 0)
+            self.paused_until = max(self.paused_until, time.monotonic() + retry_after)
+            if status == 418:
+                self.stats['banned'] += 1
+                logger.error(f"🚫 Binance IP ban (418) - pausing REST requests for {retry_after:.0f}s")
+            else:
+                self.stats['rate_limited'] += 1
+                logger.warning(f"⚠️ Binance rate limit (429) - pausing REST requests for {retry_after:.0f}s")
+    
+    def metrics(self) -> Dict[str, Any]:
+        """Budget hiện tại và thống kê"""
+        now = time.monotonic()
+        self._refill(now)
+        queued_by_priority: Dict[int, int] = {}
+        for waiter in self._queue:
+            queued_by_priority[waiter.priority] = queued_by_priority.get(waiter.priority, 0) + 1
+        
+        return {
+            'weight_limit': self.weight_limit,
+            'capacity': self.capacity,
+            'available_weight': max(0, int(self.tokens)),
+            'server_used_weight': self.server_used_weight,
+            'paused_for': max(0.0, self.paused_until - now),
+            'queue_length': len(self._queue),
+            'queued_by_priority': queued_by_priority,
+            **self.stats
+        }
+
+_shared_limiter: Optional[RateLimiter] = None
+
+def get_rate_limiter() -> RateLimiter:
+    """RateLimiter dùng chung trong process (weight limit của Binance tính theo IP)"""
+    global _shared_limiter
+    if _shared_limiter is None:
+        _shared_limiter = RateLimiter()
+    return _shared_limiter